@@ -0,0 +1,54 @@
+import itertools
+import os
+import time
+from typing import Callable, Dict, List, Optional, Tuple
+
+# Bumps with no guild invalidate every guild in the group
+ALL_GUILDS = "*"
+# Bumped by every change in the group, for responses that cover all guilds
+ANY_GUILD = "+"
+
+
+class DataVersions:
+    """
+    Change counters for data the dashboard serves with ETags.
+
+    Writers call bump() after committing a change to a group ("leveling",
+    "chat", "names"), optionally for one guild, and read endpoints build their
+    ETag from version(), so a client revalidating unchanged data gets a 304
+    without the handler running. Counters live in memory and start from zero,
+    so the process start time is part of every version to keep ETags from
+    a previous run from matching.
+    """
+
+    def __init__(self):
+        self.epoch = f"{int(time.time()):x}{os.getpid():x}"
+        self._counters: Dict[Tuple[str, str], int] = {}
+        self._clock = itertools.count(1)
+        self._listeners: List[Callable[[str, Optional[str]], None]] = []
+
+    def add_listener(self, callback: Callable[[str, Optional[str]], None]) -> None:
+        """Call ``callback(group, guild_id)`` after every bump, e.g. to forward it to a dashboard process."""
+        self._listeners.append(callback)
+
+    def remove_listener(self, callback: Callable[[str, Optional[str]], None]) -> None:
+        if callback in self._listeners:
+            self._listeners.remove(callback)
+
+    def bump(self, group: str, guild_id: Optional[str] = None) -> None:
+        """Record a committed change to ``group``, for one guild or (with no guild) for all of them."""
+        tick = next(self._clock)
+        self._counters[(group, str(guild_id) if guild_id else ALL_GUILDS)] = tick
+        self._counters[(group, ANY_GUILD)] = tick
+        for listener in self._listeners:
+            listener(group, str(guild_id) if guild_id else None)
+
+    def version(self, group: str, guild_id: Optional[str] = None) -> str:
+        """The current version of ``group``, scoped to one guild or covering every guild."""
+        if guild_id is None:
+            return f"{self._counters.get((group, ANY_GUILD), 0)}"
+        return (f"{self._counters.get((group, str(guild_id)), 0)}."
+                f"{self._counters.get((group, ALL_GUILDS), 0)}")
+
+
+data_versions = DataVersions()
@@ -6,6 +6,8 @@ from .database_pool import (
     DEFAULT_LEVELING_DB_PATH,
 )
 from .database_utils import optimized_db, batch_store_message
+from .guild_stats_registry import guild_stats_registry
+from .guild_stats_writer import guild_stats_writer
 
 # Basic URL matcher for stripping links from stored message content
 URL_PATTERN = re.compile(r'https?://\S+|www\.\S+')
@@ -146,6 +148,15 @@ async def store_message(conn, message, full_message_content):
                 row = await cursor2.fetchone()
                 return row[0] if row else None
 
+        # Keep the dashboard's running totals current without rescanning messages
+        guild_stats_registry.record_message(
+            str(message.guild.id), cursor.lastrowid, str(message.author.id),
+            str(message.channel.id), message.created_at
+        )
+        guild_stats_writer.record_message(
+            str(message.guild.id), cursor.lastrowid, str(message.channel.id), message.created_at
+        )
+
         return cursor.lastrowid  # Return ID for use in store_message_components
 
     except Exception as e:
@@ -365,8 +376,9 @@ async def store_message_optimized(message, full_message_content):
     await batch_store_message(message, full_message_content)
 
 async def flush_message_batches():
-    """Flush any pending message batches."""
+    """Flush any pending message batches and materialized guild stats."""
     await optimized_db.flush_message_batch()
+    await guild_stats_writer.stop()
 
 async def cleanup_old_data(days_to_keep: int = 365):
     """Clean up old database records."""
@@ -41,6 +41,25 @@ ON fetch_queue (status, priority DESC, created_at ASC);
 CREATE INDEX IF NOT EXISTS idx_fetch_progress_guild
 ON historical_fetch_progress (guild_id, is_scanning);
 
+-- Materialized message totals per guild, kept current by GuildStatsWriter.
+-- last_row_id is the highest chat_history.db messages.id already counted.
+CREATE TABLE IF NOT EXISTS guild_stats (
+    guild_id TEXT PRIMARY KEY,
+    total_messages INTEGER NOT NULL DEFAULT 0,
+    active_channels INTEGER NOT NULL DEFAULT 0,
+    oldest_message TEXT,
+    newest_message TEXT,
+    last_row_id INTEGER NOT NULL DEFAULT 0,
+    updated_at TEXT NOT NULL
+);
+
+CREATE TABLE IF NOT EXISTS guild_channel_stats (
+    guild_id TEXT NOT NULL,
+    channel_id TEXT NOT NULL,
+    message_count INTEGER NOT NULL DEFAULT 0,
+    PRIMARY KEY (guild_id, channel_id)
+);
+
 CREATE TABLE IF NOT EXISTS command_overrides (
     guild_id TEXT NOT NULL,
     command_name TEXT NOT NULL,
@@ -74,6 +93,26 @@ CREATE TABLE IF NOT EXISTS event_settings (
     updated_at TEXT NOT NULL
 );
 
+CREATE TABLE IF NOT EXISTS ai_usage_daily (
+    day TEXT NOT NULL,
+    guild_id TEXT NOT NULL,
+    mode TEXT NOT NULL,
+    requests INTEGER DEFAULT 0,
+    calls INTEGER DEFAULT 0,
+    errors INTEGER DEFAULT 0,
+    input_tokens INTEGER DEFAULT 0,
+    output_tokens INTEGER DEFAULT 0,
+    cache_read_tokens INTEGER DEFAULT 0,
+    cache_creation_tokens INTEGER DEFAULT 0,
+    tool_uses INTEGER DEFAULT 0,
+    refusal_retries INTEGER DEFAULT 0,
+    attachment_bytes INTEGER DEFAULT 0,
+    cost_usd REAL DEFAULT 0,
+    provider_latency_ms_total REAL DEFAULT 0,
+    e2e_latency_ms_total REAL DEFAULT 0,
+    PRIMARY KEY (day, guild_id, mode)
+);
+
 """
 
 # Per-guild database schema (chat history only)
@@ -99,13 +138,22 @@ ON messages (guild_id, channel_id, user_id, message_content);
 CREATE INDEX IF NOT EXISTS idx_messages_timestamp
 ON messages (timestamp);
 
-CREATE INDEX IF NOT EXISTS idx_messages_channel_timestamp
-ON messages (channel_id, timestamp DESC);
+-- Keyset pagination: (timestamp, id) order within a channel, scanned in either direction
+CREATE INDEX IF NOT EXISTS idx_messages_channel_keyset
+ON messages (channel_id, timestamp, id);
 
 CREATE UNIQUE INDEX IF NOT EXISTS idx_messages_discord_id
 ON messages (discord_message_id);
 """
 
+# Brings existing per-guild databases up to the current PER_GUILD_SCHEMA indexes
+PER_GUILD_INDEX_MIGRATIONS = """
+CREATE INDEX IF NOT EXISTS idx_messages_channel_keyset
+ON messages (channel_id, timestamp, id);
+
+DROP INDEX IF EXISTS idx_messages_channel_timestamp;
+"""
+
 # Birthdays database schema (per-guild)
 BIRTHDAYS_SCHEMA = """
 CREATE TABLE IF NOT EXISTS birthdays (
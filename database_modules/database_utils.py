@@ -3,6 +3,7 @@ import asyncio
 from typing import List, Dict, Any, Tuple
 from datetime import datetime, timedelta
 from .database_pool import get_main_pool
+from .data_versions import data_versions
 import discord
 
 class OptimizedDatabase:
@@ -293,6 +294,7 @@ import aiosqlite
 from .database_schema import (
     GUILD_CONFIG_SCHEMA,
     PER_GUILD_SCHEMA,
+    PER_GUILD_INDEX_MIGRATIONS,
     ATTACHMENTS_SCHEMA,
     EMBEDS_SCHEMA,
     BIRTHDAYS_SCHEMA,
@@ -400,6 +402,20 @@ async def initialize_guild_database(guild_id: str):
 
     logging.info(f"Initialized all databases for guild {guild_id}")
 
+async def migrate_guild_chat_indexes(guild_db_path: str):
+    """
+    Apply PER_GUILD_INDEX_MIGRATIONS to an existing chat_history.db.
+
+    Args:
+        guild_db_path: Path to the guild's chat_history.db
+    """
+    try:
+        async with aiosqlite.connect(guild_db_path) as conn:
+            await conn.executescript(PER_GUILD_INDEX_MIGRATIONS)
+            await conn.commit()
+    except Exception as e:
+        logging.error(f"Error migrating chat history indexes for {guild_db_path}: {e}")
+
 async def add_guild_to_config(guild_id: str, guild_name: str, logging_enabled: bool = True, bot_name: str = 'drongo'):
     """
     Add or update a guild in the configuration database.
@@ -424,6 +440,7 @@ async def add_guild_to_config(guild_id: str, guild_name: str, logging_enabled: b
         """, (guild_id, guild_name, 1 if logging_enabled else 0, bot_name.lower(), now, now))
 
         await conn.commit()
+        data_versions.bump("chat", guild_id)
 
     logging.info(f"Added/updated guild {guild_name} ({guild_id}) in config")
 
@@ -467,6 +484,7 @@ async def update_guild_logging(guild_id: str, enabled: bool):
         """, (1 if enabled else 0, datetime.now().isoformat(), guild_id))
 
         await conn.commit()
+        data_versions.bump("chat", guild_id)
 
     logging.info(f"Updated logging for guild {guild_id}: {'enabled' if enabled else 'disabled'}")
 
@@ -565,6 +583,7 @@ async def queue_channel_for_historical_fetch(
             """, (guild_id, channel_id))
 
         await conn.commit()
+        data_versions.bump("chat", guild_id)
 
         if job_created:
             logging.info(f"Queued channel {channel_name} ({channel_id}) for historical fetch")
@@ -611,6 +630,115 @@ async def is_guild_scanning(guild_id: str) -> bool:
             result = await cursor.fetchone()
             return result[0] > 0 if result else False
 
+async def get_scanning_guild_ids() -> set:
+    """
+    Get every guild currently being scanned for historical messages.
+
+    Returns:
+        set: Guild IDs with an unfinished scan in progress
+    """
+    config_db_path = get_guild_config_db_path()
+
+    async with aiosqlite.connect(config_db_path) as conn:
+        async with conn.execute("""
+            SELECT DISTINCT guild_id FROM historical_fetch_progress
+            WHERE is_scanning = 1 AND fetch_completed = 0
+        """) as cursor:
+            return {str(row[0]) for row in await cursor.fetchall()}
+
+async def get_fetch_progress() -> list:
+    """
+    Get historical fetch progress for every guild.
+
+    Returns:
+        list: One dict per guild with channel totals, messages fetched and completion
+    """
+    config_db_path = get_guild_config_db_path()
+    progress = []
+
+    async with aiosqlite.connect(config_db_path) as conn:
+        async with conn.execute("""
+            SELECT
+                guild_id,
+                COUNT(*) as total_channels,
+                SUM(CASE WHEN fetch_completed = 1 THEN 1 ELSE 0 END) as completed_channels,
+                SUM(total_fetched) as total_fetched,
+                MAX(last_fetch_timestamp) as last_fetch
+            FROM historical_fetch_progress
+            GROUP BY guild_id
+        """) as cursor:
+            for guild_id, total, completed, total_fetched, last_fetch in await cursor.fetchall():
+                progress.append({
+                    "guild_id": guild_id,
+                    "total_channels": total,
+                    "completed_channels": completed,
+                    "total_fetched": total_fetched or 0,
+                    "percentage": int((completed / total) * 100) if total > 0 else 0,
+                    "last_fetch": last_fetch,
+                    "is_complete": completed == total and total > 0
+                })
+
+    return progress
+
+async def get_chat_guild_summaries() -> list:
+    """
+    Get every guild's settings, materialized message stats and fetch progress in one query.
+
+    Returns:
+        list: One dict per guild in guild_settings
+    """
+    config_db_path = get_guild_config_db_path()
+
+    async with aiosqlite.connect(config_db_path) as conn:
+        conn.row_factory = aiosqlite.Row
+        async with conn.execute("""
+            SELECT
+                gs.guild_id,
+                gs.guild_name,
+                gs.logging_enabled,
+                gs.date_joined,
+                COALESCE(st.total_messages, 0) as total_messages,
+                st.newest_message as last_message_time,
+                COUNT(p.channel_id) as channels_total,
+                COALESCE(SUM(p.fetch_completed = 1), 0) as channels_done,
+                COALESCE(MAX(p.is_scanning = 1 AND p.fetch_completed = 0), 0) as is_scanning
+            FROM guild_settings gs
+            LEFT JOIN guild_stats st ON st.guild_id = gs.guild_id
+            LEFT JOIN historical_fetch_progress p ON p.guild_id = gs.guild_id
+            GROUP BY gs.guild_id
+        """) as cursor:
+            return [dict(row) for row in await cursor.fetchall()]
+
+async def get_guild_chat_summary(guild_id: str) -> dict:
+    """
+    Get a guild's materialized message stats and fetch progress in one query.
+
+    Args:
+        guild_id: Discord guild ID
+
+    Returns:
+        dict: Message totals, oldest/newest timestamps, scanning flag and fetch totals
+    """
+    config_db_path = get_guild_config_db_path()
+
+    async with aiosqlite.connect(config_db_path) as conn:
+        conn.row_factory = aiosqlite.Row
+        async with conn.execute("""
+            SELECT
+                COALESCE(st.total_messages, 0) as total_messages,
+                COALESCE(st.active_channels, 0) as active_channels,
+                st.oldest_message,
+                st.newest_message,
+                COALESCE(SUM(p.total_fetched), 0) as total_fetched,
+                COUNT(p.channel_id) as channels_tracking,
+                COALESCE(SUM(p.fetch_completed = 1), 0) as channels_completed,
+                COALESCE(MAX(p.is_scanning = 1 AND p.fetch_completed = 0), 0) as is_scanning
+            FROM (SELECT ? as guild_id) g
+            LEFT JOIN guild_stats st ON st.guild_id = g.guild_id
+            LEFT JOIN historical_fetch_progress p ON p.guild_id = g.guild_id
+        """, (guild_id,)) as cursor:
+            return dict(await cursor.fetchone())
+
 async def migrate_guild_config_add_bot_name():
     """
     Migration to add bot_name column to existing guild_settings table.
@@ -0,0 +1,206 @@
+import asyncio
+import logging
+import time
+from collections import deque
+from datetime import datetime
+from typing import Any, Callable, Dict, List, Optional
+
+import aiosqlite
+
+# Sliding window for "recent activity", kept as per-minute buckets
+RECENT_WINDOW_MINUTES = 60
+
+
+class GuildMessageStats:
+    """Running message totals for one guild's chat_history.db."""
+
+    __slots__ = ("guild_id", "total_messages", "users", "channel_counts", "last_message",
+                 "buckets", "seeded_max_id", "pending")
+
+    def __init__(self, guild_id: str):
+        self.guild_id = guild_id
+        self.total_messages = 0
+        self.users = set()
+        self.channel_counts: Dict[str, int] = {}
+        self.last_message: Optional[str] = None
+        self.buckets = deque()  # [minute, count], oldest first
+        self.seeded_max_id: Optional[int] = None  # None while the seed scan is running
+        self.pending: List[tuple] = []
+
+    def apply(self, row_id: int, user_id: str, channel_id: str, created_at: datetime) -> None:
+        if self.seeded_max_id is not None and row_id <= self.seeded_max_id:
+            return  # Already counted by the seed scan
+        self.total_messages += 1
+        self.users.add(user_id)
+        self.channel_counts[channel_id] = self.channel_counts.get(channel_id, 0) + 1
+        timestamp = created_at.isoformat()
+        if self.last_message is None or timestamp > self.last_message:
+            self.last_message = timestamp
+        self.add_to_window(int(created_at.timestamp() // 60), 1)
+
+    def add_to_window(self, minute: int, count: int) -> None:
+        if minute <= int(time.time() // 60) - RECENT_WINDOW_MINUTES:
+            return
+        if self.buckets and self.buckets[-1][0] == minute:
+            self.buckets[-1][1] += count
+            return
+        if not self.buckets or self.buckets[-1][0] < minute:
+            self.buckets.append([minute, count])
+            return
+        # Late arrival (e.g. a historical fetch); the window is at most 60 buckets
+        for bucket in self.buckets:
+            if bucket[0] == minute:
+                bucket[1] += count
+                return
+        self.buckets.append([minute, count])
+        self.buckets = deque(sorted(self.buckets))
+
+    def recent_activity(self) -> int:
+        cutoff = int(time.time() // 60) - RECENT_WINDOW_MINUTES
+        while self.buckets and self.buckets[0][0] <= cutoff:
+            self.buckets.popleft()
+        return sum(count for _, count in self.buckets)
+
+    def snapshot(self) -> Dict[str, Any]:
+        return {
+            "total_messages": self.total_messages,
+            "unique_users": len(self.users),
+            "active_channels": len(self.channel_counts),
+            "recent_activity": self.recent_activity(),
+            "last_message": self.last_message
+        }
+
+
+class GuildStatsRegistry:
+    """
+    Per-guild message statistics maintained by the ingest path.
+
+    Each guild is seeded with one scan of its chat_history.db, after which
+    store_message keeps the totals current, so reading stats never touches
+    the message tables. The seed records the highest message row id it
+    counted; messages stored while the scan runs are buffered and only
+    applied if their row id is newer, so nothing is counted twice.
+    """
+
+    def __init__(self):
+        self.guilds: Dict[str, GuildMessageStats] = {}
+        self._seeding: Dict[str, asyncio.Task] = {}
+        self._listeners: List[Callable[[str, int, str, str, datetime], None]] = []
+
+        self.stats = {
+            "guilds_seeded": 0,
+            "seed_errors": 0,
+            "seed_ms": 0.0,
+            "messages_recorded": 0
+        }
+
+    def add_listener(self, callback: Callable[[str, int, str, str, datetime], None]) -> None:
+        """Call ``callback(guild_id, row_id, user_id, channel_id, created_at)`` for every recorded message."""
+        self._listeners.append(callback)
+
+    def remove_listener(self, callback: Callable[[str, int, str, str, datetime], None]) -> None:
+        if callback in self._listeners:
+            self._listeners.remove(callback)
+
+    def record_message(self, guild_id: str, row_id: int, user_id: str, channel_id: str,
+                       created_at: datetime) -> None:
+        """Count a newly inserted message. Guilds that haven't been seeded yet pick it up from the scan."""
+        for listener in self._listeners:
+            listener(guild_id, row_id, user_id, channel_id, created_at)
+        state = self.guilds.get(guild_id)
+        if state is None:
+            return
+        self.stats["messages_recorded"] += 1
+        if state.seeded_max_id is None:
+            state.pending.append((row_id, user_id, channel_id, created_at))
+        else:
+            state.apply(row_id, user_id, channel_id, created_at)
+
+    async def get_guild_stats(self, guild_id: str, db_path: str) -> Dict[str, Any]:
+        """Return a guild's stats, seeding it from its database the first time it is seen."""
+        state = self.guilds.get(guild_id)
+        if state is None or state.seeded_max_id is None:
+            await self.seed_guild(guild_id, db_path)
+            state = self.guilds[guild_id]
+        return state.snapshot()
+
+    async def get_channel_counts(self, guild_id: str, db_path: str) -> Dict[str, int]:
+        """Return message counts per channel for a guild, seeding it the first time it is seen."""
+        state = self.guilds.get(guild_id)
+        if state is None or state.seeded_max_id is None:
+            await self.seed_guild(guild_id, db_path)
+            state = self.guilds[guild_id]
+        return dict(state.channel_counts)
+
+    async def seed_all(self, db_paths: Dict[str, str]) -> None:
+        """Seed every guild in ``db_paths`` (guild_id -> chat_history.db path)."""
+        for guild_id, db_path in db_paths.items():
+            await self.seed_guild(guild_id, db_path)
+
+    async def seed_guild(self, guild_id: str, db_path: str) -> None:
+        state = self.guilds.get(guild_id)
+        if state is not None and state.seeded_max_id is not None:
+            return
+        task = self._seeding.get(guild_id)
+        if task is None:
+            task = asyncio.create_task(self._seed(guild_id, db_path))
+            self._seeding[guild_id] = task
+        await asyncio.shield(task)
+
+    async def _seed(self, guild_id: str, db_path: str) -> None:
+        started_at = time.perf_counter()
+        state = GuildMessageStats(guild_id)
+        self.guilds[guild_id] = state
+        try:
+            async with aiosqlite.connect(db_path) as conn:
+                # One read transaction so every figure comes from the same snapshot
+                await conn.execute("BEGIN")
+                async with conn.execute("SELECT COUNT(*), MAX(id), MAX(timestamp) FROM messages") as cursor:
+                    total_messages, max_id, last_message = await cursor.fetchone()
+                async with conn.execute("SELECT DISTINCT user_id FROM messages") as cursor:
+                    users = {row[0] for row in await cursor.fetchall()}
+                async with conn.execute("SELECT channel_id, COUNT(*) FROM messages GROUP BY channel_id") as cursor:
+                    channel_counts = dict(await cursor.fetchall())
+                async with conn.execute("""
+                    SELECT CAST(strftime('%s', timestamp) AS INTEGER) / 60 AS minute, COUNT(*)
+                    FROM messages
+                    WHERE datetime(timestamp) > datetime('now', ?)
+                    GROUP BY minute
+                """, (f"-{RECENT_WINDOW_MINUTES} minutes",)) as cursor:
+                    window = await cursor.fetchall()
+                await conn.execute("COMMIT")
+        except Exception as e:
+            self.stats["seed_errors"] += 1
+            logging.error(f"Error seeding message stats for guild {guild_id}: {e}")
+            # Drop the partial state so the next read retries the scan
+            self.guilds.pop(guild_id, None)
+            self._seeding.pop(guild_id, None)
+            raise
+
+        state.total_messages = total_messages or 0
+        state.users = users
+        state.channel_counts = channel_counts
+        state.last_message = last_message
+        for minute, count in sorted(window):
+            if minute is not None:
+                state.add_to_window(minute, count)
+        state.seeded_max_id = max_id or 0
+
+        pending, state.pending = state.pending, []
+        for row_id, user_id, channel_id, created_at in pending:
+            state.apply(row_id, user_id, channel_id, created_at)
+
+        self._seeding.pop(guild_id, None)
+        self.stats["guilds_seeded"] += 1
+        self.stats["seed_ms"] += round((time.perf_counter() - started_at) * 1000, 2)
+
+    def reset(self) -> None:
+        """Forget every seeded guild so the next read scans its database again."""
+        for guild_id in [guild_id for guild_id in self.guilds if guild_id not in self._seeding]:
+            del self.guilds[guild_id]
+
+    def get_stats(self) -> Dict[str, Any]:
+        return dict(self.stats, guilds=len(self.guilds))
+
+
+guild_stats_registry = GuildStatsRegistry()
@@ -0,0 +1,235 @@
+import asyncio
+import logging
+import os
+import time
+from datetime import datetime
+from typing import Any, Dict, List, Optional, Tuple
+
+import aiosqlite
+
+from .data_versions import data_versions
+from .database_schema import GUILD_CONFIG_SCHEMA, get_guild_config_db_path, get_guild_db_path
+
+# Seconds recorded messages wait before they are written to guild_stats
+GUILD_STATS_FLUSH_DEADLINE = float(os.getenv("DRONGO_GUILD_STATS_FLUSH_DEADLINE", "1.0"))
+
+
+class GuildStatsWriter:
+    """
+    Maintains the materialized guild_stats and guild_channel_stats tables.
+
+    store_message records every newly inserted row, from live messages and
+    the historical fetcher alike, and the writer applies them to
+    guild_config.db in one transaction per flush, so the chat endpoints read
+    a guild's totals from a single row instead of counting its messages.
+
+    guild_stats.last_row_id is the highest messages.id already counted. The
+    first flush for a guild in each process catches up on rows above it
+    (a full scan the first time a guild is seen, otherwise only rows whose
+    flush was lost to a crash), and recorded rows at or below the watermark
+    are skipped, so nothing is counted twice.
+    """
+
+    def __init__(self, flush_deadline: float = GUILD_STATS_FLUSH_DEADLINE):
+        self.flush_deadline = flush_deadline
+
+        # guild_id -> [(row_id, channel_id, timestamp)]
+        self._pending: Dict[str, List[Tuple[int, str, str]]] = {}
+        self._caught_up = set()
+        self._schema_ready = False
+        self._wakeup = asyncio.Event()
+        self._flush_lock = asyncio.Lock()
+        self._task: Optional[asyncio.Task] = None
+
+        self.stats = {
+            "messages_recorded": 0,
+            "messages_applied": 0,
+            "flushes": 0,
+            "failed_flushes": 0,
+            "guilds_caught_up": 0,
+            "catch_up_ms": 0.0
+        }
+
+    # =========================================================================
+    # LIFECYCLE
+    # =========================================================================
+
+    def start(self) -> None:
+        """Start the background flush task."""
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        """Stop the flush task and write anything still queued."""
+        if self._task:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        await self.flush()
+
+    async def _run(self) -> None:
+        while True:
+            await self._wakeup.wait()
+            await asyncio.sleep(self.flush_deadline)
+            self._wakeup.clear()
+            await self.flush()
+
+    # =========================================================================
+    # RECORDING
+    # =========================================================================
+
+    def record_message(self, guild_id: str, row_id: int, channel_id: str, created_at: datetime) -> None:
+        """Queue a newly inserted message for the next flush."""
+        try:
+            self.start()
+        except RuntimeError:
+            return  # No running loop; the next catch-up counts it from the database
+        self._pending.setdefault(guild_id, []).append((row_id, channel_id, created_at.isoformat()))
+        self.stats["messages_recorded"] += 1
+        self._wakeup.set()
+
+    async def catch_up(self, guild_ids: List[str]) -> None:
+        """Bring each guild's row up to date with its chat_history.db, e.g. at startup."""
+        async with self._flush_lock:
+            try:
+                async with aiosqlite.connect(get_guild_config_db_path()) as conn:
+                    await self._ensure_schema(conn)
+                    for guild_id in guild_ids:
+                        if guild_id not in self._caught_up:
+                            await self._catch_up_guild(conn, guild_id)
+                    await conn.commit()
+                data_versions.bump("chat")
+            except Exception as e:
+                logging.error(f"Error catching up guild stats: {e}")
+
+    # =========================================================================
+    # FLUSHING
+    # =========================================================================
+
+    async def flush(self) -> None:
+        """Apply every queued message to guild_stats in one transaction."""
+        async with self._flush_lock:
+            if not self._pending:
+                return
+
+            pending, self._pending = self._pending, {}
+            try:
+                async with aiosqlite.connect(get_guild_config_db_path()) as conn:
+                    await self._ensure_schema(conn)
+                    for guild_id, rows in pending.items():
+                        if guild_id not in self._caught_up:
+                            await self._catch_up_guild(conn, guild_id)
+                        await self._apply(conn, guild_id, rows)
+                    await conn.commit()
+                self.stats["flushes"] += 1
+                for guild_id in pending:
+                    data_versions.bump("chat", guild_id)
+            except Exception as e:
+                self.stats["failed_flushes"] += 1
+                # The rows are in chat_history.db; catching up again recounts them
+                self._caught_up.difference_update(pending)
+                logging.error(f"Error writing guild stats for {len(pending)} guilds: {e}")
+
+    async def _ensure_schema(self, conn) -> None:
+        if not self._schema_ready:
+            await conn.executescript(GUILD_CONFIG_SCHEMA)
+            self._schema_ready = True
+
+    async def _apply(self, conn, guild_id: str, rows: List[Tuple[int, str, str]]) -> None:
+        async with conn.execute(
+            "SELECT last_row_id FROM guild_stats WHERE guild_id = ?", (guild_id,)
+        ) as cursor:
+            row = await cursor.fetchone()
+        watermark = row[0] if row else 0
+
+        channel_counts: Dict[str, int] = {}
+        count = 0
+        oldest = newest = None
+        max_row_id = watermark
+        for row_id, channel_id, timestamp in rows:
+            if row_id <= watermark:
+                continue  # Already counted by the catch-up scan
+            count += 1
+            channel_counts[channel_id] = channel_counts.get(channel_id, 0) + 1
+            oldest = timestamp if oldest is None or timestamp < oldest else oldest
+            newest = timestamp if newest is None or timestamp > newest else newest
+            max_row_id = max(max_row_id, row_id)
+
+        if count:
+            await self._add(conn, guild_id, count, channel_counts, oldest, newest, max_row_id)
+            self.stats["messages_applied"] += count
+
+    async def _catch_up_guild(self, conn, guild_id: str) -> None:
+        """Count rows above the guild's watermark straight from its chat_history.db."""
+        started_at = time.perf_counter()
+        async with conn.execute(
+            "SELECT last_row_id FROM guild_stats WHERE guild_id = ?", (guild_id,)
+        ) as cursor:
+            row = await cursor.fetchone()
+        watermark = row[0] if row else 0
+
+        guild_db_path = get_guild_db_path(guild_id)
+        if os.path.exists(guild_db_path):
+            async with aiosqlite.connect(guild_db_path) as guild_conn:
+                # One read transaction so the totals and the new watermark agree
+                await guild_conn.execute("BEGIN")
+                async with guild_conn.execute("""
+                    SELECT COUNT(*), MIN(timestamp), MAX(timestamp), MAX(id)
+                    FROM messages WHERE id > ?
+                """, (watermark,)) as cursor:
+                    count, oldest, newest, max_row_id = await cursor.fetchone()
+                async with guild_conn.execute("""
+                    SELECT channel_id, COUNT(*) FROM messages
+                    WHERE id > ? GROUP BY channel_id
+                """, (watermark,)) as cursor:
+                    channel_counts = dict(await cursor.fetchall())
+                await guild_conn.execute("COMMIT")
+        else:
+            count, oldest, newest, max_row_id, channel_counts = 0, None, None, None, {}
+
+        await self._add(conn, guild_id, count or 0, channel_counts, oldest, newest, max_row_id or watermark)
+        self._caught_up.add(guild_id)
+        self.stats["guilds_caught_up"] += 1
+        self.stats["catch_up_ms"] += round((time.perf_counter() - started_at) * 1000, 2)
+
+    async def _add(self, conn, guild_id: str, count: int, channel_counts: Dict[str, int],
+                   oldest: Optional[str], newest: Optional[str], last_row_id: int) -> None:
+        if channel_counts:
+            await conn.executemany("""
+                INSERT INTO guild_channel_stats (guild_id, channel_id, message_count)
+                VALUES (?, ?, ?)
+                ON CONFLICT(guild_id, channel_id) DO UPDATE SET
+                    message_count = message_count + excluded.message_count
+            """, [(guild_id, channel_id, n) for channel_id, n in channel_counts.items()])
+
+        await conn.execute("""
+            INSERT INTO guild_stats (
+                guild_id, total_messages, active_channels, oldest_message, newest_message,
+                last_row_id, updated_at
+            )
+            VALUES (?, ?, (SELECT COUNT(*) FROM guild_channel_stats WHERE guild_id = ?), ?, ?, ?, ?)
+            ON CONFLICT(guild_id) DO UPDATE SET
+                total_messages = total_messages + excluded.total_messages,
+                active_channels = excluded.active_channels,
+                oldest_message = CASE
+                    WHEN oldest_message IS NULL OR excluded.oldest_message < oldest_message
+                    THEN excluded.oldest_message ELSE oldest_message END,
+                newest_message = CASE
+                    WHEN newest_message IS NULL OR excluded.newest_message > newest_message
+                    THEN excluded.newest_message ELSE newest_message END,
+                last_row_id = MAX(last_row_id, excluded.last_row_id),
+                updated_at = excluded.updated_at
+        """, (guild_id, count, guild_id, oldest, newest, last_row_id, datetime.now().isoformat()))
+
+    def get_stats(self) -> Dict[str, Any]:
+        return dict(
+            self.stats,
+            pending_messages=sum(len(rows) for rows in self._pending.values()),
+            guilds_tracked=len(self._caught_up)
+        )
+
+
+guild_stats_writer = GuildStatsWriter()
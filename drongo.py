@@ -9,6 +9,7 @@ from database_modules.database_pool import close_all_pools
 from database_modules import command_database
 from modules.dashboard_manager import DashboardManager
 from web.dashboard import app as dashboard_app, set_bot_instance
+from web.dashboard.ipc import DASHBOARD_MODE
 from modules.ai import AIHandler
 from modules.leveling_system import get_leveling_system
 from modules.config import token, authorized_user_id, anthropic_api_key
@@ -31,6 +32,7 @@ class DrongoBot(commands.Bot):
         self.historical_fetcher = None
         self.start_time = None
         self.dashboard_opened = False
+        self.dashboard_process = None
         self.add_listener(self.track_command_usage, 'on_interaction')
 
     async def setup_hook(self):
@@ -161,8 +163,10 @@ class DrongoBot(commands.Bot):
         from modules.ai.anthropic import ai
         ai.setup(self)
         await self.ai_handler.load_persisted_modes()
+        self.ai_handler.telemetry.start()
 
         self.leveling_system = get_leveling_system(self)
+        await self.leveling_system.initialize()
         self.logger.info("Leveling system initialized")
 
         from modules.historical_fetcher import HistoricalMessageFetcher
@@ -192,7 +196,11 @@ class DrongoBot(commands.Bot):
                 logging.error(f"Error processing AI message: {str(e)}")
 
     async def run_dashboard(self):
-        """Run the Quart dashboard server using Hypercorn."""
+        """Run the Quart dashboard server using Hypercorn, on this loop or (split mode) in its own process."""
+        if DASHBOARD_MODE == "split":
+            await self.run_dashboard_process()
+            return
+
         try:
             from hypercorn.asyncio import serve
             from hypercorn.config import Config
@@ -209,6 +217,20 @@ class DrongoBot(commands.Bot):
         except Exception as e:
             logging.error(f"Failed to start dashboard server: {e}")
 
+    async def run_dashboard_process(self):
+        """Serve the dashboard from a child process that reaches the bot over the IPC socket."""
+        from web.dashboard.ipc_server import DashboardIPCServer, DashboardProcess
+        from web.dashboard.stats_service import prepare_guild_databases
+
+        try:
+            self.dashboard_process = DashboardProcess(DashboardIPCServer(self))
+            await self.dashboard_process.start()
+            # The dashboard process only reads, so the bot runs the startup migrations
+            self.loop.create_task(prepare_guild_databases())
+            logging.info("Dashboard process starting on port 5001")
+        except Exception as e:
+            logging.error(f"Failed to start dashboard process: {e}")
+
 
 intents = discord.Intents.default()
 intents.message_content = True
@@ -233,9 +255,18 @@ def signal_handler(sig, frame):
             logging.error(f"Error shutting down dashboard server: {e}")
         finally:
             try:
+                if bot.dashboard_process:
+                    await bot.dashboard_process.stop()
+
                 if hasattr(bot, 'historical_fetcher') and bot.historical_fetcher:
                     await bot.historical_fetcher.stop()
 
+                if bot.ai_handler:
+                    await bot.ai_handler.telemetry.stop()
+
+                if bot.leveling_system:
+                    await bot.leveling_system.shutdown()
+
                 await flush_message_batches()
                 await close_all_pools()
 
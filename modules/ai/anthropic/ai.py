@@ -1,9 +1,11 @@
 from anthropic import AsyncAnthropic
 import discord
 import traceback
+import asyncio
 import random
+import time
 import re
-from typing import List, Dict, Any, Optional
+from typing import List, Dict, Any, Optional, Tuple
 import datetime
 
 from .ai_constants import (
@@ -17,7 +19,9 @@ from .ai_constants import (
     COMMAND_SETMODE_DESC, COMMAND_LISTMODES_DESC,
     LISTMODES_HEADER, LISTMODES_NAME_FORMAT,
     LISTMODES_CHANCE_FORMAT, LISTMODES_RATIO_FORMAT,
-    LISTMODES_SEPARATOR
+    LISTMODES_SEPARATOR,
+    HEDGED_FALLBACK_ENABLED, RESPONSE_MODE_SEQUENTIAL, RESPONSE_MODE_HEDGED,
+    TELEMETRY_MODE_CHAT, TELEMETRY_MODE_MODE_CHANGE
 )
 from .prompts import (
     SYSTEM_PROMPT, get_system_prompt, get_insult_prompt,
@@ -25,9 +29,12 @@ from .prompts import (
 )
 from .ai_handlers import (
     MessageHandler, AttachmentHandler,
-    ConversationManager, ProbabilityManager
+    ConversationManager, ProbabilityManager, RefusalTracker
 )
+from .context_provider import ChannelContextProvider
+from .ai_telemetry import AITelemetry, ModelUsage, begin_request, request_elapsed, attachment_bytes
 from database_modules.ai_mode_overrides import get_all_ai_modes, set_ai_mode
+from modules.ttl_cache import TTLCache
 
 class AIHandler:
     def __init__(self, bot: discord.Client, anthropic_api_key: str):
@@ -40,21 +47,25 @@ class AIHandler:
         self.attachment_handler = AttachmentHandler()
         self.conversation_manager = ConversationManager()
         self.probability_manager = ProbabilityManager()
+        self.refusal_tracker = RefusalTracker()
+        self.context_provider = ChannelContextProvider(bot)
+        self.telemetry = AITelemetry()
 
-        # Cache for bot names per guild
-        self.bot_name_cache = {}
+        # Race primary and fallback prompts for guilds that refuse often
+        self.hedged_fallback_enabled = HEDGED_FALLBACK_ENABLED
+
+        # Cache for bot names per guild; renames clear it explicitly, the TTL is a backstop
+        self.bot_name_cache = TTLCache(maxsize=1000, ttl=3600, name="bot_names")
 
     async def get_bot_name_for_guild(self, guild_id: str) -> str:
         """Get the custom bot name for a guild with caching."""
-        if guild_id not in self.bot_name_cache:
-            from database_modules.database_utils import get_guild_bot_name
-            self.bot_name_cache[guild_id] = await get_guild_bot_name(guild_id)
-        return self.bot_name_cache[guild_id]
+        from database_modules.database_utils import get_guild_bot_name
+        return await self.bot_name_cache.get_or_load(guild_id, lambda: get_guild_bot_name(guild_id))
 
     def clear_bot_name_cache(self, guild_id: str = None):
         """Clear bot name cache for a guild or all guilds."""
         if guild_id:
-            self.bot_name_cache.pop(guild_id, None)
+            self.bot_name_cache.invalidate(guild_id)
         else:
             self.bot_name_cache.clear()
 
@@ -92,20 +103,33 @@ class AIHandler:
         trigger_phrase = self.get_trigger_phrase(bot_name)
         trigger_pattern = self.get_trigger_pattern(bot_name)
         self.bot.logger.info(f"Handling '{trigger_phrase}' message")
+        guild_id = str(message.guild.id) if message.guild else "DM"
+        usage = ModelUsage()
+        started_at = time.perf_counter()
+        error = False
         async with message.channel.typing():
             try:
                 # Remove trigger phrase from the beginning of the message
                 cleaned_content = trigger_pattern.sub('', full_message_content).strip()
                 self.bot.logger.info(f"Cleaned content: {cleaned_content}")
 
+                # Give the model the recent channel conversation from the local store
+                recent_messages = await self.context_provider.get_recent_messages(message)
+                channel_context = self.context_provider.format_recent_messages(recent_messages)
+                prompt_text = f"{channel_context}\n\n{cleaned_content}" if channel_context else cleaned_content
+
                 # Construct the message content array with both text and images
                 message_content_for_api = []
                 message_content_for_api.extend(image_attachments)
                 message_content_for_api.append({
                     KEY_TYPE: CONTENT_TYPE_TEXT,
-                    "text": cleaned_content
+                    "text": prompt_text
                 })
-                self.bot.logger.info(f"Message content array for API: {message_content_for_api}")
+                # Never log image payloads; they are base64 and can be megabytes
+                self.bot.logger.debug(
+                    f"Message content for API: {len(prompt_text)} text chars, "
+                    f"{len(image_attachments)} image(s), {attachment_bytes(image_attachments)} attachment bytes"
+                )
 
                 # Update conversation history with user's message
                 self.conversation_manager.update_history(str(message.author.id), ROLE_USER, cleaned_content)
@@ -135,7 +159,9 @@ class AIHandler:
 
                 # Get response from Claude
                 self.bot.logger.info("Sending request to Claude")
+                call_started_at = time.perf_counter()
                 response = await self.anthropic_client.messages.create(**api_call_args)
+                usage.add_response(response, time.perf_counter() - call_started_at)
 
                 # Find the text content from the response, which may include tool use
                 claude_response_text = ""
@@ -154,6 +180,7 @@ class AIHandler:
                 # Send the split response
                 await self.message_handler.send_split_message(message.channel, claude_response_text, reply_to=message)
             except Exception as e:
+                error = True
                 error_traceback = traceback.format_exc()
                 error_msg = f"""
                                 Error in Claude response:
@@ -168,9 +195,18 @@ class AIHandler:
                             """
                 self.bot.logger.error(error_msg)
                 await message.reply(ERROR_MESSAGES["general_error"])
+            finally:
+                self.telemetry.record(
+                    guild_id,
+                    TELEMETRY_MODE_CHAT,
+                    usage,
+                    request_elapsed(started_at),
+                    attachment_size=attachment_bytes(image_attachments),
+                    error=error
+                )
 
-    async def _collect_attachments(self, message: discord.Message) -> tuple[List[str], List[Dict[str, Any]]]:
-        """Collect text and image attachment content for a message."""
+    async def _collect_attachments(self, message) -> tuple[List[str], List[Dict[str, Any]]]:
+        """Collect text and image attachment content for a message (or ContextMessage)."""
         text_contents: List[str] = []
         image_attachments: List[Dict[str, Any]] = []
 
@@ -185,6 +221,92 @@ class AIHandler:
 
         return text_contents, image_attachments
 
+    def _build_brief_content(self, image_attachments: List[Dict[str, Any]], prompt_text: str) -> List[Dict[str, Any]]:
+        """Build the content array for a brief response request."""
+        content = []
+        content.extend(image_attachments)
+        content.append({
+            KEY_TYPE: CONTENT_TYPE_TEXT,
+            "text": prompt_text
+        })
+        return content
+
+    async def _create_brief_completion(self, message_content: List[Dict[str, Any]],
+                                       usage: Optional[ModelUsage] = None) -> str:
+        """Request a brief completion and return its stripped text."""
+        call_started_at = time.perf_counter()
+        response = await self.anthropic_client.messages.create(
+            model=DEFAULT_MODEL,
+            max_tokens=BRIEF_MAX_TOKENS,
+            messages=[{KEY_ROLE: ROLE_USER, KEY_CONTENT: message_content}],
+            temperature=BRIEF_TEMPERATURE,
+        )
+        if usage is not None:
+            usage.add_response(response, time.perf_counter() - call_started_at)
+        return response.content[0].text.strip()
+
+    async def _run_sequential_fallback(
+        self,
+        message_content: List[Dict[str, Any]],
+        fallback_content: Optional[List[Dict[str, Any]]],
+        usage: Optional[ModelUsage] = None
+    ) -> Tuple[str, bool, bool]:
+        """Run the primary prompt, retrying with the fallback only after a refusal.
+
+        Returns (response_text, used_fallback, primary_refused).
+        """
+        response_text = await self._create_brief_completion(message_content, usage)
+        primary_refused = self._looks_like_refusal(response_text)
+
+        # Retry once with a stricter safe-roast prompt when the model refuses.
+        if fallback_content is not None and primary_refused:
+            fallback_text = await self._create_brief_completion(fallback_content, usage)
+            if fallback_text:
+                return fallback_text, True, primary_refused
+
+        return response_text, False, primary_refused
+
+    async def _run_hedged_fallback(
+        self,
+        message_content: List[Dict[str, Any]],
+        fallback_content: List[Dict[str, Any]],
+        usage: Optional[ModelUsage] = None
+    ) -> Tuple[str, bool, Optional[bool]]:
+        """Start primary and fallback prompts together; the first acceptable answer wins.
+
+        Returns (response_text, used_fallback, primary_refused). primary_refused is
+        None when the primary request was cancelled before it finished.
+        """
+        primary_task = asyncio.create_task(self._create_brief_completion(message_content, usage))
+        fallback_task = asyncio.create_task(self._create_brief_completion(fallback_content, usage))
+        pending = {primary_task, fallback_task}
+        primary_refused: Optional[bool] = None
+
+        try:
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+
+                # Prefer the primary answer when both land together and it isn't a refusal
+                if primary_task in done and primary_task.exception() is None:
+                    primary_refused = self._looks_like_refusal(primary_task.result())
+                    if not primary_refused:
+                        return primary_task.result(), False, False
+
+                if fallback_task in done and fallback_task.exception() is None:
+                    fallback_text = fallback_task.result()
+                    if fallback_text:
+                        return fallback_text, True, primary_refused
+
+            # Neither answer was acceptable; keep the refusal like the sequential path does
+            if primary_task.exception() is None:
+                return primary_task.result(), False, primary_refused
+            raise primary_task.exception()
+        finally:
+            for task in pending:
+                task.cancel()
+            if pending:
+                await asyncio.gather(*pending, return_exceptions=True)
+
     async def _generate_brief_response(
         self,
         message: discord.Message,
@@ -194,6 +316,11 @@ class AIHandler:
         fallback_prompt_text: Optional[str] = None
     ) -> str:
         # Helper method to generate brief responses (insults/compliments) with image support
+        guild_id = str(message.guild.id) if message.guild else "DM"
+        usage = ModelUsage()
+        started_at = time.perf_counter()
+        refusal_retries = 0
+        error = False
         async with message.channel.typing():
             try:
                 # Process image attachments if not already provided by process_message.
@@ -203,43 +330,45 @@ class AIHandler:
                     image_attachments = list(image_attachments)
 
                 # Construct message content array with both text and images
-                message_content = []
-                message_content.extend(image_attachments)
-                message_content.append({
-                    KEY_TYPE: CONTENT_TYPE_TEXT,
-                    "text": prompt_text
-                })
-
-                response = await self.anthropic_client.messages.create(
-                    model=DEFAULT_MODEL,
-                    max_tokens=BRIEF_MAX_TOKENS,
-                    messages=[{KEY_ROLE: ROLE_USER, KEY_CONTENT: message_content}],
-                    temperature=BRIEF_TEMPERATURE,
+                message_content = self._build_brief_content(image_attachments, prompt_text)
+                fallback_content = None
+                if fallback_prompt_text:
+                    fallback_content = self._build_brief_content(image_attachments, fallback_prompt_text)
+
+                # Hedge only when a fallback exists and this guild has been refusing often
+                hedged = (
+                    fallback_content is not None
+                    and self.hedged_fallback_enabled
+                    and self.refusal_tracker.should_hedge(guild_id)
                 )
 
-                response_text = response.content[0].text.strip()
-
-                # Retry once with a stricter safe-roast prompt when the model refuses.
-                if fallback_prompt_text and self._looks_like_refusal(response_text):
-                    fallback_content = []
-                    fallback_content.extend(image_attachments)
-                    fallback_content.append({
-                        KEY_TYPE: CONTENT_TYPE_TEXT,
-                        "text": fallback_prompt_text
-                    })
-                    fallback_response = await self.anthropic_client.messages.create(
-                        model=DEFAULT_MODEL,
-                        max_tokens=BRIEF_MAX_TOKENS,
-                        messages=[{KEY_ROLE: ROLE_USER, KEY_CONTENT: fallback_content}],
-                        temperature=BRIEF_TEMPERATURE,
+                started_at = time.perf_counter()
+                if hedged:
+                    response_text, used_fallback, primary_refused = await self._run_hedged_fallback(
+                        message_content, fallback_content, usage
                     )
-                    fallback_text = fallback_response.content[0].text.strip()
-                    if fallback_text:
-                        response_text = fallback_text
+                    refusal_retries = 1
+                else:
+                    response_text, used_fallback, primary_refused = await self._run_sequential_fallback(
+                        message_content, fallback_content, usage
+                    )
+                    refusal_retries = 1 if fallback_content is not None and primary_refused else 0
+                latency = time.perf_counter() - started_at
+
+                # Only fallback-capable responses feed the hedging decision
+                if fallback_content is not None and primary_refused is not None:
+                    self.refusal_tracker.record_outcome(guild_id, primary_refused)
+                self.refusal_tracker.record_latency(
+                    RESPONSE_MODE_HEDGED if hedged else RESPONSE_MODE_SEQUENTIAL,
+                    latency,
+                    primary_refused,
+                    used_fallback
+                )
 
                 await message.reply(response_text)
                 return response_text
             except Exception as e:
+                error = True
                 error_traceback = traceback.format_exc()
                 error_msg = f"""
                                 Error generating {response_type}:
@@ -254,6 +383,16 @@ class AIHandler:
                             """
                 self.bot.logger.error(error_msg)
                 return f"Error generating {response_type}: {str(e)}"
+            finally:
+                self.telemetry.record(
+                    guild_id,
+                    response_type,
+                    usage,
+                    request_elapsed(started_at),
+                    refusal_retries=refusal_retries,
+                    attachment_size=attachment_bytes(image_attachments or []),
+                    error=error
+                )
 
     async def generate_insult(
         self,
@@ -289,6 +428,7 @@ class AIHandler:
     async def process_message(self, message: discord.Message) -> str:
         # Process a message and generate appropriate responses.
         self.bot.logger.info(f"Processing message: {message.content}")
+        begin_request()
 
         # Get guild-specific bot name
         guild_id = str(message.guild.id) if message.guild else "DM"
@@ -303,18 +443,20 @@ class AIHandler:
         referenced_content = ""
         if message.reference is not None:
             try:
-                reply_message = await message.channel.fetch_message(message.reference.message_id)
-                referenced_content = f"Message being replied to: {reply_message.content}\n\n"
-
-                # Include referenced-message attachments so image-only replies still work.
-                reply_text_contents, reply_image_attachments = await self._collect_attachments(reply_message)
-                text_contents.extend(
-                    f"(From replied message) {text_content}"
-                    for text_content in reply_text_contents
-                )
-                image_attachments.extend(reply_image_attachments)
+                # Resolved from the reply payload or local store; REST is the last resort
+                reply_message = await self.context_provider.resolve_reference(message)
+                if reply_message is not None:
+                    referenced_content = f"Message being replied to: {reply_message.content}\n\n"
+
+                    # Include referenced-message attachments so image-only replies still work.
+                    reply_text_contents, reply_image_attachments = await self._collect_attachments(reply_message)
+                    text_contents.extend(
+                        f"(From replied message) {text_content}"
+                        for text_content in reply_text_contents
+                    )
+                    image_attachments.extend(reply_image_attachments)
             except Exception as fetch_err:
-                self.bot.logger.error(f"Failed to fetch referenced message: {fetch_err}")
+                self.bot.logger.error(f"Failed to resolve referenced message: {fetch_err}")
 
         # Remove trigger phrase from the beginning of the message
         cleaned_content = trigger_pattern.sub('', message.clean_content).strip()
@@ -371,6 +513,9 @@ class AIHandler:
     async def generate_mode_response(self, mode: str, duration: Optional[int] = None) -> str:
         # Generate a response announcing a mode change.
         config = self.probability_manager.get_config(mode)
+        usage = ModelUsage()
+        started_at = time.perf_counter()
+        error = False
         try:
             response = await self.anthropic_client.messages.create(
                 model=DEFAULT_MODEL,
@@ -387,9 +532,11 @@ class AIHandler:
                 }],
                 temperature=BRIEF_TEMPERATURE,
             )
+            usage.add_response(response, time.perf_counter() - started_at)
 
             return response.content[0].text.strip()
         except Exception as e:
+            error = True
             error_traceback = traceback.format_exc()
             error_msg = f"""
                             Error generating mode change response:
@@ -402,6 +549,9 @@ class AIHandler:
                         """
             self.bot.logger.error(error_msg)
             return ERROR_MESSAGES["mode_change_error"].format(error=str(e))
+        finally:
+            self.telemetry.record("global", TELEMETRY_MODE_MODE_CHANGE, usage,
+                                  time.perf_counter() - started_at, error=error)
 
     async def setmode_command(self, interaction: discord.Interaction, mode: str, duration: Optional[int] = None) -> None:
         # Set the bot's response mode with optional duration for this server.
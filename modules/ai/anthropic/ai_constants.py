@@ -3,6 +3,10 @@
 MAX_MESSAGE_LENGTH = 1900  # Leave room for Discord's overhead
 MAX_HISTORY_LENGTH = 30
 
+# Channel context constants
+RECENT_CONTEXT_MESSAGES = 10
+RECENT_CONTEXT_MAX_CHARS = 300
+
 # Trigger constants
 TRIGGER_PHRASE = "oi drongo"
 TRIGGER_PATTERN = r'^oi\s+drongo\s*'
@@ -64,6 +68,32 @@ DEFAULT_TEMPERATURE = 0.8
 BRIEF_MAX_TOKENS = 150
 BRIEF_TEMPERATURE = 0.9
 
+# Hedged fallback constants
+# When a guild's recent refusal rate for brief responses crosses the threshold,
+# the primary and fallback prompts are sent concurrently and the first
+# acceptable answer wins.
+HEDGED_FALLBACK_ENABLED = True
+HEDGE_REFUSAL_RATE_THRESHOLD = 0.25
+HEDGE_MIN_SAMPLES = 4
+REFUSAL_WINDOW_SIZE = 20
+REFUSAL_SAMPLE_TTL_SECONDS = 3600
+LATENCY_WINDOW_SIZE = 200
+RESPONSE_MODE_SEQUENTIAL = "sequential"
+RESPONSE_MODE_HEDGED = "hedged"
+
+# Telemetry constants
+TELEMETRY_LATENCY_BUCKETS_MS = (100, 250, 500, 1000, 2000, 4000, 8000, 15000, 30000, 60000)
+TELEMETRY_FLUSH_INTERVAL = 300  # Seconds between daily rollup writes
+TELEMETRY_MODE_CHAT = "chat"
+TELEMETRY_MODE_MODE_CHANGE = "mode_change"
+
+# Pricing (USD) used for cost estimates; keep in sync with DEFAULT_MODEL
+PRICE_INPUT_PER_MTOK = 3.00
+PRICE_OUTPUT_PER_MTOK = 15.00
+PRICE_CACHE_READ_PER_MTOK = 0.30
+PRICE_CACHE_WRITE_PER_MTOK = 3.75
+PRICE_WEB_SEARCH_PER_USE = 0.01
+
 # Probability configurations
 DEFAULT_CONFIG = {
     "name": CONFIG_NAME_DEFAULT,
@@ -1,7 +1,9 @@
-from typing import List, Dict, Any, Optional, BinaryIO
+from typing import List, Dict, Any, Optional, BinaryIO, Deque, Tuple
+from collections import deque
 import discord
 import aiohttp
 import io
+import time
 import base64
 import asyncio
 import mimetypes
@@ -14,7 +16,9 @@ from .ai_constants import (
     KEY_TYPE, KEY_ROLE, KEY_CONTENT, KEY_SOURCE, KEY_MEDIA_TYPE, KEY_DATA,
     CONTENT_TYPE_IMAGE, IMAGE_SOURCE_TYPE, DEFAULT_IMAGE_MEDIA_TYPE,
     CONFIG_NAME_DEFAULT, CONFIG_NAME_FRIENDLY, CONFIG_NAME_NOT_FRIENDLY,
-    CONFIG_NAME_DISABLED, CONFIG_NAME_TEST_INSULTS, CONFIG_NAME_TEST_COMPLIMENTS
+    CONFIG_NAME_DISABLED, CONFIG_NAME_TEST_INSULTS, CONFIG_NAME_TEST_COMPLIMENTS,
+    HEDGE_REFUSAL_RATE_THRESHOLD, HEDGE_MIN_SAMPLES, REFUSAL_WINDOW_SIZE,
+    REFUSAL_SAMPLE_TTL_SECONDS, LATENCY_WINDOW_SIZE
 )
 
 class MessageHandler:
@@ -254,3 +258,105 @@ class ProbabilityManager:
     def list_configs(self) -> Dict[str, ProbabilityConfig]:
         # Get all available configurations
         return self.configs.copy()
+
+
+class RefusalTracker:
+    """Track refusal rates per guild and latency per response mode for brief responses."""
+
+    def __init__(self,
+                 threshold: float = HEDGE_REFUSAL_RATE_THRESHOLD,
+                 min_samples: int = HEDGE_MIN_SAMPLES,
+                 window_size: int = REFUSAL_WINDOW_SIZE,
+                 sample_ttl: float = REFUSAL_SAMPLE_TTL_SECONDS):
+        self.threshold = threshold
+        self.min_samples = min_samples
+        self.window_size = window_size
+        self.sample_ttl = sample_ttl
+
+        # Structure: {guild_id: deque[(recorded_at, refused)]}
+        self.guild_samples: Dict[str, Deque[Tuple[float, bool]]] = {}
+
+        # Structure: {mode: {"requests": int, "refusals": int, "fallbacks_used": int, "latencies": deque}}
+        self.mode_stats: Dict[str, Dict[str, Any]] = {}
+
+    def _prune(self, guild_id: str) -> Deque[Tuple[float, bool]]:
+        # Drop samples older than the TTL so a guild falls back to sequential
+        # mode (and gets re-measured) once its refusal history goes stale.
+        samples = self.guild_samples.get(guild_id)
+        if samples is None:
+            return deque()
+        cutoff = time.monotonic() - self.sample_ttl
+        while samples and samples[0][0] < cutoff:
+            samples.popleft()
+        if not samples:
+            del self.guild_samples[guild_id]
+        return samples
+
+    def record_outcome(self, guild_id: str, refused: bool) -> None:
+        # Record whether the primary prompt was refused for a guild
+        samples = self.guild_samples.get(guild_id)
+        if samples is None:
+            samples = deque(maxlen=self.window_size)
+            self.guild_samples[guild_id] = samples
+        samples.append((time.monotonic(), refused))
+
+    def get_refusal_rate(self, guild_id: str) -> Optional[float]:
+        # Return the recent refusal rate, or None if there are too few samples
+        samples = self._prune(guild_id)
+        if len(samples) < self.min_samples:
+            return None
+        return sum(1 for _, refused in samples if refused) / len(samples)
+
+    def should_hedge(self, guild_id: str) -> bool:
+        # Hedge only when the guild has enough recent samples above the threshold
+        rate = self.get_refusal_rate(guild_id)
+        return rate is not None and rate >= self.threshold
+
+    def record_latency(self, mode: str, latency: float, refused: Optional[bool], used_fallback: bool) -> None:
+        # Record end-to-end latency and outcome for a response mode
+        stats = self.mode_stats.get(mode)
+        if stats is None:
+            stats = {
+                "requests": 0,
+                "refusals": 0,
+                "fallbacks_used": 0,
+                "latencies": deque(maxlen=LATENCY_WINDOW_SIZE)
+            }
+            self.mode_stats[mode] = stats
+
+        stats["requests"] += 1
+        if refused:
+            stats["refusals"] += 1
+        if used_fallback:
+            stats["fallbacks_used"] += 1
+        stats["latencies"].append(latency)
+
+    def get_stats(self) -> Dict[str, Any]:
+        # Summarise per-mode latency/refusal stats and per-guild refusal rates
+        modes = {}
+        for mode, stats in self.mode_stats.items():
+            latencies = sorted(stats["latencies"])
+            count = len(latencies)
+            modes[mode] = {
+                "requests": stats["requests"],
+                "refusal_rate": stats["refusals"] / stats["requests"] if stats["requests"] else 0.0,
+                "fallbacks_used": stats["fallbacks_used"],
+                "latency_avg_ms": round(sum(latencies) / count * 1000, 1) if count else 0.0,
+                "latency_p50_ms": round(latencies[count // 2] * 1000, 1) if count else 0.0,
+                "latency_p95_ms": round(latencies[min(count - 1, int(count * 0.95))] * 1000, 1) if count else 0.0
+            }
+
+        guilds = {}
+        for guild_id in list(self.guild_samples.keys()):
+            rate = self.get_refusal_rate(guild_id)
+            guilds[guild_id] = {
+                "samples": len(self.guild_samples.get(guild_id, ())),
+                "refusal_rate": rate,
+                "hedging": rate is not None and rate >= self.threshold
+            }
+
+        return {
+            "threshold": self.threshold,
+            "modes": modes,
+            "guilds": guilds
+        }
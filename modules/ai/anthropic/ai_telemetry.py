@@ -0,0 +1,356 @@
+import asyncio
+import bisect
+import contextvars
+import datetime
+import logging
+import time
+from typing import Any, Dict, List, Optional, Tuple
+
+from .ai_constants import (
+    TELEMETRY_LATENCY_BUCKETS_MS, TELEMETRY_FLUSH_INTERVAL,
+    PRICE_INPUT_PER_MTOK, PRICE_OUTPUT_PER_MTOK,
+    PRICE_CACHE_READ_PER_MTOK, PRICE_CACHE_WRITE_PER_MTOK,
+    PRICE_WEB_SEARCH_PER_USE, CONTENT_TYPE_IMAGE, KEY_SOURCE, KEY_DATA, KEY_TYPE
+)
+
+# Start time of the request currently being handled, set by AIHandler.process_message
+_request_started_at: contextvars.ContextVar[Optional[float]] = contextvars.ContextVar(
+    "ai_request_started_at", default=None
+)
+
+COUNTER_FIELDS = (
+    "requests", "calls", "errors", "input_tokens", "output_tokens", "cache_read_tokens",
+    "cache_creation_tokens", "tool_uses", "refusal_retries", "attachment_bytes"
+)
+
+
+def begin_request() -> None:
+    """Mark the start of an AI request for end-to-end latency measurement."""
+    _request_started_at.set(time.perf_counter())
+
+
+def request_elapsed(default_start: float) -> float:
+    """Seconds since begin_request(), or since default_start when no request is active."""
+    started_at = _request_started_at.get()
+    return time.perf_counter() - (started_at if started_at is not None else default_start)
+
+
+def attachment_bytes(image_attachments: List[Dict[str, Any]], text_contents: Optional[List[str]] = None) -> int:
+    """Approximate decoded size of attachments sent to the model."""
+    total = 0
+    for block in image_attachments or ():
+        if block.get(KEY_TYPE) == CONTENT_TYPE_IMAGE:
+            total += len(block.get(KEY_SOURCE, {}).get(KEY_DATA, "")) * 3 // 4
+    for text in text_contents or ():
+        total += len(text.encode("utf-8"))
+    return total
+
+
+class ModelUsage:
+    """Token and latency totals across every model call made for one request."""
+
+    __slots__ = ("calls", "input_tokens", "output_tokens", "cache_read_tokens",
+                 "cache_creation_tokens", "tool_uses", "provider_latency")
+
+    def __init__(self):
+        self.calls = 0
+        self.input_tokens = 0
+        self.output_tokens = 0
+        self.cache_read_tokens = 0
+        self.cache_creation_tokens = 0
+        self.tool_uses = 0
+        self.provider_latency = 0.0
+
+    def add_response(self, response: Any, latency: float) -> None:
+        # Accumulate usage from an Anthropic Messages API response
+        self.calls += 1
+        self.provider_latency += latency
+
+        usage = getattr(response, "usage", None)
+        if usage is not None:
+            self.input_tokens += getattr(usage, "input_tokens", 0) or 0
+            self.output_tokens += getattr(usage, "output_tokens", 0) or 0
+            self.cache_read_tokens += getattr(usage, "cache_read_input_tokens", 0) or 0
+            self.cache_creation_tokens += getattr(usage, "cache_creation_input_tokens", 0) or 0
+
+        server_tool_use = getattr(usage, "server_tool_use", None) if usage is not None else None
+        if server_tool_use is not None:
+            self.tool_uses += getattr(server_tool_use, "web_search_requests", 0) or 0
+        else:
+            self.tool_uses += sum(
+                1 for block in getattr(response, "content", None) or ()
+                if getattr(block, "type", None) == "server_tool_use"
+            )
+
+    def estimated_cost(self) -> float:
+        # Estimate USD cost from the configured per-token prices
+        return (
+            self.input_tokens * PRICE_INPUT_PER_MTOK
+            + self.output_tokens * PRICE_OUTPUT_PER_MTOK
+            + self.cache_read_tokens * PRICE_CACHE_READ_PER_MTOK
+            + self.cache_creation_tokens * PRICE_CACHE_WRITE_PER_MTOK
+        ) / 1_000_000 + self.tool_uses * PRICE_WEB_SEARCH_PER_USE
+
+
+class LatencyHistogram:
+    """Fixed-bucket latency histogram in milliseconds."""
+
+    __slots__ = ("counts", "total_ms", "max_ms")
+
+    def __init__(self):
+        self.counts = [0] * (len(TELEMETRY_LATENCY_BUCKETS_MS) + 1)
+        self.total_ms = 0.0
+        self.max_ms = 0.0
+
+    def observe(self, latency_ms: float) -> None:
+        self.counts[bisect.bisect_left(TELEMETRY_LATENCY_BUCKETS_MS, latency_ms)] += 1
+        self.total_ms += latency_ms
+        self.max_ms = max(self.max_ms, latency_ms)
+
+    def percentile(self, fraction: float) -> Optional[float]:
+        # Upper bound of the bucket containing the requested percentile
+        count = sum(self.counts)
+        if count == 0:
+            return None
+        target = fraction * count
+        running = 0
+        for index, bucket_count in enumerate(self.counts):
+            running += bucket_count
+            if running >= target:
+                if index < len(TELEMETRY_LATENCY_BUCKETS_MS):
+                    return float(TELEMETRY_LATENCY_BUCKETS_MS[index])
+                return self.max_ms
+        return self.max_ms
+
+    def to_dict(self) -> Dict[str, Any]:
+        count = sum(self.counts)
+        return {
+            "count": count,
+            "avg_ms": round(self.total_ms / count, 1) if count else 0.0,
+            "max_ms": round(self.max_ms, 1),
+            "p50_ms": self.percentile(0.5),
+            "p95_ms": self.percentile(0.95),
+            "p99_ms": self.percentile(0.99),
+            "buckets": [
+                {"le": bound, "count": bucket_count}
+                for bound, bucket_count in zip(list(TELEMETRY_LATENCY_BUCKETS_MS) + ["inf"], self.counts)
+            ]
+        }
+
+
+class TelemetryAggregate:
+    """Counters plus provider and end-to-end latency histograms for one slice."""
+
+    __slots__ = COUNTER_FIELDS + ("cost_usd", "provider_latency", "e2e_latency")
+
+    def __init__(self):
+        for field in COUNTER_FIELDS:
+            setattr(self, field, 0)
+        self.cost_usd = 0.0
+        self.provider_latency = LatencyHistogram()
+        self.e2e_latency = LatencyHistogram()
+
+    def add(self, usage: ModelUsage, e2e_latency: float, refusal_retries: int,
+            attachment_size: int, error: bool) -> None:
+        self.requests += 1
+        self.calls += usage.calls
+        self.errors += 1 if error else 0
+        self.input_tokens += usage.input_tokens
+        self.output_tokens += usage.output_tokens
+        self.cache_read_tokens += usage.cache_read_tokens
+        self.cache_creation_tokens += usage.cache_creation_tokens
+        self.tool_uses += usage.tool_uses
+        self.refusal_retries += refusal_retries
+        self.attachment_bytes += attachment_size
+        self.cost_usd += usage.estimated_cost()
+        if usage.calls:
+            self.provider_latency.observe(usage.provider_latency * 1000)
+        self.e2e_latency.observe(e2e_latency * 1000)
+
+    def to_dict(self) -> Dict[str, Any]:
+        data = {field: getattr(self, field) for field in COUNTER_FIELDS}
+        data["cost_usd"] = round(self.cost_usd, 6)
+        data["provider_latency"] = self.provider_latency.to_dict()
+        data["e2e_latency"] = self.e2e_latency.to_dict()
+        return data
+
+
+class AITelemetry:
+    """
+    In-memory AI pipeline telemetry aggregated per guild and per mode.
+
+    Daily rollups are accumulated alongside the live aggregates and written to
+    the ai_usage_daily table in guild_config.db every TELEMETRY_FLUSH_INTERVAL
+    seconds and on shutdown.
+    """
+
+    def __init__(self, flush_interval: int = TELEMETRY_FLUSH_INTERVAL):
+        self.flush_interval = flush_interval
+        self.started_at = datetime.datetime.now(datetime.timezone.utc)
+        self.totals = TelemetryAggregate()
+        self.by_guild: Dict[str, TelemetryAggregate] = {}
+        self.by_mode: Dict[str, TelemetryAggregate] = {}
+
+        # Pending rollup deltas: {(day, guild_id, mode): {field: value}}
+        self._pending_rollups: Dict[Tuple[str, str, str], Dict[str, float]] = {}
+        self._flush_task: Optional[asyncio.Task] = None
+        self._flush_lock = asyncio.Lock()
+
+    def record(self, guild_id: str, mode: str, usage: ModelUsage, e2e_latency: float,
+               refusal_retries: int = 0, attachment_size: int = 0, error: bool = False) -> None:
+        """Record one AI request (which may have issued several model calls)."""
+        for aggregate in (
+            self.totals,
+            self.by_guild.setdefault(guild_id, TelemetryAggregate()),
+            self.by_mode.setdefault(mode, TelemetryAggregate())
+        ):
+            aggregate.add(usage, e2e_latency, refusal_retries, attachment_size, error)
+
+        day = datetime.datetime.now(datetime.timezone.utc).date().isoformat()
+        rollup = self._pending_rollups.setdefault((day, guild_id, mode), {
+            field: 0 for field in COUNTER_FIELDS + ("cost_usd", "provider_latency_ms", "e2e_latency_ms")
+        })
+        rollup["requests"] += 1
+        rollup["calls"] += usage.calls
+        rollup["errors"] += 1 if error else 0
+        rollup["input_tokens"] += usage.input_tokens
+        rollup["output_tokens"] += usage.output_tokens
+        rollup["cache_read_tokens"] += usage.cache_read_tokens
+        rollup["cache_creation_tokens"] += usage.cache_creation_tokens
+        rollup["tool_uses"] += usage.tool_uses
+        rollup["refusal_retries"] += refusal_retries
+        rollup["attachment_bytes"] += attachment_size
+        rollup["cost_usd"] += usage.estimated_cost()
+        rollup["provider_latency_ms"] += usage.provider_latency * 1000
+        rollup["e2e_latency_ms"] += e2e_latency * 1000
+
+    def get_summary(self) -> Dict[str, Any]:
+        """Return the in-memory aggregates for the dashboard."""
+        return {
+            "since": self.started_at.isoformat(),
+            "totals": self.totals.to_dict(),
+            "by_guild": {guild_id: agg.to_dict() for guild_id, agg in self.by_guild.items()},
+            "by_mode": {mode: agg.to_dict() for mode, agg in self.by_mode.items()}
+        }
+
+    def start(self) -> None:
+        """Start the periodic rollup flush task."""
+        if self._flush_task is None or self._flush_task.done():
+            self._flush_task = asyncio.create_task(self._flush_loop())
+
+    async def stop(self) -> None:
+        """Stop the flush task and write any pending rollups."""
+        if self._flush_task:
+            self._flush_task.cancel()
+            try:
+                await self._flush_task
+            except asyncio.CancelledError:
+                pass
+            self._flush_task = None
+        await self.flush()
+
+    async def _flush_loop(self) -> None:
+        while True:
+            await asyncio.sleep(self.flush_interval)
+            await self.flush()
+
+    async def flush(self) -> None:
+        """Add pending rollup deltas to ai_usage_daily."""
+        async with self._flush_lock:
+            if not self._pending_rollups:
+                return
+
+            pending, self._pending_rollups = self._pending_rollups, {}
+            rows = [
+                (day, guild_id, mode, int(r["requests"]),
+                 int(r["calls"]), int(r["errors"]), int(r["input_tokens"]), int(r["output_tokens"]),
+                 int(r["cache_read_tokens"]), int(r["cache_creation_tokens"]), int(r["tool_uses"]),
+                 int(r["refusal_retries"]), int(r["attachment_bytes"]), r["cost_usd"],
+                 r["provider_latency_ms"], r["e2e_latency_ms"])
+                for (day, guild_id, mode), r in pending.items()
+            ]
+
+            try:
+                from database_modules.database_pool import get_multi_guild_pool
+
+                pool = await get_multi_guild_pool()
+                async with pool.get_config_connection() as conn:
+                    await conn.executemany('''
+                        INSERT INTO ai_usage_daily (
+                            day, guild_id, mode, requests, calls, errors, input_tokens, output_tokens,
+                            cache_read_tokens, cache_creation_tokens, tool_uses, refusal_retries,
+                            attachment_bytes, cost_usd, provider_latency_ms_total, e2e_latency_ms_total
+                        )
+                        VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+                        ON CONFLICT(day, guild_id, mode) DO UPDATE SET
+                            requests = requests + excluded.requests,
+                            calls = calls + excluded.calls,
+                            errors = errors + excluded.errors,
+                            input_tokens = input_tokens + excluded.input_tokens,
+                            output_tokens = output_tokens + excluded.output_tokens,
+                            cache_read_tokens = cache_read_tokens + excluded.cache_read_tokens,
+                            cache_creation_tokens = cache_creation_tokens + excluded.cache_creation_tokens,
+                            tool_uses = tool_uses + excluded.tool_uses,
+                            refusal_retries = refusal_retries + excluded.refusal_retries,
+                            attachment_bytes = attachment_bytes + excluded.attachment_bytes,
+                            cost_usd = cost_usd + excluded.cost_usd,
+                            provider_latency_ms_total = provider_latency_ms_total + excluded.provider_latency_ms_total,
+                            e2e_latency_ms_total = e2e_latency_ms_total + excluded.e2e_latency_ms_total
+                    ''', rows)
+                    await conn.commit()
+            except Exception as e:
+                logging.error(f"Error flushing AI telemetry rollups: {e}")
+                # Put the deltas back so the next flush retries them
+                for key, values in pending.items():
+                    current = self._pending_rollups.get(key)
+                    if current is None:
+                        self._pending_rollups[key] = values
+                    else:
+                        for field, value in values.items():
+                            current[field] += value
+
+
+async def get_daily_rollups(days: int = 30, guild_id: Optional[str] = None) -> List[Dict[str, Any]]:
+    """Read persisted daily AI usage rollups, newest first."""
+    from database_modules.database_pool import get_multi_guild_pool
+
+    since = (datetime.datetime.now(datetime.timezone.utc).date() - datetime.timedelta(days=days - 1)).isoformat()
+    query = '''
+        SELECT day, guild_id, mode, requests, calls, errors, input_tokens, output_tokens,
+               cache_read_tokens, cache_creation_tokens, tool_uses, refusal_retries,
+               attachment_bytes, cost_usd, provider_latency_ms_total, e2e_latency_ms_total
+        FROM ai_usage_daily
+        WHERE day >= ?
+    '''
+    params: List[Any] = [since]
+    if guild_id:
+        query += " AND guild_id = ?"
+        params.append(guild_id)
+    query += " ORDER BY day DESC, guild_id, mode"
+
+    pool = await get_multi_guild_pool()
+    async with pool.get_config_connection() as conn:
+        async with conn.execute(query, params) as cursor:
+            rows = await cursor.fetchall()
+
+    return [
+        {
+            "day": row[0],
+            "guild_id": row[1],
+            "mode": row[2],
+            "requests": row[3],
+            "calls": row[4],
+            "errors": row[5],
+            "input_tokens": row[6],
+            "output_tokens": row[7],
+            "cache_read_tokens": row[8],
+            "cache_creation_tokens": row[9],
+            "tool_uses": row[10],
+            "refusal_retries": row[11],
+            "attachment_bytes": row[12],
+            "cost_usd": round(row[13], 6),
+            "avg_provider_latency_ms": round(row[14] / row[3], 1) if row[3] else 0.0,
+            "avg_e2e_latency_ms": round(row[15] / row[3], 1) if row[3] else 0.0
+        }
+        for row in rows
+    ]
@@ -0,0 +1,208 @@
+import logging
+import os
+from typing import List, Optional, Sequence
+
+import discord
+
+from database_modules.database_schema import get_guild_db_path
+from .ai_constants import RECENT_CONTEXT_MESSAGES, RECENT_CONTEXT_MAX_CHARS
+
+
+class ContextMessage:
+    """Lightweight view of a channel message used to build AI context."""
+
+    __slots__ = ("message_id", "author_id", "author_name", "content", "timestamp", "attachments", "source")
+
+    def __init__(self, message_id: str, author_id: str, author_name: str, content: str,
+                 timestamp: str = "", attachments: Sequence[discord.Attachment] = (), source: str = ""):
+        self.message_id = message_id
+        self.author_id = author_id
+        self.author_name = author_name
+        self.content = content
+        self.timestamp = timestamp
+        self.attachments = list(attachments)
+        self.source = source
+
+    @classmethod
+    def from_discord(cls, message: discord.Message, source: str) -> "ContextMessage":
+        return cls(
+            message_id=str(message.id),
+            author_id=str(message.author.id),
+            author_name=message.author.display_name,
+            content=message.clean_content or "",
+            timestamp=message.created_at.isoformat(),
+            attachments=message.attachments,
+            source=source
+        )
+
+
+class ChannelContextProvider:
+    """
+    Resolve replied-to and recent channel messages for AI prompts.
+
+    Lookups prefer data we already hold: the reply payload Discord sends with the
+    message, then the per-guild chat_history.db, then discord.py's message cache,
+    and only fall back to REST when nothing local has the message.
+    """
+
+    def __init__(self, bot: discord.Client):
+        self.bot = bot
+
+        # Lookup counters by source, surfaced for debugging/telemetry
+        self.stats = {
+            "payload": 0,
+            "local_store": 0,
+            "message_cache": 0,
+            "rest": 0,
+            "misses": 0
+        }
+
+    def _resolve_author_name(self, guild: Optional[discord.Guild], user_id: str) -> str:
+        # Resolve a display name from the gateway caches without API calls
+        try:
+            if guild:
+                member = guild.get_member(int(user_id))
+                if member:
+                    return member.display_name
+            user = self.bot.get_user(int(user_id))
+            if user:
+                return user.display_name
+        except (TypeError, ValueError):
+            pass
+        return f"User {user_id}"
+
+    def _get_cached_message(self, message_id: int) -> Optional[discord.Message]:
+        # discord.py keeps a bounded deque of recently seen messages
+        for cached in reversed(self.bot.cached_messages):
+            if cached.id == message_id:
+                return cached
+        return None
+
+    async def _query_local_store(self, guild_id: str, query: str, params: tuple) -> list:
+        # Read from the guild's chat history without creating a database for unknown guilds
+        if not os.path.exists(get_guild_db_path(guild_id)):
+            return []
+
+        from database_modules.database_pool import get_multi_guild_pool
+
+        pool = await get_multi_guild_pool()
+        async with pool.get_guild_connection(guild_id) as conn:
+            async with conn.execute(query, params) as cursor:
+                return await cursor.fetchall()
+
+    async def resolve_reference(self, message: discord.Message) -> Optional[ContextMessage]:
+        """Resolve the message being replied to, avoiding REST wherever possible."""
+        reference = message.reference
+        if reference is None or reference.message_id is None:
+            return None
+
+        # Discord includes the referenced message in the reply payload
+        resolved = reference.resolved or reference.cached_message
+        if isinstance(resolved, discord.Message):
+            self.stats["payload"] += 1
+            return ContextMessage.from_discord(resolved, "payload")
+
+        guild = message.guild
+        if guild:
+            try:
+                rows = await self._query_local_store(
+                    str(guild.id),
+                    "SELECT user_id, message_content, timestamp FROM messages WHERE discord_message_id = ?",
+                    (str(reference.message_id),)
+                )
+                if rows:
+                    user_id, content, timestamp = rows[0]
+                    self.stats["local_store"] += 1
+                    return ContextMessage(
+                        message_id=str(reference.message_id),
+                        author_id=user_id,
+                        author_name=self._resolve_author_name(guild, user_id),
+                        content=content,
+                        timestamp=timestamp,
+                        source="local_store"
+                    )
+            except Exception as e:
+                logging.error(f"Error reading referenced message {reference.message_id} from local store: {e}")
+
+        cached = self._get_cached_message(reference.message_id)
+        if cached:
+            self.stats["message_cache"] += 1
+            return ContextMessage.from_discord(cached, "message_cache")
+
+        try:
+            fetched = await message.channel.fetch_message(reference.message_id)
+            self.stats["rest"] += 1
+            return ContextMessage.from_discord(fetched, "rest")
+        except Exception as e:
+            self.stats["misses"] += 1
+            logging.error(f"Failed to fetch referenced message {reference.message_id}: {e}")
+            return None
+
+    async def get_recent_messages(self, message: discord.Message,
+                                  limit: int = RECENT_CONTEXT_MESSAGES) -> List[ContextMessage]:
+        """Return up to `limit` messages preceding `message` in its channel, oldest first."""
+        if limit <= 0:
+            return []
+
+        guild = message.guild
+        if guild:
+            try:
+                rows = await self._query_local_store(
+                    str(guild.id),
+                    '''
+                    SELECT discord_message_id, user_id, message_content, timestamp
+                    FROM messages
+                    WHERE channel_id = ? AND discord_message_id != ?
+                    ORDER BY timestamp DESC
+                    LIMIT ?
+                    ''',
+                    (str(message.channel.id), str(message.id), limit)
+                )
+                if rows:
+                    self.stats["local_store"] += 1
+                    return [
+                        ContextMessage(
+                            message_id=row[0],
+                            author_id=row[1],
+                            author_name=self._resolve_author_name(guild, row[1]),
+                            content=row[2],
+                            timestamp=row[3],
+                            source="local_store"
+                        )
+                        for row in reversed(rows)
+                    ]
+            except Exception as e:
+                logging.error(f"Error reading recent messages for channel {message.channel.id}: {e}")
+
+        cached = [
+            cached_message for cached_message in self.bot.cached_messages
+            if cached_message.channel.id == message.channel.id and cached_message.id != message.id
+        ]
+        if cached:
+            self.stats["message_cache"] += 1
+            return [ContextMessage.from_discord(m, "message_cache") for m in cached[-limit:]]
+
+        try:
+            history = [m async for m in message.channel.history(limit=limit, before=message)]
+            self.stats["rest"] += 1
+            return [ContextMessage.from_discord(m, "rest") for m in reversed(history)]
+        except Exception as e:
+            self.stats["misses"] += 1
+            logging.error(f"Failed to fetch recent messages for channel {message.channel.id}: {e}")
+            return []
+
+    @staticmethod
+    def format_recent_messages(messages: List[ContextMessage]) -> str:
+        """Format recent messages as a compact transcript for the prompt."""
+        lines = []
+        for context_message in messages:
+            content = context_message.content.strip()
+            if not content:
+                continue
+            if len(content) > RECENT_CONTEXT_MAX_CHARS:
+                content = content[:RECENT_CONTEXT_MAX_CHARS].rstrip() + "..."
+            lines.append(f"{context_message.author_name}: {content}")
+
+        if not lines:
+            return ""
+        return "Recent messages in this channel (oldest first):\n" + "\n".join(lines)
@@ -47,13 +47,18 @@ class LevelingCog(commands.Cog):
             old_level = level_result['old_level']
             new_level = level_result['new_level']
 
+            context = level_result.get('level_up_context')
+            if context is None:
+                context = await self.leveling_system.build_level_up_context(
+                    str(message.author.id), str(message.guild.id), old_level, new_level
+                )
+
             level_up_message = await self.leveling_system.get_level_up_message(
-                str(message.author.id), str(message.guild.id), old_level, new_level
+                str(message.author.id), str(message.guild.id), old_level, new_level, context=context
             )
 
-            rank_info = await self.leveling_system.get_user_rank(str(message.author.id), str(message.guild.id))
-            if rank_info and rank_info.get('rank_title'):
-                level_up_message += f" ({rank_info['rank_title']})"
+            if context.rank_title:
+                level_up_message += f" ({context.rank_title})"
 
             announcement_channel_id = config.get('announcement_channel_id')
             if announcement_channel_id:
@@ -217,10 +222,6 @@ class LevelingCog(commands.Cog):
                 else:
                     name = f"Unknown User ({entry['user_id'][:8]}...)"
 
-                rank_info = await self.leveling_system.get_user_rank(
-                    entry['user_id'], str(interaction.guild_id)
-                )
-
                 if i == 1:
                     medal = "\U0001f947"
                 elif i == 2:
@@ -231,9 +232,9 @@ class LevelingCog(commands.Cog):
                     medal = f"**{i}.**"
 
                 rank_display = ""
-                if rank_info and rank_info.get('rank_title'):
-                    emoji_prefix = f"{rank_info.get('emoji', '')} " if rank_info.get('emoji') else ""
-                    rank_display = f" \u2022 {emoji_prefix}{rank_info['rank_title']}"
+                if entry.get('rank_title'):
+                    emoji_prefix = f"{entry['rank_emoji']} " if entry.get('rank_emoji') else ""
+                    rank_display = f" \u2022 {emoji_prefix}{entry['rank_title']}"
 
                 range_display = ""
                 if entry.get('range_name'):
@@ -253,6 +254,66 @@ class LevelingCog(commands.Cog):
                 "An error occurred while fetching the leaderboard.", ephemeral=True
             )
 
+    @level.command(name="replay")
+    async def replay(self, interaction: discord.Interaction, dry_run: bool = False):
+        """Rebuild everyone's XP and levels from this server's chat history (Admin only)."""
+        perms = interaction.user.guild_permissions
+        is_admin = perms.administrator if perms else False
+        is_owner = interaction.user.id == (self.bot.owner_id or 0)
+        is_authorized = str(interaction.user.id) == getattr(self.bot, "authorized_user_id", "")
+
+        if not (is_admin or is_owner or is_authorized):
+            await interaction.response.send_message(
+                "You need to be a server admin to run this.",
+                ephemeral=True
+            )
+            return
+
+        guild_id = str(interaction.guild_id)
+        if self.leveling_system.replay.is_running(guild_id):
+            await interaction.response.send_message(
+                "A replay is already running for this server.", ephemeral=True
+            )
+            return
+
+        await interaction.response.defer(ephemeral=True, thinking=True)
+
+        last_update = 0.0
+
+        async def report_progress(status):
+            nonlocal last_update
+            now = asyncio.get_running_loop().time()
+            # Interaction edits are rate limited, so only refresh every few seconds
+            if status.get('phase') == 'done' or now - last_update < 3:
+                return
+            last_update = now
+            await interaction.edit_original_response(
+                content=(
+                    f"⏳ Replaying chat history: {status.get('phase')} • "
+                    f"{status.get('processed_messages', 0):,}/{status.get('total_messages', 0):,} "
+                    f"messages ({status.get('percent', 0)}%)"
+                )
+            )
+
+        try:
+            result = await self.leveling_system.replay.run(guild_id, dry_run=dry_run, progress=report_progress)
+            if not result.get('success'):
+                await interaction.edit_original_response(content=f"❌ Replay failed: {result.get('reason')}")
+                return
+
+            await interaction.edit_original_response(
+                content=(
+                    f"✅ Replay {'preview' if dry_run else 'complete'}: "
+                    f"{result['messages_scanned']:,} messages scanned, {result['awards']:,} XP awards, "
+                    f"{result['users']:,} members, {result['total_xp']:,} XP total, "
+                    f"highest level {result['max_level']} ({result['duration_ms'] / 1000:.1f}s)"
+                    + ("\nNothing was written; run again without dry_run to apply." if dry_run else "")
+                )
+            )
+        except Exception as e:
+            logging.error(f"Error running XP replay: {e}")
+            await interaction.edit_original_response(content="An error occurred while replaying chat history.")
+
 
 async def setup(bot):
     bot.logger.info("Setting up LevelingCog...")
@@ -4,9 +4,10 @@ from discord import app_commands
 import aiohttp
 import logging
 from collections import defaultdict
-from datetime import datetime, timedelta
 from typing import Dict, List, Tuple, Optional
 
+from modules.ttl_cache import TTLCache
+
 
 GRAPHQL_URL = "https://graphql.pokeapi.co/v1beta2"
 ARTWORK_URL = "https://raw.githubusercontent.com/PokeAPI/sprites/master/sprites/pokemon/other/official-artwork/{}.png"
@@ -113,19 +114,13 @@ STAT_SHORT_NAMES = {
 
 class PokemonAPI:
     def __init__(self):
-        self._cache: Dict[str, Tuple[dict, datetime]] = {}
-        self._cache_duration = timedelta(hours=24)
+        self._cache = TTLCache(maxsize=2000, ttl=24 * 3600, name="pokemon")
 
     def _get_cached(self, key: str) -> Optional[dict]:
-        if key in self._cache:
-            data, timestamp = self._cache[key]
-            if datetime.now() - timestamp < self._cache_duration:
-                return data
-            del self._cache[key]
-        return None
+        return self._cache.get(key)
 
     def _set_cache(self, key: str, data: dict):
-        self._cache[key] = (data, datetime.now())
+        self._cache.set(key, data)
 
     @staticmethod
     def _normalize_name(name: str) -> str:
@@ -4,8 +4,9 @@ from discord import app_commands
 import aiohttp
 import random
 import urllib.parse
-from datetime import datetime, timedelta
-from typing import Dict, List, Tuple, Optional
+from typing import List, Tuple, Optional
+
+from modules.ttl_cache import TTLCache
 
 class SteamAPI:
     def __init__(self):
@@ -16,20 +17,13 @@ class SteamAPI:
                     break
             else:
                 raise ValueError("STEAM_API_KEY not found in id.env")
-        self._cache: Dict[str, Tuple[List[dict], datetime]] = {}
-        self._cache_duration = timedelta(hours=24)
+        self._cache = TTLCache(maxsize=500, ttl=24 * 3600, name="steam_achievements")
 
     def _get_cached_achievements(self, app_id: str) -> Optional[List[dict]]:
-        if app_id in self._cache:
-            achievements, timestamp = self._cache[app_id]
-            if datetime.now() - timestamp < self._cache_duration:
-                return achievements
-            else:
-                del self._cache[app_id]
-        return None
+        return self._cache.get(app_id)
 
     def _cache_achievements(self, app_id: str, achievements: List[dict]):
-        self._cache[app_id] = (achievements, datetime.now())
+        self._cache.set(app_id, achievements)
 
     async def get_app_id(self, session: aiohttp.ClientSession, game_name: str) -> Optional[str]:
         """Search for a game using Steam Store search API (supports fuzzy matching)"""
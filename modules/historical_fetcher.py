@@ -5,6 +5,8 @@ from typing import Optional
 import discord
 import aiosqlite
 
+from database_modules.data_versions import data_versions
+
 class HistoricalMessageFetcher:
     """
     Background task that fetches historical messages from Discord channels
@@ -198,6 +200,7 @@ class HistoricalMessageFetcher:
         """Store fetched messages in the guild database."""
         from database_modules.database_pool import get_multi_guild_pool
         from database_modules.database import store_message, store_message_components
+        from database_modules.guild_stats_writer import guild_stats_writer
 
         stored_count = 0
 
@@ -219,6 +222,9 @@ class HistoricalMessageFetcher:
                 except Exception as e:
                     logging.error(f"Error storing historical message {message.id}: {e}")
 
+        # Write the batch to guild_stats now so the totals move with the fetch progress
+        await guild_stats_writer.flush()
+
         return stored_count
 
     async def _get_fetch_progress(self, guild_id: str, channel_id: str) -> dict:
@@ -256,6 +262,7 @@ class HistoricalMessageFetcher:
             """, (last_message_id, last_message_id, total_fetched, datetime.now().isoformat(), guild_id, channel_id))
 
             await conn.commit()
+            data_versions.bump("chat", guild_id)
 
     async def _mark_channel_fetch_completed(self, guild_id: str, channel_id: str):
         """Mark a channel as completely fetched."""
@@ -273,6 +280,7 @@ class HistoricalMessageFetcher:
             """, (datetime.now().isoformat(), guild_id, channel_id))
 
             await conn.commit()
+            data_versions.bump("chat", guild_id)
 
     async def _mark_job_completed(self, job_id: int, success: bool = True, error: str = None):
         """Mark a fetch job as completed."""
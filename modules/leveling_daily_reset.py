@@ -0,0 +1,230 @@
+import asyncio
+import logging
+import time
+from collections import deque
+from datetime import datetime, timedelta, timezone
+from typing import Any, Dict, Optional, Tuple
+from zoneinfo import ZoneInfo, ZoneInfoNotFoundError
+
+from database_modules.database_pool import get_leveling_pool
+
+DEFAULT_RESET_TIME = "00:00"
+DEFAULT_RESET_TIMEZONE = "UTC"
+
+# Seconds between schedule checks; also how quickly config changes are picked up
+RESET_CHECK_INTERVAL = 60
+
+# Columns added to leveling_config after the original schema
+CONFIG_MIGRATIONS = (
+    ("daily_reset_time", f"TEXT DEFAULT '{DEFAULT_RESET_TIME}'"),
+    ("daily_reset_timezone", f"TEXT DEFAULT '{DEFAULT_RESET_TIMEZONE}'"),
+)
+
+RESET_SCHEMA = """
+CREATE TABLE IF NOT EXISTS leveling_daily_resets (
+    guild_id TEXT PRIMARY KEY,
+    last_reset_date TEXT NOT NULL,
+    last_reset_at TIMESTAMP,
+    rows_reset INTEGER DEFAULT 0,
+    duration_ms REAL DEFAULT 0
+);
+"""
+
+
+def parse_reset_time(value: Optional[str]) -> Tuple[int, int]:
+    """Parse an HH:MM reset time, falling back to midnight."""
+    try:
+        hour, minute = (int(part) for part in str(value or DEFAULT_RESET_TIME).split(":", 1))
+        if 0 <= hour < 24 and 0 <= minute < 60:
+            return hour, minute
+    except ValueError:
+        pass
+    return 0, 0
+
+
+def get_zone(name: Optional[str]) -> ZoneInfo:
+    try:
+        return ZoneInfo(name or DEFAULT_RESET_TIMEZONE)
+    except (ZoneInfoNotFoundError, ValueError):
+        return ZoneInfo(DEFAULT_RESET_TIMEZONE)
+
+
+def reset_period(config: Dict[str, Any], now: Optional[datetime] = None) -> str:
+    """
+    The guild-local date of the most recent daily reset.
+
+    Daily XP earned since that reset counts towards the cap. Before today's
+    reset time the period is still yesterday's.
+    """
+    zone = get_zone(config.get('daily_reset_timezone'))
+    local_now = (now or datetime.now(timezone.utc)).astimezone(zone)
+    hour, minute = parse_reset_time(config.get('daily_reset_time'))
+    if (local_now.hour, local_now.minute) < (hour, minute):
+        local_now -= timedelta(days=1)
+    return local_now.date().isoformat()
+
+
+class DailyResetScheduler:
+    """
+    Resets daily_xp_earned once per guild per day, at the guild's configured local time.
+
+    Each reset is a single UPDATE over the guild's rows, followed by clearing
+    the guild's in-memory daily counters, so the XP hot path never has to look
+    at dates. The last reset period per guild is stored in
+    leveling_daily_resets, so resets missed while the bot was down run on the
+    first check after startup.
+    """
+
+    def __init__(self, leveling_system, check_interval: int = RESET_CHECK_INTERVAL):
+        self.leveling = leveling_system
+        self.check_interval = check_interval
+        self._last_periods: Dict[str, str] = {}
+        self._loaded = False
+        self._task: Optional[asyncio.Task] = None
+        self._lock = asyncio.Lock()
+        self._recent = deque(maxlen=50)
+
+        self.stats = {
+            "resets": 0,
+            "rows_reset": 0,
+            "errors": 0,
+            "last_check_at": None
+        }
+
+    # =========================================================================
+    # SCHEMA
+    # =========================================================================
+
+    async def ensure_schema(self) -> None:
+        """Add the reset columns to leveling_config and create leveling_daily_resets."""
+        try:
+            pool = await get_leveling_pool()
+            async with pool.get_connection() as conn:
+                async with conn.execute("PRAGMA table_info(leveling_config)") as cursor:
+                    columns = {row[1] for row in await cursor.fetchall()}
+
+                for column, definition in CONFIG_MIGRATIONS:
+                    if columns and column not in columns:
+                        await conn.execute(f"ALTER TABLE leveling_config ADD COLUMN {column} {definition}")
+                        logging.info(f"Added leveling_config.{column}")
+
+                await conn.executescript(RESET_SCHEMA)
+                await conn.commit()
+        except Exception as e:
+            logging.error(f"Error migrating daily reset schema: {e}")
+
+    # =========================================================================
+    # BACKGROUND LOOP
+    # =========================================================================
+
+    def start(self) -> None:
+        """Start the reset scheduler. The first check runs immediately to catch up."""
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        if self._task:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    async def _run(self) -> None:
+        while True:
+            await self.run_due()
+            await asyncio.sleep(self.check_interval)
+
+    async def run_due(self, now: Optional[datetime] = None) -> int:
+        """Reset every guild whose reset time has passed since its last reset. Returns resets run."""
+        now = now or datetime.now(timezone.utc)
+        self.stats["last_check_at"] = now.isoformat()
+        try:
+            pool = await get_leveling_pool()
+            if not self._loaded:
+                rows = await pool.execute_query("SELECT guild_id, last_reset_date FROM leveling_daily_resets")
+                for guild_id, last_reset_date in rows:
+                    self._last_periods.setdefault(str(guild_id), last_reset_date)
+                self._loaded = True
+
+            schedules = await pool.execute_query(
+                "SELECT guild_id, daily_reset_time, daily_reset_timezone FROM leveling_config"
+            )
+        except Exception as e:
+            self.stats["errors"] += 1
+            logging.error(f"Error loading daily reset schedules: {e}")
+            return 0
+
+        resets = 0
+        for guild_id, reset_time, reset_timezone in schedules:
+            guild_id = str(guild_id)
+            period = reset_period(
+                {'daily_reset_time': reset_time, 'daily_reset_timezone': reset_timezone}, now
+            )
+            if self._last_periods.get(guild_id) == period:
+                continue
+            if await self.reset_guild(guild_id, period):
+                resets += 1
+        return resets
+
+    async def reset_guild(self, guild_id: str, period: str) -> Optional[Dict[str, Any]]:
+        """Zero a guild's daily XP counters in one statement and record the run."""
+        async with self._lock:
+            if self._last_periods.get(guild_id) == period:
+                return None
+
+            started_at = time.perf_counter()
+            try:
+                # Let queued awards land first so their daily XP belongs to the old period
+                await self.leveling.ledger.flush()
+
+                pool = await get_leveling_pool()
+                async with pool.get_connection() as conn:
+                    try:
+                        cursor = await conn.execute("""
+                            UPDATE user_levels
+                            SET daily_xp_earned = 0, daily_reset_date = ?
+                            WHERE guild_id = ? AND daily_xp_earned != 0
+                        """, (period, guild_id))
+                        rows_reset = max(cursor.rowcount or 0, 0)
+                        duration_ms = round((time.perf_counter() - started_at) * 1000, 2)
+                        await conn.execute("""
+                            INSERT INTO leveling_daily_resets (guild_id, last_reset_date, last_reset_at, rows_reset, duration_ms)
+                            VALUES (?, ?, CURRENT_TIMESTAMP, ?, ?)
+                            ON CONFLICT(guild_id) DO UPDATE SET
+                                last_reset_date = excluded.last_reset_date,
+                                last_reset_at = excluded.last_reset_at,
+                                rows_reset = excluded.rows_reset,
+                                duration_ms = excluded.duration_ms
+                        """, (guild_id, period, rows_reset, duration_ms))
+                        await conn.commit()
+                    except Exception:
+                        await conn.rollback()
+                        raise
+            except Exception as e:
+                self.stats["errors"] += 1
+                logging.error(f"Error resetting daily XP for guild {guild_id}: {e}")
+                return None
+
+            self.leveling.eligibility.reset_daily_xp(guild_id)
+            self.leveling.clear_guild_user_cache(guild_id)
+            self._last_periods[guild_id] = period
+
+            result = {
+                "guild_id": guild_id,
+                "period": period,
+                "rows_reset": rows_reset,
+                "duration_ms": duration_ms,
+                "reset_at": datetime.now(timezone.utc).isoformat()
+            }
+            self.stats["resets"] += 1
+            self.stats["rows_reset"] += rows_reset
+            self._recent.append(result)
+            logging.info(
+                f"Daily XP reset for guild {guild_id} ({period}): {rows_reset} rows in {duration_ms}ms"
+            )
+            return result
+
+    def get_stats(self) -> Dict[str, Any]:
+        return dict(self.stats, recent_resets=list(self._recent))
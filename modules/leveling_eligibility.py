@@ -0,0 +1,319 @@
+import asyncio
+import json
+import logging
+import random
+import time
+from datetime import datetime, timezone
+from typing import Any, Dict, FrozenSet, Optional, Tuple
+
+from database_modules.database_pool import get_leveling_pool
+
+# How often dirty cooldowns are written back to xp_cooldowns
+COOLDOWN_PERSIST_INTERVAL = 5  # seconds
+
+
+def parse_channel_list(raw: Any) -> FrozenSet[str]:
+    """Parse a JSON channel list from leveling_config into a set of channel ID strings."""
+    if not raw:
+        return frozenset()
+    if isinstance(raw, (list, tuple, set, frozenset)):
+        items = raw
+    else:
+        try:
+            items = json.loads(raw)
+        except (TypeError, ValueError):
+            return frozenset()
+    if not isinstance(items, (list, tuple)):
+        return frozenset()
+    return frozenset(str(item) for item in items)
+
+
+class GuildEligibilityState:
+    """Per-guild XP eligibility state kept entirely in memory."""
+
+    __slots__ = ("guild_id", "config", "blacklist", "whitelist", "cooldowns", "daily_xp")
+
+    def __init__(self, guild_id: str):
+        self.guild_id = guild_id
+        self.config: Optional[Dict[str, Any]] = None
+        self.blacklist: FrozenSet[str] = frozenset()
+        self.whitelist: FrozenSet[str] = frozenset()
+        self.cooldowns: Dict[str, float] = {}  # user_id -> cooldown end (epoch seconds)
+        self.daily_xp: Dict[str, int] = {}  # user_id -> XP earned today
+
+    def apply_config(self, config: Dict[str, Any]) -> None:
+        # get_guild_config hands back the same cached dict until it expires or is
+        # invalidated, so the channel lists are only parsed when the config changes
+        if config is self.config:
+            return
+        self.config = config
+        self.blacklist = parse_channel_list(config.get('blacklisted_channels'))
+        self.whitelist = parse_channel_list(config.get('whitelisted_channels'))
+
+
+class XPEligibilityEngine:
+    """
+    In-memory cooldowns, daily XP counters and channel filters for the XP hot path.
+
+    State is rebuilt from xp_cooldowns and user_levels on startup. New cooldowns
+    are queued and written back in batches by a background task, so checking a
+    message (including the common "user on cooldown" rejection) needs no I/O.
+    Daily counters are persisted by the regular user_levels upsert in award_xp.
+    """
+
+    def __init__(self, persist_interval: int = COOLDOWN_PERSIST_INTERVAL):
+        self.persist_interval = persist_interval
+        self.guilds: Dict[str, GuildEligibilityState] = {}
+        self.loaded = False
+
+        # Cooldowns waiting to be persisted: {(user_id, guild_id): (started_at, ends_at, count)}
+        self._dirty_cooldowns: Dict[Tuple[str, str], Tuple[float, float, int]] = {}
+        self._load_lock = asyncio.Lock()
+        self._persist_lock = asyncio.Lock()
+        self._persist_task: Optional[asyncio.Task] = None
+
+        self.stats = {
+            "checks": 0,
+            "cooldown_rejections": 0,
+            "daily_cap_rejections": 0,
+            "cooldowns_persisted": 0,
+            "persist_errors": 0
+        }
+
+    def _guild(self, guild_id: str) -> GuildEligibilityState:
+        state = self.guilds.get(guild_id)
+        if state is None:
+            state = self.guilds[guild_id] = GuildEligibilityState(guild_id)
+        return state
+
+    # =========================================================================
+    # STARTUP / SHUTDOWN
+    # =========================================================================
+
+    async def load(self) -> None:
+        """Rebuild cooldowns and daily counters from the leveling database."""
+        async with self._load_lock:
+            if self.loaded:
+                return
+
+            try:
+                pool = await get_leveling_pool()
+                cooldown_rows = await pool.execute_query(
+                    "SELECT user_id, guild_id, cooldown_ends_at FROM xp_cooldowns WHERE cooldown_ends_at > ?",
+                    (datetime.now().isoformat(),)
+                )
+                daily_rows = await pool.execute_query(
+                    "SELECT user_id, guild_id, daily_xp_earned FROM user_levels WHERE daily_xp_earned > 0"
+                )
+            except Exception as e:
+                logging.error(f"Error loading XP eligibility state: {e}")
+                return
+
+            for user_id, guild_id, cooldown_ends_at in cooldown_rows:
+                try:
+                    # cooldown_ends_at is a naive local timestamp, as written by start_cooldown
+                    ends_at = datetime.fromisoformat(cooldown_ends_at).timestamp()
+                except (TypeError, ValueError):
+                    continue
+                cooldowns = self._guild(str(guild_id)).cooldowns
+                cooldowns[str(user_id)] = max(cooldowns.get(str(user_id), 0.0), ends_at)
+
+            for user_id, guild_id, daily_xp_earned in daily_rows:
+                # Awards made before the load finished are already counted in memory
+                self._guild(str(guild_id)).daily_xp.setdefault(str(user_id), int(daily_xp_earned or 0))
+
+            self.loaded = True
+            logging.info(
+                f"XP eligibility state loaded: {len(cooldown_rows)} active cooldowns, "
+                f"{len(daily_rows)} daily counters across {len(self.guilds)} guilds"
+            )
+
+    async def ensure_loaded(self) -> None:
+        if not self.loaded:
+            await self.load()
+
+    def start(self) -> None:
+        """Start the background cooldown persistence task."""
+        if self._persist_task is None or self._persist_task.done():
+            self._persist_task = asyncio.create_task(self._persist_loop())
+
+    async def stop(self) -> None:
+        """Stop the persistence task and write any pending cooldowns."""
+        if self._persist_task:
+            self._persist_task.cancel()
+            try:
+                await self._persist_task
+            except asyncio.CancelledError:
+                pass
+            self._persist_task = None
+        await self.flush()
+
+    async def _persist_loop(self) -> None:
+        while True:
+            await asyncio.sleep(self.persist_interval)
+            await self.flush()
+            self.prune_expired()
+
+    async def flush(self) -> None:
+        """Write queued cooldowns to xp_cooldowns in a single transaction."""
+        async with self._persist_lock:
+            if not self._dirty_cooldowns:
+                return
+
+            pending, self._dirty_cooldowns = self._dirty_cooldowns, {}
+            rows = []
+            for (user_id, guild_id), (started_at, ends_at, count) in pending.items():
+                # Match the formats SQLite's CURRENT_TIMESTAMP and the old per-message writer used
+                last_xp = datetime.fromtimestamp(started_at, timezone.utc).strftime('%Y-%m-%d %H:%M:%S')
+                ends_iso = datetime.fromtimestamp(ends_at).isoformat()
+                rows.append((user_id, guild_id, last_xp, ends_iso, count))
+
+            try:
+                pool = await get_leveling_pool()
+                await pool.execute_many("""
+                    INSERT INTO xp_cooldowns (user_id, guild_id, last_xp_timestamp, cooldown_ends_at)
+                    VALUES (?, ?, ?, ?)
+                    ON CONFLICT(user_id, guild_id) DO UPDATE SET
+                        last_xp_timestamp = excluded.last_xp_timestamp,
+                        cooldown_ends_at = excluded.cooldown_ends_at,
+                        consecutive_messages = consecutive_messages + ?
+                """, rows)
+                self.stats["cooldowns_persisted"] += len(rows)
+            except Exception as e:
+                self.stats["persist_errors"] += 1
+                logging.error(f"Error persisting XP cooldowns: {e}")
+                # Requeue anything that hasn't been superseded since
+                for key, value in pending.items():
+                    self._dirty_cooldowns.setdefault(key, value)
+
+    def prune_expired(self, now: Optional[float] = None) -> int:
+        """Drop expired cooldowns from memory. Returns the number removed."""
+        now = time.time() if now is None else now
+        removed = 0
+        for state in self.guilds.values():
+            expired = [user_id for user_id, ends_at in state.cooldowns.items() if ends_at <= now]
+            for user_id in expired:
+                del state.cooldowns[user_id]
+            removed += len(expired)
+        return removed
+
+    # =========================================================================
+    # HOT PATH
+    # =========================================================================
+
+    def is_on_cooldown(self, user_id: str, guild_id: str, now: Optional[float] = None) -> bool:
+        state = self.guilds.get(guild_id)
+        if state is None:
+            return False
+        ends_at = state.cooldowns.get(user_id)
+        if ends_at is None:
+            return False
+        return (time.time() if now is None else now) < ends_at
+
+    def check(self, user_id: str, guild_id: str, channel_id: str, message_content: str,
+              config: Dict[str, Any], now: Optional[float] = None) -> Tuple[bool, str]:
+        """
+        Run every anti-abuse check against in-memory state.
+
+        Returns:
+            Tuple of (can_earn_xp, reason_if_blocked)
+        """
+        self.stats["checks"] += 1
+        state = self._guild(guild_id)
+        state.apply_config(config)
+
+        if not config.get('enabled', True):
+            return False, "Leveling system disabled"
+
+        if len(message_content) < config.get('min_message_chars', 5):
+            return False, "Message too short"
+
+        if len(message_content.split()) < config.get('min_message_words', 2):
+            return False, "Insufficient word count"
+
+        if channel_id in state.blacklist:
+            return False, "Channel blacklisted"
+
+        if state.whitelist and channel_id not in state.whitelist:
+            return False, "Channel not whitelisted"
+
+        ends_at = state.cooldowns.get(user_id)
+        if ends_at is not None and (time.time() if now is None else now) < ends_at:
+            self.stats["cooldown_rejections"] += 1
+            return False, "User on cooldown"
+
+        if state.daily_xp.get(user_id, 0) >= config.get('daily_xp_cap', 1000):
+            self.stats["daily_cap_rejections"] += 1
+            return False, "Daily XP cap reached"
+
+        return True, ""
+
+    def start_cooldown(self, user_id: str, guild_id: str, config: Dict[str, Any],
+                       now: Optional[float] = None) -> float:
+        """Start a randomized cooldown for a user and queue it for persistence."""
+        now = time.time() if now is None else now
+        min_cooldown = config.get('min_cooldown_seconds', 30)
+        max_cooldown = config.get('max_cooldown_seconds', 60)
+        ends_at = now + random.randint(min_cooldown, max(min_cooldown, max_cooldown))
+
+        self._guild(guild_id).cooldowns[user_id] = ends_at
+
+        key = (user_id, guild_id)
+        previous = self._dirty_cooldowns.get(key)
+        count = previous[2] + 1 if previous else 1
+        self._dirty_cooldowns[key] = (now, ends_at, count)
+        return ends_at
+
+    def get_cooldown(self, user_id: str, guild_id: str) -> Optional[float]:
+        """When a user's current cooldown ends, or None if they have none in memory."""
+        state = self.guilds.get(guild_id)
+        return state.cooldowns.get(user_id) if state else None
+
+    def release_cooldown(self, user_id: str, guild_id: str, previous_ends_at: Optional[float]) -> None:
+        """Undo start_cooldown for an award that never landed, putting back the cooldown it replaced."""
+        cooldowns = self._guild(guild_id).cooldowns
+        if previous_ends_at is None:
+            cooldowns.pop(user_id, None)
+        else:
+            cooldowns[user_id] = previous_ends_at
+
+        key = (user_id, guild_id)
+        queued = self._dirty_cooldowns.get(key)
+        if queued is None:
+            return  # Already persisted; the next award overwrites it
+        started_at, _, count = queued
+        if count > 1 and previous_ends_at is not None:
+            # Earlier awards in the same persist window still landed
+            self._dirty_cooldowns[key] = (started_at, previous_ends_at, count - 1)
+        else:
+            del self._dirty_cooldowns[key]
+
+    def get_daily_xp(self, user_id: str, guild_id: str) -> int:
+        state = self.guilds.get(guild_id)
+        return state.daily_xp.get(user_id, 0) if state else 0
+
+    def add_daily_xp(self, user_id: str, guild_id: str, amount: int) -> int:
+        daily_xp = self._guild(guild_id).daily_xp
+        daily_xp[user_id] = max(0, daily_xp.get(user_id, 0) + amount)
+        return daily_xp[user_id]
+
+    def set_daily_xp(self, user_id: str, guild_id: str, amount: int) -> None:
+        """Overwrite a user's daily counter after an out-of-band write (e.g. dashboard admin tools)."""
+        self._guild(guild_id).daily_xp[user_id] = max(0, int(amount or 0))
+
+    def reset_daily_xp(self, guild_id: str) -> int:
+        """Drop every daily counter for a guild after its daily reset. Returns counters cleared."""
+        state = self.guilds.get(guild_id)
+        if not state:
+            return 0
+        cleared = len(state.daily_xp)
+        state.daily_xp = {}
+        return cleared
+
+    def get_stats(self) -> Dict[str, Any]:
+        return {
+            **self.stats,
+            "guilds": len(self.guilds),
+            "active_cooldowns": sum(len(state.cooldowns) for state in self.guilds.values()),
+            "pending_cooldowns": len(self._dirty_cooldowns)
+        }
@@ -0,0 +1,299 @@
+import asyncio
+import logging
+import time
+from collections import deque
+from typing import Any, Callable, Dict, List, Optional
+
+from database_modules.database_pool import get_leveling_pool
+from modules.leveling_retention import record_rollups
+
+# Awards wait at most this long for others to share their commit
+LEDGER_FLUSH_DEADLINE = 0.05  # seconds
+# A batch this large is flushed immediately
+LEDGER_MAX_BATCH = 256
+# Number of recent batches kept for the batch size / commit latency metrics
+LEDGER_METRICS_WINDOW = 512
+
+
+class PendingAward:
+    """One XP award waiting for the next group commit."""
+
+    __slots__ = ("user_id", "guild_id", "channel_id", "message_id", "xp_amount",
+                 "message_length", "word_count", "char_count", "daily_cap_applied", "future")
+
+    def __init__(self, user_id: str, guild_id: str, channel_id: str, message_id: Optional[str],
+                 xp_amount: int, message_length: int, word_count: int, char_count: int,
+                 daily_cap_applied: bool, future: asyncio.Future):
+        self.user_id = user_id
+        self.guild_id = guild_id
+        self.channel_id = channel_id
+        self.message_id = message_id
+        self.xp_amount = xp_amount
+        self.message_length = message_length
+        self.word_count = word_count
+        self.char_count = char_count
+        self.daily_cap_applied = daily_cap_applied
+        self.future = future
+
+
+class XPLedgerWriter:
+    """
+    Group-commit writer for XP awards.
+
+    Awards are queued per guild and applied in a single transaction once the
+    flush deadline passes or the batch fills up. The user_levels upsert returns
+    the new total_xp, so level-ups are detected and written in the same
+    transaction without re-reading the row. The daily XP rollups are updated
+    in that transaction too. Callers await a future that
+    resolves with the user's post-award level state once the batch commits.
+    """
+
+    def __init__(self, leveling_system, flush_deadline: float = LEDGER_FLUSH_DEADLINE,
+                 max_batch: int = LEDGER_MAX_BATCH):
+        self.leveling = leveling_system
+        self.flush_deadline = flush_deadline
+        self.max_batch = max_batch
+
+        self._pending: Dict[str, List[PendingAward]] = {}
+        self._pending_count = 0
+        self._wakeup = asyncio.Event()
+        self._batch_full = asyncio.Event()
+        self._flush_lock = asyncio.Lock()
+        self._task: Optional[asyncio.Task] = None
+        self._stopping = False
+        self._listeners: List[Callable[[List[PendingAward], List[Dict[str, Any]]], None]] = []
+
+        self.stats = {
+            "awards": 0,
+            "batches": 0,
+            "failed_batches": 0,
+            "level_ups": 0,
+            "max_batch_size": 0,
+            "max_commit_ms": 0.0
+        }
+        # Recent (batch_size, commit_ms) samples
+        self._recent = deque(maxlen=LEDGER_METRICS_WINDOW)
+
+    # =========================================================================
+    # LIFECYCLE
+    # =========================================================================
+
+    def start(self) -> None:
+        """Start the background flush task."""
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        """Stop the flush task and commit anything still queued."""
+        if self._task:
+            # Let the task finish its current flush rather than cancelling it mid-transaction
+            self._stopping = True
+            self._wakeup.set()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            except Exception as e:
+                logging.error(f"XP ledger flush task failed: {e}")
+            finally:
+                self._task = None
+                self._stopping = False
+        await self.flush()
+
+    async def _run(self) -> None:
+        while not self._stopping:
+            await self._wakeup.wait()
+            if self._pending_count < self.max_batch and not self._stopping:
+                try:
+                    await asyncio.wait_for(self._batch_full.wait(), timeout=self.flush_deadline)
+                except asyncio.TimeoutError:
+                    pass
+            self._wakeup.clear()
+            self._batch_full.clear()
+            # A cancelled _run must not interrupt a batch halfway through its transaction
+            await asyncio.shield(self.flush())
+
+    def add_listener(self, callback: Callable[[List[PendingAward], List[Dict[str, Any]]], None]) -> None:
+        """Call ``callback(awards, results)`` after every committed batch, e.g. for the dashboard XP feed."""
+        self._listeners.append(callback)
+
+    def remove_listener(self, callback: Callable[[List[PendingAward], List[Dict[str, Any]]], None]) -> None:
+        if callback in self._listeners:
+            self._listeners.remove(callback)
+
+    def notify_listeners(self, awards: List[PendingAward], results: List[Dict[str, Any]]) -> None:
+        """Hand a committed batch to the listeners; also used to replay batches committed by the bot process."""
+        for listener in list(self._listeners):
+            try:
+                listener(awards, results)
+            except Exception as e:
+                logging.error(f"Error in XP ledger listener: {e}")
+
+    # =========================================================================
+    # SUBMISSION
+    # =========================================================================
+
+    def submit(self, user_id: str, guild_id: str, channel_id: str, message_id: Optional[str],
+               xp_amount: int, message_content: str, daily_cap_applied: bool) -> asyncio.Future:
+        """
+        Queue an award for the next group commit.
+
+        Returns:
+            Future resolving to {'total_xp', 'old_level', 'new_level', 'level_up'}
+        """
+        self.start()
+
+        future = asyncio.get_running_loop().create_future()
+        award = PendingAward(
+            user_id, guild_id, channel_id, message_id, xp_amount,
+            len(message_content), len(message_content.split()), len(message_content),
+            daily_cap_applied, future
+        )
+        self._pending.setdefault(guild_id, []).append(award)
+        self._pending_count += 1
+
+        self._wakeup.set()
+        if self._pending_count >= self.max_batch:
+            self._batch_full.set()
+        return future
+
+    # =========================================================================
+    # GROUP COMMIT
+    # =========================================================================
+
+    async def flush(self) -> None:
+        """Apply every queued award in one transaction and resolve their futures."""
+        async with self._flush_lock:
+            if not self._pending:
+                return
+
+            pending, self._pending = self._pending, {}
+            batch_size, self._pending_count = self._pending_count, 0
+            awards = [award for guild_awards in pending.values() for award in guild_awards]
+
+            started_at = time.perf_counter()
+            try:
+                results = await self._apply(awards)
+            except asyncio.CancelledError:
+                # Rolled back; queue the awards again so stop() still commits them
+                for guild_id, guild_awards in pending.items():
+                    self._pending.setdefault(guild_id, [])[:0] = guild_awards
+                self._pending_count += batch_size
+                raise
+            except Exception as e:
+                self.stats["failed_batches"] += 1
+                logging.error(f"Error committing XP batch of {batch_size} awards: {e}")
+                for award in awards:
+                    if not award.future.done():
+                        award.future.set_exception(e)
+                return
+
+            commit_ms = (time.perf_counter() - started_at) * 1000
+            self.stats["batches"] += 1
+            self.stats["awards"] += batch_size
+            self.stats["max_batch_size"] = max(self.stats["max_batch_size"], batch_size)
+            self.stats["max_commit_ms"] = max(self.stats["max_commit_ms"], commit_ms)
+            self._recent.append((batch_size, commit_ms))
+
+            # The batch is committed: every future gets its result even if the
+            # rank index can't be updated
+            for award, result in zip(awards, results):
+                if result['level_up']:
+                    self.stats["level_ups"] += 1
+                try:
+                    self.leveling.rank_index.update(award.guild_id, award.user_id, result['total_xp'])
+                except Exception as e:
+                    logging.error(f"Error updating rank index for {award.user_id} in {award.guild_id}: {e}")
+                if not award.future.done():
+                    award.future.set_result(result)
+
+            self.notify_listeners(awards, results)
+
+    async def _apply(self, awards: List[PendingAward]) -> List[Dict[str, Any]]:
+        pool = await get_leveling_pool()
+        results = []
+
+        async with pool.get_connection() as conn:
+            try:
+                for award in awards:
+                    xp = award.xp_amount
+                    async with conn.execute("""
+                        INSERT INTO user_levels (user_id, guild_id, current_xp, total_xp, messages_sent, daily_xp_earned)
+                        VALUES (?, ?, ?, ?, 1, ?)
+                        ON CONFLICT(user_id, guild_id) DO UPDATE SET
+                            current_xp = current_xp + ?,
+                            total_xp = total_xp + ?,
+                            messages_sent = messages_sent + 1,
+                            daily_xp_earned = daily_xp_earned + ?,
+                            last_xp_timestamp = CURRENT_TIMESTAMP,
+                            updated_at = CURRENT_TIMESTAMP
+                        RETURNING total_xp, current_level
+                    """, (award.user_id, award.guild_id, xp, xp, xp, xp, xp, xp)) as cursor:
+                        total_xp, current_level = await cursor.fetchone()
+
+                    current_level = current_level or 0
+                    new_level = self.leveling.calculate_level_from_xp(total_xp)
+                    level_up = new_level > current_level
+                    if level_up:
+                        # Same update check_level_up makes: level plus progress within it
+                        await conn.execute("""
+                            UPDATE user_levels
+                            SET current_level = ?,
+                                current_xp = ?,
+                                level_up_timestamp = CURRENT_TIMESTAMP,
+                                updated_at = CURRENT_TIMESTAMP
+                            WHERE user_id = ? AND guild_id = ?
+                        """, (new_level, total_xp - self.leveling.get_xp_required_for_level(new_level),
+                              award.user_id, award.guild_id))
+
+                    results.append({
+                        'total_xp': total_xp,
+                        'old_level': current_level,
+                        'new_level': new_level if level_up else current_level,
+                        'level_up': level_up
+                    })
+
+                await conn.executemany("""
+                    INSERT INTO xp_transactions
+                    (user_id, guild_id, channel_id, message_id, xp_awarded,
+                     message_length, word_count, char_count, daily_cap_applied)
+                    VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
+                """, [
+                    (award.user_id, award.guild_id, award.channel_id, award.message_id, award.xp_amount,
+                     award.message_length, award.word_count, award.char_count, award.daily_cap_applied)
+                    for award in awards
+                ])
+                await record_rollups(conn, (
+                    (award.guild_id, award.user_id, award.xp_amount, award.daily_cap_applied)
+                    for award in awards
+                ))
+
+                await conn.commit()
+            except BaseException:
+                # Including cancellation: the connection goes back to the pool,
+                # so nothing from this batch may be left uncommitted on it
+                await conn.rollback()
+                raise
+
+        return results
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Batch size and commit latency metrics for the dashboard."""
+        sizes = sorted(size for size, _ in self._recent)
+        latencies = sorted(latency for _, latency in self._recent)
+
+        def percentile(values, fraction):
+            if not values:
+                return 0
+            return values[min(len(values) - 1, int(len(values) * fraction))]
+
+        return {
+            **self.stats,
+            "pending": self._pending_count,
+            "avg_batch_size": round(self.stats["awards"] / self.stats["batches"], 2) if self.stats["batches"] else 0.0,
+            "p50_batch_size": percentile(sizes, 0.50),
+            "p99_batch_size": percentile(sizes, 0.99),
+            "p50_commit_ms": round(percentile(latencies, 0.50), 2),
+            "p99_commit_ms": round(percentile(latencies, 0.99), 2),
+            "max_commit_ms": round(self.stats["max_commit_ms"], 2)
+        }
@@ -0,0 +1,188 @@
+import asyncio
+import json
+import logging
+from bisect import bisect_right
+from typing import Any, Callable, Dict, List, Optional
+
+from database_modules.database_pool import get_leveling_pool
+
+
+class IntervalLookup:
+    """
+    Level -> entry lookup compiled from possibly overlapping [min_level, max_level] intervals.
+
+    The level axis is cut at every interval boundary; inside each elementary
+    segment the set of covering intervals is constant, so the winning entry is
+    resolved once at compile time and a lookup is a single bisect.
+    """
+
+    __slots__ = ("_starts", "_values")
+
+    def __init__(self, entries: List[Dict[str, Any]], pick: Callable[[List[Dict[str, Any]]], Dict[str, Any]]):
+        points = set()
+        for entry in entries:
+            points.add(entry['min_level'])
+            if entry['max_level'] is not None:
+                points.add(entry['max_level'] + 1)
+
+        self._starts: List[int] = []
+        self._values: List[Optional[Dict[str, Any]]] = []
+        for point in sorted(points):
+            covering = [
+                entry for entry in entries
+                if entry['min_level'] <= point and (entry['max_level'] is None or point <= entry['max_level'])
+            ]
+            value = pick(covering) if covering else None
+            if self._values and self._values[-1] is value:
+                continue
+            self._starts.append(point)
+            self._values.append(value)
+
+    def get(self, level: int) -> Optional[Dict[str, Any]]:
+        index = bisect_right(self._starts, level) - 1
+        return self._values[index] if index >= 0 else None
+
+
+class GuildLevelIndex:
+    """Compiled rank titles, level ranges and rewards for one guild."""
+
+    def __init__(self, ranks: List[Dict[str, Any]], ranges: List[Dict[str, Any]],
+                 rewards: List[Dict[str, Any]]):
+        # Same winners as the SQL lookups: the highest-starting rank, the lowest-starting range
+        self.ranks = IntervalLookup(ranks, lambda covering: max(covering, key=lambda r: r['min_level']))
+        self.ranges = IntervalLookup(ranges, lambda covering: min(covering, key=lambda r: r['min_level']))
+
+        self.direct_rewards: Dict[int, List[Dict[str, Any]]] = {}
+        self.milestone_rewards: List[Dict[str, Any]] = []
+        for reward in rewards:
+            if reward['is_milestone']:
+                if reward.get('milestone_interval'):
+                    self.milestone_rewards.append(reward)
+            else:
+                self.direct_rewards.setdefault(reward['level'], []).append(reward)
+
+    def rank_for_level(self, level: int) -> Optional[Dict[str, Any]]:
+        rank = self.ranks.get(level)
+        return dict(rank) if rank else None
+
+    def range_for_level(self, level: int) -> Optional[Dict[str, Any]]:
+        level_range = self.ranges.get(level)
+        return dict(level_range) if level_range else None
+
+    def rewards_for_level(self, level: int) -> List[Dict[str, Any]]:
+        rewards = [dict(reward, level=level) for reward in self.direct_rewards.get(level, ())]
+        rewards.extend(
+            dict(reward, level=level) for reward in self.milestone_rewards
+            if level % reward['milestone_interval'] == 0
+        )
+        return rewards
+
+
+class LevelIndexCache:
+    """
+    Per-guild GuildLevelIndex instances, loaded on first use and kept until invalidated.
+
+    Every write to rank_titles, level_range_names or level_rewards (LevelingSystem
+    CRUD methods and the dashboard routes) must call invalidate() for the guild.
+    """
+
+    def __init__(self):
+        self._indexes: Dict[str, GuildLevelIndex] = {}
+        self._locks: Dict[str, asyncio.Lock] = {}
+        # Bumped on invalidation so a load that raced with a write is not cached
+        self._generation: Dict[str, int] = {}
+
+    async def get(self, guild_id: str) -> GuildLevelIndex:
+        index = self._indexes.get(guild_id)
+        if index is not None:
+            return index
+
+        lock = self._locks.setdefault(guild_id, asyncio.Lock())
+        async with lock:
+            index = self._indexes.get(guild_id)
+            if index is not None:
+                return index
+
+            generation = self._generation.get(guild_id, 0)
+            index = await self._load(guild_id)
+            if self._generation.get(guild_id, 0) == generation:
+                self._indexes[guild_id] = index
+            return index
+
+    def invalidate(self, guild_id: Optional[str] = None) -> None:
+        if guild_id is None:
+            for cached_guild_id in list(self._indexes):
+                self.invalidate(cached_guild_id)
+            return
+        guild_id = str(guild_id)
+        self._indexes.pop(guild_id, None)
+        self._generation[guild_id] = self._generation.get(guild_id, 0) + 1
+
+    async def _load(self, guild_id: str) -> GuildLevelIndex:
+        pool = await get_leveling_pool()
+        rank_rows = await pool.execute_query("""
+            SELECT id, title, description, color_hex, emoji, role_id, min_level, max_level
+            FROM rank_titles
+            WHERE guild_id = ?
+            ORDER BY id
+        """, (guild_id,))
+        range_rows = await pool.execute_query("""
+            SELECT id, range_name, description, min_level, max_level
+            FROM level_range_names
+            WHERE guild_id = ?
+            ORDER BY id
+        """, (guild_id,))
+        reward_rows = await pool.execute_query("""
+            SELECT id, level, reward_type, reward_data, is_milestone, milestone_interval, created_at
+            FROM level_rewards
+            WHERE guild_id = ? AND active = TRUE
+            ORDER BY id
+        """, (guild_id,))
+
+        ranks = [
+            {
+                'id': row[0],
+                'title': row[1],
+                'description': row[2],
+                'color_hex': row[3],
+                'emoji': row[4],
+                'role_id': row[5],
+                'min_level': row[6],
+                'max_level': row[7]
+            }
+            for row in rank_rows
+        ]
+        ranges = [
+            {
+                'id': row[0],
+                'name': row[1],
+                'description': row[2],
+                'min_level': row[3],
+                'max_level': row[4]
+            }
+            for row in range_rows
+        ]
+
+        rewards = []
+        for row in reward_rows:
+            try:
+                reward_data = json.loads(row[3])
+            except (TypeError, ValueError):
+                reward_data = {}
+            reward = {
+                'id': row[0],
+                'level': row[1],
+                'reward_type': row[2],
+                'reward_data': reward_data,
+                'is_milestone': bool(row[4]),
+                'created_at': row[6]
+            }
+            if reward['is_milestone']:
+                reward['milestone_interval'] = row[5]
+            rewards.append(reward)
+
+        logging.debug(
+            f"Compiled level index for guild {guild_id}: {len(ranks)} ranks, "
+            f"{len(ranges)} ranges, {len(rewards)} rewards"
+        )
+        return GuildLevelIndex(ranks, ranges, rewards)
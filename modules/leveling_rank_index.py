@@ -0,0 +1,263 @@
+import logging
+from bisect import bisect_left, bisect_right, insort
+from typing import Dict, List, Optional, Tuple
+
+from database_modules.database_pool import get_leveling_pool
+
+# Target bucket size; buckets split at twice this
+RANK_INDEX_LOAD = 512
+
+# Leaderboard order: most XP first, ties broken by user_id (matches get_leaderboard_page)
+RankKey = Tuple[int, str]
+
+
+def _key(total_xp: int, user_id: str) -> RankKey:
+    return (-int(total_xp or 0), user_id)
+
+
+class OrderStatisticList:
+    """
+    Sorted list of rank keys supporting O(log n) position and select queries.
+
+    Keys live in sorted buckets of roughly RANK_INDEX_LOAD entries. A Fenwick
+    tree over the bucket sizes gives the number of keys before any bucket, so
+    "how many keys precede this one" and "which key is at position k" only
+    need a bisect plus a tree walk. Inserts and removals shift at most one
+    bucket, which keeps them cheap without a balanced tree.
+    """
+
+    def __init__(self, keys: Optional[List[RankKey]] = None, load: int = RANK_INDEX_LOAD):
+        self._load = load
+        self._buckets: List[List[RankKey]] = []
+        self._maxes: List[RankKey] = []
+        self._tree: List[int] = []
+        self._len = 0
+        if keys:
+            ordered = sorted(keys)
+            self._buckets = [ordered[i:i + load] for i in range(0, len(ordered), load)]
+            self._maxes = [bucket[-1] for bucket in self._buckets]
+            self._len = len(ordered)
+        self._rebuild_tree()
+
+    def __len__(self) -> int:
+        return self._len
+
+    # -------------------------------------------------------------------------
+    # Fenwick tree over bucket sizes
+    # -------------------------------------------------------------------------
+
+    def _rebuild_tree(self) -> None:
+        tree = [0] + [len(bucket) for bucket in self._buckets]
+        size = len(tree)
+        for i in range(1, size):
+            parent = i + (i & -i)
+            if parent < size:
+                tree[parent] += tree[i]
+        self._tree = tree
+
+    def _tree_add(self, bucket_index: int, delta: int) -> None:
+        i = bucket_index + 1
+        size = len(self._tree)
+        while i < size:
+            self._tree[i] += delta
+            i += i & -i
+
+    def _tree_prefix(self, bucket_index: int) -> int:
+        """Number of keys in buckets before bucket_index."""
+        total = 0
+        i = bucket_index
+        while i > 0:
+            total += self._tree[i]
+            i -= i & -i
+        return total
+
+    def _tree_find(self, position: int) -> Tuple[int, int]:
+        """Return (bucket_index, offset_in_bucket) for a 0-based position."""
+        i = 0
+        step = 1 << (len(self._tree).bit_length())
+        while step:
+            nxt = i + step
+            if nxt < len(self._tree) and self._tree[nxt] <= position:
+                i = nxt
+                position -= self._tree[nxt]
+            step >>= 1
+        return i, position
+
+    # -------------------------------------------------------------------------
+    # Operations
+    # -------------------------------------------------------------------------
+
+    def add(self, key: RankKey) -> None:
+        if not self._buckets:
+            self._buckets.append([key])
+            self._maxes.append(key)
+            self._len = 1
+            self._rebuild_tree()
+            return
+
+        index = bisect_left(self._maxes, key)
+        if index == len(self._maxes):
+            index -= 1
+        bucket = self._buckets[index]
+        insort(bucket, key)
+        self._maxes[index] = bucket[-1]
+        self._len += 1
+
+        if len(bucket) > self._load * 2:
+            self._buckets[index:index + 1] = [bucket[:self._load], bucket[self._load:]]
+            self._maxes[index:index + 1] = [bucket[self._load - 1], bucket[-1]]
+            self._rebuild_tree()
+        else:
+            self._tree_add(index, 1)
+
+    def remove(self, key: RankKey) -> bool:
+        index = bisect_left(self._maxes, key)
+        if index == len(self._maxes):
+            return False
+        bucket = self._buckets[index]
+        offset = bisect_left(bucket, key)
+        if offset == len(bucket) or bucket[offset] != key:
+            return False
+
+        del bucket[offset]
+        self._len -= 1
+        if bucket:
+            self._maxes[index] = bucket[-1]
+            self._tree_add(index, -1)
+        else:
+            del self._buckets[index]
+            del self._maxes[index]
+            self._rebuild_tree()
+        return True
+
+    def count_before(self, key: RankKey) -> int:
+        """Number of keys strictly less than key."""
+        index = bisect_left(self._maxes, key)
+        if index == len(self._maxes):
+            return self._len
+        return self._tree_prefix(index) + bisect_left(self._buckets[index], key)
+
+    def count_not_after(self, key: RankKey) -> int:
+        """Number of keys less than or equal to key."""
+        index = bisect_right(self._maxes, key)
+        if index == len(self._maxes):
+            return self._len
+        return self._tree_prefix(index) + bisect_right(self._buckets[index], key)
+
+    def at(self, position: int) -> Optional[RankKey]:
+        """Key at a 0-based position, or None when out of range."""
+        if position < 0 or position >= self._len:
+            return None
+        bucket_index, offset = self._tree_find(position)
+        return self._buckets[bucket_index][offset]
+
+
+class ServerRankIndex:
+    """
+    Per-guild server rank index over total_xp, rebuilt from user_levels on startup.
+
+    Positions follow the leaderboard order (total_xp descending, then user_id);
+    server ranks are competition ranks, so users on equal XP share a rank.
+    """
+
+    def __init__(self):
+        self.loaded = False
+        self._guilds: Dict[str, OrderStatisticList] = {}
+        self._totals: Dict[str, Dict[str, int]] = {}
+
+    async def load(self) -> None:
+        """Rebuild every guild's index from user_levels."""
+        if self.loaded:
+            return
+        try:
+            pool = await get_leveling_pool()
+            rows = await pool.execute_query("SELECT guild_id, user_id, total_xp FROM user_levels")
+        except Exception as e:
+            logging.error(f"Error loading server rank index: {e}")
+            return
+
+        keys_by_guild: Dict[str, List[RankKey]] = {}
+        for guild_id, user_id, total_xp in rows:
+            guild_id, user_id = str(guild_id), str(user_id)
+            # Awards committed before the load finished already updated these users
+            if user_id in self._totals.get(guild_id, {}):
+                continue
+            self._totals.setdefault(guild_id, {})[user_id] = int(total_xp or 0)
+            keys_by_guild.setdefault(guild_id, []).append(_key(total_xp, user_id))
+
+        for guild_id, keys in keys_by_guild.items():
+            existing = self._guilds.get(guild_id)
+            if existing:
+                for key in keys:
+                    existing.add(key)
+            else:
+                self._guilds[guild_id] = OrderStatisticList(keys)
+
+        self.loaded = True
+        logging.info(f"Server rank index loaded: {len(rows)} users across {len(self._guilds)} guilds")
+
+    def update(self, guild_id: str, user_id: str, total_xp: int) -> None:
+        """Record a user's new total XP."""
+        totals = self._totals.setdefault(guild_id, {})
+        index = self._guilds.get(guild_id)
+        if index is None:
+            index = self._guilds[guild_id] = OrderStatisticList()
+
+        previous = totals.get(user_id)
+        total_xp = int(total_xp or 0)
+        if previous == total_xp:
+            return
+        if previous is not None:
+            index.remove(_key(previous, user_id))
+        index.add(_key(total_xp, user_id))
+        totals[user_id] = total_xp
+
+    def replace_guild(self, guild_id: str, totals: Dict[str, int]) -> None:
+        """Rebuild one guild's index from a complete {user_id: total_xp} mapping."""
+        self._totals[guild_id] = dict(totals)
+        self._guilds[guild_id] = OrderStatisticList([_key(total_xp, user_id) for user_id, total_xp in totals.items()])
+
+    def remove(self, guild_id: str, user_id: str) -> None:
+        previous = self._totals.get(guild_id, {}).pop(user_id, None)
+        if previous is not None:
+            self._guilds[guild_id].remove(_key(previous, user_id))
+
+    def get_total_xp(self, guild_id: str, user_id: str) -> Optional[int]:
+        return self._totals.get(guild_id, {}).get(user_id)
+
+    def get_position(self, guild_id: str, user_id: str) -> Optional[int]:
+        """1-based leaderboard position of a user."""
+        total_xp = self.get_total_xp(guild_id, user_id)
+        if total_xp is None:
+            return None
+        return self._guilds[guild_id].count_before(_key(total_xp, user_id)) + 1
+
+    def get_rank(self, guild_id: str, user_id: str) -> Optional[int]:
+        """Competition-style server rank of a user (ties share a rank)."""
+        total_xp = self.get_total_xp(guild_id, user_id)
+        if total_xp is None:
+            return None
+        return self.count_above(guild_id, total_xp) + 1
+
+    def count_above(self, guild_id: str, total_xp: int) -> int:
+        """Number of users with strictly more XP than total_xp."""
+        index = self._guilds.get(guild_id)
+        # (-total_xp, "") sorts before every user on exactly total_xp
+        return index.count_before((-int(total_xp), "")) if index else 0
+
+    def count_through(self, guild_id: str, total_xp: int, user_id: str) -> int:
+        """Number of users up to and including (total_xp, user_id) in leaderboard order."""
+        index = self._guilds.get(guild_id)
+        return index.count_not_after(_key(total_xp, user_id)) if index else 0
+
+    def get_user_at(self, guild_id: str, position: int) -> Optional[Tuple[str, int]]:
+        """(user_id, total_xp) at a 1-based leaderboard position."""
+        index = self._guilds.get(guild_id)
+        key = index.at(position - 1) if index else None
+        if key is None:
+            return None
+        return key[1], -key[0]
+
+    def guild_size(self, guild_id: str) -> int:
+        index = self._guilds.get(guild_id)
+        return len(index) if index else 0
@@ -0,0 +1,414 @@
+import asyncio
+import inspect
+import logging
+import os
+import time
+from datetime import datetime, timezone
+from typing import Any, Awaitable, Callable, Dict, Optional, Union
+
+import aiosqlite
+
+from database_modules.database_pool import get_leveling_pool
+from database_modules.database_schema import get_guild_db_path
+from modules.leveling_daily_reset import get_zone, parse_reset_time
+from modules.leveling_eligibility import parse_channel_list
+
+# Messages fetched from chat_history.db per round trip
+REPLAY_CHUNK_SIZE = 50000
+
+MS_PER_DAY = 86400 * 1000
+MS_PER_HOUR = 3600 * 1000
+
+ProgressCallback = Callable[[Dict[str, Any]], Union[None, Awaitable[None]]]
+
+
+def _import_numpy():
+    try:
+        import numpy
+    except ImportError as e:
+        raise RuntimeError("XP replay requires NumPy (pip install numpy)") from e
+    return numpy
+
+
+def _reset_periods(np, ts, config: Dict[str, Any]):
+    """
+    Number each timestamp's daily cap period, using reset_period's rule.
+
+    A period starts at the guild's daily_reset_time in its
+    daily_reset_timezone. The zone's UTC offset is looked up once per UTC hour
+    rather than per message.
+    """
+    zone = get_zone(config.get('daily_reset_timezone'))
+    hour, minute = parse_reset_time(config.get('daily_reset_time'))
+    reset_ms = (hour * 60 + minute) * 60 * 1000
+
+    hours, inverse = np.unique(ts // MS_PER_HOUR, return_inverse=True)
+    offsets = np.array([
+        int(datetime.fromtimestamp(int(h) * 3600, timezone.utc).astimezone(zone).utcoffset().total_seconds() * 1000)
+        for h in hours
+    ], dtype=np.int64)
+    return (ts + offsets[inverse] - reset_ms) // MS_PER_DAY
+
+
+def _parse_timestamp_ms(value: str) -> Optional[int]:
+    try:
+        parsed = datetime.fromisoformat(value)
+    except (TypeError, ValueError):
+        return None
+    if parsed.tzinfo is None:
+        # chat_history.db stores discord.py's UTC created_at
+        parsed = parsed.replace(tzinfo=timezone.utc)
+    return int(parsed.timestamp() * 1000)
+
+
+class XPReplayEngine:
+    """
+    Rebuild a guild's user_levels by replaying its chat_history.db.
+
+    Messages are streamed in chunks and filtered with the same length, word
+    and channel rules as the live path. XP, the cooldown window and the daily
+    cap are then applied per user with NumPy, and the results are written in
+    one transaction.
+
+    Replay differs from live awards in a few ways:
+      - the cooldown is the midpoint of the configured min/max instead of a random value
+      - level rewards are not handed out again
+      - manual XP adjustments are not in the history, so they are lost
+    """
+
+    def __init__(self, leveling_system, chunk_size: int = REPLAY_CHUNK_SIZE):
+        self.leveling = leveling_system
+        self.chunk_size = chunk_size
+        self._status: Dict[str, Dict[str, Any]] = {}
+        self._tasks: Dict[str, asyncio.Task] = {}
+
+    def is_running(self, guild_id: str) -> bool:
+        task = self._tasks.get(guild_id)
+        return task is not None and not task.done()
+
+    def get_status(self, guild_id: str) -> Optional[Dict[str, Any]]:
+        status = self._status.get(guild_id)
+        return dict(status) if status else None
+
+    def start(self, guild_id: str, dry_run: bool = False,
+              progress: Optional[ProgressCallback] = None) -> Dict[str, Any]:
+        """Run a replay in the background. Poll get_status() for progress."""
+        if self.is_running(guild_id):
+            return {'success': False, 'reason': 'A replay is already running for this guild'}
+
+        self._status[guild_id] = {'state': 'queued', 'dry_run': dry_run}
+        self._tasks[guild_id] = asyncio.create_task(self.replay(guild_id, dry_run, progress))
+        return {'success': True, 'status': self.get_status(guild_id)}
+
+    async def run(self, guild_id: str, dry_run: bool = False,
+                  progress: Optional[ProgressCallback] = None) -> Dict[str, Any]:
+        """Start a replay like start() and wait for its summary."""
+        started = self.start(guild_id, dry_run, progress)
+        if not started['success']:
+            return started
+        # Shielded so a cancelled caller doesn't stop the replay halfway through
+        return await asyncio.shield(self._tasks[guild_id])
+
+    async def _report(self, guild_id: str, progress: Optional[ProgressCallback], **fields) -> None:
+        status = self._status.setdefault(guild_id, {})
+        status.update(fields)
+        total = status.get('total_messages') or 0
+        status['percent'] = round(100 * status.get('processed_messages', 0) / total, 1) if total else 0.0
+        if progress:
+            try:
+                outcome = progress(dict(status))
+                if inspect.isawaitable(outcome):
+                    await outcome
+            except Exception as e:
+                logging.error(f"Error in XP replay progress callback: {e}")
+
+    async def replay(self, guild_id: str, dry_run: bool = False,
+                     progress: Optional[ProgressCallback] = None) -> Dict[str, Any]:
+        """
+        Recompute every member's XP and level from the guild's chat history.
+
+        Args:
+            guild_id: Discord guild ID
+            dry_run: Compute the results without writing user_levels
+            progress: Optional callback (sync or async) receiving status snapshots
+
+        Returns:
+            Dictionary with the replay summary
+        """
+        started_at = time.perf_counter()
+        self._status[guild_id] = {
+            'state': 'running',
+            'phase': 'scanning',
+            'dry_run': dry_run,
+            'processed_messages': 0,
+            'total_messages': 0,
+            'started_at': datetime.now().isoformat()
+        }
+
+        try:
+            result = await self._replay(guild_id, dry_run, progress)
+        except Exception as e:
+            logging.error(f"Error replaying XP for guild {guild_id}: {e}")
+            result = {'success': False, 'reason': str(e)}
+
+        result['duration_ms'] = round((time.perf_counter() - started_at) * 1000, 1)
+        await self._report(
+            guild_id, progress,
+            state='completed' if result.get('success') else 'failed',
+            phase='done',
+            finished_at=datetime.now().isoformat(),
+            result=result
+        )
+        if result.get('success'):
+            logging.info(
+                f"XP replay for guild {guild_id}: {result['users']} users, "
+                f"{result['awards']} awards in {result['duration_ms']}ms"
+                f"{' (dry run)' if dry_run else ''}"
+            )
+        return result
+
+    async def _replay(self, guild_id: str, dry_run: bool,
+                      progress: Optional[ProgressCallback]) -> Dict[str, Any]:
+        np = _import_numpy()
+
+        db_path = get_guild_db_path(guild_id)
+        if not os.path.exists(db_path):
+            return {'success': False, 'reason': 'No chat history found for this guild'}
+
+        config = await self.leveling.get_guild_config(guild_id)
+        min_chars = config.get('min_message_chars', 5)
+        min_words = config.get('min_message_words', 2)
+        blacklist = parse_channel_list(config.get('blacklisted_channels'))
+        whitelist = parse_channel_list(config.get('whitelisted_channels'))
+
+        # =====================================================================
+        # Stream chat history into compact arrays
+        # =====================================================================
+
+        user_codes: Dict[str, int] = {}
+        user_chunks, ts_chunks, word_chunks, char_chunks = [], [], [], []
+        processed = 0
+
+        async with aiosqlite.connect(db_path) as conn:
+            async with conn.execute("SELECT COUNT(*) FROM messages WHERE guild_id = ?", (guild_id,)) as cursor:
+                total_messages = (await cursor.fetchone())[0]
+            await self._report(guild_id, progress, total_messages=total_messages)
+
+            async with conn.execute("""
+                SELECT user_id, channel_id, message_content, timestamp
+                FROM messages
+                WHERE guild_id = ?
+            """, (guild_id,)) as cursor:
+                while True:
+                    rows = await cursor.fetchmany(self.chunk_size)
+                    if not rows:
+                        break
+
+                    chunk = await asyncio.to_thread(
+                        self._filter_chunk, np, rows, user_codes, min_chars, min_words, blacklist, whitelist
+                    )
+                    if chunk:
+                        for arrays, array in zip((user_chunks, ts_chunks, word_chunks, char_chunks), chunk):
+                            arrays.append(array)
+
+                    processed += len(rows)
+                    await self._report(guild_id, progress, processed_messages=processed)
+
+        await self._report(guild_id, progress, phase='computing')
+        # Pure NumPy/Python work; kept off the event loop so the bot stays responsive
+        rows, totals = await asyncio.to_thread(
+            self._compute, np, guild_id, config, user_codes,
+            user_chunks, ts_chunks, word_chunks, char_chunks
+        )
+        summary = {'success': True, 'dry_run': dry_run, 'messages_scanned': processed, **totals}
+        if dry_run:
+            return summary
+
+        await self._report(guild_id, progress, phase='writing')
+        await self._write(guild_id, rows)
+        return summary
+
+    @staticmethod
+    def _filter_chunk(np, rows, user_codes: Dict[str, int], min_chars: int, min_words: int,
+                      blacklist, whitelist):
+        """Apply the live path's message filters to one chunk and return its (users, ts, words, chars) arrays."""
+        users, stamps, words, chars = [], [], [], []
+        for user_id, channel_id, content, timestamp in rows:
+            # Same filters the live path applies before the cooldown check
+            if not content or len(content) < min_chars:
+                continue
+            word_count = len(content.split())
+            if word_count < min_words:
+                continue
+            channel_id = str(channel_id)
+            if channel_id in blacklist or (whitelist and channel_id not in whitelist):
+                continue
+            timestamp_ms = _parse_timestamp_ms(timestamp)
+            if timestamp_ms is None:
+                continue
+
+            user_id = str(user_id)
+            code = user_codes.get(user_id)
+            if code is None:
+                code = user_codes[user_id] = len(user_codes)
+            users.append(code)
+            stamps.append(timestamp_ms)
+            words.append(word_count)
+            chars.append(len(content))
+
+        if not users:
+            return None
+        return tuple(np.array(values, dtype=np.int64) for values in (users, stamps, words, chars))
+
+    @staticmethod
+    def _compute(np, guild_id: str, config: Dict[str, Any], user_codes: Dict[str, int],
+                 user_chunks, ts_chunks, word_chunks, char_chunks):
+        """Apply XP, the cooldown and the daily cap to the filtered messages; returns (rows, summary)."""
+        user_ids = list(user_codes)
+        if not user_chunks:
+            users = ts = words = chars = np.zeros(0, dtype=np.int64)
+        else:
+            users = np.concatenate(user_chunks)
+            ts = np.concatenate(ts_chunks)
+            words = np.concatenate(word_chunks)
+            chars = np.concatenate(char_chunks)
+        eligible_messages = len(users)
+
+        # =====================================================================
+        # XP per message, then cooldown and daily cap per user
+        # =====================================================================
+
+        # calculate_xp: min(base + word_mult * words + char_mult * chars, max), truncated
+        xp = np.trunc(np.minimum(
+            config.get('base_xp', 5)
+            + config.get('word_multiplier', 0.5) * words
+            + config.get('char_multiplier', 0.1) * chars,
+            config.get('max_xp', 25)
+        )).astype(np.int64)
+        keep = xp > 0
+        users, ts, xp = users[keep], ts[keep], xp[keep]
+
+        order = np.lexsort((ts, users))
+        users, ts, xp = users[order], ts[order], xp[order]
+        count = len(users)
+
+        min_cooldown = config.get('min_cooldown_seconds', 30)
+        max_cooldown = max(min_cooldown, config.get('max_cooldown_seconds', 60))
+        cooldown_ms = int((min_cooldown + max_cooldown) * 1000 / 2)
+
+        daily_cap = config.get('daily_xp_cap', 1000)
+        awarded = np.zeros(count, dtype=np.int64)
+        if count:
+            # One sortable key per message: users occupy disjoint spans, so a
+            # search for "first message at or after ts + cooldown" never lands
+            # inside another user's messages
+            base_ts = int(ts.min())
+            span = int(ts.max()) - base_ts + cooldown_ms + 1
+            keys = users * span + (ts - base_ts)
+            next_award = np.searchsorted(keys, keys + cooldown_ms, side='left')
+            next_award = np.maximum(next_award, np.arange(1, count + 1))
+
+            # A capped message starts no cooldown, and every later message in
+            # the same period is capped too, so the chain resumes at the next period
+            periods = _reset_periods(np, ts, config)
+            period_start = np.r_[True, (users[1:] != users[:-1]) | (periods[1:] != periods[:-1])]
+            next_period = np.r_[np.flatnonzero(period_start)[1:], count][np.cumsum(period_start) - 1]
+
+            # Walk every user's award chain at once, one step per iteration,
+            # applying the daily cap as awards land
+            earned = np.zeros(len(user_ids), dtype=np.int64)
+            current_period = np.full(len(user_ids), np.iinfo(np.int64).min, dtype=np.int64)
+            frontier = np.flatnonzero(np.r_[True, users[1:] != users[:-1]])
+            while frontier.size:
+                # Users in the frontier are distinct, so per-user updates don't collide
+                frontier_users = users[frontier]
+                frontier_periods = periods[frontier]
+                earned[frontier_users] = np.where(
+                    current_period[frontier_users] == frontier_periods, earned[frontier_users], 0
+                )
+                current_period[frontier_users] = frontier_periods
+                grant = np.minimum(xp[frontier], np.maximum(daily_cap - earned[frontier_users], 0))
+                awarded[frontier] = grant
+                earned[frontier_users] += grant
+
+                following = np.where(grant > 0, next_award[frontier], next_period[frontier])
+                in_range = following < count
+                frontier, following = frontier[in_range], following[in_range]
+                frontier = following[users[following] == users[frontier]]
+
+        landed = awarded > 0
+        award_users, award_ts, awarded = users[landed], ts[landed], awarded[landed]
+
+        user_count = len(user_ids)
+        totals = np.bincount(award_users, weights=awarded, minlength=user_count).astype(np.int64)
+        messages = np.bincount(award_users, minlength=user_count).astype(np.int64)
+        last_award = np.zeros(user_count, dtype=np.int64)
+        if len(award_users):
+            last_of_user = np.r_[award_users[1:] != award_users[:-1], True]
+            last_award[award_users[last_of_user]] = award_ts[last_of_user]
+
+        # calculate_level_from_xp in closed form
+        levels = np.where(
+            totals > 0,
+            np.floor((-100 + np.sqrt(10000 + 200 * totals.astype(np.float64))) / 100),
+            0
+        ).astype(np.int64)
+        current_xp = totals - (50 * levels * levels + 100 * levels)
+
+        rows = [
+            (
+                user_ids[code], guild_id, int(current_xp[code]), int(levels[code]),
+                int(totals[code]), int(messages[code]),
+                datetime.fromtimestamp(last_award[code] / 1000, timezone.utc).strftime('%Y-%m-%d %H:%M:%S')
+            )
+            for code in np.flatnonzero(messages)
+        ]
+
+        summary = {
+            'messages_eligible': eligible_messages,
+            'awards': int(len(awarded)),
+            'users': len(rows),
+            'total_xp': int(totals.sum()),
+            'max_level': int(levels.max()) if user_count else 0,
+            'cooldown_seconds': cooldown_ms / 1000
+        }
+        return rows, summary
+
+    async def _write(self, guild_id: str, rows) -> None:
+        # Let queued live awards land first so they are not written over mid-batch
+        await self.leveling.ledger.flush()
+
+        pool = await get_leveling_pool()
+        async with pool.get_connection() as conn:
+            try:
+                # Members with no qualifying history keep their row but lose their XP
+                await conn.execute("""
+                    UPDATE user_levels
+                    SET current_xp = 0, current_level = 0, total_xp = 0, messages_sent = 0,
+                        updated_at = CURRENT_TIMESTAMP
+                    WHERE guild_id = ?
+                """, (guild_id,))
+                await conn.executemany("""
+                    INSERT INTO user_levels
+                    (user_id, guild_id, current_xp, current_level, total_xp, messages_sent, last_xp_timestamp)
+                    VALUES (?, ?, ?, ?, ?, ?, ?)
+                    ON CONFLICT(user_id, guild_id) DO UPDATE SET
+                        current_xp = excluded.current_xp,
+                        current_level = excluded.current_level,
+                        total_xp = excluded.total_xp,
+                        messages_sent = excluded.messages_sent,
+                        last_xp_timestamp = excluded.last_xp_timestamp,
+                        updated_at = CURRENT_TIMESTAMP
+                """, rows)
+                await conn.commit()
+            except Exception:
+                await conn.rollback()
+                raise
+
+            async with conn.execute(
+                "SELECT user_id, total_xp FROM user_levels WHERE guild_id = ?", (guild_id,)
+            ) as cursor:
+                totals = {str(user_id): int(total_xp or 0) for user_id, total_xp in await cursor.fetchall()}
+
+        self.leveling.rank_index.replace_guild(guild_id, totals)
+        self.leveling.clear_guild_user_cache(guild_id)
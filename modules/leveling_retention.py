@@ -0,0 +1,251 @@
+import asyncio
+import logging
+import os
+import time
+from collections import deque
+from datetime import datetime, timedelta, timezone
+from typing import Any, Dict, Iterable, Optional, Tuple
+
+from database_modules.database_pool import get_leveling_pool
+
+# Raw xp_transactions rows older than this are deleted; the daily rollups keep the totals
+XP_TRANSACTION_RETENTION_DAYS = int(os.getenv("XP_TRANSACTION_RETENTION_DAYS", "90"))
+
+# Per-user daily rollups are pruned after this; per-guild rollups are kept
+XP_USER_ROLLUP_RETENTION_DAYS = int(os.getenv("XP_USER_ROLLUP_RETENTION_DAYS", "365"))
+
+# Rows deleted per statement, and the pause between statements so awards can interleave
+RETENTION_DELETE_CHUNK = 5000
+RETENTION_CHUNK_PAUSE = 0.05
+
+# Seconds between retention sweeps
+RETENTION_INTERVAL = 3600
+
+ROLLUP_SCHEMA = """
+CREATE TABLE IF NOT EXISTS xp_daily_guild_rollups (
+    guild_id TEXT NOT NULL,
+    day TEXT NOT NULL,
+    xp_awarded INTEGER NOT NULL DEFAULT 0,
+    awards INTEGER NOT NULL DEFAULT 0,
+    capped_awards INTEGER NOT NULL DEFAULT 0,
+    PRIMARY KEY (guild_id, day)
+);
+
+CREATE TABLE IF NOT EXISTS xp_daily_user_rollups (
+    guild_id TEXT NOT NULL,
+    day TEXT NOT NULL,
+    user_id TEXT NOT NULL,
+    xp_awarded INTEGER NOT NULL DEFAULT 0,
+    awards INTEGER NOT NULL DEFAULT 0,
+    PRIMARY KEY (guild_id, day, user_id)
+);
+
+CREATE INDEX IF NOT EXISTS idx_xp_transactions_timestamp
+    ON xp_transactions(timestamp);
+CREATE INDEX IF NOT EXISTS idx_xp_transactions_guild_timestamp
+    ON xp_transactions(guild_id, timestamp);
+"""
+
+
+def utc_day(timestamp: Optional[float] = None) -> str:
+    """Rollup day key; UTC like the CURRENT_TIMESTAMP values in xp_transactions."""
+    moment = datetime.now(timezone.utc) if timestamp is None else datetime.fromtimestamp(timestamp, timezone.utc)
+    return moment.strftime('%Y-%m-%d')
+
+
+async def record_rollups(conn, awards: Iterable[Tuple[str, str, int, bool]], day: Optional[str] = None) -> None:
+    """
+    Add awards to the daily rollups on an open connection, inside the caller's transaction.
+
+    Args:
+        conn: Leveling database connection
+        awards: (guild_id, user_id, xp_awarded, daily_cap_applied) tuples
+        day: Rollup day, defaults to today (UTC)
+    """
+    day = day or utc_day()
+    guild_totals: Dict[str, list] = {}
+    user_totals: Dict[Tuple[str, str], list] = {}
+    for guild_id, user_id, xp_awarded, daily_cap_applied in awards:
+        guild_entry = guild_totals.setdefault(guild_id, [0, 0, 0])
+        guild_entry[0] += xp_awarded
+        guild_entry[1] += 1
+        guild_entry[2] += 1 if daily_cap_applied else 0
+        user_entry = user_totals.setdefault((guild_id, user_id), [0, 0])
+        user_entry[0] += xp_awarded
+        user_entry[1] += 1
+
+    if not guild_totals:
+        return
+
+    await conn.executemany("""
+        INSERT INTO xp_daily_guild_rollups (guild_id, day, xp_awarded, awards, capped_awards)
+        VALUES (?, ?, ?, ?, ?)
+        ON CONFLICT(guild_id, day) DO UPDATE SET
+            xp_awarded = xp_awarded + excluded.xp_awarded,
+            awards = awards + excluded.awards,
+            capped_awards = capped_awards + excluded.capped_awards
+    """, [(guild_id, day, xp, count, capped) for guild_id, (xp, count, capped) in guild_totals.items()])
+    await conn.executemany("""
+        INSERT INTO xp_daily_user_rollups (guild_id, day, user_id, xp_awarded, awards)
+        VALUES (?, ?, ?, ?, ?)
+        ON CONFLICT(guild_id, day, user_id) DO UPDATE SET
+            xp_awarded = xp_awarded + excluded.xp_awarded,
+            awards = awards + excluded.awards
+    """, [(guild_id, day, user_id, xp, count) for (guild_id, user_id), (xp, count) in user_totals.items()])
+
+
+class XPLedgerRetention:
+    """
+    Lifecycle for the xp_transactions ledger.
+
+    Rollups are written by the ledger writer in the same transaction as the
+    raw rows, so dashboard stats read a handful of rollup rows instead of
+    scanning the ledger. A background sweep deletes raw rows past the
+    retention window in small chunks, oldest first, so it never holds the
+    write lock for long.
+    """
+
+    def __init__(self, retention_days: int = XP_TRANSACTION_RETENTION_DAYS,
+                 user_rollup_retention_days: int = XP_USER_ROLLUP_RETENTION_DAYS,
+                 interval: int = RETENTION_INTERVAL, chunk_size: int = RETENTION_DELETE_CHUNK):
+        self.retention_days = retention_days
+        self.user_rollup_retention_days = user_rollup_retention_days
+        self.interval = interval
+        self.chunk_size = chunk_size
+        self._task: Optional[asyncio.Task] = None
+        self._sweep_lock = asyncio.Lock()
+        self._recent = deque(maxlen=24)
+
+        self.stats = {
+            "sweeps": 0,
+            "transactions_deleted": 0,
+            "user_rollups_deleted": 0,
+            "errors": 0,
+            "last_sweep_at": None
+        }
+
+    # =========================================================================
+    # SCHEMA
+    # =========================================================================
+
+    async def ensure_schema(self) -> None:
+        """Create the rollup tables and ledger indexes, backfilling rollups on first run."""
+        try:
+            pool = await get_leveling_pool()
+            async with pool.get_connection() as conn:
+                async with conn.execute(
+                    "SELECT name FROM sqlite_master WHERE type = 'table' AND name = 'xp_daily_guild_rollups'"
+                ) as cursor:
+                    existed = await cursor.fetchone() is not None
+
+                await conn.executescript(ROLLUP_SCHEMA)
+
+                if not existed:
+                    # Seed the rollups from whatever raw history is still around
+                    await conn.execute("""
+                        INSERT INTO xp_daily_guild_rollups (guild_id, day, xp_awarded, awards, capped_awards)
+                        SELECT guild_id, DATE(timestamp), SUM(xp_awarded), COUNT(*),
+                               SUM(CASE WHEN daily_cap_applied THEN 1 ELSE 0 END)
+                        FROM xp_transactions
+                        WHERE channel_id NOT IN ('MANUAL', 'ADMIN')
+                        GROUP BY guild_id, DATE(timestamp)
+                    """)
+                    await conn.execute("""
+                        INSERT INTO xp_daily_user_rollups (guild_id, day, user_id, xp_awarded, awards)
+                        SELECT guild_id, DATE(timestamp), user_id, SUM(xp_awarded), COUNT(*)
+                        FROM xp_transactions
+                        WHERE channel_id NOT IN ('MANUAL', 'ADMIN')
+                        GROUP BY guild_id, DATE(timestamp), user_id
+                    """)
+                    logging.info("Backfilled XP daily rollups from xp_transactions")
+                await conn.commit()
+        except Exception as e:
+            logging.error(f"Error creating XP rollup tables: {e}")
+
+    # =========================================================================
+    # BACKGROUND SWEEP
+    # =========================================================================
+
+    def start(self) -> None:
+        """Start the background retention sweep."""
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        if self._task:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    async def _run(self) -> None:
+        while True:
+            await self.sweep()
+            await asyncio.sleep(self.interval)
+
+    async def sweep(self) -> Dict[str, Any]:
+        """Delete expired ledger rows and per-user rollups. Returns what was removed."""
+        async with self._sweep_lock:
+            started_at = time.perf_counter()
+            now = datetime.now(timezone.utc)
+            # xp_transactions.timestamp is SQLite's CURRENT_TIMESTAMP format
+            transaction_cutoff = (now - timedelta(days=self.retention_days)).strftime('%Y-%m-%d %H:%M:%S')
+            rollup_cutoff = (now - timedelta(days=self.user_rollup_retention_days)).strftime('%Y-%m-%d')
+
+            result = {"transactions_deleted": 0, "user_rollups_deleted": 0}
+            try:
+                pool = await get_leveling_pool()
+                result["transactions_deleted"] = await self._delete_chunked(pool, """
+                    DELETE FROM xp_transactions
+                    WHERE id IN (
+                        SELECT id FROM xp_transactions
+                        WHERE timestamp < ?
+                        ORDER BY timestamp
+                        LIMIT ?
+                    )
+                """, transaction_cutoff)
+                result["user_rollups_deleted"] = await self._delete_chunked(pool, """
+                    DELETE FROM xp_daily_user_rollups
+                    WHERE rowid IN (
+                        SELECT rowid FROM xp_daily_user_rollups
+                        WHERE day < ?
+                        LIMIT ?
+                    )
+                """, rollup_cutoff)
+            except Exception as e:
+                self.stats["errors"] += 1
+                logging.error(f"Error pruning XP ledger: {e}")
+
+            duration_ms = round((time.perf_counter() - started_at) * 1000, 1)
+            result["duration_ms"] = duration_ms
+            self.stats["sweeps"] += 1
+            self.stats["transactions_deleted"] += result["transactions_deleted"]
+            self.stats["user_rollups_deleted"] += result["user_rollups_deleted"]
+            self.stats["last_sweep_at"] = now.isoformat()
+            self._recent.append(result)
+
+            if result["transactions_deleted"] or result["user_rollups_deleted"]:
+                logging.info(
+                    f"XP ledger retention: deleted {result['transactions_deleted']} transactions and "
+                    f"{result['user_rollups_deleted']} user rollups in {duration_ms}ms"
+                )
+            return result
+
+    async def _delete_chunked(self, pool, query: str, cutoff: str) -> int:
+        deleted = 0
+        while True:
+            _, rowcount = await pool.execute_write(query, (cutoff, self.chunk_size))
+            deleted += max(rowcount or 0, 0)
+            if not rowcount or rowcount < self.chunk_size:
+                return deleted
+            await asyncio.sleep(RETENTION_CHUNK_PAUSE)
+
+    def get_stats(self) -> Dict[str, Any]:
+        return dict(
+            self.stats,
+            retention_days=self.retention_days,
+            user_rollup_retention_days=self.user_rollup_retention_days,
+            recent_sweeps=list(self._recent)
+        )
@@ -1,11 +1,30 @@
 import json
-import random
-from datetime import datetime, timedelta
+import logging
 from typing import Optional, Dict, Any, List, Tuple
 from math import sqrt
 
 import discord
+from database_modules.data_versions import data_versions
 from database_modules.database_pool import get_leveling_pool
+from modules.leveling_eligibility import XPEligibilityEngine
+from modules.leveling_ledger import XPLedgerWriter
+from modules.leveling_rank_index import ServerRankIndex
+from modules.leveling_level_index import LevelIndexCache
+from modules.leveling_templates import LevelUpContext, LevelUpTemplateCache
+from modules.leveling_replay import XPReplayEngine
+from modules.leveling_retention import XPLedgerRetention
+from modules.ttl_cache import TTLCache
+from modules.leveling_daily_reset import (
+    DEFAULT_RESET_TIME, DEFAULT_RESET_TIMEZONE, DailyResetScheduler
+)
+
+# leveling_config columns read into a guild's config, selected by name
+CONFIG_COLUMNS = (
+    'guild_id', 'enabled', 'base_xp', 'max_xp', 'word_multiplier', 'char_multiplier',
+    'min_cooldown_seconds', 'max_cooldown_seconds', 'min_message_chars', 'min_message_words',
+    'daily_xp_cap', 'blacklisted_channels', 'whitelisted_channels', 'level_up_announcements',
+    'announcement_channel_id', 'dm_level_notifications', 'daily_reset_time', 'daily_reset_timezone'
+)
 
 class LevelingSystem:
     """
@@ -21,24 +40,100 @@ class LevelingSystem:
         self.bot = bot
         
         # Cache for guild configurations
-        self._config_cache = {}
-        self._cache_expiry = {}
-        self._cache_duration = 300  # 5 minutes
+        self._config_cache = TTLCache(maxsize=1000, ttl=300, name="leveling_config")  # 5 minutes
         
         # Cache for user data to reduce database hits
-        self._user_cache = {}
-        self._user_cache_expiry = {}
-        self._user_cache_duration = 60  # 1 minute
+        self._user_cache = TTLCache(maxsize=10000, ttl=60, name="leveling_users")  # 1 minute
+        
+        # In-memory cooldowns, daily counters and channel filters for the XP hot path
+        self.eligibility = XPEligibilityEngine()
+        
+        # Group-commit writer for XP awards
+        self.ledger = XPLedgerWriter(self)
+        
+        # In-memory order-statistic index for server ranks and leaderboard positions
+        self.rank_index = ServerRankIndex()
         
-        # Compatibility flags for optional schema features
-        self._rank_view_has_server_rank = None  # None = unknown, bool once detected
-        self._rank_view_warning_logged = False
+        # Compiled per-guild rank title, level range and reward lookups
+        self.level_index = LevelIndexCache()
         
+        # Compiled level-up message templates
+        self.templates = LevelUpTemplateCache()
+        
+        # Chat history replay for rebuilding levels after config changes
+        self.replay = XPReplayEngine(self)
+        
+        # Daily XP rollups and xp_transactions retention
+        self.retention = XPLedgerRetention()
+        
+        # Per-guild daily XP cap reset at each guild's configured local time
+        self.daily_reset = DailyResetScheduler(self)
+
+        # Set in the split-process dashboard, where the bot process owns every write
+        self.read_only = False
+        
+    async def initialize(self):
+        """Load in-memory leveling state and start background tasks. Safe to call repeatedly."""
+        await self._ensure_indexes()
+        await self.retention.ensure_schema()
+        await self.daily_reset.ensure_schema()
+        await self.eligibility.load()
+        await self.rank_index.load()
+        self.eligibility.start()
+        self.ledger.start()
+        self.retention.start()
+        self.daily_reset.start()
+    
+    async def shutdown(self):
+        """Stop background tasks and persist pending leveling state."""
+        await self.daily_reset.stop()
+        await self.retention.stop()
+        await self.ledger.stop()
+        await self.eligibility.stop()
+        
+    async def _ensure_indexes(self):
+        """Create the indexes the leaderboard and rank lookups rely on."""
+        try:
+            pool = await get_leveling_pool()
+            async with pool.get_connection() as conn:
+                await conn.executescript("""
+                    CREATE INDEX IF NOT EXISTS idx_user_levels_guild_total_xp
+                        ON user_levels(guild_id, total_xp DESC, user_id);
+                    CREATE INDEX IF NOT EXISTS idx_rank_titles_guild_min_level
+                        ON rank_titles(guild_id, min_level);
+                    CREATE INDEX IF NOT EXISTS idx_level_range_names_guild_min_level
+                        ON level_range_names(guild_id, min_level);
+                """)
+        except Exception as e:
+            self.bot.logger.error(f"Error creating leveling indexes: {e}")
+    
     def clear_guild_config_cache(self, guild_id: str):
         """Invalidate cached configuration for a guild."""
-        cache_key = str(guild_id)
-        self._config_cache.pop(cache_key, None)
-        self._cache_expiry.pop(cache_key, None)
+        self._config_cache.invalidate(str(guild_id))
+        data_versions.bump("leveling", guild_id)
+
+    def clear_guild_user_cache(self, guild_id: str):
+        """Invalidate cached user level data for every member of a guild."""
+        suffix = f":{guild_id}"
+        self._user_cache.invalidate_where(lambda cache_key: cache_key.endswith(suffix))
+        data_versions.bump("leveling", guild_id)
+
+    def clear_user_cache(self, user_id: str, guild_id: str):
+        """Invalidate cached level data for one member."""
+        self._user_cache.invalidate(f"{user_id}:{guild_id}")
+        data_versions.bump("leveling", guild_id)
+
+    def drop_guild_caches(self, guild_id: Optional[str] = None):
+        """Drop everything cached for a guild (all guilds when None) after another process changed it."""
+        if guild_id is None:
+            self._config_cache.clear()
+            self._user_cache.clear()
+        else:
+            suffix = f":{guild_id}"
+            self._config_cache.invalidate(str(guild_id))
+            self._user_cache.invalidate_where(lambda cache_key: cache_key.endswith(suffix))
+        self.level_index.invalidate(guild_id)
+        self.templates.invalidate(guild_id)
 
     def _normalize_bool(self, value: Any, default: bool = False) -> bool:
         """Convert a database value into a boolean with robust handling."""
@@ -179,48 +274,14 @@ class LevelingSystem:
             Tuple of (can_earn_xp, reason_if_blocked)
         """
         try:
-            # Get guild configuration
-            config = await self.get_guild_config(guild_id)
-            if not config.get('enabled', True):
-                return False, "Leveling system disabled"
-            
-            # Check message quality requirements
-            if len(message_content) < config.get('min_message_chars', 5):
-                return False, "Message too short"
-                
-            words = len(message_content.split())
-            if words < config.get('min_message_words', 2):
-                return False, "Insufficient word count"
-            
-            # Check channel restrictions
-            blacklist = json.loads(config.get('blacklisted_channels', '[]'))
-            if channel_id in blacklist:
-                return False, "Channel blacklisted"
-                
-            whitelist = json.loads(config.get('whitelisted_channels', '[]'))
-            if whitelist and channel_id not in whitelist:
-                return False, "Channel not whitelisted"
-            
-            # Check cooldown
-            pool = await get_leveling_pool()
-            cooldown_result = await pool.execute_single(
-                "SELECT cooldown_ends_at FROM xp_cooldowns WHERE user_id = ? AND guild_id = ?",
-                (user_id, guild_id)
-            )
-            
-            if cooldown_result:
-                cooldown_end = datetime.fromisoformat(cooldown_result[0])
-                if datetime.now() < cooldown_end:
-                    return False, "User on cooldown"
-            
-            # Check daily XP cap
-            user_data = await self.get_user_level_data(user_id, guild_id)
-            daily_cap = config.get('daily_xp_cap', 1000)
+            await self.eligibility.ensure_loaded()
             
-            if user_data and user_data.get('daily_xp_earned', 0) >= daily_cap:
-                return False, "Daily XP cap reached"
+            # Cooldown rejections are by far the most common, answer them before anything else
+            if self.eligibility.is_on_cooldown(user_id, guild_id):
+                return False, "User on cooldown"
             
-            return True, ""
+            config = await self.get_guild_config(guild_id)
+            return self.eligibility.check(user_id, guild_id, channel_id, message_content, config)
             
         except Exception as e:
             self.bot.logger.error(f"Error checking XP eligibility: {e}")
@@ -265,85 +326,73 @@ class LevelingSystem:
             config = await self.get_guild_config(guild_id)
             
             # Calculate XP
-            xp_amount = self.calculate_xp(message_content, config)
-            if xp_amount <= 0:
+            uncapped_xp = self.calculate_xp(message_content, config)
+            if uncapped_xp <= 0:
                 result['reason'] = "No XP calculated"
                 return result
             
-            # Get current user data
-            user_data = await self.get_user_level_data(user_id, guild_id)
-            current_level = user_data.get('current_level', 0) if user_data else 0
-            
-            # Check daily cap
-            daily_earned = user_data.get('daily_xp_earned', 0) if user_data else 0
-            daily_cap = config.get('daily_xp_cap', 1000)
+            # Re-check in memory: another message from this user may have been
+            # awarded while the config lookup above was awaiting
+            can_earn, reason = self.eligibility.check(user_id, guild_id, channel_id, message_content, config)
+            if not can_earn:
+                result['reason'] = reason
+                return result
             
             # Apply daily cap
+            daily_earned = self.eligibility.get_daily_xp(user_id, guild_id)
+            daily_cap = config.get('daily_xp_cap', 1000)
             remaining_daily = max(0, daily_cap - daily_earned)
-            xp_amount = min(xp_amount, remaining_daily)
-            daily_cap_applied = xp_amount < self.calculate_xp(message_content, config)
+            xp_amount = min(uncapped_xp, remaining_daily)
+            daily_cap_applied = xp_amount < uncapped_xp
             
             if xp_amount <= 0:
                 result['reason'] = "Daily XP cap reached"
                 return result
             
-            # Award XP in database
-            pool = await get_leveling_pool()
+            # Reserve the cooldown and daily XP before the first await so concurrent
+            # messages from the same user are rejected in memory
+            previous_cooldown = self.eligibility.get_cooldown(user_id, guild_id)
+            self.eligibility.start_cooldown(user_id, guild_id, config)
+            self.eligibility.add_daily_xp(user_id, guild_id, xp_amount)
+            
+            # Queue the award for the next group commit and wait for it to land
+            try:
+                ledger_result = await self.ledger.submit(
+                    user_id, guild_id, channel_id, message_id,
+                    xp_amount, message_content, daily_cap_applied
+                )
+            except Exception:
+                # The award never landed, release the reserved cooldown and daily XP
+                self.eligibility.release_cooldown(user_id, guild_id, previous_cooldown)
+                self.eligibility.add_daily_xp(user_id, guild_id, -xp_amount)
+                raise
             
-            # Begin transaction
-            async with pool.get_connection() as conn:
-                try:
-                    # Create or update user level data
-                    await conn.execute("""
-                        INSERT INTO user_levels (user_id, guild_id, current_xp, total_xp, messages_sent, daily_xp_earned)
-                        VALUES (?, ?, ?, ?, 1, ?)
-                        ON CONFLICT(user_id, guild_id) DO UPDATE SET
-                            current_xp = current_xp + ?,
-                            total_xp = total_xp + ?,
-                            messages_sent = messages_sent + 1,
-                            daily_xp_earned = daily_xp_earned + ?,
-                            last_xp_timestamp = CURRENT_TIMESTAMP,
-                            updated_at = CURRENT_TIMESTAMP
-                    """, (user_id, guild_id, xp_amount, xp_amount, xp_amount,
-                          xp_amount, xp_amount, xp_amount))
-                    
-                    # Log transaction
-                    await conn.execute("""
-                        INSERT INTO xp_transactions 
-                        (user_id, guild_id, channel_id, message_id, xp_awarded, 
-                         message_length, word_count, char_count, daily_cap_applied)
-                        VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
-                    """, (user_id, guild_id, channel_id, message_id, xp_amount,
-                          len(message_content), len(message_content.split()),
-                          len(message_content), daily_cap_applied))
-                    
-                    # Set cooldown
-                    await self._set_user_cooldown(conn, user_id, guild_id, config)
-                    
-                    await conn.commit()
-                    
-                    # Check for level up
-                    level_up_result = await self.check_level_up(user_id, guild_id)
-                    
-                    result.update({
-                        'success': True,
-                        'xp_awarded': xp_amount,
-                        'level_up': level_up_result['level_up'],
-                        'old_level': current_level,
-                        'new_level': level_up_result['new_level'],
-                        'reason': 'XP awarded successfully'
-                    })
-                    
-                    # Add range info if level changed
-                    if level_up_result['level_up']:
-                        range_info = await self.get_user_range(user_id, guild_id)
-                        if range_info:
-                            result['range_name'] = range_info['name']
-                            result['range_description'] = range_info['description']
-                    
-                except Exception as e:
-                    await conn.rollback()
-                    raise e
+            self.clear_user_cache(user_id, guild_id)
+            
+            result.update({
+                'success': True,
+                'xp_awarded': xp_amount,
+                'level_up': ledger_result['level_up'],
+                'old_level': ledger_result['old_level'],
+                'new_level': ledger_result['new_level'],
+                'reason': 'XP awarded successfully'
+            })
+            
+            if ledger_result['level_up']:
+                # The level itself was updated in the ledger transaction
+                result['rewards'] = await self.distribute_level_rewards(
+                    user_id, guild_id, ledger_result['old_level'], ledger_result['new_level']
+                )
+                
+                # Gather what the announcement needs while the level data is at hand
+                context = await self.build_level_up_context(
+                    user_id, guild_id, ledger_result['old_level'], ledger_result['new_level'],
+                    total_xp=ledger_result['total_xp']
+                )
+                result['level_up_context'] = context
+                if context.range_name:
+                    result['range_name'] = context.range_name
+                    result['range_description'] = context.range_description
                     
         except Exception as e:
             self.bot.logger.error(f"Error awarding XP: {e}")
@@ -351,23 +400,6 @@ class LevelingSystem:
             
         return result
     
-    async def _set_user_cooldown(self, conn, user_id: str, guild_id: str, config: Dict):
-        """Set randomized cooldown for user."""
-        min_cooldown = config.get('min_cooldown_seconds', 30)
-        max_cooldown = config.get('max_cooldown_seconds', 60)
-        
-        cooldown_duration = random.randint(min_cooldown, max_cooldown)
-        cooldown_end = datetime.now() + timedelta(seconds=cooldown_duration)
-        
-        await conn.execute("""
-            INSERT INTO xp_cooldowns (user_id, guild_id, last_xp_timestamp, cooldown_ends_at)
-            VALUES (?, ?, CURRENT_TIMESTAMP, ?)
-            ON CONFLICT(user_id, guild_id) DO UPDATE SET
-                last_xp_timestamp = CURRENT_TIMESTAMP,
-                cooldown_ends_at = ?,
-                consecutive_messages = consecutive_messages + 1
-        """, (user_id, guild_id, cooldown_end.isoformat(), cooldown_end.isoformat()))
-    
     # =========================================================================
     # LEVEL UP DETECTION
     # =========================================================================
@@ -431,10 +463,7 @@ class LevelingSystem:
                 })
                 
                 # Clear cache for this user
-                cache_key = f"{user_id}:{guild_id}"
-                if cache_key in self._user_cache:
-                    del self._user_cache[cache_key]
-                    del self._user_cache_expiry[cache_key]
+                self.clear_user_cache(user_id, guild_id)
                 
         except Exception as e:
             self.bot.logger.error(f"Error checking level up: {e}")
@@ -447,59 +476,41 @@ class LevelingSystem:
     
     async def get_guild_config(self, guild_id: str) -> Dict[str, Any]:
         """Get guild configuration with caching."""
-        cache_key = guild_id
-        now = datetime.now()
-        
-        # Check cache
-        if (cache_key in self._config_cache and 
-            cache_key in self._cache_expiry and 
-            now < self._cache_expiry[cache_key]):
-            return self._config_cache[cache_key]
-        
         try:
-            pool = await get_leveling_pool()
-            result = await pool.execute_single(
-                "SELECT * FROM leveling_config WHERE guild_id = ?",
-                (guild_id,)
-            )
-            
-            if result:
-                config = {
-                    'guild_id': result[0],
-                    'enabled': self._normalize_bool(result[1], True),
-                    'base_xp': result[2],
-                    'max_xp': result[3],
-                    'word_multiplier': result[4],
-                    'char_multiplier': result[5],
-                    'min_cooldown_seconds': result[6],
-                    'max_cooldown_seconds': result[7],
-                    'min_message_chars': result[8],
-                    'min_message_words': result[9],
-                    'daily_xp_cap': result[10],
-                    'blacklisted_channels': result[11],
-                    'whitelisted_channels': result[12],
-                    'level_up_announcements': self._normalize_bool(result[13], True),
-                    'announcement_channel_id': result[14],
-                    'dm_level_notifications': self._normalize_bool(result[15], False)
-                }
-            else:
-                # Create default config
-                config = await self._create_default_guild_config(guild_id)
-            
-            # Cache the result
-            self._config_cache[cache_key] = config
-            self._cache_expiry[cache_key] = now + timedelta(seconds=self._cache_duration)
-            
-            return config
-            
+            return await self._config_cache.get_or_load(guild_id, lambda: self._load_guild_config(guild_id))
         except Exception as e:
             self.bot.logger.error(f"Error getting guild config: {e}")
             return self._get_default_config()
     
+    async def _load_guild_config(self, guild_id: str) -> Dict[str, Any]:
+        """Read a guild's configuration, creating the default row if it has none."""
+        pool = await get_leveling_pool()
+        result = await pool.execute_single(f"""
+            SELECT {', '.join(CONFIG_COLUMNS)}
+            FROM leveling_config
+            WHERE guild_id = ?
+        """, (guild_id,))
+        
+        if result:
+            config = dict(zip(CONFIG_COLUMNS, result))
+            config['enabled'] = self._normalize_bool(config['enabled'], True)
+            config['level_up_announcements'] = self._normalize_bool(config['level_up_announcements'], True)
+            config['dm_level_notifications'] = self._normalize_bool(config['dm_level_notifications'], False)
+            config['daily_reset_time'] = config['daily_reset_time'] or DEFAULT_RESET_TIME
+            config['daily_reset_timezone'] = config['daily_reset_timezone'] or DEFAULT_RESET_TIMEZONE
+        else:
+            # Create default config
+            config = await self._create_default_guild_config(guild_id)
+        
+        return config
+
     async def _create_default_guild_config(self, guild_id: str) -> Dict[str, Any]:
         """Create default configuration for a guild."""
         config = self._get_default_config()
         config['guild_id'] = guild_id
+        if self.read_only:
+            # The bot creates the row when the guild first earns XP
+            return config
         
         try:
             pool = await get_leveling_pool()
@@ -507,7 +518,7 @@ class LevelingSystem:
                 INSERT INTO leveling_config (guild_id) VALUES (?)
             """, (guild_id,))
         except Exception as e:
-            self.bot.logger.error(f"Error creating default guild config: {e}")
+            logging.error(f"Error creating default guild config: {e}")
             
         return config
     
@@ -528,134 +539,221 @@ class LevelingSystem:
             'whitelisted_channels': '[]',
             'level_up_announcements': True,
             'announcement_channel_id': None,
-            'dm_level_notifications': False
+            'dm_level_notifications': False,
+            'daily_reset_time': DEFAULT_RESET_TIME,
+            'daily_reset_timezone': DEFAULT_RESET_TIMEZONE
         }
     
     async def get_user_level_data(self, user_id: str, guild_id: str) -> Optional[Dict[str, Any]]:
         """Get user level data with caching."""
-        cache_key = f"{user_id}:{guild_id}"
-        now = datetime.now()
-        
-        # Check cache
-        if (cache_key in self._user_cache and 
-            cache_key in self._user_cache_expiry and 
-            now < self._user_cache_expiry[cache_key]):
-            return self._user_cache[cache_key]
-        
         try:
-            pool = await get_leveling_pool()
-            result = await pool.execute_single("""
-                SELECT user_id, guild_id, current_xp, current_level, total_xp, 
-                       messages_sent, daily_xp_earned, daily_reset_date,
-                       last_xp_timestamp, level_up_timestamp
-                FROM user_levels 
-                WHERE user_id = ? AND guild_id = ?
-            """, (user_id, guild_id))
-            
-            if result:
-                user_data = {
-                    'user_id': result[0],
-                    'guild_id': result[1],
-                    'current_xp': result[2],
-                    'current_level': result[3],
-                    'total_xp': result[4],
-                    'messages_sent': result[5],
-                    'daily_xp_earned': result[6],
-                    'daily_reset_date': result[7],
-                    'last_xp_timestamp': result[8],
-                    'level_up_timestamp': result[9]
-                }
-                
-                # Cache the result
-                self._user_cache[cache_key] = user_data
-                self._user_cache_expiry[cache_key] = now + timedelta(seconds=self._user_cache_duration)
-                
-                return user_data
-            
+            # Members with no row yet aren't cached, so their first award shows up immediately
+            return await self._user_cache.get_or_load(
+                f"{user_id}:{guild_id}",
+                lambda: self._load_user_level_data(user_id, guild_id),
+                ttl=lambda user_data: self._user_cache.ttl if user_data else None
+            )
         except Exception as e:
             self.bot.logger.error(f"Error getting user level data: {e}")
-            
-        return None
+            return None
     
-    async def get_leaderboard(self, guild_id: str, limit: int = 10) -> List[Dict[str, Any]]:
+    async def _load_user_level_data(self, user_id: str, guild_id: str) -> Optional[Dict[str, Any]]:
+        """Read a member's user_levels row, or None if they have not earned XP."""
+        pool = await get_leveling_pool()
+        result = await pool.execute_single("""
+            SELECT user_id, guild_id, current_xp, current_level, total_xp, 
+                   messages_sent, daily_xp_earned, daily_reset_date,
+                   last_xp_timestamp, level_up_timestamp
+            FROM user_levels 
+            WHERE user_id = ? AND guild_id = ?
+        """, (user_id, guild_id))
+        
+        if result:
+            user_data = {
+                'user_id': result[0],
+                'guild_id': result[1],
+                'current_xp': result[2],
+                'current_level': result[3],
+                'total_xp': result[4],
+                'messages_sent': result[5],
+                'daily_xp_earned': result[6],
+                'daily_reset_date': result[7],
+                'last_xp_timestamp': result[8],
+                'level_up_timestamp': result[9]
+            }
+            return user_data
+        
+        return None
+
+    async def get_leaderboard(self, guild_id: str, limit: int = 10, offset: int = 0) -> List[Dict[str, Any]]:
         """Get guild leaderboard."""
+        page = await self.get_leaderboard_page(guild_id, limit, offset=offset)
+        return page['entries']
+    
+    async def get_leaderboard_page(self, guild_id: str, limit: int = 10, offset: int = 0,
+                                   cursor: Optional[str] = None) -> Dict[str, Any]:
+        """
+        Get one page of the guild leaderboard with rank titles and level ranges resolved in SQL.
+        
+        Args:
+            guild_id: Discord guild ID
+            limit: Maximum number of entries to return
+            offset: Number of entries to skip (ignored when a cursor is given)
+            cursor: Opaque cursor from a previous page's next_cursor
+            
+        Returns:
+            Dictionary with entries, next_cursor and has_more
+        """
+        page = {'entries': [], 'next_cursor': None, 'has_more': False}
+        limit = max(1, int(limit))
+        offset = max(0, int(offset))
+        
         try:
+            after = self._decode_leaderboard_cursor(cursor) if cursor else None
+            if not after and offset and self.rank_index.loaded:
+                # Turn a deep OFFSET into a keyset seek from the user just before the page
+                previous = self.rank_index.get_user_at(guild_id, offset)
+                if previous:
+                    after = (previous[1], previous[0])
+            if after:
+                cursor_clause = "AND (total_xp < ? OR (total_xp = ? AND user_id > ?))"
+                params = (guild_id, after[0], after[0], after[1], limit + 1, 0)
+            else:
+                cursor_clause = ""
+                params = (guild_id, limit + 1, offset)
+            
             pool = await get_leveling_pool()
-            results = await pool.execute_query("""
-                SELECT user_id, current_level, total_xp, messages_sent, rank, position
-                FROM view_xp_leaderboard 
-                WHERE guild_id = ?
-                ORDER BY position
-                LIMIT ?
-            """, (guild_id, limit))
+            results = await pool.execute_query(f"""
+                SELECT ul.user_id, ul.current_level, ul.current_xp, ul.total_xp, ul.messages_sent,
+                       rt.title, rt.emoji, rt.color_hex,
+                       lr.id, lr.range_name, lr.description, lr.min_level, lr.max_level
+                FROM (
+                    SELECT user_id, guild_id, current_level, current_xp, total_xp, messages_sent
+                    FROM user_levels
+                    WHERE guild_id = ? {cursor_clause}
+                    ORDER BY total_xp DESC, user_id
+                    LIMIT ? OFFSET ?
+                ) ul
+                LEFT JOIN rank_titles rt ON rt.id = (
+                    SELECT id FROM rank_titles
+                    WHERE guild_id = ul.guild_id
+                      AND ul.current_level >= min_level
+                      AND (max_level IS NULL OR ul.current_level <= max_level)
+                    ORDER BY min_level DESC
+                    LIMIT 1
+                )
+                LEFT JOIN level_range_names lr ON lr.id = (
+                    SELECT id FROM level_range_names
+                    WHERE guild_id = ul.guild_id
+                      AND ul.current_level >= min_level
+                      AND ul.current_level <= max_level
+                    ORDER BY min_level
+                    LIMIT 1
+                )
+                ORDER BY ul.total_xp DESC, ul.user_id
+            """, params)
+            
+            page['has_more'] = len(results) > limit
+            results = results[:limit]
+            if not results:
+                return page
+            
+            # Position and tie-aware rank of the first row; only later pages need a count
+            first_total_xp = results[0][3]
+            if (after or offset) and self.rank_index.loaded:
+                position = self.rank_index.count_through(guild_id, *after) + 1 if after else offset + 1
+                rank = self.rank_index.count_above(guild_id, first_total_xp) + 1
+            elif after or offset:
+                xp_ahead, rows_ahead = await self._count_leaderboard_ahead(guild_id, first_total_xp, after)
+                position = rows_ahead + 1 if after else offset + 1
+                rank = xp_ahead + 1
+            else:
+                position = rank = 1
             
-            leaderboard = []
+            previous_total_xp = first_total_xp
             for result in results:
-                leaderboard.append({
+                if result[3] != previous_total_xp:
+                    rank = position
+                    previous_total_xp = result[3]
+                
+                range_info = None
+                if result[8] is not None:
+                    range_info = {
+                        'id': result[8],
+                        'name': result[9],
+                        'description': result[10],
+                        'min_level': result[11],
+                        'max_level': result[12]
+                    }
+                
+                page['entries'].append({
                     'user_id': result[0],
                     'current_level': result[1],
-                    'total_xp': result[2],
-                    'messages_sent': result[3],
-                    'rank': result[4],
-                    'position': result[5]
+                    'current_xp': result[2],
+                    'total_xp': result[3],
+                    'messages_sent': result[4],
+                    'rank': rank,
+                    'position': position,
+                    'rank_title': result[5],
+                    'rank_emoji': result[6],
+                    'rank_color': result[7],
+                    'range_info': range_info,
+                    'range_name': range_info['name'] if range_info else None
                 })
-                
-            # Add range info and configured rank title for each user (no Discord role assignment)
-            for item in leaderboard:
-                # Level range info
-                range_info = await self.get_user_range(item['user_id'], guild_id)
-                if range_info:
-                    item['range_info'] = range_info
-                    item['range_name'] = range_info['name']
-                else:
-                    item['range_info'] = None
-                    item['range_name'] = None
-
-                # Configured rank title (display only)
-                rank_info = await self.get_user_rank(item['user_id'], guild_id)
-                item['rank_title'] = rank_info['rank_title'] if rank_info and rank_info.get('rank_title') else None
+                position += 1
             
-            return leaderboard
+            if page['has_more']:
+                last = page['entries'][-1]
+                page['next_cursor'] = self._encode_leaderboard_cursor(last['total_xp'], last['user_id'])
             
         except Exception as e:
             self.bot.logger.error(f"Error getting leaderboard: {e}")
-            return []
+            
+        return page
+    
+    async def _count_leaderboard_ahead(self, guild_id: str, total_xp: int,
+                                       after: Optional[Tuple[int, str]] = None) -> Tuple[int, int]:
+        """Return (users with more XP than total_xp, users up to and including the cursor row)."""
+        after_xp, after_user = after if after else (None, None)
+        pool = await get_leveling_pool()
+        result = await pool.execute_single("""
+            SELECT
+                (SELECT COUNT(*) FROM user_levels WHERE guild_id = ? AND total_xp > ?),
+                (SELECT COUNT(*) FROM user_levels WHERE guild_id = ?
+                    AND (total_xp > ? OR (total_xp = ? AND user_id <= ?)))
+        """, (guild_id, total_xp, guild_id, after_xp, after_xp, after_user))
+        return (result[0], result[1]) if result else (0, 0)
+    
+    @staticmethod
+    def _encode_leaderboard_cursor(total_xp: int, user_id: str) -> str:
+        return f"{total_xp}:{user_id}"
+    
+    @staticmethod
+    def _decode_leaderboard_cursor(cursor: str) -> Optional[Tuple[int, str]]:
+        try:
+            total_xp, user_id = cursor.split(":", 1)
+            return int(total_xp), user_id
+        except (AttributeError, ValueError):
+            return None
     
     async def get_user_rank(self, user_id: str, guild_id: str) -> Optional[Dict[str, Any]]:
         """Get user's rank information."""
         try:
             pool = await get_leveling_pool()
-            base_query = """
-                SELECT current_level, current_xp, total_xp, rank_title,
-                       rank_description, color_hex, emoji, rank_role_id, rank
-                FROM view_user_ranks
-                WHERE user_id = ? AND guild_id = ?
-            """
-            fallback_query = """
-                SELECT current_level, current_xp, total_xp, rank_title,
-                       rank_description, color_hex, emoji, rank_role_id
-                FROM view_user_ranks
-                WHERE user_id = ? AND guild_id = ?
-            """
-            
-            result = None
-            if self._rank_view_has_server_rank is False:
-                result = await pool.execute_single(fallback_query, (user_id, guild_id))
-            else:
-                try:
-                    result = await pool.execute_single(base_query, (user_id, guild_id))
-                    self._rank_view_has_server_rank = True
-                except Exception as e:
-                    if "no such column: rank" in str(e).lower():
-                        self._rank_view_has_server_rank = False
-                        if not self._rank_view_warning_logged:
-                            self.bot.logger.warning(
-                                "view_user_ranks is missing 'rank' column; falling back to legacy schema without server rank column."
-                            )
-                            self._rank_view_warning_logged = True
-                        result = await pool.execute_single(fallback_query, (user_id, guild_id))
-                    else:
-                        raise
+            result = await pool.execute_single("""
+                SELECT ul.current_level, ul.current_xp, ul.total_xp, rt.title,
+                       rt.description, rt.color_hex, rt.emoji, rt.role_id
+                FROM user_levels ul
+                LEFT JOIN rank_titles rt ON rt.id = (
+                    SELECT id FROM rank_titles
+                    WHERE guild_id = ul.guild_id
+                      AND ul.current_level >= min_level
+                      AND (max_level IS NULL OR ul.current_level <= max_level)
+                    ORDER BY min_level DESC
+                    LIMIT 1
+                )
+                WHERE ul.user_id = ? AND ul.guild_id = ?
+            """, (user_id, guild_id))
             
             if result:
                 return {
@@ -667,45 +765,86 @@ class LevelingSystem:
                     'color_hex': result[5],
                     'emoji': result[6],
                     'rank_role_id': result[7],
-                    'server_rank': result[8] if len(result) > 8 else None
+                    'server_rank': await self.get_server_rank(user_id, guild_id, result[2])
                 }
             
         except Exception as e:
             self.bot.logger.error(f"Error getting user rank: {e}")
             
         return None
+    
+    async def get_server_rank(self, user_id: str, guild_id: str, total_xp: Optional[int] = None) -> Optional[int]:
+        """Get a user's server rank (1 = most XP, ties share a rank)."""
+        if self.rank_index.loaded:
+            rank = self.rank_index.get_rank(guild_id, user_id)
+            if rank is not None:
+                return rank
+        
+        # Index not loaded yet (or user unknown to it): count directly
+        try:
+            pool = await get_leveling_pool()
+            if total_xp is None:
+                row = await pool.execute_single(
+                    "SELECT total_xp FROM user_levels WHERE user_id = ? AND guild_id = ?",
+                    (user_id, guild_id)
+                )
+                if not row:
+                    return None
+                total_xp = row[0]
+            row = await pool.execute_single(
+                "SELECT COUNT(*) FROM user_levels WHERE guild_id = ? AND total_xp > ?",
+                (guild_id, total_xp)
+            )
+            return (row[0] if row else 0) + 1
+        except Exception as e:
+            self.bot.logger.error(f"Error getting server rank: {e}")
+            return None
+    
+    async def get_user_at_position(self, guild_id: str, position: int) -> Optional[Dict[str, Any]]:
+        """Get the user at a 1-based leaderboard position."""
+        if self.rank_index.loaded:
+            entry = self.rank_index.get_user_at(guild_id, position)
+            if entry is None:
+                return None
+            return {'user_id': entry[0], 'total_xp': entry[1], 'position': position}
+        
+        page = await self.get_leaderboard_page(guild_id, 1, offset=max(0, position - 1))
+        if not page['entries']:
+            return None
+        entry = page['entries'][0]
+        return {'user_id': entry['user_id'], 'total_xp': entry['total_xp'], 'position': position}
+    
+    async def refresh_user_rank(self, user_id: str, guild_id: str):
+        """Re-read a user's total XP after an out-of-band write and update the rank index."""
+        try:
+            pool = await get_leveling_pool()
+            row = await pool.execute_single(
+                "SELECT total_xp FROM user_levels WHERE user_id = ? AND guild_id = ?",
+                (user_id, guild_id)
+            )
+            if row:
+                self.rank_index.update(guild_id, user_id, row[0])
+            else:
+                self.rank_index.remove(guild_id, user_id)
+        except Exception as e:
+            self.bot.logger.error(f"Error refreshing rank index for user {user_id}: {e}")
 
     async def get_rank_for_level(self, guild_id: str, level: int) -> Optional[Dict[str, Any]]:
         """Get rank metadata that corresponds to a specific level."""
         if level is None or level < 0:
             return None
         try:
-            pool = await get_leveling_pool()
-            result = await pool.execute_single("""
-                SELECT id, title, description, color_hex, emoji, role_id, min_level, max_level
-                FROM rank_titles
-                WHERE guild_id = ?
-                  AND ? >= min_level
-                  AND (max_level IS NULL OR ? <= max_level)
-                ORDER BY min_level DESC
-                LIMIT 1
-            """, (guild_id, level, level))
-            
-            if result:
-                return {
-                    'id': result[0],
-                    'title': result[1],
-                    'description': result[2],
-                    'color_hex': result[3],
-                    'emoji': result[4],
-                    'role_id': result[5],
-                    'min_level': result[6],
-                    'max_level': result[7]
-                }
+            index = await self.level_index.get(guild_id)
+            return index.rank_for_level(level)
         except Exception as e:
             self.bot.logger.error(f"Error getting rank for level {level} in guild {guild_id}: {e}")
         return None
     
+    def invalidate_level_index(self, guild_id: Optional[str] = None):
+        """Drop compiled rank, range and reward lookups after they change (all guilds when None)."""
+        self.level_index.invalidate(guild_id)
+        data_versions.bump("leveling", guild_id)
+    
     # =========================================================================
     # RANK MANAGEMENT FUNCTIONS
     # =========================================================================
@@ -751,6 +890,7 @@ class LevelingSystem:
                 (guild_id, min_level, max_level, title, description, color_hex, emoji, role_id)
                 VALUES (?, ?, ?, ?, ?, ?, ?, ?)
             """, (guild_id, min_level, max_level, title, description, color_hex, emoji, role_id))
+            self.invalidate_level_index(guild_id)
             
             return {
                 'success': True,
@@ -815,6 +955,7 @@ class LevelingSystem:
                 SET {', '.join(update_fields)}
                 WHERE id = ? AND guild_id = ?
             """, update_values)
+            self.invalidate_level_index(guild_id)
             
             return {
                 'success': True,
@@ -856,6 +997,7 @@ class LevelingSystem:
             await pool.execute_write("""
                 DELETE FROM rank_titles WHERE id = ? AND guild_id = ?
             """, (rank_id, guild_id))
+            self.invalidate_level_index(guild_id)
             
             return {
                 'success': True,
@@ -958,6 +1100,7 @@ class LevelingSystem:
                 (guild_id, level, reward_type, reward_data, is_milestone, milestone_interval)
                 VALUES (?, ?, ?, ?, ?, ?)
             """, (guild_id, level, reward_type, json.dumps(reward_data), is_milestone, milestone_interval))
+            self.invalidate_level_index(guild_id)
             
             return {
                 'success': True,
@@ -1024,6 +1167,7 @@ class LevelingSystem:
                 SET {', '.join(update_fields)}
                 WHERE id = ? AND guild_id = ?
             """, update_values)
+            self.invalidate_level_index(guild_id)
             
             return {
                 'success': True,
@@ -1065,6 +1209,7 @@ class LevelingSystem:
             await pool.execute_write("""
                 DELETE FROM level_rewards WHERE id = ? AND guild_id = ?
             """, (reward_id, guild_id))
+            self.invalidate_level_index(guild_id)
             
             return {
                 'success': True,
@@ -1133,60 +1278,8 @@ class LevelingSystem:
             List of reward dictionaries for the level
         """
         try:
-            pool = await get_leveling_pool()
-            
-            # Get direct level rewards
-            direct_rewards = await pool.execute_query("""
-                SELECT id, reward_type, reward_data, created_at
-                FROM level_rewards
-                WHERE guild_id = ? AND level = ? AND active = TRUE AND is_milestone = FALSE
-            """, (guild_id, level))
-            
-            # Get milestone rewards
-            milestone_rewards = await pool.execute_query("""
-                SELECT id, reward_type, reward_data, milestone_interval, created_at
-                FROM level_rewards
-                WHERE guild_id = ? AND active = TRUE AND is_milestone = TRUE
-                AND ? % milestone_interval = 0
-            """, (guild_id, level))
-            
-            rewards = []
-            
-            # Process direct rewards
-            for result in direct_rewards:
-                try:
-                    reward_data = json.loads(result[2])
-                except:
-                    reward_data = {}
-                
-                rewards.append({
-                    'id': result[0],
-                    'level': level,
-                    'reward_type': result[1],
-                    'reward_data': reward_data,
-                    'is_milestone': False,
-                    'created_at': result[3]
-                })
-            
-            # Process milestone rewards
-            for result in milestone_rewards:
-                try:
-                    reward_data = json.loads(result[2])
-                except:
-                    reward_data = {}
-                
-                rewards.append({
-                    'id': result[0],
-                    'level': level,
-                    'reward_type': result[1],
-                    'reward_data': reward_data,
-                    'is_milestone': True,
-                    'milestone_interval': result[3],
-                    'created_at': result[4]
-                })
-            
-            return rewards
-            
+            index = await self.level_index.get(guild_id)
+            return index.rewards_for_level(level)
         except Exception as e:
             self.bot.logger.error(f"Error getting level rewards: {e}")
             return []
@@ -1207,9 +1300,10 @@ class LevelingSystem:
         distributed_rewards = []
         
         try:
-            # Get rewards for all levels between old and new
+            # Get rewards for all levels between old and new from the compiled index
+            index = await self.level_index.get(guild_id)
             for level in range(old_level + 1, new_level + 1):
-                level_rewards = await self.get_level_rewards(guild_id, level)
+                level_rewards = index.rewards_for_level(level)
                 
                 for reward in level_rewards:
                     # Process the reward based on type
@@ -1255,6 +1349,7 @@ class LevelingSystem:
                     SET total_xp = total_xp + ?, current_xp = current_xp + ?
                     WHERE user_id = ? AND guild_id = ?
                 """, (bonus_xp, bonus_xp, user_id, guild_id))
+                await self.refresh_user_rank(user_id, guild_id)
                 
                 return {
                     'success': True,
@@ -1300,39 +1395,28 @@ class LevelingSystem:
     async def get_user_range(self, user_id: str, guild_id: str) -> Optional[Dict[str, Any]]:
         """Get the level range name for a user's current level"""
         try:
-            pool = await get_leveling_pool()
-            
             # Get user's current level
             user_data = await self.get_user_level_data(user_id, guild_id)
             if not user_data:
                 return None
             
-            level = user_data['current_level']
-            
-            # Get the range for this level
-            range_result = await pool.execute_single('''
-                SELECT id, range_name, description, min_level, max_level
-                FROM level_range_names
-                WHERE guild_id = ? AND ? >= min_level AND ? <= max_level
-                ORDER BY min_level
-                LIMIT 1
-            ''', (guild_id, level, level))
-            
-            if range_result:
-                return {
-                    'id': range_result[0],
-                    'name': range_result[1],
-                    'description': range_result[2],
-                    'min_level': range_result[3],
-                    'max_level': range_result[4]
-                }
-            
-            return None
+            return await self.get_range_for_level(guild_id, user_data['current_level'])
             
         except Exception as e:
             self.bot.logger.error(f"Error getting user range: {e}")
             return None
     
+    async def get_range_for_level(self, guild_id: str, level: int) -> Optional[Dict[str, Any]]:
+        """Get the level range that contains a specific level."""
+        if level is None:
+            return None
+        try:
+            index = await self.level_index.get(guild_id)
+            return index.range_for_level(level)
+        except Exception as e:
+            self.bot.logger.error(f"Error getting range for level {level} in guild {guild_id}: {e}")
+            return None
+    
     async def get_guild_ranges(self, guild_id: str) -> List[Dict[str, Any]]:
         """Get all level ranges for a guild"""
         try:
@@ -1388,6 +1472,7 @@ class LevelingSystem:
                 (guild_id, min_level, max_level, range_name, description)
                 VALUES (?, ?, ?, ?, ?)
             ''', (guild_id, min_level, max_level, range_name, description))
+            self.invalidate_level_index(guild_id)
             
             return True, "Range added successfully"
             
@@ -1432,6 +1517,7 @@ class LevelingSystem:
                 SET min_level = ?, max_level = ?, range_name = ?, description = ?
                 WHERE id = ?
             ''', (min_level, max_level, range_name, description, range_id))
+            self.invalidate_level_index(guild_id)
             
             return True, "Range updated successfully"
             
@@ -1444,16 +1530,21 @@ class LevelingSystem:
         try:
             pool = await get_leveling_pool()
             
-            result = await pool.execute_write(
+            # Get guild_id for this range so its compiled lookups can be dropped
+            range_info = await pool.execute_single(
+                'SELECT guild_id FROM level_range_names WHERE id = ?',
+                (range_id,)
+            )
+            if not range_info:
+                return False, "Range not found"
+            
+            await pool.execute_write(
                 'DELETE FROM level_range_names WHERE id = ?',
                 (range_id,)
             )
+            self.invalidate_level_index(range_info[0])
             
-            # Check if any rows were deleted
-            if result:
-                return True, "Range deleted successfully"
-            else:
-                return False, "Range not found"
+            return True, "Range deleted successfully"
             
         except Exception as e:
             self.bot.logger.error(f"Error deleting level range: {e}")
@@ -1499,102 +1590,50 @@ class LevelingSystem:
         return result if result['success'] else None
 
 
-    async def get_level_up_message(self, user_id: str, guild_id: str, old_level: int, new_level: int) -> str:
+    async def build_level_up_context(self, user_id: str, guild_id: str, old_level: int, new_level: int,
+                                     total_xp: Optional[int] = None) -> LevelUpContext:
+        """
+        Collect rank, range and server rank details for a level-up announcement.
+        
+        Rank titles and ranges come from the compiled level index and the server
+        rank from the rank index, so this normally issues no queries.
+        """
+        index = await self.level_index.get(guild_id)
+        server_rank = await self.get_server_rank(user_id, guild_id, total_xp)
+        return LevelUpContext(
+            user_id, old_level, new_level,
+            new_rank=index.rank_for_level(new_level),
+            old_rank=index.rank_for_level(old_level) if old_level is not None and old_level >= 0 else None,
+            server_rank=server_rank,
+            level_range=index.range_for_level(new_level)
+        )
+    
+    def invalidate_templates(self, guild_id: Optional[str] = None):
+        """Drop compiled level-up templates after they change (all guilds when None)."""
+        self.templates.invalidate(guild_id)
+
+    async def get_level_up_message(self, user_id: str, guild_id: str, old_level: int, new_level: int,
+                                   context: Optional[LevelUpContext] = None) -> str:
         """
         Retrieve and render the level-up message using configured templates.
         Falls back to the default message if no template matches.
+        
+        Pass the context from award_xp's result to avoid gathering it again.
         """
         try:
-            pool = await get_leveling_pool()
-            rank_info = await self.get_user_rank(user_id, guild_id)
-            new_rank_data = await self.get_rank_for_level(guild_id, new_level)
-            old_rank_data = await self.get_rank_for_level(guild_id, old_level)
-            rank_changed = (
-                new_rank_data is not None and
-                (old_rank_data is None or old_rank_data.get('id') != new_rank_data.get('id'))
-            )
-
-            # Try rank promotion template if rank changed
-            template_row = None
-            if rank_changed:
-                promotion_query = """
-                    SELECT message_content FROM level_up_message_templates
-                    WHERE guild_id = ?
-                      AND template_type = 'rank_promotion'
-                      AND enabled = 1
-                      AND (? >= COALESCE(min_level, -1))
-                      AND (? <= COALESCE(max_level, 9223372036854775807))
-                    ORDER BY priority DESC
-                    LIMIT 1
-                """
-                template_row = await pool.execute_single(promotion_query, (guild_id, new_level, new_level))
-
-            # Fall back to standard level-up template
-            if not template_row:
-                default_query = """
-                    SELECT message_content FROM level_up_message_templates
-                    WHERE guild_id = ?
-                      AND template_type = 'default_levelup'
-                      AND enabled = 1
-                      AND (? >= COALESCE(min_level, -1))
-                      AND (? <= COALESCE(max_level, 9223372036854775807))
-                    ORDER BY priority DESC
-                    LIMIT 1
-                """
-                template_row = await pool.execute_single(default_query, (guild_id, new_level, new_level))
-
-            if template_row and template_row[0]:
-                message = template_row[0]
-                message = message.replace('{user}', f'<@{user_id}>')
-                message = message.replace('{username}', f'<@{user_id}>')
-                message = message.replace('{user_id}', user_id)
-                message = message.replace('{old_level}', str(old_level))
-                message = message.replace('{level}', str(new_level))
-
-                # Rank placeholders
-                new_rank_title = ''
-                if rank_info and rank_info.get('rank_title'):
-                    new_rank_title = rank_info['rank_title']
-                elif new_rank_data and new_rank_data.get('title'):
-                    new_rank_title = new_rank_data['title']
-                previous_rank_title = old_rank_data['title'] if old_rank_data else ''
-
-                message = message.replace('{rank}', new_rank_title)
-                message = message.replace('{rankname}', new_rank_title)
-                message = message.replace('{old_rank}', previous_rank_title)
-                message = message.replace('{previous_rank}', previous_rank_title)
-
-                rank_emoji = ''
-                if new_rank_data and new_rank_data.get('emoji'):
-                    rank_emoji = new_rank_data['emoji']
-                message = message.replace('{rank_emoji}', rank_emoji)
-
-                rank_color = ''
-                if new_rank_data and new_rank_data.get('color_hex'):
-                    rank_color = new_rank_data['color_hex']
-                message = message.replace('{rank_color}', rank_color)
-
-                rank_role_id = ''
-                if new_rank_data and new_rank_data.get('role_id'):
-                    rank_role_id = str(new_rank_data['role_id'])
-                message = message.replace('{rank_role_id}', rank_role_id)
-
-                # Leaderboard/server rank placeholders
-                if rank_info and rank_info.get('server_rank'):
-                    server_rank_str = str(rank_info['server_rank'])
-                    message = message.replace('{leaderboard_position}', server_rank_str)
-                    message = message.replace('{server_rank}', server_rank_str)
-                else:
-                    message = message.replace('{leaderboard_position}', '')
-                    message = message.replace('{server_rank}', '')
+            if context is None:
+                context = await self.build_level_up_context(user_id, guild_id, old_level, new_level)
+            templates = await self.templates.get(guild_id)
 
-                # Range placeholders
-                range_info = await self.get_user_range(user_id, guild_id)
-                range_name = range_info.get('name') if range_info and range_info.get('name') else ''
-                message = message.replace('{range}', range_name)
-                message = message.replace('{tier}', range_name)
+            # Try rank promotion template if rank changed, then the standard level-up template
+            template = None
+            if context.rank_changed:
+                template = templates.select('rank_promotion', new_level)
+            if template is None:
+                template = templates.select('default_levelup', new_level)
 
-                return message
+            if template is not None:
+                return template.render(context.values())
         except Exception:
             # On error, ignore and fall back to default
             pass
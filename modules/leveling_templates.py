@@ -0,0 +1,162 @@
+import asyncio
+import logging
+import re
+from typing import Dict, List, Optional, Tuple
+
+from database_modules.database_pool import get_leveling_pool
+
+PLACEHOLDER_PATTERN = re.compile(r"\{([a-z_]+)\}")
+
+# Upper bound used when a template has no max_level (matches the old COALESCE)
+NO_MAX_LEVEL = 9223372036854775807
+
+
+class CompiledTemplate:
+    """
+    A message template split once into literal text and placeholder names.
+
+    Rendering walks the parts and substitutes each placeholder from a value
+    mapping in a single pass; placeholders without a value are left as-is.
+    """
+
+    __slots__ = ("source", "parts")
+
+    def __init__(self, source: str):
+        self.source = source
+        parts: List[Tuple[bool, str]] = []
+        position = 0
+        for match in PLACEHOLDER_PATTERN.finditer(source):
+            if match.start() > position:
+                parts.append((False, source[position:match.start()]))
+            parts.append((True, match.group(1)))
+            position = match.end()
+        if position < len(source):
+            parts.append((False, source[position:]))
+        self.parts = parts
+
+    def render(self, values: Dict[str, str]) -> str:
+        rendered = []
+        for is_placeholder, text in self.parts:
+            if not is_placeholder:
+                rendered.append(text)
+            elif text in values:
+                rendered.append(values[text])
+            else:
+                rendered.append("{" + text + "}")
+        return "".join(rendered)
+
+
+class LevelUpContext:
+    """Everything a level-up template can reference, gathered once per level-up."""
+
+    __slots__ = ("user_id", "old_level", "new_level", "rank_title", "previous_rank_title",
+                 "rank_emoji", "rank_color", "rank_role_id", "rank_changed", "server_rank",
+                 "range_name", "range_description")
+
+    def __init__(self, user_id: str, old_level: int, new_level: int,
+                 new_rank: Optional[Dict] = None, old_rank: Optional[Dict] = None,
+                 server_rank: Optional[int] = None, level_range: Optional[Dict] = None):
+        self.user_id = user_id
+        self.old_level = old_level
+        self.new_level = new_level
+        self.rank_title = (new_rank or {}).get('title') or ''
+        self.previous_rank_title = (old_rank or {}).get('title') or ''
+        self.rank_emoji = (new_rank or {}).get('emoji') or ''
+        self.rank_color = (new_rank or {}).get('color_hex') or ''
+        self.rank_role_id = str((new_rank or {}).get('role_id') or '')
+        self.rank_changed = (
+            new_rank is not None and
+            (old_rank is None or old_rank.get('id') != new_rank.get('id'))
+        )
+        self.server_rank = server_rank
+        self.range_name = (level_range or {}).get('name') or ''
+        self.range_description = (level_range or {}).get('description')
+
+    def values(self) -> Dict[str, str]:
+        server_rank = str(self.server_rank) if self.server_rank else ''
+        return {
+            'user': f'<@{self.user_id}>',
+            'username': f'<@{self.user_id}>',
+            'user_id': self.user_id,
+            'old_level': str(self.old_level),
+            'level': str(self.new_level),
+            'rank': self.rank_title,
+            'rankname': self.rank_title,
+            'old_rank': self.previous_rank_title,
+            'previous_rank': self.previous_rank_title,
+            'rank_emoji': self.rank_emoji,
+            'rank_color': self.rank_color,
+            'rank_role_id': self.rank_role_id,
+            'leaderboard_position': server_rank,
+            'server_rank': server_rank,
+            'range': self.range_name,
+            'tier': self.range_name
+        }
+
+
+class GuildTemplates:
+    """Enabled level-up templates for one guild, grouped by type in priority order."""
+
+    def __init__(self, rows: List[Tuple]):
+        self._by_type: Dict[str, List[Tuple[int, int, CompiledTemplate]]] = {}
+        for template_type, message_content, min_level, max_level in rows:
+            if not message_content:
+                continue
+            low = min_level if min_level is not None else -1
+            high = max_level if max_level is not None else NO_MAX_LEVEL
+            self._by_type.setdefault(template_type, []).append(
+                (low, high, CompiledTemplate(message_content))
+            )
+
+    def select(self, template_type: str, level: int) -> Optional[CompiledTemplate]:
+        for low, high, template in self._by_type.get(template_type, ()):
+            if low <= level <= high:
+                return template
+        return None
+
+
+class LevelUpTemplateCache:
+    """
+    Per-guild compiled level-up templates, loaded on first use and kept until invalidated.
+
+    The dashboard template routes call invalidate() after every write.
+    """
+
+    def __init__(self):
+        self._guilds: Dict[str, GuildTemplates] = {}
+        self._locks: Dict[str, asyncio.Lock] = {}
+        self._generation: Dict[str, int] = {}
+
+    async def get(self, guild_id: str) -> GuildTemplates:
+        templates = self._guilds.get(guild_id)
+        if templates is not None:
+            return templates
+
+        lock = self._locks.setdefault(guild_id, asyncio.Lock())
+        async with lock:
+            templates = self._guilds.get(guild_id)
+            if templates is not None:
+                return templates
+
+            generation = self._generation.get(guild_id, 0)
+            pool = await get_leveling_pool()
+            rows = await pool.execute_query("""
+                SELECT template_type, message_content, min_level, max_level
+                FROM level_up_message_templates
+                WHERE guild_id = ? AND enabled = 1
+                ORDER BY priority DESC, id
+            """, (guild_id,))
+            templates = GuildTemplates(rows)
+            if self._generation.get(guild_id, 0) == generation:
+                self._guilds[guild_id] = templates
+            logging.debug(f"Compiled {len(rows)} level-up templates for guild {guild_id}")
+            return templates
+
+    def invalidate(self, guild_id: Optional[str] = None) -> None:
+        if guild_id is None:
+            for cached_guild_id in list(self._guilds):
+                self.invalidate(cached_guild_id)
+            return
+        guild_id = str(guild_id)
+        self._guilds.pop(guild_id, None)
+        self._generation[guild_id] = self._generation.get(guild_id, 0) + 1
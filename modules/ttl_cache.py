@@ -0,0 +1,186 @@
+import asyncio
+import time
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Dict, Hashable, Optional, Tuple, Union
+
+TTLSpec = Union[None, float, Callable[[Any], Optional[float]]]
+
+_MISSING = object()
+
+
+class TTLCache:
+    """
+    Bounded LRU cache with per-entry expiry and single-flight loading.
+
+    Entries expire after ``ttl`` seconds and the least recently used entry is
+    evicted once ``maxsize`` is reached. ``get_or_load`` coalesces concurrent
+    misses for the same key into one loader call, so a burst of requests for a
+    cold key costs a single query. Invalidating a key while it is loading
+    discards that load's result instead of caching a stale value.
+
+    Not thread-safe; use from a single event loop.
+    """
+
+    def __init__(self, maxsize: int, ttl: float, name: str = "cache"):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.name = name
+        self._entries: "OrderedDict[Hashable, Tuple[Any, float]]" = OrderedDict()
+        self._inflight: Dict[Hashable, asyncio.Future] = {}
+
+        self.stats = {
+            "hits": 0,
+            "misses": 0,
+            "loads": 0,
+            "load_errors": 0,
+            "coalesced": 0,
+            "evictions": 0,
+            "expirations": 0,
+            "invalidations": 0
+        }
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def __contains__(self, key: Hashable) -> bool:
+        entry = self._entries.get(key)
+        return entry is not None and entry[1] > time.monotonic()
+
+    # =========================================================================
+    # READS AND WRITES
+    # =========================================================================
+
+    def get(self, key: Hashable, default: Any = None) -> Any:
+        """Return a live entry and mark it recently used, or ``default``."""
+        entry = self._entries.get(key)
+        if entry is None:
+            self.stats["misses"] += 1
+            return default
+        if entry[1] <= time.monotonic():
+            del self._entries[key]
+            self.stats["expirations"] += 1
+            self.stats["misses"] += 1
+            return default
+        self._entries.move_to_end(key)
+        self.stats["hits"] += 1
+        return entry[0]
+
+    def set(self, key: Hashable, value: Any, ttl: Optional[float] = None) -> None:
+        """Store a value, evicting expired and then least recently used entries when full."""
+        if key not in self._entries and len(self._entries) >= self.maxsize:
+            self.purge_expired()
+            while len(self._entries) >= self.maxsize:
+                self._entries.popitem(last=False)
+                self.stats["evictions"] += 1
+        self._entries[key] = (value, time.monotonic() + (self.ttl if ttl is None else ttl))
+        self._entries.move_to_end(key)
+
+    async def get_or_load(self, key: Hashable, loader: Callable[[], Awaitable[Any]], ttl: TTLSpec = None) -> Any:
+        """
+        Return the cached value for ``key``, calling ``loader`` once on a miss.
+
+        Args:
+            key: Cache key
+            loader: Zero-argument coroutine function producing the value
+            ttl: Seconds to keep the loaded value, defaulting to the cache TTL.
+                May also be a callable taking the loaded value and returning
+                seconds, or None to return that value without caching it.
+
+        Returns:
+            The cached or freshly loaded value. Loader exceptions propagate to
+            every waiter and nothing is cached. If the task running the load
+            is cancelled, only that task sees the cancellation; the others
+            start the load again.
+        """
+        while True:
+            value = self.get(key, _MISSING)
+            if value is not _MISSING:
+                return value
+
+            pending = self._inflight.get(key)
+            if pending is None:
+                return await self._load(key, loader, ttl)
+
+            self.stats["coalesced"] += 1
+            try:
+                return await asyncio.shield(pending)
+            except asyncio.CancelledError:
+                if not pending.cancelled():
+                    raise  # This waiter was cancelled
+                # The task running the load was cancelled, not this one: load again
+
+    async def _load(self, key: Hashable, loader: Callable[[], Awaitable[Any]], ttl: TTLSpec) -> Any:
+        future = asyncio.get_running_loop().create_future()
+        self._inflight[key] = future
+        self.stats["loads"] += 1
+        try:
+            value = await loader()
+        except BaseException as e:
+            if self._inflight.get(key) is future:
+                del self._inflight[key]
+            if isinstance(e, asyncio.CancelledError):
+                # Only the cancelled task gives up; waiters see the cancelled future and retry
+                future.cancel()
+                raise
+            self.stats["load_errors"] += 1
+            if not future.done():
+                future.set_exception(e)
+                # Mark retrieved so a load nobody else waited on doesn't warn
+                future.exception()
+            raise
+
+        if self._inflight.get(key) is future:
+            del self._inflight[key]
+            seconds = ttl(value) if callable(ttl) else ttl
+            if not callable(ttl) or seconds is not None:
+                self.set(key, value, seconds)
+        future.set_result(value)
+        return value
+
+    # =========================================================================
+    # INVALIDATION
+    # =========================================================================
+
+    def invalidate(self, key: Hashable) -> bool:
+        """Drop an entry and detach any in-flight load for it. Returns True if an entry was removed."""
+        self._inflight.pop(key, None)
+        removed = self._entries.pop(key, None) is not None
+        if removed:
+            self.stats["invalidations"] += 1
+        return removed
+
+    def invalidate_where(self, predicate: Callable[[Hashable], bool]) -> int:
+        """Drop every entry whose key matches ``predicate``. Returns entries removed."""
+        for key in [key for key in self._inflight if predicate(key)]:
+            del self._inflight[key]
+        keys = [key for key in self._entries if predicate(key)]
+        for key in keys:
+            del self._entries[key]
+        self.stats["invalidations"] += len(keys)
+        return len(keys)
+
+    def clear(self) -> None:
+        self.stats["invalidations"] += len(self._entries)
+        self._entries.clear()
+        self._inflight.clear()
+
+    def purge_expired(self) -> int:
+        """Remove every expired entry. Returns entries removed."""
+        now = time.monotonic()
+        expired = [key for key, (_, expires_at) in self._entries.items() if expires_at <= now]
+        for key in expired:
+            del self._entries[key]
+        self.stats["expirations"] += len(expired)
+        return len(expired)
+
+    def get_stats(self) -> Dict[str, Any]:
+        lookups = self.stats["hits"] + self.stats["misses"]
+        return dict(
+            self.stats,
+            name=self.name,
+            size=len(self._entries),
+            maxsize=self.maxsize,
+            ttl=self.ttl,
+            hit_rate=round(self.stats["hits"] / lookups, 4) if lookups else 0.0
+        )
+
@@ -0,0 +1,368 @@
+#!/usr/bin/env python3
+"""
+Replay synthetic Discord messages through AIHandler.process_message against the
+offline Anthropic stub and report throughput, latency percentiles and memory.
+
+By default the stub runs in-process on a free port, so no network access or API
+credits are needed:
+
+  python3 tools/ai_load_test.py --messages 500 --concurrency 20
+
+Mix knobs:
+  --trigger-ratio   share of messages starting with "oi drongo" (full responses)
+  --image-ratio     share of messages carrying an image attachment
+  --text-ratio      share of messages carrying a text attachment
+  --reply-ratio     share of messages replying to an earlier message
+Non-trigger messages always get a brief response (the guild runs in the
+test-insults or test-compliments mode).
+
+Use --base-url to target an already running stub (tools/anthropic_stub_server.py)
+and --json for machine-readable output.
+"""
+
+import argparse
+import asyncio
+import datetime
+import json
+import logging
+import os
+import random
+import resource
+import socket
+import statistics
+import sys
+import tempfile
+import time
+import tracemalloc
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(ROOT))
+sys.path.insert(0, str(Path(__file__).resolve().parent))
+
+from anthropic import AsyncAnthropic  # noqa: E402
+
+from anthropic_stub_server import StubConfig, create_app  # noqa: E402
+
+GUILD_ID = 100000000000000001
+CHANNEL_ID = 200000000000000001
+BOT_USER_ID = 300000000000000001
+
+SAMPLE_LINES = (
+    "anyone keen for a servo pie this arvo",
+    "just finished the build, it actually compiles first go",
+    "my ute got bogged again down by the creek",
+    "who left the milk out, it's gone chunky",
+    "reckon the footy will be rained out tonight",
+    "new keyboard arrived, clacky as anything",
+)
+
+
+class FakeUser:
+    def __init__(self, user_id: int, name: str, bot: bool = False):
+        self.id = user_id
+        self.name = name
+        self.display_name = name
+        self.global_name = name
+        self.bot = bot
+        self.mention = f"<@{user_id}>"
+
+    def __str__(self):
+        return self.name
+
+    def __eq__(self, other):
+        return isinstance(other, FakeUser) and other.id == self.id
+
+    def __hash__(self):
+        return hash(self.id)
+
+
+class FakeGuild:
+    def __init__(self, guild_id: int, name: str):
+        self.id = guild_id
+        self.name = name
+
+    def get_member(self, user_id: int):
+        return None
+
+    def __str__(self):
+        return self.name
+
+
+class FakeTyping:
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb):
+        return False
+
+
+class FakeChannel:
+    def __init__(self, channel_id: int, name: str, guild: FakeGuild, bot: "FakeBot"):
+        self.id = channel_id
+        self.name = name
+        self.guild = guild
+        self.bot = bot
+        self.sent = 0
+
+    def typing(self):
+        return FakeTyping()
+
+    async def send(self, content=None, **kwargs):
+        self.sent += 1
+        return None
+
+    async def fetch_message(self, message_id: int):
+        # Count REST lookups; the context provider should rarely need them
+        self.bot.rest_fetches += 1
+        for message in self.bot.cached_messages:
+            if message.id == message_id:
+                return message
+        raise LookupError(f"Unknown message {message_id}")
+
+    async def history(self, limit: int = 100, before=None):
+        self.bot.rest_fetches += 1
+        for message in list(reversed(self.bot.cached_messages))[:limit]:
+            yield message
+
+    def __str__(self):
+        return f"#{self.name}"
+
+
+class FakeAttachment:
+    def __init__(self, base_url: str, filename: str, content_type: str, size: int):
+        self.filename = filename
+        self.content_type = content_type
+        self.size = size
+        self.url = f"{base_url}/attachments/{filename}?size={size}"
+
+
+class FakeReference:
+    def __init__(self, message_id: int):
+        self.message_id = message_id
+        self.resolved = None
+        self.cached_message = None
+
+
+class FakeMessage:
+    def __init__(self, message_id: int, author: FakeUser, channel: FakeChannel, content: str,
+                 attachments=None, reference=None):
+        self.id = message_id
+        self.author = author
+        self.channel = channel
+        self.guild = channel.guild
+        self.content = content
+        self.clean_content = content
+        self.attachments = attachments or []
+        self.reference = reference
+        self.created_at = datetime.datetime.now(datetime.timezone.utc)
+        self.replies = 0
+
+    async def reply(self, content=None, **kwargs):
+        self.replies += 1
+        return None
+
+
+class FakeLogger:
+    def __init__(self):
+        self._logger = logging.getLogger("ai_load_test")
+
+    def info(self, msg):
+        self._logger.debug(msg)
+
+    def debug(self, msg):
+        self._logger.debug(msg)
+
+    def warning(self, msg):
+        self._logger.warning(msg)
+
+    def error(self, msg):
+        self._logger.error(msg)
+
+
+class FakeBot:
+    def __init__(self):
+        self.user = FakeUser(BOT_USER_ID, "Drongo", bot=True)
+        self.logger = FakeLogger()
+        self.authorized_user_id = "0"
+        self.cached_messages = []
+        self.rest_fetches = 0
+
+    def get_user(self, user_id: int):
+        return None
+
+
+def _free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def _percentile(values, fraction):
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * fraction))]
+
+
+def build_messages(args, bot: FakeBot, channel: FakeChannel, base_url: str):
+    rng = random.Random(args.seed)
+    users = [FakeUser(400000000000000000 + i, f"user{i}") for i in range(args.users)]
+    messages = []
+
+    for index in range(args.messages):
+        author = rng.choice(users)
+        text = rng.choice(SAMPLE_LINES)
+        if rng.random() < args.trigger_ratio:
+            text = f"oi drongo {text}"
+
+        attachments = []
+        if rng.random() < args.image_ratio:
+            attachments.append(FakeAttachment(base_url, f"photo{index}.png", "image/png", 68))
+        if rng.random() < args.text_ratio:
+            attachments.append(FakeAttachment(base_url, f"notes{index}.txt", "text/plain", args.text_size))
+
+        reference = None
+        if messages and rng.random() < args.reply_ratio:
+            reference = FakeReference(rng.choice(messages).id)
+
+        message = FakeMessage(500000000000000000 + index, author, channel, text, attachments, reference)
+        messages.append(message)
+
+    # Earlier messages sit in discord.py's message cache like they would live
+    bot.cached_messages = messages[-1000:]
+    return messages
+
+
+async def run(args) -> dict:
+    from modules.ai.anthropic.ai import AIHandler
+
+    runner = None
+    if args.base_url:
+        base_url = args.base_url.rstrip("/")
+    else:
+        from aiohttp import web
+
+        port = _free_port()
+        stub_config = StubConfig(
+            latency_ms=args.latency_ms,
+            jitter_ms=args.jitter_ms,
+            error_rate=args.error_rate,
+            refusal_rate=args.refusal_rate,
+            tool_use_rate=args.tool_use_rate,
+            seed=args.seed
+        )
+        stub_app = create_app(stub_config)
+        runner = web.AppRunner(stub_app, access_log=None)
+        await runner.setup()
+        await web.TCPSite(runner, "127.0.0.1", port).start()
+        base_url = f"http://127.0.0.1:{port}"
+
+    bot = FakeBot()
+    guild = FakeGuild(GUILD_ID, "Load Test Guild")
+    channel = FakeChannel(CHANNEL_ID, "general", guild, bot)
+
+    handler = AIHandler(bot, "stub-key")
+    handler.anthropic_client = AsyncAnthropic(api_key="stub-key", base_url=base_url, max_retries=0)
+    handler.bot_name_cache.set(str(GUILD_ID), "drongo")
+    handler.probability_manager.apply_mode(str(GUILD_ID), args.mode)
+
+    messages = build_messages(args, bot, channel, base_url)
+    latencies = []
+    failures = 0
+    semaphore = asyncio.Semaphore(args.concurrency)
+
+    async def replay(message):
+        nonlocal failures
+        async with semaphore:
+            started_at = time.perf_counter()
+            try:
+                await handler.process_message(message)
+            except Exception:
+                failures += 1
+            latencies.append(time.perf_counter() - started_at)
+
+    tracemalloc.start()
+    wall_started_at = time.perf_counter()
+    await asyncio.gather(*(replay(message) for message in messages))
+    wall_time = time.perf_counter() - wall_started_at
+    _, peak_traced = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    stub_stats = None
+    if runner is not None:
+        stub_stats = dict(stub_app["stats"])
+        await runner.cleanup()
+
+    telemetry = handler.telemetry.get_summary()["totals"]
+    max_rss_kb = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+
+    return {
+        "messages": len(messages),
+        "concurrency": args.concurrency,
+        "wall_time_s": round(wall_time, 3),
+        "throughput_msg_s": round(len(messages) / wall_time, 2) if wall_time else 0.0,
+        "latency_p50_ms": round(_percentile(latencies, 0.50) * 1000, 1),
+        "latency_p99_ms": round(_percentile(latencies, 0.99) * 1000, 1),
+        "latency_mean_ms": round(statistics.fmean(latencies) * 1000, 1) if latencies else 0.0,
+        "failures": failures,
+        "replies_sent": sum(message.replies for message in messages) + channel.sent,
+        "rest_fetches": bot.rest_fetches,
+        "model_calls": telemetry["calls"],
+        "input_tokens": telemetry["input_tokens"],
+        "output_tokens": telemetry["output_tokens"],
+        "refusal_retries": telemetry["refusal_retries"],
+        "peak_traced_mb": round(peak_traced / (1024 * 1024), 2),
+        "max_rss_mb": round(max_rss_kb / 1024, 1),
+        "stub": stub_stats
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="AI pipeline load test against the offline Anthropic stub")
+    parser.add_argument("--messages", type=int, default=200)
+    parser.add_argument("--concurrency", type=int, default=10)
+    parser.add_argument("--users", type=int, default=25)
+    parser.add_argument("--trigger-ratio", type=float, default=0.3)
+    parser.add_argument("--image-ratio", type=float, default=0.2)
+    parser.add_argument("--text-ratio", type=float, default=0.05)
+    parser.add_argument("--text-size", type=int, default=2048)
+    parser.add_argument("--reply-ratio", type=float, default=0.2)
+    parser.add_argument("--mode", default="test-insults",
+                        choices=["test-insults", "test-compliments", "default", "disabled"])
+    parser.add_argument("--base-url", default=None, help="Use an already running stub instead of an in-process one")
+    parser.add_argument("--latency-ms", type=float, default=200.0)
+    parser.add_argument("--jitter-ms", type=float, default=50.0)
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    parser.add_argument("--refusal-rate", type=float, default=0.1)
+    parser.add_argument("--tool-use-rate", type=float, default=0.2)
+    parser.add_argument("--seed", type=int, default=1234)
+    parser.add_argument("--json", action="store_true", help="Print results as JSON")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.WARNING)
+
+    # Run from a scratch directory so no real chat_history.db or config DB is touched
+    with tempfile.TemporaryDirectory(prefix="drongo-ai-load-") as scratch:
+        os.chdir(scratch)
+        results = asyncio.run(run(args))
+
+    if args.json:
+        print(json.dumps(results, indent=2))
+        return
+
+    print("=" * 60)
+    print("AI PIPELINE LOAD TEST")
+    print("=" * 60)
+    for key, value in results.items():
+        if key == "stub":
+            continue
+        print(f"{key:<20} {value}")
+    if results["stub"]:
+        print("-" * 60)
+        for key, value in results["stub"].items():
+            print(f"stub.{key:<15} {value}")
+
+
+if __name__ == "__main__":
+    main()
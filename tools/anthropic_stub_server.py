@@ -0,0 +1,285 @@
+#!/usr/bin/env python3
+"""
+Offline stub of the Anthropic Messages API for load-testing the AI pipeline.
+
+Mimics POST /v1/messages closely enough for the official SDK: plain and
+streaming (SSE) responses, web_search server tool-use blocks, usage blocks,
+configurable latency, error injection and canned refusals. It also serves
+synthetic attachment files under /attachments/<name> so AttachmentHandler
+downloads stay local.
+
+Usage:
+  python3 tools/anthropic_stub_server.py --port 8765 --latency-ms 400 --jitter-ms 150 \\
+      --error-rate 0.02 --refusal-rate 0.1 --tool-use-rate 0.2
+
+Then point the SDK at it:
+  ANTHROPIC_BASE_URL=http://127.0.0.1:8765 ANTHROPIC_API_KEY=stub python3 drongo.py
+"""
+
+import argparse
+import asyncio
+import json
+import random
+import uuid
+
+from aiohttp import web
+
+REFUSAL_TEXT = "I can't help with writing insults about real people, but I'm happy to help with other things."
+REPLY_WORDS = (
+    "mate", "fair dinkum", "reckon", "arvo", "servo", "bloody", "legend", "drongo",
+    "ripper", "no worries", "heaps", "stoked", "crikey", "sheila", "bogan", "ute"
+)
+
+# 1x1 transparent PNG
+PNG_BYTES = bytes.fromhex(
+    "89504e470d0a1a0a0000000d4948445200000001000000010806000000"
+    "1f15c4890000000d49444154789c6360000002000154a24f5d0000000049454e44ae426082"
+)
+
+
+class StubConfig:
+    def __init__(self, latency_ms: float = 300.0, jitter_ms: float = 100.0, error_rate: float = 0.0,
+                 error_status: int = 529, refusal_rate: float = 0.0, tool_use_rate: float = 0.0,
+                 output_words: int = 40, stream_chunk_words: int = 4, seed: int = None):
+        self.latency_ms = latency_ms
+        self.jitter_ms = jitter_ms
+        self.error_rate = error_rate
+        self.error_status = error_status
+        self.refusal_rate = refusal_rate
+        self.tool_use_rate = tool_use_rate
+        self.output_words = output_words
+        self.stream_chunk_words = stream_chunk_words
+        self.random = random.Random(seed)
+
+
+ERROR_TYPES = {
+    400: "invalid_request_error",
+    401: "authentication_error",
+    429: "rate_limit_error",
+    500: "api_error",
+    529: "overloaded_error",
+}
+
+
+def _estimate_input_tokens(payload: dict) -> int:
+    # Roughly 4 characters per token; base64 image data is counted separately
+    total_chars = len(payload.get("system") or "") if isinstance(payload.get("system"), str) else 0
+    images = 0
+    for message in payload.get("messages", []):
+        content = message.get("content")
+        if isinstance(content, str):
+            total_chars += len(content)
+            continue
+        for block in content or []:
+            if block.get("type") == "text":
+                total_chars += len(block.get("text", ""))
+            elif block.get("type") == "image":
+                images += 1
+    return max(1, total_chars // 4) + images * 1600
+
+
+def _last_user_text(payload: dict) -> str:
+    for message in reversed(payload.get("messages", [])):
+        if message.get("role") != "user":
+            continue
+        content = message.get("content")
+        if isinstance(content, str):
+            return content
+        texts = [block.get("text", "") for block in content or [] if block.get("type") == "text"]
+        return " ".join(texts)
+    return ""
+
+
+def _build_content(config: StubConfig, payload: dict) -> tuple:
+    """Return (content_blocks, web_search_requests)."""
+    rng = config.random
+    blocks = []
+    searches = 0
+
+    tools = payload.get("tools") or []
+    if any(tool.get("name") == "web_search" for tool in tools) and rng.random() < config.tool_use_rate:
+        searches = 1
+        tool_use_id = f"srvtoolu_{uuid.uuid4().hex[:24]}"
+        query = " ".join(_last_user_text(payload).split()[:6]) or "drongo"
+        blocks.append({
+            "type": "server_tool_use",
+            "id": tool_use_id,
+            "name": "web_search",
+            "input": {"query": query}
+        })
+        blocks.append({
+            "type": "web_search_tool_result",
+            "tool_use_id": tool_use_id,
+            "content": [{
+                "type": "web_search_result",
+                "url": "https://example.com/stub",
+                "title": "Stub search result",
+                "encrypted_content": "c3R1Yg==",
+                "page_age": None
+            }]
+        })
+
+    # Only brief (non-tool) requests get canned refusals, mirroring roast prompts
+    if not tools and rng.random() < config.refusal_rate:
+        text = REFUSAL_TEXT
+    else:
+        max_tokens = int(payload.get("max_tokens", 1024))
+        word_count = max(1, min(config.output_words, max_tokens // 2))
+        text = " ".join(rng.choice(REPLY_WORDS) for _ in range(word_count)).capitalize() + "."
+
+    blocks.append({"type": "text", "text": text})
+    return blocks, searches
+
+
+def _usage(payload: dict, blocks: list, searches: int) -> dict:
+    output_chars = sum(len(block.get("text", "")) for block in blocks if block["type"] == "text")
+    usage = {
+        "input_tokens": _estimate_input_tokens(payload),
+        "output_tokens": max(1, output_chars // 4),
+        "cache_creation_input_tokens": 0,
+        "cache_read_input_tokens": 0,
+    }
+    if searches:
+        usage["server_tool_use"] = {"web_search_requests": searches}
+    return usage
+
+
+async def _simulate_latency(config: StubConfig) -> None:
+    delay_ms = max(0.0, config.random.gauss(config.latency_ms, config.jitter_ms))
+    await asyncio.sleep(delay_ms / 1000)
+
+
+def _sse(event: str, data: dict) -> bytes:
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n".encode("utf-8")
+
+
+async def _stream_response(request: web.Request, config: StubConfig, message: dict) -> web.StreamResponse:
+    response = web.StreamResponse(headers={"Content-Type": "text/event-stream", "Cache-Control": "no-cache"})
+    await response.prepare(request)
+
+    start_message = dict(message, content=[], stop_reason=None)
+    start_message["usage"] = dict(message["usage"], output_tokens=1)
+    await response.write(_sse("message_start", {"type": "message_start", "message": start_message}))
+
+    chunk_delay = config.latency_ms / 1000 / max(1, config.output_words // config.stream_chunk_words)
+    for index, block in enumerate(message["content"]):
+        if block["type"] != "text":
+            await response.write(_sse("content_block_start", {
+                "type": "content_block_start", "index": index, "content_block": block
+            }))
+            await response.write(_sse("content_block_stop", {"type": "content_block_stop", "index": index}))
+            continue
+
+        await response.write(_sse("content_block_start", {
+            "type": "content_block_start", "index": index, "content_block": {"type": "text", "text": ""}
+        }))
+        words = block["text"].split(" ")
+        for start in range(0, len(words), config.stream_chunk_words):
+            chunk = " ".join(words[start:start + config.stream_chunk_words])
+            if start + config.stream_chunk_words < len(words):
+                chunk += " "
+            await response.write(_sse("content_block_delta", {
+                "type": "content_block_delta", "index": index,
+                "delta": {"type": "text_delta", "text": chunk}
+            }))
+            await asyncio.sleep(chunk_delay)
+        await response.write(_sse("content_block_stop", {"type": "content_block_stop", "index": index}))
+
+    await response.write(_sse("message_delta", {
+        "type": "message_delta",
+        "delta": {"stop_reason": message["stop_reason"], "stop_sequence": None},
+        "usage": {"output_tokens": message["usage"]["output_tokens"]}
+    }))
+    await response.write(_sse("message_stop", {"type": "message_stop"}))
+    await response.write_eof()
+    return response
+
+
+def create_app(config: StubConfig) -> web.Application:
+    """Create the stub aiohttp application (also used in-process by the load harness)."""
+    stats = {"requests": 0, "streamed": 0, "errors_injected": 0, "refusals": 0, "tool_uses": 0}
+
+    async def messages(request: web.Request) -> web.StreamResponse:
+        stats["requests"] += 1
+        payload = await request.json()
+
+        if config.random.random() < config.error_rate:
+            await _simulate_latency(config)
+            stats["errors_injected"] += 1
+            status = config.error_status
+            return web.json_response({
+                "type": "error",
+                "error": {"type": ERROR_TYPES.get(status, "api_error"), "message": "Injected stub error"}
+            }, status=status)
+
+        blocks, searches = _build_content(config, payload)
+        stats["tool_uses"] += searches
+        if blocks[-1]["text"] == REFUSAL_TEXT:
+            stats["refusals"] += 1
+
+        message = {
+            "id": f"msg_stub_{uuid.uuid4().hex[:24]}",
+            "type": "message",
+            "role": "assistant",
+            "model": payload.get("model", "stub-model"),
+            "content": blocks,
+            "stop_reason": "end_turn",
+            "stop_sequence": None,
+            "usage": _usage(payload, blocks, searches)
+        }
+
+        if payload.get("stream"):
+            stats["streamed"] += 1
+            return await _stream_response(request, config, message)
+
+        await _simulate_latency(config)
+        return web.json_response(message)
+
+    async def attachment(request: web.Request) -> web.Response:
+        name = request.match_info["name"]
+        if name.endswith((".png", ".jpg", ".jpeg", ".gif", ".webp")):
+            return web.Response(body=PNG_BYTES, content_type="image/png")
+        size = int(request.query.get("size", "2048"))
+        body = ("stub attachment line\n" * (size // 21 + 1))[:size]
+        return web.Response(text=body, content_type="text/plain")
+
+    async def stub_stats(request: web.Request) -> web.Response:
+        return web.json_response(stats)
+
+    app = web.Application(client_max_size=64 * 1024 * 1024)
+    app["stats"] = stats
+    app.router.add_post("/v1/messages", messages)
+    app.router.add_get("/attachments/{name}", attachment)
+    app.router.add_get("/stub/stats", stub_stats)
+    return app
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Offline Anthropic Messages API stub")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--latency-ms", type=float, default=300.0)
+    parser.add_argument("--jitter-ms", type=float, default=100.0)
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    parser.add_argument("--error-status", type=int, default=529)
+    parser.add_argument("--refusal-rate", type=float, default=0.0)
+    parser.add_argument("--tool-use-rate", type=float, default=0.0)
+    parser.add_argument("--output-words", type=int, default=40)
+    parser.add_argument("--seed", type=int, default=None)
+    args = parser.parse_args()
+
+    config = StubConfig(
+        latency_ms=args.latency_ms,
+        jitter_ms=args.jitter_ms,
+        error_rate=args.error_rate,
+        error_status=args.error_status,
+        refusal_rate=args.refusal_rate,
+        tool_use_rate=args.tool_use_rate,
+        output_words=args.output_words,
+        seed=args.seed
+    )
+    web.run_app(create_app(config), host=args.host, port=args.port)
+
+
+if __name__ == "__main__":
+    main()
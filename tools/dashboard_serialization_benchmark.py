@@ -0,0 +1,193 @@
+#!/usr/bin/env python3
+"""
+Payload build and serialization benchmark for the dashboard's JSON layer.
+
+Builds the dashboard's largest list payloads (a chat message page and the XP
+live feed) from database-style tuples, once as dicts per row the way the
+routes used to and once as the dataclass rows in web/dashboard/rows.py, then
+serializes each with the stdlib encoder and with web/dashboard/serialization
+(orjson when it is installed). A stats snapshot with a per-guild breakdown is
+serialized the same way, since it goes out to every stats subscriber:
+
+  python3 tools/dashboard_serialization_benchmark.py --rows 200 --iterations 500
+  python3 tools/dashboard_serialization_benchmark.py --rows 1000 --guilds 50 --json
+
+Times are the median per payload in microseconds.
+"""
+
+import argparse
+import json
+import random
+import statistics
+import sys
+import time
+import types
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(ROOT))
+
+# Load the serializer and row modules without importing the whole dashboard app
+_dashboard = types.ModuleType("web.dashboard")
+_dashboard.__path__ = [str(ROOT / "web" / "dashboard")]
+sys.modules.setdefault("web.dashboard", _dashboard)
+
+from web.dashboard import serialization  # noqa: E402
+from web.dashboard.rows import MessageRow, XPFeedRow  # noqa: E402
+
+SAMPLE_LINES = (
+    "anyone keen for a servo pie this arvo",
+    "just finished the build, it actually compiles first go",
+    "my ute got bogged again down by the creek",
+    "reckon the footy will be rained out tonight",
+)
+
+
+def message_tuples(rows: int, rng: random.Random) -> list:
+    return [
+        (index, str(400000000000000000 + rng.randrange(500)), str(200000000000000000 + rng.randrange(20)),
+         rng.choice(SAMPLE_LINES), f"2024-06-{1 + index % 28:02d}T12:{index % 60:02d}:00+00:00")
+        for index in range(rows)
+    ]
+
+
+def feed_tuples(rows: int, rng: random.Random) -> list:
+    return [
+        (str(400000000000000000 + rng.randrange(500)), str(100000000000000000 + rng.randrange(4)),
+         str(200000000000000000 + rng.randrange(20)), rng.randint(15, 25), rng.randint(5, 200),
+         rng.randint(1, 40), rng.randint(5, 200), f"2024-06-01 12:{index % 60:02d}:00", rng.random() < 0.05)
+        for index in range(rows)
+    ]
+
+
+def messages_as_dicts(rows: list) -> list:
+    return [{
+        "id": row_id, "user_id": user_id, "username": f"user{user_id[-4:]}", "channel_id": channel_id,
+        "channel_name": f"channel-{channel_id[-2:]}", "message_content": content, "timestamp": timestamp
+    } for row_id, user_id, channel_id, content, timestamp in rows]
+
+
+def messages_as_rows(rows: list) -> list:
+    return [
+        MessageRow(row_id, user_id, f"user{user_id[-4:]}", channel_id, f"channel-{channel_id[-2:]}", content, timestamp)
+        for row_id, user_id, channel_id, content, timestamp in rows
+    ]
+
+
+def feed_as_dicts(rows: list) -> list:
+    return [{
+        "user_id": user_id, "user_name": f"user{user_id[-4:]}", "guild_id": guild_id,
+        "guild_name": f"Guild {guild_id[-1:]}", "channel_id": channel_id, "xp_awarded": xp,
+        "message_length": length, "word_count": words, "char_count": chars, "timestamp": timestamp,
+        "daily_cap_applied": bool(capped)
+    } for user_id, guild_id, channel_id, xp, length, words, chars, timestamp, capped in rows]
+
+
+def feed_as_rows(rows: list) -> list:
+    return [
+        XPFeedRow(user_id, f"user{user_id[-4:]}", guild_id, f"Guild {guild_id[-1:]}", channel_id, xp,
+                  length, words, chars, timestamp, bool(capped))
+        for user_id, guild_id, channel_id, xp, length, words, chars, timestamp, capped in rows
+    ]
+
+
+def stats_snapshot(guilds: int, rng: random.Random) -> dict:
+    return {
+        "message_count": rng.randint(10 ** 5, 10 ** 7),
+        "command_count": rng.randint(100, 10000),
+        "active_users": rng.randint(10, 5000),
+        "uptime": "3d 4h 12m",
+        "status": "Online",
+        "cpu_usage": 12.5,
+        "memory_usage": 43.1,
+        "recent_events": [{"timestamp": "12:00:00", "message": f"event {index}", "type": "info"}
+                          for index in range(50)],
+        "guild_breakdown": [{
+            "guild_id": str(100000000000000000 + index), "guild_name": f"Guild {index}",
+            "total_messages": rng.randint(0, 10 ** 6), "unique_users": rng.randint(0, 5000),
+            "active_channels": rng.randint(0, 80), "recent_activity": rng.randint(0, 500),
+            "last_message": "2024-06-01T12:00:00+00:00", "is_scanning": False
+        } for index in range(guilds)]
+    }
+
+
+def stdlib_dumps(obj) -> bytes:
+    # What jsonify/json.dumps did before: the stdlib encoder, no dataclass support
+    return json.dumps(obj, separators=(",", ":")).encode()
+
+
+def median_us(func, iterations: int) -> float:
+    samples = []
+    for _ in range(iterations):
+        started_at = time.perf_counter()
+        func()
+        samples.append(time.perf_counter() - started_at)
+    return round(statistics.median(samples) * 1_000_000, 1)
+
+
+def run(args) -> dict:
+    rng = random.Random(args.seed)
+    messages = message_tuples(args.rows, rng)
+    feed = feed_tuples(args.rows, rng)
+    snapshot = stats_snapshot(args.guilds, rng)
+
+    results = {"backend": serialization.BACKEND, "rows": args.rows, "guilds": args.guilds}
+    for name, tuples, as_dicts, as_rows in (
+        ("messages", messages, messages_as_dicts, messages_as_rows),
+        ("xp_feed", feed, feed_as_dicts, feed_as_rows),
+    ):
+        dict_payload = as_dicts(tuples)
+        row_payload = as_rows(tuples)
+        before = median_us(lambda: stdlib_dumps(as_dicts(tuples)), args.iterations)
+        after = median_us(lambda: serialization.dumps_bytes(as_rows(tuples)), args.iterations)
+        results[name] = {
+            "build_dicts_us": median_us(lambda: as_dicts(tuples), args.iterations),
+            "build_rows_us": median_us(lambda: as_rows(tuples), args.iterations),
+            "stdlib_dicts_us": median_us(lambda: stdlib_dumps(dict_payload), args.iterations),
+            "serializer_dicts_us": median_us(lambda: serialization.dumps_bytes(dict_payload), args.iterations),
+            "serializer_rows_us": median_us(lambda: serialization.dumps_bytes(row_payload), args.iterations),
+            "before_total_us": before,
+            "after_total_us": after,
+            "speedup": round(before / after, 2) if after else None,
+            "bytes": len(serialization.dumps_bytes(row_payload))
+        }
+        # Both paths must produce the same document
+        assert json.loads(stdlib_dumps(dict_payload)) == serialization.loads(serialization.dumps_bytes(row_payload))
+
+    message = {"type": "stats_update", "seq": 1, "data": snapshot}
+    stdlib_us = median_us(lambda: json.dumps(message), args.iterations)
+    serializer_us = median_us(lambda: serialization.dumps(message), args.iterations)
+    results["stats_snapshot"] = {
+        "stdlib_us": stdlib_us,
+        "serializer_us": serializer_us,
+        "speedup": round(stdlib_us / serializer_us, 2) if serializer_us else None,
+        "bytes": len(serialization.dumps(message))
+    }
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Dashboard JSON payload benchmark")
+    parser.add_argument("--rows", type=int, default=200, help="Rows per message page and XP feed")
+    parser.add_argument("--guilds", type=int, default=20, help="Guilds in the stats snapshot breakdown")
+    parser.add_argument("--iterations", type=int, default=300)
+    parser.add_argument("--seed", type=int, default=1234)
+    parser.add_argument("--json", action="store_true", help="Print results as JSON")
+    args = parser.parse_args()
+
+    results = run(args)
+    if args.json:
+        print(json.dumps(results, indent=2))
+        return
+
+    print("=" * 60)
+    print(f"DASHBOARD SERIALIZATION BENCHMARK ({results['backend']})")
+    print("=" * 60)
+    for section in ("messages", "xp_feed", "stats_snapshot"):
+        for key, value in results[section].items():
+            print(f"{section}.{key:<24} {value}")
+        print("-" * 60)
+
+
+if __name__ == "__main__":
+    main()
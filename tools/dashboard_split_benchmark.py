@@ -0,0 +1,148 @@
+#!/usr/bin/env python3
+"""
+Measure how dashboard load affects the bot's event loop and gateway latency.
+
+Runs against a live bot. Samples the bot's event-loop lag (/api/system_info,
+always answered by the bot process) and Discord gateway heartbeat latency
+(/api/dashboard/ipc) while idle, then again while concurrent clients hammer
+the heaviest dashboard reads. Run it once per mode and compare:
+
+  python3 drongo.py                                     # dashboard on the bot's loop
+  python3 tools/dashboard_split_benchmark.py --guild-id 1234 --json > inprocess.json
+
+  DRONGO_DASHBOARD_MODE=split python3 drongo.py         # dashboard in its own process
+  python3 tools/dashboard_split_benchmark.py --guild-id 1234 --json > split.json
+
+The gateway latency is discord.py's heartbeat round trip, refreshed once per
+heartbeat (about every 41 seconds), so keep each phase to a couple of minutes.
+Loop lag is sampled every second and is the closer proxy for message handling
+delay.
+"""
+
+import argparse
+import asyncio
+import json
+import statistics
+import time
+
+import aiohttp
+
+
+def load_paths(guild_id: str) -> list:
+    return [
+        "/api/stats",
+        "/api/chat/guilds",
+        f"/api/chat/guild/{guild_id}/messages?limit=200",
+        f"/api/chat/guild/{guild_id}/stats",
+        f"/api/leveling/leaderboard?guild_id={guild_id}&limit=100",
+        f"/api/leveling/live-feed?guild_id={guild_id}&limit=100",
+    ]
+
+
+def summarize(values: list) -> dict:
+    values = [value for value in values if value is not None]
+    if not values:
+        return {"samples": 0}
+    ordered = sorted(values)
+    return {
+        "samples": len(values),
+        "p50": round(statistics.median(ordered), 1),
+        "p95": round(ordered[min(len(ordered) - 1, int(len(ordered) * 0.95))], 1),
+        "max": round(ordered[-1], 1)
+    }
+
+
+async def sample(session: aiohttp.ClientSession, base_url: str, interval: float, stop: asyncio.Event) -> dict:
+    loop_lag, gateway = [], []
+    while not stop.is_set():
+        try:
+            async with session.get(f"{base_url}/api/system_info") as response:
+                loop_lag.append((await response.json()).get("loop_lag_ms"))
+            async with session.get(f"{base_url}/api/dashboard/ipc") as response:
+                gateway.append((await response.json()).get("gateway_latency_ms"))
+        except aiohttp.ClientError:
+            pass
+        try:
+            await asyncio.wait_for(stop.wait(), timeout=interval)
+        except asyncio.TimeoutError:
+            pass
+    return {"loop_lag_ms": summarize(loop_lag), "gateway_latency_ms": summarize(gateway)}
+
+
+async def client(session: aiohttp.ClientSession, base_url: str, paths: list, offset: int,
+                 stop: asyncio.Event, latencies: list, errors: list) -> None:
+    index = offset
+    while not stop.is_set():
+        started_at = time.perf_counter()
+        try:
+            async with session.get(base_url + paths[index % len(paths)]) as response:
+                await response.read()
+                if response.status >= 500:
+                    errors.append(response.status)
+        except aiohttp.ClientError as e:
+            errors.append(str(e))
+        latencies.append((time.perf_counter() - started_at) * 1000)
+        index += 1
+
+
+async def phase(session: aiohttp.ClientSession, args, concurrency: int, duration: float) -> dict:
+    stop = asyncio.Event()
+    latencies, errors = [], []
+    paths = load_paths(args.guild_id)
+    sampler = asyncio.create_task(sample(session, args.base_url, args.sample_interval, stop))
+    clients = [
+        asyncio.create_task(client(session, args.base_url, paths, offset, stop, latencies, errors))
+        for offset in range(concurrency)
+    ]
+    await asyncio.sleep(duration)
+    stop.set()
+    await asyncio.gather(*clients)
+    result = await sampler
+    if concurrency:
+        result["requests"] = len(latencies)
+        result["requests_per_second"] = round(len(latencies) / duration, 1)
+        result["request_ms"] = summarize(latencies)
+        result["errors"] = len(errors)
+    return result
+
+
+async def run(args) -> dict:
+    timeout = aiohttp.ClientTimeout(total=60)
+    async with aiohttp.ClientSession(timeout=timeout) as session:
+        async with session.get(f"{args.base_url}/api/dashboard/ipc") as response:
+            mode = (await response.json()).get("mode")
+        return {
+            "mode": mode,
+            "concurrency": args.concurrency,
+            "idle": await phase(session, args, 0, args.idle),
+            "loaded": await phase(session, args, args.concurrency, args.duration)
+        }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Bot loop lag and gateway latency under dashboard load")
+    parser.add_argument("--base-url", default="http://localhost:5001")
+    parser.add_argument("--guild-id", required=True, help="Guild with chat history and leveling data")
+    parser.add_argument("--concurrency", type=int, default=32, help="Concurrent dashboard clients")
+    parser.add_argument("--idle", type=float, default=90, help="Seconds sampled with no load")
+    parser.add_argument("--duration", type=float, default=120, help="Seconds sampled under load")
+    parser.add_argument("--sample-interval", type=float, default=1.0)
+    parser.add_argument("--json", action="store_true", help="Print results as JSON")
+    args = parser.parse_args()
+
+    results = asyncio.run(run(args))
+    if args.json:
+        print(json.dumps(results, indent=2))
+        return
+
+    print("=" * 60)
+    print(f"DASHBOARD LOAD vs BOT LATENCY ({results['mode']}, {args.concurrency} clients)")
+    print("=" * 60)
+    for name in ("idle", "loaded"):
+        for key, value in results[name].items():
+            print(f"{name}.{key:<24} {value}")
+        print("-" * 60)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,241 @@
+#!/usr/bin/env python3
+"""
+Regression benchmark for the leveling leaderboard.
+
+Builds a synthetic leveling database and compares the set-based
+LevelingSystem.get_leaderboard_page against the previous per-entry lookup
+path (view_xp_leaderboard plus get_user_range/get_user_rank for every row):
+
+  python3 tools/leaderboard_benchmark.py --users 20000 --limit 25 --runs 20
+
+It reports median latency and queries issued per page for both paths, checks
+that they return the same positions, rank titles and ranges, and walks deep
+pages with offsets and cursors, with and without the in-memory server rank
+index. Exits non-zero when the set-based path issues more than --max-queries
+queries per page or the results disagree.
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import statistics
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(ROOT))
+sys.path.insert(0, str(Path(__file__).resolve().parent))
+
+from leveling_bench_fixtures import create_leveling_db  # noqa: E402
+
+
+class QuietLogger:
+    def error(self, msg):
+        print(f"error: {msg}", file=sys.stderr)
+
+    warning = info = debug = lambda self, msg: None
+
+
+class BenchBot:
+    logger = QuietLogger()
+
+
+class QueryCounter:
+    """Count statements issued through the pool's helper methods."""
+
+    def __init__(self, pool):
+        self.count = 0
+        for name in ("execute_query", "execute_single", "execute_write"):
+            original = getattr(pool, name)
+            setattr(pool, name, self._wrap(original))
+
+    def _wrap(self, original):
+        async def wrapper(*args, **kwargs):
+            self.count += 1
+            return await original(*args, **kwargs)
+        return wrapper
+
+
+async def legacy_leaderboard(leveling, pool, guild_id: str, limit: int) -> list:
+    """The pre-set-based implementation: one query per page plus two lookups per row."""
+    results = await pool.execute_query("""
+        SELECT user_id, current_level, total_xp, messages_sent, rank, position
+        FROM view_xp_leaderboard
+        WHERE guild_id = ?
+        ORDER BY position
+        LIMIT ?
+    """, (guild_id, limit))
+
+    leaderboard = []
+    for result in results:
+        item = {
+            'user_id': result[0],
+            'current_level': result[1],
+            'total_xp': result[2],
+            'messages_sent': result[3],
+            'rank': result[4],
+            'position': result[5]
+        }
+        range_info = await leveling.get_user_range(item['user_id'], guild_id)
+        item['range_name'] = range_info['name'] if range_info else None
+        rank_row = await pool.execute_single(
+            "SELECT rank_title, rank FROM view_user_ranks WHERE user_id = ? AND guild_id = ?",
+            (item['user_id'], guild_id)
+        )
+        item['rank_title'] = rank_row[0] if rank_row and rank_row[0] else None
+        leaderboard.append(item)
+    return leaderboard
+
+
+def _comparable(entries: list) -> list:
+    return [
+        (entry['user_id'], entry['position'], entry['rank'], entry['total_xp'],
+         entry['range_name'], entry['rank_title'])
+        for entry in entries
+    ]
+
+
+async def _time_runs(runs: int, counter: QueryCounter, leveling, func) -> tuple:
+    timings = []
+    queries = []
+    result = None
+    for _ in range(runs):
+        # Start cold each run so per-user caches don't hide lookups
+        leveling._user_cache.clear()
+        counter.count = 0
+        started_at = time.perf_counter()
+        result = await func()
+        timings.append((time.perf_counter() - started_at) * 1000)
+        queries.append(counter.count)
+    return result, statistics.median(timings), max(queries)
+
+
+async def run(args) -> dict:
+    from database_modules.database_pool import get_leveling_pool, close_all_pools
+    from modules.leveling_system import LevelingSystem
+
+    pool = await get_leveling_pool()
+    leveling = LevelingSystem(BenchBot())
+    await leveling._ensure_indexes()
+    counter = QueryCounter(pool)
+    guild_id = args.guild_ids[0]
+
+    legacy, legacy_ms, legacy_queries = await _time_runs(
+        args.runs, counter, leveling, lambda: legacy_leaderboard(leveling, pool, guild_id, args.limit)
+    )
+    page, set_ms, set_queries = await _time_runs(
+        args.runs, counter, leveling, lambda: leveling.get_leaderboard_page(guild_id, args.limit)
+    )
+    mismatches = _comparable(legacy) != _comparable(page['entries'])
+
+    # Deep pagination: offset and cursor walks must agree and stay within the query budget
+    deep_offset = max(0, args.users // 2)
+    offset_page, offset_ms, offset_queries = await _time_runs(
+        args.runs, counter, leveling,
+        lambda: leveling.get_leaderboard_page(guild_id, args.limit, offset=deep_offset)
+    )
+    cursor_entries = []
+    cursor = None
+    cursor_pages = 0
+    cursor_max_queries = 0
+    walk_started_at = time.perf_counter()
+    while True:
+        counter.count = 0
+        cursor_page = await leveling.get_leaderboard_page(guild_id, args.limit, cursor=cursor)
+        cursor_max_queries = max(cursor_max_queries, counter.count)
+        cursor_entries.extend(cursor_page['entries'])
+        cursor_pages += 1
+        cursor = cursor_page['next_cursor']
+        if not cursor or cursor_pages >= args.walk_pages:
+            break
+    walk_ms = (time.perf_counter() - walk_started_at) * 1000
+
+    walked = len(cursor_entries)
+    offset_walk = []
+    for offset in range(0, walked, args.limit):
+        offset_walk.extend((await leveling.get_leaderboard_page(guild_id, args.limit, offset=offset))['entries'])
+    cursor_mismatch = _comparable(cursor_entries) != _comparable(offset_walk[:walked])
+
+    # Same deep page once the in-memory server rank index is loaded (keyset seek, no COUNT)
+    await leveling.rank_index.load()
+    indexed_page, indexed_ms, indexed_queries = await _time_runs(
+        args.runs, counter, leveling,
+        lambda: leveling.get_leaderboard_page(guild_id, args.limit, offset=deep_offset)
+    )
+    indexed_mismatch = _comparable(indexed_page['entries']) != _comparable(offset_page['entries'])
+
+    await close_all_pools()
+
+    return {
+        "users": args.users,
+        "limit": args.limit,
+        "legacy_median_ms": round(legacy_ms, 2),
+        "legacy_queries_per_page": legacy_queries,
+        "set_based_median_ms": round(set_ms, 2),
+        "set_based_queries_per_page": set_queries,
+        "speedup": round(legacy_ms / set_ms, 1) if set_ms else None,
+        "deep_offset": deep_offset,
+        "deep_offset_median_ms": round(offset_ms, 2),
+        "deep_offset_queries": offset_queries,
+        "deep_offset_indexed_ms": round(indexed_ms, 2),
+        "deep_offset_indexed_queries": indexed_queries,
+        "cursor_pages_walked": cursor_pages,
+        "cursor_walk_ms": round(walk_ms, 2),
+        "cursor_max_queries_per_page": cursor_max_queries,
+        "results_match_legacy": not mismatches,
+        "cursor_matches_offset": not cursor_mismatch,
+        "rank_index_matches_sql": not indexed_mismatch,
+        "deep_page_first_position": offset_page['entries'][0]['position'] if offset_page['entries'] else None
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Leaderboard regression benchmark")
+    parser.add_argument("--users", type=int, default=10000)
+    parser.add_argument("--limit", type=int, default=25)
+    parser.add_argument("--runs", type=int, default=10)
+    parser.add_argument("--walk-pages", type=int, default=40, help="Cursor pages to walk for the pagination check")
+    parser.add_argument("--max-queries", type=int, default=2, help="Fail if a set-based page needs more queries")
+    parser.add_argument("--seed", type=int, default=1234)
+    parser.add_argument("--json", action="store_true", help="Print results as JSON")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory(prefix="drongo-leaderboard-bench-") as scratch:
+        db_path = os.path.join(scratch, "leveling_system.db")
+        args.guild_ids = create_leveling_db(db_path, users_per_guild=args.users, seed=args.seed)
+        # Must be set before database_pool is imported
+        os.environ["DRONGO_LEVELING_DB_PATH"] = db_path
+        os.chdir(scratch)
+        results = asyncio.run(run(args))
+
+    failures = []
+    if results["set_based_queries_per_page"] > args.max_queries:
+        failures.append(f"set-based page used {results['set_based_queries_per_page']} queries")
+    if results["deep_offset_queries"] > args.max_queries or results["cursor_max_queries_per_page"] > args.max_queries:
+        failures.append("deep pages exceeded the query budget")
+    if not results["results_match_legacy"]:
+        failures.append("set-based results differ from the legacy path")
+    if not results["cursor_matches_offset"]:
+        failures.append("cursor walk differs from offset walk")
+    if not results["rank_index_matches_sql"]:
+        failures.append("rank-index pages differ from SQL-counted pages")
+
+    if args.json:
+        print(json.dumps(dict(results, failures=failures), indent=2))
+    else:
+        print("=" * 60)
+        print("LEADERBOARD BENCHMARK")
+        print("=" * 60)
+        for key, value in results.items():
+            print(f"{key:<30} {value}")
+        for failure in failures:
+            print(f"FAIL: {failure}")
+
+    sys.exit(1 if failures else 0)
+
+
+if __name__ == "__main__":
+    main()
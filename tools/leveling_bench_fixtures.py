@@ -0,0 +1,225 @@
+"""
+Synthetic leveling database for the leveling benchmarks.
+
+The production schema lives in the deployed database/leveling_system.db, so
+this module recreates the tables, views and indexes the leveling code touches
+and fills them with deterministic data.
+"""
+
+import random
+import sqlite3
+from datetime import datetime, timedelta
+
+LEVELING_SCHEMA = """
+CREATE TABLE IF NOT EXISTS user_levels (
+    user_id TEXT NOT NULL,
+    guild_id TEXT NOT NULL,
+    current_xp INTEGER DEFAULT 0,
+    current_level INTEGER DEFAULT 0,
+    total_xp INTEGER DEFAULT 0,
+    messages_sent INTEGER DEFAULT 0,
+    daily_xp_earned INTEGER DEFAULT 0,
+    daily_reset_date TEXT,
+    last_xp_timestamp TIMESTAMP,
+    level_up_timestamp TIMESTAMP,
+    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    PRIMARY KEY (user_id, guild_id)
+);
+
+CREATE TABLE IF NOT EXISTS xp_transactions (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    user_id TEXT NOT NULL,
+    guild_id TEXT NOT NULL,
+    channel_id TEXT NOT NULL,
+    message_id TEXT,
+    xp_awarded INTEGER NOT NULL,
+    reason TEXT,
+    message_length INTEGER,
+    word_count INTEGER,
+    char_count INTEGER,
+    daily_cap_applied BOOLEAN DEFAULT 0,
+    timestamp TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+);
+
+CREATE TABLE IF NOT EXISTS xp_cooldowns (
+    user_id TEXT NOT NULL,
+    guild_id TEXT NOT NULL,
+    last_xp_timestamp TIMESTAMP,
+    cooldown_ends_at TIMESTAMP,
+    consecutive_messages INTEGER DEFAULT 0,
+    PRIMARY KEY (user_id, guild_id)
+);
+
+CREATE TABLE IF NOT EXISTS leveling_config (
+    guild_id TEXT PRIMARY KEY,
+    enabled BOOLEAN DEFAULT 1,
+    base_xp INTEGER DEFAULT 5,
+    max_xp INTEGER DEFAULT 25,
+    word_multiplier REAL DEFAULT 0.5,
+    char_multiplier REAL DEFAULT 0.1,
+    min_cooldown_seconds INTEGER DEFAULT 30,
+    max_cooldown_seconds INTEGER DEFAULT 60,
+    min_message_chars INTEGER DEFAULT 5,
+    min_message_words INTEGER DEFAULT 2,
+    daily_xp_cap INTEGER DEFAULT 1000,
+    blacklisted_channels TEXT DEFAULT '[]',
+    whitelisted_channels TEXT DEFAULT '[]',
+    level_up_announcements BOOLEAN DEFAULT 1,
+    announcement_channel_id TEXT,
+    dm_level_notifications BOOLEAN DEFAULT 0
+);
+
+CREATE TABLE IF NOT EXISTS rank_titles (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    guild_id TEXT NOT NULL,
+    min_level INTEGER NOT NULL,
+    max_level INTEGER,
+    title TEXT NOT NULL,
+    description TEXT,
+    color_hex TEXT DEFAULT '#7289DA',
+    emoji TEXT,
+    role_id TEXT,
+    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+);
+
+CREATE TABLE IF NOT EXISTS level_range_names (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    guild_id TEXT NOT NULL,
+    min_level INTEGER NOT NULL,
+    max_level INTEGER NOT NULL,
+    range_name TEXT NOT NULL,
+    description TEXT,
+    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+);
+
+CREATE TABLE IF NOT EXISTS level_rewards (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    guild_id TEXT NOT NULL,
+    level INTEGER NOT NULL,
+    reward_type TEXT NOT NULL,
+    reward_data TEXT,
+    is_milestone BOOLEAN DEFAULT 0,
+    milestone_interval INTEGER,
+    active BOOLEAN DEFAULT 1,
+    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+);
+
+CREATE TABLE IF NOT EXISTS level_up_message_templates (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    guild_id TEXT NOT NULL,
+    template_type TEXT NOT NULL,
+    template_name TEXT,
+    message_content TEXT NOT NULL,
+    embed_enabled BOOLEAN DEFAULT 0,
+    embed_config TEXT,
+    milestone_interval INTEGER,
+    min_level INTEGER,
+    max_level INTEGER,
+    enabled BOOLEAN DEFAULT 1,
+    send_to_channel BOOLEAN DEFAULT 1,
+    send_as_dm BOOLEAN DEFAULT 0,
+    mention_user BOOLEAN DEFAULT 1,
+    priority INTEGER DEFAULT 0,
+    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+);
+
+CREATE VIEW IF NOT EXISTS view_xp_leaderboard AS
+SELECT
+    ul.user_id, ul.guild_id, ul.current_level, ul.total_xp, ul.messages_sent,
+    RANK() OVER (PARTITION BY ul.guild_id ORDER BY ul.total_xp DESC) AS rank,
+    ROW_NUMBER() OVER (PARTITION BY ul.guild_id ORDER BY ul.total_xp DESC, ul.user_id) AS position
+FROM user_levels ul;
+
+CREATE VIEW IF NOT EXISTS view_user_ranks AS
+SELECT
+    ul.user_id, ul.guild_id, ul.current_level, ul.current_xp, ul.total_xp,
+    rt.title AS rank_title, rt.description AS rank_description, rt.color_hex, rt.emoji,
+    rt.role_id AS rank_role_id,
+    RANK() OVER (PARTITION BY ul.guild_id ORDER BY ul.total_xp DESC) AS rank
+FROM user_levels ul
+LEFT JOIN rank_titles rt ON rt.id = (
+    SELECT id FROM rank_titles
+    WHERE guild_id = ul.guild_id
+      AND ul.current_level >= min_level
+      AND (max_level IS NULL OR ul.current_level <= max_level)
+    ORDER BY min_level DESC
+    LIMIT 1
+);
+"""
+
+RANK_LADDER = (
+    (0, 4, "Lurker", "\U0001f440"),
+    (5, 9, "Regular", "\U0001f4ac"),
+    (10, 19, "Chatterbox", "\U0001f5e3"),
+    (20, 34, "Veteran", "\U0001f396"),
+    (35, None, "Legend", "\U0001f451"),
+)
+
+RANGE_LADDER = (
+    (0, 9, "Bronze"),
+    (10, 24, "Silver"),
+    (25, 49, "Gold"),
+    (50, 200, "Platinum"),
+)
+
+
+def level_for_xp(total_xp: int) -> int:
+    # Same curve as LevelingSystem.calculate_level_from_xp
+    return int((-100 + (10000 + 200 * total_xp) ** 0.5) / 100)
+
+
+def create_leveling_db(path: str, guilds: int = 1, users_per_guild: int = 5000,
+                       transactions_per_user: int = 0, seed: int = 1234) -> list:
+    """Create and populate a leveling database. Returns the generated guild IDs."""
+    rng = random.Random(seed)
+    conn = sqlite3.connect(path)
+    conn.executescript(LEVELING_SCHEMA)
+
+    guild_ids = [str(100000000000000000 + index) for index in range(guilds)]
+    now = datetime.now()
+
+    for guild_id in guild_ids:
+        conn.execute("INSERT OR IGNORE INTO leveling_config (guild_id) VALUES (?)", (guild_id,))
+        conn.executemany(
+            "INSERT INTO rank_titles (guild_id, min_level, max_level, title, emoji) VALUES (?, ?, ?, ?, ?)",
+            [(guild_id, low, high, title, emoji) for low, high, title, emoji in RANK_LADDER]
+        )
+        conn.executemany(
+            "INSERT INTO level_range_names (guild_id, min_level, max_level, range_name) VALUES (?, ?, ?, ?)",
+            [(guild_id, low, high, name) for low, high, name in RANGE_LADDER]
+        )
+
+        users = []
+        transactions = []
+        for index in range(users_per_guild):
+            user_id = str(400000000000000000 + index)
+            # Long-tailed XP distribution, like a real server
+            total_xp = int(rng.paretovariate(1.2) * 40)
+            level = level_for_xp(total_xp)
+            current_xp = total_xp - (50 * level * level + 100 * level)
+            users.append((user_id, guild_id, current_xp, level, total_xp, total_xp // 8))
+
+            for _ in range(transactions_per_user):
+                timestamp = now - timedelta(seconds=rng.randint(0, 90 * 86400))
+                transactions.append((
+                    user_id, guild_id, "200000000000000001", rng.randint(5, 25),
+                    rng.randint(10, 200), rng.randint(2, 40), rng.randint(10, 200),
+                    timestamp.strftime("%Y-%m-%d %H:%M:%S")
+                ))
+
+        conn.executemany("""
+            INSERT INTO user_levels (user_id, guild_id, current_xp, current_level, total_xp, messages_sent)
+            VALUES (?, ?, ?, ?, ?, ?)
+        """, users)
+        if transactions:
+            conn.executemany("""
+                INSERT INTO xp_transactions
+                (user_id, guild_id, channel_id, xp_awarded, message_length, word_count, char_count, timestamp)
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+            """, transactions)
+
+    conn.commit()
+    conn.close()
+    return guild_ids
@@ -0,0 +1,334 @@
+#!/usr/bin/env python3
+"""
+Synthetic message-load benchmark for the leveling XP pipeline.
+
+Builds a temporary leveling database, then replays synthetic guild messages
+through LevelingSystem.process_message (or LevelingCog._process_xp_award with
+--path cog, which includes level-up announcements) at a fixed arrival rate:
+
+  python3 tools/leveling_load_benchmark.py --guilds 4 --users 2000 --messages 20000 --rate 2000
+  python3 tools/leveling_load_benchmark.py --scenario levelup --path cog --rate 0
+
+Scenarios:
+  steady    guild defaults, so most messages hit the 30-60s cooldown like production
+  award     no cooldown and no daily cap, every message is awarded
+  levelup   like award, with enough XP per message that users level up constantly
+  rewards   like levelup, with XP bonus, role and milestone rewards on every level
+
+It reports sustained messages/sec, p50/p99 latency (arrival to award committed),
+SQL statements per message and database growth. --rate 0 replays as fast as
+--concurrency allows. Exits non-zero when --max-p99-ms, --min-throughput or
+--max-queries-per-message are exceeded.
+"""
+
+import argparse
+import asyncio
+import datetime
+import json
+import logging
+import os
+import random
+import statistics
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(ROOT))
+sys.path.insert(0, str(Path(__file__).resolve().parent))
+
+from leveling_bench_fixtures import create_leveling_db  # noqa: E402
+
+CHANNEL_ID = 200000000000000001
+BOT_USER_ID = 300000000000000001
+
+SAMPLE_LINES = (
+    "anyone keen for a servo pie this arvo",
+    "just finished the build, it actually compiles first go",
+    "my ute got bogged again down by the creek",
+    "who left the milk out, it's gone chunky",
+    "reckon the footy will be rained out tonight",
+    "new keyboard arrived, clacky as anything",
+)
+
+# leveling_config overrides per scenario
+SCENARIOS = {
+    "steady": {},
+    "award": {"min_cooldown_seconds": 0, "max_cooldown_seconds": 0, "daily_xp_cap": 10 ** 9},
+    "levelup": {"min_cooldown_seconds": 0, "max_cooldown_seconds": 0, "daily_xp_cap": 10 ** 9,
+                "base_xp": 400, "max_xp": 400},
+    "rewards": {"min_cooldown_seconds": 0, "max_cooldown_seconds": 0, "daily_xp_cap": 10 ** 9,
+                "base_xp": 400, "max_xp": 400},
+}
+
+
+class FakeUser:
+    def __init__(self, user_id: int, bot: bool = False):
+        self.id = user_id
+        self.name = f"user{user_id % 100000}"
+        self.display_name = self.name
+        self.bot = bot
+        self.mention = f"<@{user_id}>"
+        self.dms = 0
+
+    async def send(self, content=None, **kwargs):
+        self.dms += 1
+
+
+class FakeGuild:
+    def __init__(self, guild_id: int):
+        self.id = guild_id
+        self.name = f"Guild {guild_id % 1000}"
+
+
+class FakeChannel:
+    def __init__(self, channel_id: int):
+        self.id = channel_id
+        self.sent = 0
+
+    async def send(self, content=None, **kwargs):
+        self.sent += 1
+
+
+class FakeMessage:
+    def __init__(self, message_id: int, author: FakeUser, guild: FakeGuild, channel: FakeChannel, content: str):
+        self.id = message_id
+        self.author = author
+        self.guild = guild
+        self.channel = channel
+        self.content = content
+        self.clean_content = content
+        self.created_at = datetime.datetime.now(datetime.timezone.utc)
+
+
+class QuietLogger:
+    def error(self, msg):
+        print(f"error: {msg}", file=sys.stderr)
+
+    warning = info = debug = lambda self, msg: None
+
+
+class BenchBot:
+    def __init__(self, channel: FakeChannel):
+        self.user = FakeUser(BOT_USER_ID, bot=True)
+        self.logger = QuietLogger()
+        self.channel = channel
+
+    def get_channel(self, channel_id: int):
+        return self.channel
+
+
+class StatementCounter:
+    """Count SQL statements on the pooled leveling connections, transaction control excluded."""
+
+    def __init__(self):
+        self.count = 0
+
+    def __call__(self, statement: str):
+        keyword = statement.lstrip()[:8].upper()
+        if not keyword.startswith(("BEGIN", "COMMIT", "ROLLBACK", "PRAGMA")):
+            self.count += 1
+
+    async def attach(self, pool):
+        await pool.initialize()
+        for conn in list(pool._pool._queue):
+            await conn.set_trace_callback(self)
+
+
+def _percentile(values, fraction):
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * fraction))]
+
+
+def _db_size(path: str) -> int:
+    return sum(os.path.getsize(path + suffix) for suffix in ("", "-wal") if os.path.exists(path + suffix))
+
+
+def prepare_database(path: str, args) -> list:
+    import sqlite3
+
+    guild_ids = create_leveling_db(path, guilds=args.guilds, users_per_guild=args.users, seed=args.seed)
+    conn = sqlite3.connect(path)
+    overrides = SCENARIOS[args.scenario]
+    if overrides:
+        assignments = ", ".join(f"{column} = ?" for column in overrides)
+        conn.execute(f"UPDATE leveling_config SET {assignments}", tuple(overrides.values()))
+    if args.scenario == "rewards":
+        rewards = []
+        for guild_id in guild_ids:
+            for level in range(1, 201):
+                rewards.append((guild_id, level, "xp_bonus", json.dumps({"amount": 25}), 0, None))
+                if level % 10 == 0:
+                    rewards.append((guild_id, level, "role", json.dumps({"role_id": str(level)}), 0, None))
+            rewards.append((guild_id, 5, "custom_message", json.dumps({"message": "Milestone!"}), 1, 5))
+        conn.executemany("""
+            INSERT INTO level_rewards (guild_id, level, reward_type, reward_data, is_milestone, milestone_interval)
+            VALUES (?, ?, ?, ?, ?, ?)
+        """, rewards)
+    conn.commit()
+    conn.close()
+    return guild_ids
+
+
+def build_messages(args, guild_ids: list, channel: FakeChannel) -> list:
+    rng = random.Random(args.seed)
+    guilds = [FakeGuild(int(guild_id)) for guild_id in guild_ids]
+    users = [FakeUser(400000000000000000 + index) for index in range(args.users)]
+    messages = []
+    for index in range(args.messages):
+        # A few chatty members send most of the messages, like a real server
+        author = users[min(int(rng.paretovariate(1.1)) - 1, len(users) - 1)] if args.skewed else rng.choice(users)
+        messages.append(FakeMessage(
+            500000000000000000 + index, author, rng.choice(guilds), channel, rng.choice(SAMPLE_LINES)
+        ))
+    return messages
+
+
+async def run(args, db_path: str, guild_ids: list) -> dict:
+    from database_modules.database_pool import get_leveling_pool, close_all_pools
+    from modules.leveling_system import LevelingSystem
+
+    channel = FakeChannel(CHANNEL_ID)
+    bot = BenchBot(channel)
+    leveling = LevelingSystem(bot)
+    await leveling.initialize()
+
+    if args.path == "cog":
+        from modules.cogs.leveling_cog import LevelingCog
+
+        cog = LevelingCog(bot)
+        cog.leveling_system = leveling
+        handle = cog._process_xp_award
+    else:
+        handle = leveling.process_message
+
+    counter = StatementCounter()
+    await counter.attach(await get_leveling_pool())
+    messages = build_messages(args, guild_ids, channel)
+    size_before = _db_size(db_path)
+
+    latencies = []
+    failures = 0
+    semaphore = asyncio.Semaphore(args.concurrency)
+
+    async def deliver(message, arrival: float):
+        nonlocal failures
+        async with semaphore:
+            try:
+                await handle(message)
+            except Exception:
+                failures += 1
+            latencies.append(time.perf_counter() - arrival)
+
+    counter.count = 0
+    tasks = []
+    started_at = time.perf_counter()
+    for index, message in enumerate(messages):
+        if args.rate > 0:
+            # Open-loop arrivals: schedule by the clock, not by completions
+            arrival = started_at + index / args.rate
+            delay = arrival - time.perf_counter()
+            if delay > 0:
+                await asyncio.sleep(delay)
+        else:
+            arrival = time.perf_counter()
+        tasks.append(asyncio.create_task(deliver(message, arrival)))
+    await asyncio.gather(*tasks)
+    # Awards resolve on commit, so this only catches stragglers from rejected paths
+    await leveling.ledger.flush()
+    wall_time = time.perf_counter() - started_at
+    statements = counter.count
+
+    ledger_stats = leveling.ledger.get_stats()
+    eligibility_stats = leveling.eligibility.get_stats()
+    await leveling.shutdown()
+    await close_all_pools()
+
+    return {
+        "scenario": args.scenario,
+        "path": args.path,
+        "guilds": args.guilds,
+        "users_per_guild": args.users,
+        "messages": len(messages),
+        "target_rate": args.rate or None,
+        "wall_time_s": round(wall_time, 3),
+        "throughput_msg_s": round(len(messages) / wall_time, 1) if wall_time else 0.0,
+        "latency_p50_ms": round(_percentile(latencies, 0.50) * 1000, 2),
+        "latency_p99_ms": round(_percentile(latencies, 0.99) * 1000, 2),
+        "latency_mean_ms": round(statistics.fmean(latencies) * 1000, 2) if latencies else 0.0,
+        "failures": failures,
+        "statements": statements,
+        "statements_per_message": round(statements / len(messages), 3) if messages else 0.0,
+        "announcements_sent": channel.sent,
+        "db_growth_kb": round((_db_size(db_path) - size_before) / 1024, 1),
+        "ledger": ledger_stats,
+        "eligibility": eligibility_stats
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Leveling pipeline message-load benchmark")
+    parser.add_argument("--scenario", choices=sorted(SCENARIOS), default="award")
+    parser.add_argument("--path", choices=["system", "cog"], default="system",
+                        help="Drive LevelingSystem.process_message or LevelingCog._process_xp_award")
+    parser.add_argument("--guilds", type=int, default=2)
+    parser.add_argument("--users", type=int, default=1000, help="Members per guild")
+    parser.add_argument("--messages", type=int, default=5000)
+    parser.add_argument("--rate", type=float, default=1000.0, help="Arrivals per second, 0 for unthrottled")
+    parser.add_argument("--concurrency", type=int, default=500, help="Max messages in flight")
+    parser.add_argument("--skewed", action="store_true", help="Pareto-distributed authors instead of uniform")
+    parser.add_argument("--seed", type=int, default=1234)
+    parser.add_argument("--max-p99-ms", type=float, default=None)
+    parser.add_argument("--min-throughput", type=float, default=None)
+    parser.add_argument("--max-queries-per-message", type=float, default=None)
+    parser.add_argument("--json", action="store_true", help="Print results as JSON")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.WARNING)
+
+    with tempfile.TemporaryDirectory(prefix="drongo-leveling-load-") as scratch:
+        db_path = os.path.join(scratch, "leveling_system.db")
+        guild_ids = prepare_database(db_path, args)
+        # Must be set before database_pool is imported
+        os.environ["DRONGO_LEVELING_DB_PATH"] = db_path
+        os.chdir(scratch)
+        results = asyncio.run(run(args, db_path, guild_ids))
+
+    failures = []
+    if args.max_p99_ms is not None and results["latency_p99_ms"] > args.max_p99_ms:
+        failures.append(f"p99 latency {results['latency_p99_ms']}ms exceeds {args.max_p99_ms}ms")
+    if args.min_throughput is not None and results["throughput_msg_s"] < args.min_throughput:
+        failures.append(f"throughput {results['throughput_msg_s']} msg/s below {args.min_throughput}")
+    if (args.max_queries_per_message is not None
+            and results["statements_per_message"] > args.max_queries_per_message):
+        failures.append(f"{results['statements_per_message']} statements per message exceeds "
+                        f"{args.max_queries_per_message}")
+    if results["failures"]:
+        failures.append(f"{results['failures']} messages raised")
+
+    if args.json:
+        print(json.dumps(dict(results, failures=failures), indent=2))
+    else:
+        print("=" * 60)
+        print("LEVELING LOAD BENCHMARK")
+        print("=" * 60)
+        for key, value in results.items():
+            if isinstance(value, dict):
+                continue
+            print(f"{key:<26} {value}")
+        print("-" * 60)
+        for section in ("ledger", "eligibility"):
+            for key, value in results[section].items():
+                if not isinstance(value, (dict, list)):
+                    print(f"{section}.{key:<26} {value}")
+        for failure in failures:
+            print(f"FAIL: {failure}")
+
+    sys.exit(1 if failures else 0)
+
+
+if __name__ == "__main__":
+    main()
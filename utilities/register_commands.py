@@ -273,6 +273,19 @@ def get_commands():
                             "required": True
                         }
                     ]
+                },
+                {
+                    "name": "replay",
+                    "description": "Rebuild XP and levels from chat history (Admin only)",
+                    "type": 1,  # SUB_COMMAND
+                    "options": [
+                        {
+                            "name": "dry_run",
+                            "description": "Preview the results without changing anyone's XP",
+                            "type": 5,  # BOOLEAN
+                            "required": False
+                        }
+                    ]
                 }
             ]
         }
@@ -1,5 +1,13 @@
+from . import state
 from .broadcast import request_immediate_broadcast
 from .stats_service import real_time_stats
+from .topics import topic_hub
+
+
+def _forward(method: str, *args) -> None:
+    """In split-process mode, replay the call in the dashboard process as well."""
+    if state.ipc_server is not None:
+        state.ipc_server.publish("api", {"method": method, "args": args})
 
 
 class DashboardAPI:
@@ -9,28 +17,36 @@ class DashboardAPI:
     def update_stat(key: str, value):
         """Update a statistic from the bot."""
         real_time_stats.update_stat(key, value)
+        _forward("update_stat", key, value)
 
     @staticmethod
     def log_message(author: str, guild: str, channel: str):
         """Log a message from the bot."""
         real_time_stats.add_message_log(str(author), str(guild), str(channel))
         request_immediate_broadcast()
+        _forward("log_message", str(author), str(guild), str(channel))
 
     @staticmethod
     def log_event(event: str, event_type: str = "info"):
         """Log an event from the bot."""
         real_time_stats.add_event_log(str(event), event_type)
+        topic_hub.notify("events.log")
+        _forward("log_event", str(event), event_type)
 
     @staticmethod
     def set_status(status: str):
         """Set bot status."""
         real_time_stats.set_status(status)
+        topic_hub.notify("events.log")
+        _forward("set_status", status)
 
     @staticmethod
     def increment_command_count():
         """Increment command counter."""
         real_time_stats.stats["commands_executed"] += 1
         real_time_stats.add_event_log("Command executed", "command")
+        topic_hub.notify("events.log")
+        _forward("increment_command_count")
 
 
 dashboard_api = DashboardAPI()
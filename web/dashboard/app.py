@@ -1,14 +1,22 @@
+import asyncio
 import logging
 import os
 import sys
 
 from quart import Quart
+from quart.json.provider import DefaultJSONProvider
 from quart_cors import cors
 
 # Ensure project root is on the path when running directly
 sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "..")))
 
-from .broadcast import stats_broadcast_loop
+from . import state
+from .bot_bridge import forward_to_bot
+from .http_cache import bump_versions_on_write, compress_response, precompress_static
+from .paths import REACT_BUILD_DIR
+from .serialization import dumps, dumps_bytes, loads
+from .stats_service import seed_guild_stats
+from .system_metrics import system_metrics
 from .routes.chat_routes import chat_bp
 from .routes.github_routes import github_bp
 from .routes.leveling_routes import leveling_bp
@@ -17,9 +25,24 @@ from .routes.system_routes import system_bp
 from .websocket_routes import ws_bp
 
 
+class DashboardJSONProvider(DefaultJSONProvider):
+    """Routes jsonify and request.get_json through the dashboard serializer (orjson when installed)."""
+
+    def dumps(self, obj, **kwargs) -> str:
+        return dumps(obj)
+
+    def loads(self, s, **kwargs):
+        return loads(s)
+
+    def response(self, *args, **kwargs):
+        obj = self._prepare_response_obj(args, kwargs)
+        return self._app.response_class(dumps_bytes(obj), mimetype=self.mimetype)
+
+
 def create_app() -> Quart:
     """Create and configure the Quart application."""
     app = Quart(__name__)
+    app.json = DashboardJSONProvider(app)
     app = cors(app)
 
     app.register_blueprint(ws_bp)
@@ -29,6 +52,10 @@ def create_app() -> Quart:
     app.register_blueprint(chat_bp)
     app.register_blueprint(spa_bp)
 
+    app.before_request(forward_to_bot)
+    app.after_request(bump_versions_on_write)
+    app.after_request(compress_response)
+
     _register_background_tasks(app)
     return app
 
@@ -36,7 +63,26 @@ def create_app() -> Quart:
 def _register_background_tasks(app: Quart):
     @app.before_serving
     async def startup():
-        app.add_background_task(stats_broadcast_loop)
+        system_metrics.start()
+        if state.bot_bridge is not None:
+            state.bot_bridge.start()
+        app.add_background_task(seed_guild_stats)
+        app.add_background_task(_precompress_build)
+
+    @app.after_serving
+    async def shutdown():
+        system_metrics.stop()
+        if state.bot_bridge is not None:
+            await state.bot_bridge.stop()
+
+
+async def _precompress_build():
+    """Make sure the React build has .gz/.br copies to serve, e.g. after a rebuild."""
+    if not os.path.isdir(REACT_BUILD_DIR):
+        return
+    written = await asyncio.to_thread(precompress_static, REACT_BUILD_DIR)
+    if written:
+        logging.info(f"Precompressed {written} dashboard build files")
 
 
 app = create_app()
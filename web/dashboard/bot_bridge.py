@@ -0,0 +1,294 @@
+import asyncio
+import base64
+import itertools
+import logging
+from collections import deque
+from datetime import datetime
+from typing import Any, Dict, Optional
+
+from quart import Response, current_app, jsonify, request
+from werkzeug.datastructures import Headers
+
+from database_modules.data_versions import data_versions
+from database_modules.guild_stats_registry import guild_stats_registry
+from modules.leveling_ledger import PendingAward
+
+from . import state
+from .api import dashboard_api
+from .broadcast import request_immediate_broadcast
+from .ipc import IPC_CALL_TIMEOUT, IPC_SOCKET_PATH, encode_frame, open_connection, read_frame
+from .stats_service import real_time_stats
+from .topics import topic_hub
+
+# Seconds between attempts to reach the bot process
+RECONNECT_DELAY = 1.0
+
+# dashboard_api methods the bot process may replay here
+FORWARDED_API_METHODS = {"update_stat", "log_message", "log_event", "set_status", "increment_command_count"}
+
+# Not passed through when a request is forwarded: the dashboard compresses the
+# response itself, and the rest describe the original connection
+REQUEST_HEADERS_NOT_FORWARDED = {"accept-encoding", "connection", "keep-alive", "transfer-encoding", "upgrade"}
+RESPONSE_HEADERS_NOT_FORWARDED = {"content-length", "connection", "keep-alive", "transfer-encoding"}
+
+
+class BotBridgeError(Exception):
+    """The bot process failed to handle a call."""
+
+
+class BotBridge:
+    """
+    The dashboard process's connection to the bot in split-process mode.
+
+    Reads (chat history, leveling, stats) are served straight from the SQLite
+    files in this process; writes and anything needing the live Discord
+    client are sent to the bot as calls over the IPC socket. The bot pushes
+    its live counters and events, data version bumps (which also drop this
+    process's leveling caches), stored messages and committed XP batches,
+    which are replayed into the local dashboard_api, data_versions, message
+    stats registry and XP ledger listeners so the existing topics and ETags
+    work unchanged. The connection is retried
+    every RECONNECT_DELAY seconds while the bot is unreachable.
+    """
+
+    def __init__(self, socket_path: str = IPC_SOCKET_PATH, call_timeout: float = IPC_CALL_TIMEOUT):
+        self.socket_path = socket_path
+        self.call_timeout = call_timeout
+        self.bot_ready = False
+        self.channel_names: Dict[str, str] = {}
+
+        self._writer: Optional[asyncio.StreamWriter] = None
+        self._pending: Dict[int, asyncio.Future] = {}
+        self._ids = itertools.count(1)
+        self._task: Optional[asyncio.Task] = None
+
+        self.stats = {
+            "connects": 0,
+            "calls": 0,
+            "call_errors": 0,
+            "call_timeouts": 0,
+            "forwarded_requests": 0,
+            "events": 0
+        }
+
+    @property
+    def connected(self) -> bool:
+        return self._writer is not None
+
+    # =========================================================================
+    # LIFECYCLE
+    # =========================================================================
+
+    def start(self) -> None:
+        # Reads here must not create rows; the bot process owns every write
+        self._leveling().read_only = True
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        if self._task:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    async def _run(self) -> None:
+        while True:
+            try:
+                reader, writer = await open_connection(self.socket_path)
+            except OSError as e:
+                logging.debug(f"Bot process not reachable on {self.socket_path}: {e}")
+                await asyncio.sleep(RECONNECT_DELAY)
+                continue
+
+            self._writer = writer
+            self.stats["connects"] += 1
+            logging.info("Connected to the bot process")
+            try:
+                while True:
+                    frame = await read_frame(reader)
+                    if frame is None:
+                        break
+                    if "event" in frame:
+                        self._handle_event(frame["event"], frame.get("data"))
+                    else:
+                        self._handle_reply(frame)
+            except (ConnectionError, ValueError) as e:
+                logging.error(f"Bot IPC connection error: {e}")
+            finally:
+                self._writer = None
+                writer.close()
+                for future in self._pending.values():
+                    if not future.done():
+                        future.set_exception(ConnectionError("Lost connection to the bot process"))
+                self.bot_ready = False
+
+            logging.warning("Lost connection to the bot process, reconnecting")
+            dashboard_api.set_status("Disconnected")
+            await asyncio.sleep(RECONNECT_DELAY)
+
+    # =========================================================================
+    # CALLS TO THE BOT
+    # =========================================================================
+
+    async def call(self, method: str, /, **params) -> Any:
+        """
+        Call a method in the bot process and wait for its result.
+
+        Raises:
+            ConnectionError: The bot process isn't connected
+            asyncio.TimeoutError: No reply within call_timeout seconds
+            BotBridgeError: The call failed in the bot process
+        """
+        if self._writer is None:
+            raise ConnectionError("Not connected to the bot process")
+
+        call_id = next(self._ids)
+        future = asyncio.get_running_loop().create_future()
+        self._pending[call_id] = future
+        self.stats["calls"] += 1
+        try:
+            self._writer.write(encode_frame({"id": call_id, "method": method, "params": params}))
+            await self._writer.drain()
+            return await asyncio.wait_for(future, timeout=self.call_timeout)
+        except asyncio.TimeoutError:
+            self.stats["call_timeouts"] += 1
+            raise
+        except BotBridgeError:
+            self.stats["call_errors"] += 1
+            raise
+        finally:
+            self._pending.pop(call_id, None)
+
+    def _handle_reply(self, frame: Dict[str, Any]) -> None:
+        future = self._pending.get(frame.get("id"))
+        if future is None or future.done():
+            return  # The caller already timed out
+        if "error" in frame:
+            future.set_exception(BotBridgeError(frame["error"]))
+        else:
+            future.set_result(frame.get("result"))
+
+    async def forward(self, forwarded_request) -> Response:
+        """Have the bot process handle an HTTP request and return its response."""
+        body = await forwarded_request.get_data()
+        headers = [
+            [name, value] for name, value in forwarded_request.headers.items()
+            if name.lower() not in REQUEST_HEADERS_NOT_FORWARDED
+        ]
+        try:
+            result = await self.call(
+                "http",
+                method=forwarded_request.method,
+                path=forwarded_request.path,
+                query_string=forwarded_request.query_string.decode("latin-1"),
+                headers=headers,
+                body=base64.b64encode(body).decode()
+            )
+        except ConnectionError:
+            return jsonify({"error": "Bot process is not connected"}), 503
+        except asyncio.TimeoutError:
+            return jsonify({"error": "Bot process did not respond in time"}), 504
+        except BotBridgeError as e:
+            return jsonify({"error": str(e)}), 502
+
+        self.stats["forwarded_requests"] += 1
+        return Response(
+            base64.b64decode(result["body"]),
+            status=result["status"],
+            headers=Headers([
+                (name, value) for name, value in result["headers"]
+                if name.lower() not in RESPONSE_HEADERS_NOT_FORWARDED
+            ])
+        )
+
+    # =========================================================================
+    # PUSHES FROM THE BOT
+    # =========================================================================
+
+    def _handle_event(self, event: str, data: Any) -> None:
+        self.stats["events"] += 1
+        try:
+            if event == "api":
+                if data["method"] in FORWARDED_API_METHODS:
+                    getattr(dashboard_api, data["method"])(*data["args"])
+            elif event == "bump":
+                self._apply_bump(data["group"], data["guild_id"])
+            elif event == "message":
+                guild_id, row_id, user_id, channel_id, created_at = data
+                guild_stats_registry.record_message(
+                    guild_id, row_id, user_id, channel_id, datetime.fromisoformat(created_at)
+                )
+            elif event == "xp_awards":
+                self._replay_xp_batch(data["awards"], data["results"])
+            elif event == "directory":
+                self._apply_directory(data)
+            elif event == "hello":
+                self._apply_hello(data)
+        except Exception as e:
+            logging.error(f"Error applying bot event {event}: {e}")
+
+    def _apply_hello(self, data: Dict[str, Any]) -> None:
+        real_time_stats.stats.update(data["stats"])
+        real_time_stats.start_time = data["start_time"]
+        real_time_stats.recent_messages = deque(data["recent_messages"], maxlen=real_time_stats.recent_messages.maxlen)
+        real_time_stats.recent_events = deque(data["recent_events"], maxlen=real_time_stats.recent_events.maxlen)
+        self._apply_directory(data)
+        # Whatever was cached while disconnected may be out of date
+        if self.stats["connects"] > 1:
+            guild_stats_registry.reset()
+        data_versions.bump("leveling")
+        data_versions.bump("chat")
+        self._leveling().drop_guild_caches()
+        topic_hub.notify("events.log")
+        request_immediate_broadcast()
+
+    def _apply_directory(self, data: Dict[str, Any]) -> None:
+        self.bot_ready = data["bot_ready"]
+        self.channel_names = data["channel_names"]
+
+    def _apply_bump(self, group: str, guild_id: Optional[str]) -> None:
+        data_versions.bump(group, guild_id)
+        if group == "leveling":
+            self._leveling().drop_guild_caches(guild_id)
+
+    def _replay_xp_batch(self, awards, results) -> None:
+        self._leveling().ledger.notify_listeners(
+            [PendingAward(*award, future=None) for award in awards], results
+        )
+
+    def _leveling(self):
+        from modules.leveling_system import get_leveling_system
+
+        class MockBot:
+            pass
+
+        return get_leveling_system(MockBot())
+
+    def get_stats(self) -> Dict[str, Any]:
+        return dict(self.stats, connected=self.connected, bot_ready=self.bot_ready,
+                    pending_calls=len(self._pending))
+
+
+# =========================================================================
+# REQUEST ROUTING
+# =========================================================================
+
+def runs_in_bot(handler):
+    """Mark a GET endpoint that needs the live bot; in split-process mode the bot process answers it."""
+    handler.runs_in_bot = True
+    return handler
+
+
+async def forward_to_bot():
+    """before_request hook: in split-process mode, API writes and runs_in_bot endpoints go to the bot process."""
+    bridge = state.bot_bridge
+    if bridge is None or not request.path.startswith("/api/") or request.method == "OPTIONS":
+        return None
+    if request.method in ("GET", "HEAD"):
+        view = current_app.view_functions.get(request.endpoint)
+        if not getattr(view, "runs_in_bot", False):
+            return None
+    return await bridge.forward(request)
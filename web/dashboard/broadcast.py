@@ -1,54 +1,177 @@
 import asyncio
-import json
 import logging
+import os
+import time
+from typing import Any, Dict, List, Optional, Tuple
 
-from . import state
+from .serialization import dumps
 from .stats_service import get_enhanced_stats
+from .topics import topic_hub
 
-_needs_immediate_broadcast = False
+# Max stats frames per second; bursts of logged messages coalesce into one frame
+BROADCAST_FPS = float(os.getenv("DASHBOARD_BROADCAST_FPS", "4"))
 
+# Seconds between frames when nothing has requested an update
+IDLE_BROADCAST_INTERVAL = 2.0
 
-async def broadcast_stats():
-    """Broadcast current stats to all connected WebSocket clients."""
-    if not state.connected_clients:
-        return
+# Seconds between full snapshots, so a client that dropped a patch resyncs
+FULL_SNAPSHOT_INTERVAL = float(os.getenv("DASHBOARD_FULL_SNAPSHOT_INTERVAL", "30"))
 
-    stats = await get_enhanced_stats()
 
-    message = json.dumps({
-        "type": "stats_update",
-        "data": stats
-    })
+def _escape_pointer(key: Any) -> str:
+    return str(key).replace("~", "~0").replace("/", "~1")
 
-    disconnected_clients = set()
-    for client in state.connected_clients.copy():
-        try:
-            await client.send(message)
-        except Exception as e:
-            logging.debug(f"Client disconnected during broadcast: {e}")
-            disconnected_clients.add(client)
 
-    state.connected_clients.difference_update(disconnected_clients)
+def diff_stats(old: Any, new: Any, path: str = "") -> List[Dict[str, Any]]:
+    """
+    Build JSON Patch (RFC 6902) operations that turn ``old`` into ``new``.
 
+    Dicts are compared key by key and equal-length lists index by index;
+    lists that change length are replaced whole.
+    """
+    if type(old) is not type(new):
+        return [{"op": "replace", "path": path, "value": new}]
 
-def request_immediate_broadcast():
-    """Flag that stats should be broadcast ASAP."""
-    global _needs_immediate_broadcast
-    _needs_immediate_broadcast = True
-
-
-async def stats_broadcast_loop():
-    """Background task to broadcast stats every 2 seconds."""
-    global _needs_immediate_broadcast
-    while True:
-        try:
-            if _needs_immediate_broadcast:
-                _needs_immediate_broadcast = False
-                await broadcast_stats()
-                await asyncio.sleep(0.1)
+    if isinstance(new, dict):
+        ops = []
+        for key in old:
+            if key not in new:
+                ops.append({"op": "remove", "path": f"{path}/{_escape_pointer(key)}"})
+        for key, value in new.items():
+            child = f"{path}/{_escape_pointer(key)}"
+            if key not in old:
+                ops.append({"op": "add", "path": child, "value": value})
             else:
-                await broadcast_stats()
-                await asyncio.sleep(2)
-        except Exception as e:
-            logging.error(f"Error in stats broadcast loop: {e}")
-            await asyncio.sleep(5)
+                ops.extend(diff_stats(old[key], value, child))
+        return ops
+
+    if isinstance(new, list):
+        if len(old) != len(new):
+            return [{"op": "replace", "path": path, "value": new}]
+        ops = []
+        for index, (old_item, new_item) in enumerate(zip(old, new)):
+            ops.extend(diff_stats(old_item, new_item, f"{path}/{index}"))
+        return ops
+
+    return [] if old == new else [{"op": "replace", "path": path, "value": new}]
+
+
+class StatsBroadcaster:
+    """
+    Coalesced, diff-based stats broadcasting for the ``stats`` topic.
+
+    Update requests only mark the stats dirty; the loop computes one shared
+    snapshot per frame, at most BROADCAST_FPS times a second, and sends every
+    client the same serialized JSON Patch against the previous frame. Each
+    frame carries a sequence number and the one it was diffed against, so a
+    client that sees a gap asks for a full snapshot, and full snapshots also
+    go out every FULL_SNAPSHOT_INTERVAL seconds. The loop only runs while the
+    topic has subscribers.
+    """
+
+    def __init__(self, fps: float = BROADCAST_FPS, full_snapshot_interval: float = FULL_SNAPSHOT_INTERVAL):
+        self.frame_interval = 1.0 / fps if fps > 0 else 0.0
+        self.full_snapshot_interval = full_snapshot_interval
+        self.seq = 0
+        self.snapshot: Optional[Dict[str, Any]] = None
+        self._snapshot_at = 0.0
+        self._last_full_at = 0.0
+        self._full_message: Optional[str] = None
+        self._dirty = asyncio.Event()
+        self._lock = asyncio.Lock()
+
+        self.stats = {
+            "frames": 0,
+            "full_frames": 0,
+            "patch_frames": 0,
+            "patch_ops": 0,
+            "bytes_sent": 0
+        }
+
+    def request_update(self) -> None:
+        """Mark stats as changed; the next frame picks it up."""
+        self._dirty.set()
+
+    async def refresh(self, force_full: bool = False) -> None:
+        """Compute one snapshot and send it to every client as a patch or full frame."""
+        async with self._lock:
+            stats = await get_enhanced_stats()
+            now = time.monotonic()
+            self._snapshot_at = now
+
+            full = (force_full or self.snapshot is None
+                    or now - self._last_full_at >= self.full_snapshot_interval)
+            if full:
+                self.seq += 1
+                self.snapshot = stats
+                self._full_message = None
+                self._last_full_at = now
+                message = self.full_snapshot_message()
+                self.stats["full_frames"] += 1
+            else:
+                ops = diff_stats(self.snapshot, stats)
+                if not ops:
+                    return
+                base = self.seq
+                self.seq += 1
+                self.snapshot = stats
+                self._full_message = None
+                message = dumps({"type": "stats_patch", "seq": self.seq, "base": base, "data": ops})
+                self.stats["patch_frames"] += 1
+                self.stats["patch_ops"] += len(ops)
+
+            self.stats["frames"] += 1
+            await self._send_all(message)
+
+    def full_snapshot_message(self) -> str:
+        """The current snapshot as a serialized stats_update, built once per frame."""
+        if self._full_message is None:
+            self._full_message = dumps({"type": "stats_update", "seq": self.seq, "data": self.snapshot})
+        return self._full_message
+
+    async def latest(self) -> Tuple[int, Dict[str, Any]]:
+        """The current sequence number and snapshot, refreshed if it has gone stale."""
+        if self.snapshot is None or time.monotonic() - self._snapshot_at > IDLE_BROADCAST_INTERVAL:
+            await self.refresh()
+        return self.seq, self.snapshot
+
+    async def snapshot_for_client(self) -> str:
+        """Full snapshot for a newly connected or resyncing client, refreshed if it has gone stale."""
+        await self.latest()
+        return self.full_snapshot_message()
+
+    async def _send_all(self, message: str) -> None:
+        self.stats["bytes_sent"] += len(message) * len(topic_hub.subscribers("stats"))
+        await topic_hub.send("stats", message)
+
+    async def run(self, topic: str = "stats") -> None:
+        while True:
+            try:
+                try:
+                    await asyncio.wait_for(self._dirty.wait(), timeout=IDLE_BROADCAST_INTERVAL)
+                except asyncio.TimeoutError:
+                    pass
+                self._dirty.clear()
+                if topic_hub.subscribers(topic):
+                    await self.refresh()
+                # Anything requested while we slept lands in the next frame
+                await asyncio.sleep(self.frame_interval)
+            except Exception as e:
+                logging.error(f"Error in stats broadcast loop: {e}")
+                await asyncio.sleep(5)
+
+
+stats_broadcaster = StatsBroadcaster()
+topic_hub.register("stats", stats_broadcaster.run, snapshot=lambda topic: stats_broadcaster.snapshot_for_client())
+
+
+async def broadcast_stats():
+    """Broadcast current stats to every client subscribed to stats."""
+    if not topic_hub.subscribers("stats"):
+        return
+    await stats_broadcaster.refresh()
+
+
+def request_immediate_broadcast():
+    """Flag that stats should be broadcast in the next frame."""
+    stats_broadcaster.request_update()
@@ -0,0 +1,238 @@
+import gzip
+import hashlib
+import logging
+import mimetypes
+import os
+from functools import wraps
+from typing import Awaitable, Callable, Dict, Iterable, Optional
+
+from quart import Response, make_response, request
+from quart.wrappers.response import DataBody
+from werkzeug.security import safe_join
+
+from database_modules.data_versions import data_versions
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+# Bodies smaller than this aren't worth the CPU or the Content-Encoding header
+MIN_COMPRESS_SIZE = 1024
+# Levels for compressing API responses per request; precompressed files use the maximum
+GZIP_LEVEL = 6
+BROTLI_QUALITY = 4
+
+COMPRESSIBLE_TYPES = (
+    "application/json", "application/javascript", "application/manifest+json",
+    "image/svg+xml", "text/"
+)
+COMPRESSIBLE_EXTENSIONS = (".js", ".mjs", ".css", ".html", ".json", ".svg", ".map", ".txt", ".ico", ".webmanifest")
+
+# Suffix of the precompressed copy of a static file, by Content-Encoding
+ENCODING_SUFFIXES = {"br": ".br", "gzip": ".gz"}
+
+# Vite content-hashes everything it emits under assets/, so those never change
+HASHED_ASSETS_PREFIX = "assets/"
+IMMUTABLE_CACHE_CONTROL = "public, max-age=31536000, immutable"
+STATIC_CACHE_CONTROL = "public, max-age=3600"
+REVALIDATE_CACHE_CONTROL = "no-cache"
+
+# Successful writes under these API prefixes bump the matching data version
+API_WRITE_GROUPS = {
+    "/api/leveling/": "leveling",
+    "/api/chat/": "chat"
+}
+
+
+# =========================================================================
+# COMPRESSION
+# =========================================================================
+
+def supported_encodings() -> Iterable[str]:
+    return ("br", "gzip") if brotli is not None else ("gzip",)
+
+
+def negotiate_encoding(accept_encoding: str, available: Iterable[str]) -> Optional[str]:
+    """
+    Pick the Content-Encoding to use from an Accept-Encoding header.
+
+    Args:
+        accept_encoding: The request's Accept-Encoding header
+        available: Encodings we can serve, most preferred first
+
+    Returns:
+        The chosen encoding, or None to send the body as is
+    """
+    weights: Dict[str, float] = {}
+    for part in accept_encoding.lower().split(","):
+        name, _, params = part.strip().partition(";")
+        weight = 1.0
+        params = params.strip()
+        if params.startswith("q="):
+            try:
+                weight = float(params[2:])
+            except ValueError:
+                weight = 0.0
+        if name:
+            weights[name.strip()] = weight
+
+    best, best_weight = None, 0.0
+    for encoding in available:
+        weight = weights.get(encoding, weights.get("*", 0.0))
+        if weight > best_weight:
+            best, best_weight = encoding, weight
+    return best
+
+
+def compress(data: bytes, encoding: str, level: Optional[int] = None) -> bytes:
+    if encoding == "br":
+        return brotli.compress(data, quality=BROTLI_QUALITY if level is None else level)
+    return gzip.compress(data, compresslevel=GZIP_LEVEL if level is None else level)
+
+
+def _is_compressible(mimetype: Optional[str]) -> bool:
+    return bool(mimetype) and mimetype.startswith(COMPRESSIBLE_TYPES)
+
+
+async def compress_response(response: Response) -> Response:
+    """after_request hook: compress in-memory bodies (API JSON) for clients that accept it."""
+    if (response.status_code < 200 or response.status_code in (204, 206, 304)
+            or "Content-Encoding" in response.headers
+            or not isinstance(response.response, DataBody)
+            or not _is_compressible(response.mimetype)):
+        return response
+
+    response.vary.add("Accept-Encoding")
+    encoding = negotiate_encoding(request.headers.get("Accept-Encoding", ""), supported_encodings())
+    if encoding is None:
+        return response
+
+    data = await response.get_data()
+    if len(data) < MIN_COMPRESS_SIZE:
+        return response
+
+    response.set_data(compress(data, encoding))
+    response.headers["Content-Encoding"] = encoding
+    return response
+
+
+# =========================================================================
+# ETAGS
+# =========================================================================
+
+def _matches(if_none_match: str, etag: str) -> bool:
+    if if_none_match.strip() == "*":
+        return True
+    # Weak comparison: a compressed and an uncompressed copy are the same data
+    tags = {tag.strip().removeprefix("W/") for tag in if_none_match.split(",")}
+    return etag.removeprefix("W/") in tags
+
+
+def conditional(*groups: str, guild_arg: str = "guild_id",
+                version: Optional[Callable[[], Awaitable[str]]] = None):
+    """
+    Serve a GET endpoint with an ETag built from data versions.
+
+    The ETag covers the versions of ``groups`` (scoped to the guild in the
+    ``guild_arg`` query or path parameter, when there is one), ``version()``
+    if given, and the request's path and query string. A matching
+    If-None-Match gets a 304 without running the handler.
+
+    Args:
+        groups: data_versions groups the response is built from
+        guild_arg: Query or path parameter naming the guild the response covers
+        version: Optional coroutine function returning an extra version string
+    """
+    def decorator(handler):
+        @wraps(handler)
+        async def wrapper(*args, **kwargs):
+            guild_id = kwargs.get(guild_arg) or request.args.get(guild_arg)
+            parts = [data_versions.epoch, request.full_path]
+            parts.extend(f"{group}={data_versions.version(group, guild_id)}" for group in groups)
+            if version is not None:
+                parts.append(await version())
+            etag = 'W/"' + hashlib.blake2b("|".join(parts).encode(), digest_size=12).hexdigest() + '"'
+
+            if _matches(request.headers.get("If-None-Match", ""), etag):
+                response = Response(status=304)
+            else:
+                response = await make_response(await handler(*args, **kwargs))
+                if response.status_code != 200:
+                    return response
+            response.headers["ETag"] = etag
+            response.headers["Cache-Control"] = REVALIDATE_CACHE_CONTROL
+            return response
+        return wrapper
+    return decorator
+
+
+async def bump_versions_on_write(response: Response) -> Response:
+    """after_request hook: a successful dashboard write invalidates the ETags of what it changed."""
+    if request.method in ("GET", "HEAD", "OPTIONS") or response.status_code >= 400:
+        return response
+    for prefix, group in API_WRITE_GROUPS.items():
+        if request.path.startswith(prefix):
+            data_versions.bump(group, (request.view_args or {}).get("guild_id"))
+    return response
+
+
+# =========================================================================
+# STATIC FILES
+# =========================================================================
+
+def static_cache_control(path: str) -> str:
+    if path.startswith(HASHED_ASSETS_PREFIX):
+        return IMMUTABLE_CACHE_CONTROL
+    if path.endswith(".html"):
+        return REVALIDATE_CACHE_CONTROL
+    return STATIC_CACHE_CONTROL
+
+
+def static_file_mimetype(path: str) -> str:
+    return mimetypes.guess_type(path)[0] or "application/octet-stream"
+
+
+def precompressed_encodings(directory: str, path: str) -> Iterable[str]:
+    """Encodings with a precompressed copy of ``path`` next to it, most preferred first."""
+    full_path = safe_join(directory, path)
+    if full_path is None:
+        return ()
+    return tuple(
+        encoding for encoding in supported_encodings()
+        if os.path.isfile(full_path + ENCODING_SUFFIXES[encoding])
+    )
+
+
+def precompress_static(directory: str) -> int:
+    """
+    Write .gz (and .br when brotli is installed) copies of compressible files in a build directory.
+
+    Copies newer than their source are kept, so this is cheap to run on every
+    start. Returns the number of files written.
+    """
+    written = 0
+    for root, _, files in os.walk(directory):
+        for name in files:
+            if not name.endswith(COMPRESSIBLE_EXTENSIONS):
+                continue
+            source = os.path.join(root, name)
+            try:
+                if os.path.getsize(source) < MIN_COMPRESS_SIZE:
+                    continue
+                data = None
+                for encoding in supported_encodings():
+                    target = source + ENCODING_SUFFIXES[encoding]
+                    if os.path.exists(target) and os.path.getmtime(target) >= os.path.getmtime(source):
+                        continue
+                    if data is None:
+                        with open(source, "rb") as f:
+                            data = f.read()
+                    compressed = compress(data, encoding, 11 if encoding == "br" else 9)
+                    with open(target + ".tmp", "wb") as f:
+                        f.write(compressed)
+                    os.replace(target + ".tmp", target)
+                    written += 1
+            except OSError as e:
+                logging.error(f"Error precompressing {source}: {e}")
+    return written
@@ -0,0 +1,51 @@
+import asyncio
+import os
+import tempfile
+from typing import Any, Dict, Optional
+
+from .serialization import dumps_bytes, loads
+
+# "inprocess" serves the dashboard on the bot's event loop; "split" runs it in
+# its own process that talks to the bot over IPC_SOCKET_PATH
+DASHBOARD_MODE = os.getenv("DRONGO_DASHBOARD_MODE", "inprocess").lower()
+IPC_SOCKET_PATH = os.getenv(
+    "DRONGO_DASHBOARD_SOCKET", os.path.join(tempfile.gettempdir(), "drongo-dashboard.sock")
+)
+
+# Seconds a dashboard call waits for the bot before giving up
+IPC_CALL_TIMEOUT = float(os.getenv("DRONGO_DASHBOARD_IPC_TIMEOUT", "30"))
+# Frames can carry whole HTTP bodies, e.g. a leveling config upload
+IPC_FRAME_LIMIT = 16 * 1024 * 1024
+
+
+# Frames are one compact JSON object per line; the serializer escapes newlines
+# inside strings, so a newline only ever ends a frame:
+#   {"id": 1, "method": "http", "params": {...}}      dashboard -> bot call
+#   {"id": 1, "result": {...}} / {"id": 1, "error": "..."}  bot -> dashboard reply
+#   {"event": "bump", "data": {...}}                   bot -> dashboard push
+
+
+def encode_frame(frame: Dict[str, Any]) -> bytes:
+    return dumps_bytes(frame) + b"\n"
+
+
+async def read_frame(reader: asyncio.StreamReader) -> Optional[Dict[str, Any]]:
+    """The next frame, or None once the other end has closed the socket."""
+    line = await reader.readline()
+    if not line:
+        return None
+    return loads(line)
+
+
+async def open_connection(socket_path: str = IPC_SOCKET_PATH):
+    return await asyncio.open_unix_connection(socket_path, limit=IPC_FRAME_LIMIT)
+
+
+async def start_server(client_connected_cb, socket_path: str = IPC_SOCKET_PATH):
+    """Listen on ``socket_path``, replacing a socket file left behind by a previous run."""
+    if os.path.exists(socket_path):
+        os.unlink(socket_path)
+    server = await asyncio.start_unix_server(client_connected_cb, path=socket_path, limit=IPC_FRAME_LIMIT)
+    # Only this user's processes may drive the bot
+    os.chmod(socket_path, 0o600)
+    return server
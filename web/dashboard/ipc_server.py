@@ -0,0 +1,351 @@
+import asyncio
+import base64
+import logging
+import os
+import sys
+from typing import Any, Dict, List, Optional, Set
+
+from database_modules.data_versions import data_versions
+from database_modules.guild_stats_registry import guild_stats_registry
+from modules.leveling_system import get_leveling_system
+
+from . import state
+from .api import dashboard_api
+from .app import app as dashboard_app
+from .ipc import IPC_SOCKET_PATH, encode_frame, read_frame, start_server
+from .name_resolution import name_resolver
+from .paths import ROOT_DIR
+from .stats_service import gateway_latency_ms, real_time_stats
+from .system_metrics import system_metrics
+
+# Pushes to a dashboard with this much unsent data are dropped, not queued
+PUSH_BUFFER_LIMIT = 4 * 1024 * 1024
+# Only these pushes may be dropped; losing the rest (version bumps, stored
+# messages, the channel directory) would leave the dashboard stale for good
+DROPPABLE_EVENTS = {"api", "xp_awards"}
+# Seconds between gateway latency updates
+HEARTBEAT_INTERVAL = 5.0
+# Seconds a burst of guild/channel changes waits before the directory is resent
+DIRECTORY_DEBOUNCE = 1.0
+# Seconds before a dashboard process that exited is started again
+DASHBOARD_RESTART_DELAY = float(os.getenv("DRONGO_DASHBOARD_RESTART_DELAY", "5"))
+
+DIRECTORY_EVENTS = (
+    "on_ready", "on_guild_join", "on_guild_remove", "on_guild_update",
+    "on_guild_channel_create", "on_guild_channel_delete", "on_guild_channel_update"
+)
+
+
+class DashboardIPCServer:
+    """
+    The bot's end of the split-process dashboard.
+
+    Listens on a Unix socket for the dashboard process. Its calls run on the
+    bot's loop: HTTP requests it forwards (writes and anything that needs the
+    live bot) are dispatched into this process's copy of the Quart app, and
+    it can look up names and the channel directory. Live counters and events
+    (through dashboard_api), data version bumps, stored messages and committed
+    XP batches are pushed the other way. Pushes are written without waiting and dropped while
+    a client has more than PUSH_BUFFER_LIMIT unsent, so a stalled dashboard
+    can't hold up the bot.
+    """
+
+    def __init__(self, bot, socket_path: str = IPC_SOCKET_PATH):
+        self.bot = bot
+        self.socket_path = socket_path
+        self._server: Optional[asyncio.AbstractServer] = None
+        self._clients: Set[asyncio.StreamWriter] = set()
+        self._connections: Set[asyncio.Task] = set()
+        self._calls: Set[asyncio.Task] = set()
+        self._heartbeat_task: Optional[asyncio.Task] = None
+        self._directory_task: Optional[asyncio.Task] = None
+        self._methods = {
+            "http": self._forward_http,
+            "resolve_names": self._resolve_names,
+            "directory": self._get_directory
+        }
+
+        self.stats = {
+            "connections": 0,
+            "calls": 0,
+            "call_errors": 0,
+            "forwarded_requests": 0,
+            "events_sent": 0,
+            "events_dropped": 0
+        }
+
+    # =========================================================================
+    # LIFECYCLE
+    # =========================================================================
+
+    async def start(self) -> None:
+        self._server = await start_server(self._handle_client, self.socket_path)
+        state.ipc_server = self
+        data_versions.add_listener(self._on_version_bump)
+        guild_stats_registry.add_listener(self._on_message_stored)
+        get_leveling_system(self.bot).ledger.add_listener(self._on_xp_batch)
+        for event in DIRECTORY_EVENTS:
+            self.bot.add_listener(self._on_directory_change, event)
+        # The dashboard process samples itself; /api/system_info is answered from here
+        system_metrics.start()
+        self._heartbeat_task = asyncio.create_task(self._heartbeat())
+        logging.info(f"Dashboard IPC listening on {self.socket_path}")
+
+    async def stop(self) -> None:
+        state.ipc_server = None
+        data_versions.remove_listener(self._on_version_bump)
+        guild_stats_registry.remove_listener(self._on_message_stored)
+        get_leveling_system(self.bot).ledger.remove_listener(self._on_xp_batch)
+        for event in DIRECTORY_EVENTS:
+            self.bot.remove_listener(self._on_directory_change, event)
+        system_metrics.stop()
+
+        for task in (self._heartbeat_task, self._directory_task, *self._calls):
+            if task:
+                task.cancel()
+        for writer in list(self._clients):
+            writer.close()
+        # Let the connection handlers see the close and finish
+        await asyncio.gather(*self._connections, return_exceptions=True)
+        if self._server:
+            self._server.close()
+            await self._server.wait_closed()
+            self._server = None
+        if os.path.exists(self.socket_path):
+            os.unlink(self.socket_path)
+
+    # =========================================================================
+    # CALLS FROM THE DASHBOARD
+    # =========================================================================
+
+    async def _handle_client(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        self.stats["connections"] += 1
+        self._connections.add(asyncio.current_task())
+        self._clients.add(writer)
+        self._send(writer, {"event": "hello", "data": self._hello()})
+        try:
+            while True:
+                frame = await read_frame(reader)
+                if frame is None:
+                    break
+                task = asyncio.create_task(self._dispatch(writer, frame))
+                self._calls.add(task)
+                task.add_done_callback(self._calls.discard)
+        except (ConnectionError, ValueError) as e:
+            logging.error(f"Dashboard IPC connection error: {e}")
+        finally:
+            self._clients.discard(writer)
+            self._connections.discard(asyncio.current_task())
+            writer.close()
+
+    async def _dispatch(self, writer: asyncio.StreamWriter, frame: Dict[str, Any]) -> None:
+        method = frame.get("method")
+        self.stats["calls"] += 1
+        try:
+            handler = self._methods.get(method)
+            if handler is None:
+                raise ValueError(f"Unknown IPC method: {method}")
+            reply = {"id": frame.get("id"), "result": await handler(**(frame.get("params") or {}))}
+        except Exception as e:
+            self.stats["call_errors"] += 1
+            logging.error(f"Error handling dashboard IPC call {method}: {e}")
+            reply = {"id": frame.get("id"), "error": str(e)}
+        self._send(writer, reply)
+
+    async def _forward_http(self, method: str, path: str, query_string: str = "",
+                            headers: Optional[List[List[str]]] = None, body: str = "") -> Dict[str, Any]:
+        """Run a forwarded request through this process's Quart app, the way Hypercorn would."""
+        self.stats["forwarded_requests"] += 1
+        request_body = base64.b64decode(body)
+        scope = {
+            "type": "http",
+            "asgi": {"version": "3.0"},
+            "http_version": "1.1",
+            "method": method,
+            "scheme": "http",
+            "path": path,
+            "raw_path": path.encode(),
+            "query_string": query_string.encode(),
+            "root_path": "",
+            "headers": [(name.lower().encode("latin-1"), value.encode("latin-1")) for name, value in headers or []],
+            "client": ("127.0.0.1", 0),
+            "server": ("127.0.0.1", 0),
+            "extensions": {}
+        }
+        body_sent = False
+
+        async def receive():
+            nonlocal body_sent
+            if not body_sent:
+                body_sent = True
+                return {"type": "http.request", "body": request_body, "more_body": False}
+            # The client never disconnects; Quart cancels this once the response is sent
+            await asyncio.get_running_loop().create_future()
+
+        response: Dict[str, Any] = {"status": 500, "headers": []}
+        chunks: List[bytes] = []
+
+        async def send(message):
+            if message["type"] == "http.response.start":
+                response["status"] = message["status"]
+                response["headers"] = [
+                    [name.decode("latin-1"), value.decode("latin-1")] for name, value in message.get("headers", [])
+                ]
+            elif message["type"] == "http.response.body":
+                chunks.append(message.get("body", b""))
+
+        await dashboard_app(scope, receive, send)
+        response["body"] = base64.b64encode(b"".join(chunks)).decode()
+        return response
+
+    async def _resolve_names(self, kind: str, ids: List[str]) -> Dict[str, str]:
+        if kind not in ("user", "guild"):
+            raise ValueError(f"Unknown name kind: {kind}")
+        return await name_resolver.resolve(kind, ids)
+
+    async def _get_directory(self) -> Dict[str, Any]:
+        return self._directory()
+
+    # =========================================================================
+    # PUSHES TO THE DASHBOARD
+    # =========================================================================
+
+    def publish(self, event: str, data: Any) -> None:
+        """Push an event to every connected dashboard without waiting."""
+        if not self._clients:
+            return
+        frame = encode_frame({"event": event, "data": data})
+        droppable = event in DROPPABLE_EVENTS
+        for writer in list(self._clients):
+            self._write(writer, frame, droppable=droppable)
+
+    def _send(self, writer: asyncio.StreamWriter, frame: Dict[str, Any]) -> None:
+        self._write(writer, encode_frame(frame), droppable=False)
+
+    def _write(self, writer: asyncio.StreamWriter, frame: bytes, droppable: bool) -> None:
+        if writer.is_closing():
+            return
+        if droppable and writer.transport.get_write_buffer_size() > PUSH_BUFFER_LIMIT:
+            self.stats["events_dropped"] += 1
+            return
+        writer.write(frame)
+        self.stats["events_sent"] += 1
+
+    def _hello(self) -> Dict[str, Any]:
+        """Everything a freshly connected dashboard needs to pick up where the bot is."""
+        return {
+            "stats": {
+                "status": real_time_stats.stats["status"],
+                "commands_executed": real_time_stats.stats["commands_executed"],
+                "gateway_latency_ms": gateway_latency_ms(self.bot)
+            },
+            "start_time": real_time_stats.start_time,
+            "recent_messages": list(real_time_stats.recent_messages),
+            "recent_events": list(real_time_stats.recent_events),
+            **self._directory()
+        }
+
+    def _directory(self) -> Dict[str, Any]:
+        return {
+            "bot_ready": self.bot.is_ready(),
+            "channel_names": {
+                str(channel.id): channel.name for guild in self.bot.guilds for channel in guild.channels
+            }
+        }
+
+    def _on_version_bump(self, group: str, guild_id: Optional[str]) -> None:
+        self.publish("bump", {"group": group, "guild_id": guild_id})
+
+    def _on_message_stored(self, guild_id: str, row_id: int, user_id: str, channel_id: str, created_at) -> None:
+        # Keeps the dashboard's message stats registry counting
+        self.publish("message", [guild_id, row_id, user_id, channel_id, created_at.isoformat()])
+
+    def _on_xp_batch(self, awards, results) -> None:
+        if not self._clients:
+            return
+        self.publish("xp_awards", {
+            "awards": [[
+                award.user_id, award.guild_id, award.channel_id, award.message_id, award.xp_amount,
+                award.message_length, award.word_count, award.char_count, bool(award.daily_cap_applied)
+            ] for award in awards],
+            "results": results
+        })
+
+    async def _on_directory_change(self, *args) -> None:
+        if self._directory_task is None or self._directory_task.done():
+            self._directory_task = asyncio.create_task(self._publish_directory())
+
+    async def _publish_directory(self) -> None:
+        await asyncio.sleep(DIRECTORY_DEBOUNCE)
+        self.publish("directory", self._directory())
+
+    async def _heartbeat(self) -> None:
+        while True:
+            await asyncio.sleep(HEARTBEAT_INTERVAL)
+            dashboard_api.update_stat("gateway_latency_ms", gateway_latency_ms(self.bot))
+
+    def get_stats(self) -> Dict[str, Any]:
+        return dict(self.stats, clients=len(self._clients))
+
+
+class DashboardProcess:
+    """
+    Runs the dashboard as a child process of the bot (python -m web.dashboard.process).
+
+    The child serves HTTP and WebSockets on its own event loop and reaches the
+    bot through ``ipc_server``; if it exits it is started again after
+    DASHBOARD_RESTART_DELAY seconds.
+    """
+
+    def __init__(self, ipc_server: DashboardIPCServer, restart_delay: float = DASHBOARD_RESTART_DELAY):
+        self.ipc_server = ipc_server
+        self.restart_delay = restart_delay
+        self._process: Optional[asyncio.subprocess.Process] = None
+        self._task: Optional[asyncio.Task] = None
+        self._stopping = False
+        self.stats = {"starts": 0, "exits": 0}
+
+    async def start(self) -> None:
+        await self.ipc_server.start()
+        self._stopping = False
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        self._stopping = True
+        if self._process and self._process.returncode is None:
+            self._process.terminate()
+            try:
+                await asyncio.wait_for(self._process.wait(), timeout=10)
+            except asyncio.TimeoutError:
+                self._process.kill()
+                await self._process.wait()
+        if self._task:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        await self.ipc_server.stop()
+
+    async def _run(self) -> None:
+        env = dict(os.environ, DRONGO_DASHBOARD_SOCKET=self.ipc_server.socket_path)
+        env["PYTHONPATH"] = os.pathsep.join(filter(None, (ROOT_DIR, os.environ.get("PYTHONPATH"))))
+
+        while not self._stopping:
+            try:
+                self._process = await asyncio.create_subprocess_exec(
+                    sys.executable, "-m", "web.dashboard.process", env=env
+                )
+                self.stats["starts"] += 1
+                logging.info(f"Dashboard process started (pid {self._process.pid})")
+                returncode = await self._process.wait()
+                self.stats["exits"] += 1
+                if self._stopping:
+                    return
+                logging.warning(
+                    f"Dashboard process exited with code {returncode}, restarting in {self.restart_delay}s"
+                )
+            except Exception as e:
+                logging.error(f"Failed to start dashboard process: {e}")
+            await asyncio.sleep(self.restart_delay)
@@ -1,11 +1,41 @@
+import asyncio
 import logging
 import time
-from typing import Dict, List, Optional
+from typing import Dict, Iterable, List, Optional, Tuple
 
 import discord
 
+from database_modules.data_versions import data_versions
+from database_modules.database_pool import get_main_pool
+from modules.ttl_cache import TTLCache
+
 from . import state
 
+# Persisted names are served for this long before a background refresh
+PERSISTED_NAME_TTL = 7 * 24 * 3600
+# IDs Discord reports as unknown are asked about again after this long
+NEGATIVE_NAME_TTL = 24 * 3600
+# In-memory TTL for names of unknown IDs
+NEGATIVE_CACHE_DURATION = 3600
+# Concurrent Discord REST lookups, shared by requests and background refresh
+NAME_FETCH_CONCURRENCY = 5
+# Persisted (name, found) pairs remembered to skip writes that change nothing
+PERSISTED_MIRROR_SIZE = 100000
+
+NAME_CACHE_SCHEMA = """
+CREATE TABLE IF NOT EXISTS dashboard_name_cache (
+    kind TEXT NOT NULL,
+    entity_id TEXT NOT NULL,
+    name TEXT NOT NULL,
+    found INTEGER NOT NULL DEFAULT 1,
+    resolved_at REAL NOT NULL,
+    PRIMARY KEY (kind, entity_id)
+);
+"""
+
+FALLBACK_NAMES = {"user": "User ({})", "guild": "Guild ({})"}
+INVALID_NAMES = {"user": "Invalid User ID", "guild": "Invalid Guild ID"}
+
 
 def validate_guild_id(guild_id) -> Optional[int]:
     """Validate guild_id for dashboard operations."""
@@ -29,108 +59,336 @@ def validate_guild_id(guild_id) -> Optional[int]:
     return None
 
 
-async def resolve_user_name(user_id: str) -> str:
-    """Resolve user ID to display name with caching."""
-    cache_key = f"user_{user_id}"
-    current_time = time.time()
+class NameResolver:
+    """
+    Resolves user and guild IDs to display names for the dashboard.
+
+    Each call dedupes its IDs and works through the tiers in order: the
+    in-memory TTL cache, the bot's user and guild caches, the persisted
+    dashboard_name_cache table, and finally Discord REST lookups, run
+    concurrently under NAME_FETCH_CONCURRENCY. IDs Discord reports as unknown
+    are cached as negatives so departed users stop costing a request per
+    page. Persisted names past their TTL are still served and refreshed in the
+    background. Concurrent lookups of the same ID share one fetch. Names are
+    only persisted, and the "names" data version bumped, when they differ
+    from what is already stored.
+    """
+
+    def __init__(self, fetch_concurrency: int = NAME_FETCH_CONCURRENCY):
+        self._semaphore = asyncio.Semaphore(fetch_concurrency)
+        self._schema_ready = False
+        self._pending_writes: Dict[Tuple[str, str], Tuple[str, int, float]] = {}
+        # (kind, entity_id) -> (name, found) as last read from or written to dashboard_name_cache
+        self._persisted = TTLCache(maxsize=PERSISTED_MIRROR_SIZE, ttl=PERSISTED_NAME_TTL, name="persisted_names")
+        self._refresh_queue: Dict[Tuple[str, str], None] = {}
+        self._refresh_task: Optional[asyncio.Task] = None
+
+        self.stats = {
+            "memory_hits": 0,
+            "bot_cache_hits": 0,
+            "persisted_hits": 0,
+            "fetches": 0,
+            "not_found": 0,
+            "fetch_errors": 0,
+            "refreshes": 0,
+            "bot_process_lookups": 0
+        }
+
+    # =========================================================================
+    # RESOLUTION
+    # =========================================================================
+
+    async def resolve(self, kind: str, ids: Iterable) -> Dict[str, str]:
+        """
+        Resolve IDs of one kind ("user" or "guild").
+
+        Returns:
+            Dict mapping each ID (as a string) to its name or fallback name
+        """
+        names: Dict[str, str] = {}
+        pending: List[str] = []
+        from_bot_cache: List[str] = []
+
+        for entity_id in dict.fromkeys(str(entity_id) for entity_id in ids):
+            cached = state.name_cache.get(f"{kind}_{entity_id}")
+            if cached is not None:
+                self.stats["memory_hits"] += 1
+                names[entity_id] = cached
+                continue
 
-    if cache_key in state.name_cache and cache_key in state.cache_expiry:
-        if current_time < state.cache_expiry[cache_key]:
-            return state.name_cache[cache_key]
+            numeric_id = self._parse_id(kind, entity_id)
+            if numeric_id is None:
+                names[entity_id] = INVALID_NAMES[kind]
+                continue
 
-    if not state.bot_instance:
-        logging.debug("Bot instance not available for user name resolution")
-        return f"User ({user_id})"
+            name = self._from_bot_cache(kind, numeric_id)
+            if name is not None:
+                self.stats["bot_cache_hits"] += 1
+                names[entity_id] = name
+                state.name_cache.set(f"{kind}_{entity_id}", name)
+                from_bot_cache.append(entity_id)
+                continue
 
-    try:
+            pending.append(entity_id)
+
+        if from_bot_cache:
+            await self._remember(kind, {entity_id: names[entity_id] for entity_id in from_bot_cache})
+
+        if pending and state.bot_bridge is not None:
+            # The bot process owns the Discord client and the persisted names
+            names.update(await self._resolve_through_bot(kind, pending))
+            return names
+
+        if pending:
+            missing = []
+            persisted = await self._load_persisted(kind, pending)
+            now = time.time()
+            for entity_id in pending:
+                row = persisted.get(entity_id)
+                if row is None:
+                    missing.append(entity_id)
+                    continue
+                name, found, resolved_at = row
+                self.stats["persisted_hits"] += 1
+                self._persisted.set((kind, entity_id), (name, int(found)))
+                names[entity_id] = name
+                state.name_cache.set(
+                    f"{kind}_{entity_id}", name,
+                    ttl=state.CACHE_DURATION if found else NEGATIVE_CACHE_DURATION
+                )
+                if now - resolved_at > (PERSISTED_NAME_TTL if found else NEGATIVE_NAME_TTL):
+                    self._schedule_refresh(kind, entity_id)
+
+            if missing and state.bot_instance:
+                fetched = await asyncio.gather(*(self._fetch(kind, entity_id) for entity_id in missing))
+                names.update(zip(missing, fetched))
+            else:
+                for entity_id in missing:
+                    logging.debug(f"Bot instance not available for {kind} name resolution")
+                    names[entity_id] = FALLBACK_NAMES[kind].format(entity_id)
+
+        await self._flush_writes()
+        return names
+
+    async def _resolve_through_bot(self, kind: str, entity_ids: List[str]) -> Dict[str, str]:
         try:
-            validated_user_id = int(user_id)
+            resolved = await state.bot_bridge.call("resolve_names", kind=kind, ids=entity_ids)
+        except Exception as e:
+            logging.debug(f"Bot process unavailable for {kind} name resolution: {e}")
+            return {entity_id: FALLBACK_NAMES[kind].format(entity_id) for entity_id in entity_ids}
+
+        self.stats["bot_process_lookups"] += len(entity_ids)
+        for entity_id, name in resolved.items():
+            fallback = name == FALLBACK_NAMES[kind].format(entity_id)
+            state.name_cache.set(
+                f"{kind}_{entity_id}", name,
+                ttl=state.FALLBACK_CACHE_DURATION if fallback else state.CACHE_DURATION
+            )
+        return resolved
+
+    def _parse_id(self, kind: str, entity_id: str) -> Optional[int]:
+        if kind == "guild":
+            return validate_guild_id(entity_id)
+        try:
+            return int(entity_id)
         except ValueError:
-            logging.warning(f"Invalid user_id in dashboard request: '{user_id}'")
-            return "Invalid User ID"
+            logging.warning(f"Invalid {kind}_id in dashboard request: '{entity_id}'")
+            return None
 
-        user = state.bot_instance.get_user(validated_user_id)
-        if not user:
+    def _from_bot_cache(self, kind: str, numeric_id: int) -> Optional[str]:
+        bot = state.bot_instance
+        if not bot:
+            return None
+        try:
+            if kind == "user":
+                # The user cache also holds every cached member's user
+                user = bot.get_user(numeric_id)
+                return user.display_name if user else None
+            guild = bot.get_guild(numeric_id)
+            return guild.name if guild else None
+        except Exception as e:
+            logging.debug(f"Error reading {kind} {numeric_id} from bot cache: {e}")
+            return None
+
+    async def _fetch(self, kind: str, entity_id: str) -> str:
+        """Fetch one name from Discord, coalescing concurrent lookups of the same ID."""
+        outcome = {"ttl": state.FALLBACK_CACHE_DURATION}
+
+        async def load() -> str:
+            name, found = await self._fetch_from_discord(kind, int(entity_id))
+            if found is None:
+                # Transient failure: retry soon and don't persist
+                return FALLBACK_NAMES[kind].format(entity_id)
+            outcome["ttl"] = state.CACHE_DURATION if found else NEGATIVE_CACHE_DURATION
+            self._queue_write(kind, entity_id, name, found)
+            return name
+
+        return await state.name_cache.get_or_load(f"{kind}_{entity_id}", load, ttl=lambda name: outcome["ttl"])
+
+    async def _fetch_from_discord(self, kind: str, numeric_id: int) -> Tuple[str, Optional[bool]]:
+        """Returns (name, True), (fallback, False) if Discord doesn't know the ID, or (fallback, None) on error."""
+        fallback_name = FALLBACK_NAMES[kind].format(numeric_id)
+        async with self._semaphore:
+            self.stats["fetches"] += 1
             try:
-                user = await state.bot_instance.fetch_user(validated_user_id)
+                if kind == "user":
+                    user = await state.bot_instance.fetch_user(numeric_id)
+                    logging.debug(f"Resolved user {numeric_id} to {user.display_name} via Discord API")
+                    return user.display_name, True
+                guild = await state.bot_instance.fetch_guild(numeric_id)
+                logging.debug(f"Resolved guild {numeric_id} to {guild.name} via Discord API")
+                return guild.name, True
             except discord.NotFound:
-                logging.debug(f"User {user_id} not found on Discord")
+                self.stats["not_found"] += 1
+                logging.debug(f"{kind.capitalize()} {numeric_id} not found on Discord")
+                return fallback_name, False
             except discord.HTTPException as e:
-                logging.debug(f"HTTP error fetching user {user_id}: {e}")
+                self.stats["fetch_errors"] += 1
+                logging.debug(f"HTTP error fetching {kind} {numeric_id}: {e}")
+            except Exception as e:
+                self.stats["fetch_errors"] += 1
+                logging.error(f"Error resolving {kind} name via Discord API: {e}")
+        return fallback_name, None
 
-        if user:
-            display_name = user.display_name
-            state.name_cache[cache_key] = display_name
-            state.cache_expiry[cache_key] = current_time + state.CACHE_DURATION
-            logging.debug(f"Resolved user {user_id} to {display_name} via Discord API")
-            return display_name
+    # =========================================================================
+    # PERSISTENCE
+    # =========================================================================
 
-        logging.debug(f"User {user_id} not found in Discord")
-    except Exception as e:
-        logging.error(f"Error resolving user name via Discord API: {e}")
+    async def _ensure_schema(self) -> None:
+        if not self._schema_ready:
+            pool = await get_main_pool()
+            async with pool.get_connection() as conn:
+                await conn.executescript(NAME_CACHE_SCHEMA)
+                await conn.commit()
+            self._schema_ready = True
 
-    fallback_name = f"User ({user_id})"
-    state.name_cache[cache_key] = fallback_name
-    state.cache_expiry[cache_key] = current_time + 30
-    logging.debug(f"Using fallback name for user {user_id}: {fallback_name}")
-    return fallback_name
+    async def _load_persisted(self, kind: str, entity_ids: List[str]) -> Dict[str, Tuple[str, int, float]]:
+        try:
+            await self._ensure_schema()
+            pool = await get_main_pool()
+            rows = []
+            # Stay under SQLite's bound-parameter limit
+            for start in range(0, len(entity_ids), 500):
+                chunk = entity_ids[start:start + 500]
+                rows.extend(await pool.execute_query(f"""
+                    SELECT entity_id, name, found, resolved_at
+                    FROM dashboard_name_cache
+                    WHERE kind = ? AND entity_id IN ({",".join("?" * len(chunk))})
+                """, (kind, *chunk)))
+            return {entity_id: (name, found, resolved_at) for entity_id, name, found, resolved_at in rows}
+        except Exception as e:
+            logging.error(f"Error loading persisted {kind} names: {e}")
+            return {}
 
+    async def _remember(self, kind: str, names: Dict[str, str]) -> None:
+        """Persist names read from the bot's cache, skipping those already stored unchanged."""
+        unknown = [entity_id for entity_id in names if (kind, entity_id) not in self._persisted]
+        if unknown:
+            for entity_id, (name, found, _) in (await self._load_persisted(kind, unknown)).items():
+                self._persisted.set((kind, entity_id), (name, int(found)))
+        for entity_id, name in names.items():
+            if self._persisted.get((kind, entity_id)) != (name, 1):
+                self._queue_write(kind, entity_id, name, found=True)
 
-async def resolve_guild_name(guild_id: str) -> str:
-    """Resolve guild ID to guild name with caching."""
-    cache_key = f"guild_{guild_id}"
-    current_time = time.time()
+    def _queue_write(self, kind: str, entity_id: str, name: str, found: bool) -> None:
+        key = (kind, entity_id)
+        changed = self._persisted.get(key) != (name, int(found))
+        self._persisted.set(key, (name, int(found)))
+        # Written even when unchanged so resolved_at records the fresh lookup
+        self._pending_writes[key] = (name, int(found), time.time())
+        if changed:
+            # Responses built with the old (or placeholder) name are out of date
+            data_versions.bump("names")
 
-    if cache_key in state.name_cache and cache_key in state.cache_expiry:
-        if current_time < state.cache_expiry[cache_key]:
-            return state.name_cache[cache_key]
+    async def _flush_writes(self) -> None:
+        if not self._pending_writes:
+            return
+        writes, self._pending_writes = self._pending_writes, {}
+        try:
+            await self._ensure_schema()
+            pool = await get_main_pool()
+            await pool.execute_many("""
+                INSERT INTO dashboard_name_cache (kind, entity_id, name, found, resolved_at)
+                VALUES (?, ?, ?, ?, ?)
+                ON CONFLICT(kind, entity_id) DO UPDATE SET
+                    name = excluded.name,
+                    found = excluded.found,
+                    resolved_at = excluded.resolved_at
+            """, [(kind, entity_id, *row) for (kind, entity_id), row in writes.items()])
+        except Exception as e:
+            logging.error(f"Error persisting resolved names: {e}")
 
-    if not state.bot_instance:
-        logging.debug("Bot instance not available for guild name resolution")
-        return f"Guild ({guild_id})"
+    # =========================================================================
+    # BACKGROUND REFRESH
+    # =========================================================================
 
-    try:
-        validated_guild_id = validate_guild_id(guild_id)
-        if validated_guild_id is None:
-            return "Invalid Guild ID"
+    def _schedule_refresh(self, kind: str, entity_id: str) -> None:
+        if not state.bot_instance:
+            return
+        self._refresh_queue[(kind, entity_id)] = None
+        if self._refresh_task is None or self._refresh_task.done():
+            self._refresh_task = asyncio.create_task(self._refresh())
 
-        guild = state.bot_instance.get_guild(validated_guild_id)
-        if not guild:
-            try:
-                guild = await state.bot_instance.fetch_guild(validated_guild_id)
-            except discord.NotFound:
-                logging.debug(f"Guild {guild_id} not found on Discord")
-            except discord.HTTPException as e:
-                logging.debug(f"HTTP error fetching guild {guild_id}: {e}")
+    async def _refresh(self) -> None:
+        while self._refresh_queue:
+            batch = list(self._refresh_queue)[:NAME_FETCH_CONCURRENCY * 4]
+            for key in batch:
+                del self._refresh_queue[key]
+            await asyncio.gather(*(self._refresh_one(kind, entity_id) for kind, entity_id in batch))
+            self.stats["refreshes"] += len(batch)
+            await self._flush_writes()
 
-        if guild:
-            display_name = guild.name
-            state.name_cache[cache_key] = display_name
-            state.cache_expiry[cache_key] = current_time + state.CACHE_DURATION
-            logging.debug(f"Resolved guild {guild_id} to {display_name} via Discord API")
-            return display_name
+    async def _refresh_one(self, kind: str, entity_id: str) -> None:
+        name, found = await self._fetch_from_discord(kind, int(entity_id))
+        if found is None:
+            return  # Keep serving the stale name; a later lookup retries
+        state.name_cache.set(
+            f"{kind}_{entity_id}", name,
+            ttl=state.CACHE_DURATION if found else NEGATIVE_CACHE_DURATION
+        )
+        self._queue_write(kind, entity_id, name, found)
 
-        logging.debug(f"Guild {guild_id} not found in Discord")
-    except Exception as e:
-        logging.error(f"Error resolving guild name via Discord API: {e}")
+    def get_stats(self) -> Dict[str, int]:
+        return dict(self.stats, refresh_queue=len(self._refresh_queue))
 
-    fallback_name = f"Guild ({guild_id})"
-    state.name_cache[cache_key] = fallback_name
-    state.cache_expiry[cache_key] = current_time + 30
-    logging.debug(f"Using fallback name for guild {guild_id}: {fallback_name}")
-    return fallback_name
+
+name_resolver = NameResolver()
+
+
+def resolve_channel_name(channel_id: str) -> str:
+    """Channel name from the bot's cache (or the bot process's channel directory), else a placeholder."""
+    name = None
+    if state.bot_instance:
+        try:
+            channel = state.bot_instance.get_channel(int(channel_id))
+            name = channel.name if channel else None
+        except Exception:
+            pass
+    elif state.bot_bridge is not None:
+        name = state.bot_bridge.channel_names.get(str(channel_id))
+    return name or f"Channel {channel_id}"
+
+
+async def resolve_user_name(user_id: str) -> str:
+    """Resolve user ID to display name with caching."""
+    return (await name_resolver.resolve("user", [user_id]))[str(user_id)]
+
+
+async def resolve_guild_name(guild_id: str) -> str:
+    """Resolve guild ID to guild name with caching."""
+    return (await name_resolver.resolve("guild", [guild_id]))[str(guild_id)]
 
 
 async def bulk_resolve_names(user_ids: Optional[List[str]] = None, guild_ids: Optional[List[str]] = None) -> Dict[str, str]:
-    """Bulk resolve multiple user and guild names."""
+    """Bulk resolve user and guild names, keyed "user_<id>" / "guild_<id>"."""
     resolved_names: Dict[str, str] = {}
 
     if user_ids:
-        for user_id in user_ids:
-            resolved_names[f"user_{user_id}"] = await resolve_user_name(user_id)
+        for user_id, name in (await name_resolver.resolve("user", user_ids)).items():
+            resolved_names[f"user_{user_id}"] = name
 
     if guild_ids:
-        for guild_id in guild_ids:
-            resolved_names[f"guild_{guild_id}"] = await resolve_guild_name(guild_id)
+        for guild_id, name in (await name_resolver.resolve("guild", guild_ids)).items():
+            resolved_names[f"guild_{guild_id}"] = name
 
     return resolved_names
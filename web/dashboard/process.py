@@ -0,0 +1,55 @@
+"""
+Dashboard process for split-process mode (DRONGO_DASHBOARD_MODE=split).
+
+The bot starts this with ``python -m web.dashboard.process`` and supervises
+it. It serves the dashboard on its own event loop, reading the SQLite files
+directly, and reaches the bot through the IPC socket for everything else.
+"""
+
+import asyncio
+import logging
+import os
+import signal
+
+from hypercorn.asyncio import serve
+from hypercorn.config import Config
+
+from . import state
+from .app import app
+from .bot_bridge import BotBridge
+
+# Seconds between checks that the bot process is still our parent
+PARENT_CHECK_INTERVAL = 2.0
+
+
+async def _watch_parent(parent_pid: int, shutdown: asyncio.Event) -> None:
+    """Stop serving if the bot dies without stopping us, so its restart can bind the port."""
+    while os.getppid() == parent_pid:
+        await asyncio.sleep(PARENT_CHECK_INTERVAL)
+    logging.warning("Bot process has exited, stopping the dashboard")
+    shutdown.set()
+
+
+async def main():
+    state.bot_bridge = BotBridge()
+
+    config = Config()
+    config.bind = ["0.0.0.0:5001"]
+    config.use_reloader = False
+
+    shutdown = asyncio.Event()
+    loop = asyncio.get_running_loop()
+    for sig in (signal.SIGINT, signal.SIGTERM):
+        loop.add_signal_handler(sig, shutdown.set)
+
+    watcher = asyncio.create_task(_watch_parent(os.getppid(), shutdown))
+    logging.info("Starting dashboard process on port 5001...")
+    try:
+        await serve(app, config, shutdown_trigger=shutdown.wait)
+    finally:
+        watcher.cancel()
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO, handlers=[logging.StreamHandler()])
+    asyncio.run(main())
@@ -1,70 +1,83 @@
+import base64
+import json
 import logging
 import os
+from typing import Dict, List
 
 import aiosqlite
 from quart import Blueprint, jsonify, request
 
+from database_modules.guild_stats_registry import guild_stats_registry
+
 from .. import state
-from ..name_resolution import resolve_user_name
+from ..http_cache import conditional
+from ..name_resolution import bulk_resolve_names, resolve_channel_name
+from ..rows import MessageRow
 
 chat_bp = Blueprint("dashboard_chat", __name__)
 
+MAX_PAGE_SIZE = 200
+
+
+def _encode_cursor(timestamp: str, row_id: int) -> str:
+    """Opaque page cursor for a message's (timestamp, id) position."""
+    raw = json.dumps([timestamp, row_id], separators=(",", ":")).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+
+def _decode_cursor(cursor: str) -> tuple:
+    """Decode a page cursor. Raises ValueError if it is malformed."""
+    try:
+        timestamp, row_id = json.loads(base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)))
+    except Exception:
+        raise ValueError("Invalid cursor")
+    if not isinstance(timestamp, str) or not isinstance(row_id, int):
+        raise ValueError("Invalid cursor")
+    return timestamp, row_id
+
+
+async def _build_message_rows(rows) -> List[MessageRow]:
+    """Turn (id, user_id, channel_id, message_content, timestamp) tuples into MessageRows with names."""
+    resolved_names = await bulk_resolve_names([row[1] for row in rows])
+    channel_names: Dict[str, str] = {}
+    messages = []
+    for row_id, user_id, channel_id, message_content, timestamp in rows:
+        channel_name = channel_names.get(channel_id)
+        if channel_name is None:
+            channel_name = channel_names[channel_id] = resolve_channel_name(channel_id)
+
+        messages.append(MessageRow(
+            row_id, user_id, resolved_names[f"user_{user_id}"], channel_id, channel_name,
+            message_content, timestamp
+        ))
+    return messages
+
 
 @chat_bp.route("/api/chat/guilds", methods=["GET"])
+@conditional("chat")
 async def get_chat_guilds():
     """Get all guilds with chat logging info."""
     try:
-        from database_modules.database_utils import get_all_guild_settings, get_guild_message_count, is_guild_scanning
-        from database_modules.database_schema import get_guild_config_db_path
+        from database_modules.database_utils import get_chat_guild_summaries
 
-        guild_settings = await get_all_guild_settings()
         guilds_data = []
-
-        for settings in guild_settings:
-            guild_id = settings["guild_id"]
-            message_count = await get_guild_message_count(guild_id)
-            scanning = await is_guild_scanning(guild_id)
-
-            config_db_path = get_guild_config_db_path()
-            async with aiosqlite.connect(config_db_path) as conn:
-                async with conn.execute("""
-                    SELECT COUNT(*) as total,
-                           SUM(CASE WHEN fetch_completed = 1 THEN 1 ELSE 0 END) as completed
-                    FROM historical_fetch_progress
-                    WHERE guild_id = ?
-                """, (guild_id,)) as cursor:
-                    row = await cursor.fetchone()
-                    total_channels = row[0] if row and row[0] else 0
-                    completed_channels = row[1] if row and row[1] else 0
-
-                from database_modules.database_schema import get_guild_db_path
-
-                guild_db_path = get_guild_db_path(guild_id)
-                last_message_time = None
-
-                if os.path.exists(guild_db_path):
-                    async with aiosqlite.connect(guild_db_path) as guild_conn:
-                        async with guild_conn.execute("""
-                            SELECT timestamp FROM messages
-                            ORDER BY timestamp DESC LIMIT 1
-                        """) as cursor:
-                            row = await cursor.fetchone()
-                            if row:
-                                last_message_time = row[0]
+        for summary in await get_chat_guild_summaries():
+            total_channels = summary["channels_total"]
+            completed_channels = summary["channels_done"]
 
             fetch_percentage = 0
             if total_channels > 0:
                 fetch_percentage = int((completed_channels / total_channels) * 100)
 
             guilds_data.append({
-                "guild_id": guild_id,
-                "guild_name": settings["guild_name"],
-                "logging_enabled": bool(settings["logging_enabled"]),
-                "total_messages": message_count,
+                "guild_id": summary["guild_id"],
+                "guild_name": summary["guild_name"],
+                "logging_enabled": bool(summary["logging_enabled"]),
+                "total_messages": summary["total_messages"],
                 "channels_count": total_channels,
-                "date_joined": settings["date_joined"],
-                "last_message_time": last_message_time,
-                "is_scanning": scanning,
+                "date_joined": summary["date_joined"],
+                "last_message_time": summary["last_message_time"],
+                "is_scanning": bool(summary["is_scanning"]),
                 "fetch_progress": {
                     "completed": completed_channels == total_channels and total_channels > 0,
                     "percentage": fetch_percentage,
@@ -113,34 +126,15 @@ async def get_guild_channels(guild_id):
         if not os.path.exists(guild_db_path):
             return jsonify({"channels": []})
 
+        channel_counts = await guild_stats_registry.get_channel_counts(guild_id, guild_db_path)
         channels_data = []
 
-        async with aiosqlite.connect(guild_db_path) as conn:
-            async with conn.execute("""
-                SELECT channel_id, COUNT(*) as message_count
-                FROM messages
-                GROUP BY channel_id
-                ORDER BY message_count DESC
-            """) as cursor:
-                rows = await cursor.fetchall()
-
-                for row in rows:
-                    channel_id, message_count = row
-
-                    channel_name = f"Channel {channel_id}"
-                    if state.bot_instance:
-                        try:
-                            channel = state.bot_instance.get_channel(int(channel_id))
-                            if channel:
-                                channel_name = channel.name
-                        except Exception:
-                            pass
-
-                    channels_data.append({
-                        "channel_id": channel_id,
-                        "channel_name": channel_name,
-                        "message_count": message_count
-                    })
+        for channel_id, message_count in sorted(channel_counts.items(), key=lambda item: item[1], reverse=True):
+            channels_data.append({
+                "channel_id": channel_id,
+                "channel_name": resolve_channel_name(channel_id),
+                "message_count": message_count
+            })
 
         return jsonify({"channels": channels_data})
 
@@ -151,80 +145,82 @@ async def get_guild_channels(guild_id):
 
 @chat_bp.route("/api/chat/guild/<guild_id>/messages", methods=["GET"])
 async def get_guild_messages(guild_id):
-    """Get messages for a guild/channel."""
+    """
+    Get a page of messages for a guild/channel, newest first.
+
+    Pages are keyed on (timestamp, id) rather than OFFSET, so every page is an
+    index range scan however deep it is. Pass ``before=<next_cursor>`` for
+    older messages or ``after=<prev_cursor>`` for newer ones. The total comes
+    from the maintained per-guild counters, not COUNT(*).
+    """
     try:
         from database_modules.database_schema import get_guild_db_path
 
         channel_id = request.args.get("channel_id")
-        limit = int(request.args.get("limit", 50))
-        offset = int(request.args.get("offset", 0))
+        limit = min(max(int(request.args.get("limit", 50)), 1), MAX_PAGE_SIZE)
+        before = request.args.get("before")
+        after = request.args.get("after")
+        if before and after:
+            return jsonify({"error": "Pass either before or after, not both"}), 400
+
+        try:
+            position = _decode_cursor(before or after) if (before or after) else None
+        except ValueError as e:
+            return jsonify({"error": str(e)}), 400
 
         guild_db_path = get_guild_db_path(guild_id)
 
         if not os.path.exists(guild_db_path):
-            return jsonify({"messages": [], "total": 0, "has_more": False})
-
-        async with aiosqlite.connect(guild_db_path) as conn:
-            conn.row_factory = aiosqlite.Row
+            return jsonify({
+                "messages": [], "total": 0, "has_more": False, "has_newer": False,
+                "next_cursor": None, "prev_cursor": None
+            })
 
-            if channel_id:
-                query = """
-                    SELECT * FROM messages
-                    WHERE channel_id = ?
-                    ORDER BY timestamp DESC
-                    LIMIT ? OFFSET ?
-                """
-                params = (channel_id, limit, offset)
+        conditions, params = [], []
+        if channel_id:
+            conditions.append("channel_id = ?")
+            params.append(channel_id)
+        if position:
+            conditions.append("(timestamp, id) > (?, ?)" if after else "(timestamp, id) < (?, ?)")
+            params.extend(position)
+        where = f"WHERE {' AND '.join(conditions)}" if conditions else ""
+        direction = "ASC" if after else "DESC"
 
-                count_query = "SELECT COUNT(*) FROM messages WHERE channel_id = ?"
-                count_params = (channel_id,)
-            else:
-                query = """
-                    SELECT * FROM messages
-                    ORDER BY timestamp DESC
-                    LIMIT ? OFFSET ?
-                """
-                params = (limit, offset)
+        async with aiosqlite.connect(guild_db_path) as conn:
+            # One extra row tells us whether another page exists in this direction
+            async with conn.execute(f"""
+                SELECT id, user_id, channel_id, message_content, timestamp
+                FROM messages
+                {where}
+                ORDER BY timestamp {direction}, id {direction}
+                LIMIT ?
+            """, (*params, limit + 1)) as cursor:
+                rows = await cursor.fetchall()
 
-                count_query = "SELECT COUNT(*) FROM messages"
-                count_params = ()
+        more_in_direction = len(rows) > limit
+        rows = rows[:limit]
+        if after:
+            rows.reverse()
 
-            async with conn.execute(query, params) as cursor:
-                rows = await cursor.fetchall()
-                messages = []
-
-                for row in rows:
-                    msg_dict = dict(row)
-                    user_name = await resolve_user_name(msg_dict["user_id"])
-
-                    channel_name = f"Channel {msg_dict['channel_id']}"
-                    if state.bot_instance:
-                        try:
-                            channel = state.bot_instance.get_channel(int(msg_dict["channel_id"]))
-                            if channel:
-                                channel_name = channel.name
-                        except Exception:
-                            pass
-
-                    messages.append({
-                        "id": msg_dict["id"],
-                        "user_id": msg_dict["user_id"],
-                        "username": user_name,
-                        "channel_id": msg_dict["channel_id"],
-                        "channel_name": channel_name,
-                        "message_content": msg_dict["message_content"],
-                        "timestamp": msg_dict["timestamp"]
-                    })
+        messages = await _build_message_rows(rows)
 
-            async with conn.execute(count_query, count_params) as cursor:
-                total = (await cursor.fetchone())[0]
+        if channel_id:
+            total = (await guild_stats_registry.get_channel_counts(guild_id, guild_db_path)).get(channel_id, 0)
+        else:
+            total = (await guild_stats_registry.get_guild_stats(guild_id, guild_db_path))["total_messages"]
 
-        has_more = (offset + limit) < total
+        # Paging backwards from an after= cursor means older rows exist, and vice versa
+        has_more = more_in_direction if not after else True
+        has_newer = more_in_direction if after else bool(before)
+        first, last = (messages[0], messages[-1]) if messages else (None, None)
 
         return jsonify({
             "messages": messages,
             "total": total,
-            "has_more": has_more
+            "has_more": has_more and last is not None,
+            "has_newer": has_newer and first is not None,
+            "next_cursor": _encode_cursor(last.timestamp, last.id) if last else None,
+            "prev_cursor": _encode_cursor(first.timestamp, first.id) if first else None
         })
 
     except Exception as e:
@@ -246,11 +242,9 @@ async def get_recent_messages(guild_id):
             return jsonify({"messages": []})
 
         async with aiosqlite.connect(guild_db_path) as conn:
-            conn.row_factory = aiosqlite.Row
-
             if channel_id:
                 query = """
-                    SELECT * FROM messages
+                    SELECT id, user_id, channel_id, message_content, timestamp FROM messages
                     WHERE channel_id = ?
                     ORDER BY timestamp DESC
                     LIMIT 50
@@ -258,7 +252,7 @@ async def get_recent_messages(guild_id):
                 params = (channel_id,)
             else:
                 query = """
-                    SELECT * FROM messages
+                    SELECT id, user_id, channel_id, message_content, timestamp FROM messages
                     ORDER BY timestamp DESC
                     LIMIT 50
                 """
@@ -266,30 +260,8 @@ async def get_recent_messages(guild_id):
 
             async with conn.execute(query, params) as cursor:
                 rows = await cursor.fetchall()
-                messages = []
-
-                for row in rows:
-                    msg_dict = dict(row)
-                    user_name = await resolve_user_name(msg_dict["user_id"])
-
-                    channel_name = f"Channel {msg_dict['channel_id']}"
-                    if state.bot_instance:
-                        try:
-                            channel = state.bot_instance.get_channel(int(msg_dict["channel_id"]))
-                            if channel:
-                                channel_name = channel.name
-                        except Exception:
-                            pass
-
-                    messages.append({
-                        "id": msg_dict["id"],
-                        "user_id": msg_dict["user_id"],
-                        "username": user_name,
-                        "channel_id": msg_dict["channel_id"],
-                        "channel_name": channel_name,
-                        "message_content": msg_dict["message_content"],
-                        "timestamp": msg_dict["timestamp"]
-                    })
+
+        messages = await _build_message_rows(rows)
 
         return jsonify({"messages": messages})
 
@@ -299,70 +271,24 @@ async def get_recent_messages(guild_id):
 
 
 @chat_bp.route("/api/chat/guild/<guild_id>/stats", methods=["GET"])
+@conditional("chat")
 async def get_guild_chat_stats(guild_id):
     """Get statistics for a guild."""
     try:
-        from database_modules.database_utils import get_guild_message_count, is_guild_scanning
-        from database_modules.database_schema import get_guild_config_db_path, get_guild_db_path
-
-        message_count = await get_guild_message_count(guild_id)
-        scanning = await is_guild_scanning(guild_id)
+        from database_modules.database_utils import get_guild_chat_summary
 
-        guild_db_path = get_guild_db_path(guild_id)
-        oldest_message = None
-        newest_message = None
-        active_channels = 0
-
-        if os.path.exists(guild_db_path):
-            async with aiosqlite.connect(guild_db_path) as conn:
-                async with conn.execute("""
-                    SELECT timestamp FROM messages
-                    ORDER BY timestamp ASC LIMIT 1
-                """) as cursor:
-                    row = await cursor.fetchone()
-                    if row:
-                        oldest_message = row[0]
-
-                async with conn.execute("""
-                    SELECT timestamp FROM messages
-                    ORDER BY timestamp DESC LIMIT 1
-                """) as cursor:
-                    row = await cursor.fetchone()
-                    if row:
-                        newest_message = row[0]
-
-                async with conn.execute("""
-                    SELECT COUNT(DISTINCT channel_id) FROM messages
-                """) as cursor:
-                    row = await cursor.fetchone()
-                    if row:
-                        active_channels = row[0]
-
-        config_db_path = get_guild_config_db_path()
-        async with aiosqlite.connect(config_db_path) as conn:
-            async with conn.execute("""
-                SELECT
-                    SUM(total_fetched) as total_fetched,
-                    COUNT(*) as channels_tracking,
-                    SUM(CASE WHEN fetch_completed = 1 THEN 1 ELSE 0 END) as channels_completed
-                FROM historical_fetch_progress
-                WHERE guild_id = ?
-            """, (guild_id,)) as cursor:
-                row = await cursor.fetchone()
-                total_fetched = row[0] if row and row[0] else 0
-                channels_tracking = row[1] if row and row[1] else 0
-                channels_completed = row[2] if row and row[2] else 0
+        summary = await get_guild_chat_summary(guild_id)
 
         return jsonify({
-            "total_messages": message_count,
-            "active_channels": active_channels,
-            "oldest_message": oldest_message,
-            "newest_message": newest_message,
-            "is_scanning": scanning,
+            "total_messages": summary["total_messages"],
+            "active_channels": summary["active_channels"],
+            "oldest_message": summary["oldest_message"],
+            "newest_message": summary["newest_message"],
+            "is_scanning": bool(summary["is_scanning"]),
             "fetch_stats": {
-                "total_fetched": total_fetched,
-                "channels_tracking": channels_tracking,
-                "channels_completed": channels_completed
+                "total_fetched": summary["total_fetched"],
+                "channels_tracking": summary["channels_tracking"],
+                "channels_completed": summary["channels_completed"]
             }
         })
 
@@ -375,43 +301,9 @@ async def get_guild_chat_stats(guild_id):
 async def get_fetch_progress():
     """Get historical fetch progress for all guilds."""
     try:
-        from database_modules.database_schema import get_guild_config_db_path
-
-        config_db_path = get_guild_config_db_path()
-
-        progress_data = []
-
-        async with aiosqlite.connect(config_db_path) as conn:
-            conn.row_factory = aiosqlite.Row
-
-            async with conn.execute("""
-                SELECT
-                    guild_id,
-                    COUNT(*) as total_channels,
-                    SUM(CASE WHEN fetch_completed = 1 THEN 1 ELSE 0 END) as completed_channels,
-                    SUM(total_fetched) as total_fetched,
-                    MAX(last_fetch_timestamp) as last_fetch
-                FROM historical_fetch_progress
-                GROUP BY guild_id
-            """) as cursor:
-                rows = await cursor.fetchall()
-
-                for row in rows:
-                    row_dict = dict(row)
-                    total = row_dict["total_channels"]
-                    completed = row_dict["completed_channels"]
-                    percentage = int((completed / total) * 100) if total > 0 else 0
-
-                    progress_data.append({
-                        "guild_id": row_dict["guild_id"],
-                        "total_channels": total,
-                        "completed_channels": completed,
-                        "total_fetched": row_dict["total_fetched"] or 0,
-                        "percentage": percentage,
-                        "last_fetch": row_dict["last_fetch"],
-                        "is_complete": completed == total and total > 0
-                    })
+        from database_modules.database_utils import get_fetch_progress as load_fetch_progress
 
+        progress_data = await load_fetch_progress()
         return jsonify({"progress": progress_data})
 
     except Exception as e:
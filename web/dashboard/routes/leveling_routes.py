@@ -2,19 +2,26 @@ import json
 import logging
 from datetime import datetime
 import os
+from zoneinfo import ZoneInfo, ZoneInfoNotFoundError
 
 from quart import Blueprint, jsonify, request
 
 from database_modules.database import get_leveling_db_connection
 from database_modules.database_pool import get_leveling_pool
+from modules.leveling_daily_reset import parse_reset_time, reset_period
+from modules.leveling_retention import utc_day
 from modules.leveling_system import get_leveling_system
 from .. import state
+from ..bot_bridge import runs_in_bot
+from ..http_cache import conditional
 from ..name_resolution import bulk_resolve_names
+from ..rows import XPFeedRow
 
 leveling_bp = Blueprint("dashboard_leveling", __name__)
 
 
 @leveling_bp.route("/api/leveling/live-feed")
+@conditional("leveling", "names")
 async def api_leveling_live_feed():
     """Get live XP award feed with resolved names."""
     try:
@@ -59,21 +66,18 @@ async def api_leveling_live_feed():
 
         resolved_names = await bulk_resolve_names(list(user_ids), list(guild_ids))
 
-        feed_data = []
-        for tx in transactions:
-            feed_data.append({
-                "user_id": tx[0],
-                "user_name": resolved_names.get(f"user_{tx[0]}", f"Unknown User ({tx[0][-4:]})"),
-                "guild_id": tx[1],
-                "guild_name": resolved_names.get(f"guild_{tx[1]}", f"Unknown Guild ({tx[1][-4:]})"),
-                "channel_id": tx[2],
-                "xp_awarded": tx[3],
-                "message_length": tx[4],
-                "word_count": tx[5],
-                "char_count": tx[6],
-                "timestamp": tx[7],
-                "daily_cap_applied": bool(tx[8]) if tx[8] is not None else False
-            })
+        feed_data = [
+            XPFeedRow(
+                user_id,
+                resolved_names.get(f"user_{user_id}", f"Unknown User ({user_id[-4:]})"),
+                tx_guild_id,
+                resolved_names.get(f"guild_{tx_guild_id}", f"Unknown Guild ({tx_guild_id[-4:]})"),
+                channel_id, xp_awarded, message_length, word_count, char_count, timestamp,
+                bool(daily_cap_applied)
+            )
+            for (user_id, tx_guild_id, channel_id, xp_awarded, message_length, word_count, char_count,
+                 timestamp, daily_cap_applied) in transactions
+        ]
 
         return jsonify(feed_data)
 
@@ -83,11 +87,21 @@ async def api_leveling_live_feed():
 
 
 @leveling_bp.route("/api/leveling/leaderboard")
+@conditional("leveling", "names")
 async def api_leveling_leaderboard():
-    """Get leaderboard data with resolved names."""
+    """
+    Get leaderboard data with resolved names.
+
+    Without paging parameters the response is a plain list of entries. Passing
+    `offset` or `cursor` returns {entries, next_cursor, has_more} instead; pass
+    next_cursor back as `cursor` to fetch the following page.
+    """
     try:
         guild_id = request.args.get("guild_id")
-        limit = int(request.args.get("limit", 25))
+        limit = min(max(int(request.args.get("limit", 25)), 1), 100)
+        offset = int(request.args.get("offset", 0))
+        cursor = request.args.get("cursor")
+        paginated = "offset" in request.args or "cursor" in request.args
 
         if not guild_id:
             return jsonify({"error": "guild_id parameter required"}), 400
@@ -96,7 +110,8 @@ async def api_leveling_leaderboard():
             pass
 
         leveling = get_leveling_system(MockBot())
-        leaderboard = await leveling.get_leaderboard(guild_id, limit)
+        page = await leveling.get_leaderboard_page(guild_id, limit, offset=offset, cursor=cursor)
+        leaderboard = page["entries"]
 
         user_ids = [entry["user_id"] for entry in leaderboard]
         resolved_names = await bulk_resolve_names(user_ids, [guild_id])
@@ -105,6 +120,8 @@ async def api_leveling_leaderboard():
             entry["user_name"] = resolved_names.get(f"user_{entry['user_id']}", f"Unknown User ({entry['user_id'][-4:]})")
             entry["guild_name"] = resolved_names.get(f"guild_{guild_id}", f"Unknown Guild ({guild_id[-4:]})")
 
+        if paginated:
+            return jsonify(page)
         return jsonify(leaderboard)
 
     except Exception as e:
@@ -113,6 +130,7 @@ async def api_leveling_leaderboard():
 
 
 @leveling_bp.route("/api/leveling/user-stats")
+@conditional("leveling", "names")
 async def api_leveling_user_stats():
     """Get user statistics with resolved names."""
     try:
@@ -150,6 +168,7 @@ async def api_leveling_user_stats():
 
 
 @leveling_bp.route("/api/leveling/config", methods=["GET"])
+@conditional("leveling")
 async def api_leveling_config_get():
     """Get leveling configuration with proper database values."""
     try:
@@ -164,7 +183,7 @@ async def api_leveling_config_get():
                    min_cooldown_seconds, max_cooldown_seconds, min_message_chars,
                    min_message_words, daily_xp_cap, blacklisted_channels,
                    whitelisted_channels, level_up_announcements, announcement_channel_id,
-                   dm_level_notifications
+                   dm_level_notifications, daily_reset_time, daily_reset_timezone
             FROM leveling_config
             WHERE guild_id = ?
         """, (guild_id,)) as cursor:
@@ -189,7 +208,9 @@ async def api_leveling_config_get():
                 "whitelisted_channels": result[11] if result[11] is not None else "[]",
                 "level_up_announcements": bool(result[12]) if result[12] is not None else True,
                 "announcement_channel_id": result[13],
-                "dm_level_notifications": bool(result[14]) if result[14] is not None else False
+                "dm_level_notifications": bool(result[14]) if result[14] is not None else False,
+                "daily_reset_time": result[15] or "00:00",
+                "daily_reset_timezone": result[16] or "UTC"
             }
         else:
             config = {
@@ -208,7 +229,9 @@ async def api_leveling_config_get():
                 "whitelisted_channels": "[]",
                 "level_up_announcements": True,
                 "announcement_channel_id": None,
-                "dm_level_notifications": False
+                "dm_level_notifications": False,
+                "daily_reset_time": "00:00",
+                "daily_reset_timezone": "UTC"
             }
 
         return jsonify(config)
@@ -228,6 +251,16 @@ async def api_leveling_config_update():
         if not guild_id:
             return jsonify({"error": "guild_id required"}), 400
 
+        daily_reset_time = str(data.get("daily_reset_time") or "00:00")
+        daily_reset_timezone = str(data.get("daily_reset_timezone") or "UTC")
+        hour, minute = parse_reset_time(daily_reset_time)
+        if f"{hour:02d}:{minute:02d}" != daily_reset_time.zfill(5):
+            return jsonify({"error": "daily_reset_time must be HH:MM"}), 400
+        try:
+            ZoneInfo(daily_reset_timezone)
+        except (ZoneInfoNotFoundError, ValueError):
+            return jsonify({"error": f"Unknown timezone: {daily_reset_timezone}"}), 400
+
         conn = await get_leveling_db_connection()
 
         await conn.execute("""
@@ -246,7 +279,9 @@ async def api_leveling_config_update():
                 whitelisted_channels = ?,
                 level_up_announcements = ?,
                 announcement_channel_id = ?,
-                dm_level_notifications = ?
+                dm_level_notifications = ?,
+                daily_reset_time = ?,
+                daily_reset_timezone = ?
             WHERE guild_id = ?
         """, (
             data.get("enabled", True),
@@ -264,6 +299,8 @@ async def api_leveling_config_update():
             data.get("level_up_announcements", True),
             data.get("announcement_channel_id"),
             data.get("dm_level_notifications", False),
+            f"{hour:02d}:{minute:02d}",
+            daily_reset_timezone,
             guild_id
         ))
 
@@ -349,6 +386,11 @@ async def api_leveling_manual_adjust():
         await conn.commit()
         await conn.close()
 
+        class MockBot:
+            pass
+
+        await get_leveling_system(MockBot()).refresh_user_rank(str(user_id), str(guild_id))
+
         return jsonify({"success": True, "message": f"Successfully applied {adjustment_type}"})
 
     except Exception as e:
@@ -357,6 +399,7 @@ async def api_leveling_manual_adjust():
 
 
 @leveling_bp.route("/api/leveling/ranks", methods=["GET"])
+@conditional("leveling")
 async def api_leveling_ranks_get():
     """Get guild rank titles with enhanced data."""
     try:
@@ -461,6 +504,11 @@ async def api_leveling_ranks_create():
 
         await conn.close()
 
+        class MockBot:
+            pass
+
+        get_leveling_system(MockBot()).invalidate_level_index(str(guild_id))
+
         return jsonify({
             "success": True,
             "rank_id": rank_id,
@@ -529,6 +577,11 @@ async def api_leveling_ranks_update(rank_id):
         await conn.commit()
         await conn.close()
 
+        class MockBot:
+            pass
+
+        get_leveling_system(MockBot()).invalidate_level_index(str(guild_id))
+
         return jsonify({
             "success": True,
             "message": "Rank updated successfully"
@@ -567,6 +620,11 @@ async def api_leveling_ranks_delete(rank_id):
         await conn.commit()
         await conn.close()
 
+        class MockBot:
+            pass
+
+        get_leveling_system(MockBot()).invalidate_level_index(str(guild_id))
+
         return jsonify({
             "success": True,
             "message": f"Rank '{existing_rank[0]}' deleted successfully"
@@ -578,6 +636,7 @@ async def api_leveling_ranks_delete(rank_id):
 
 
 @leveling_bp.route("/api/leveling/rewards", methods=["GET"])
+@conditional("leveling")
 async def api_leveling_rewards_get():
     """Get guild level rewards."""
     try:
@@ -703,13 +762,10 @@ async def api_leveling_admin_add_xp():
         leveling = get_leveling_system(MockBot())
         pool = await get_leveling_pool()
 
-        today = datetime.utcnow().date().isoformat()
+        # The daily reset scheduler zeroes the in-memory counters, so they are current
+        today = reset_period(await leveling.get_guild_config(str(guild_id)))
         user_data = await leveling.get_user_level_data(user_id, guild_id)
-        new_daily = (
-            user_data.get("daily_xp_earned", 0) + xp
-            if user_data and user_data.get("daily_reset_date") == today
-            else xp
-        )
+        new_daily = leveling.eligibility.get_daily_xp(str(user_id), str(guild_id)) + xp
 
         if user_data:
             await pool.execute_write(
@@ -741,9 +797,9 @@ async def api_leveling_admin_add_xp():
             (user_id, guild_id, xp),
         )
 
-        cache_key = f"{user_id}:{guild_id}"
-        leveling._user_cache.pop(cache_key, None)
-        leveling._user_cache_expiry.pop(cache_key, None)
+        leveling.clear_user_cache(user_id, guild_id)
+        leveling.eligibility.set_daily_xp(str(user_id), str(guild_id), new_daily)
+        await leveling.refresh_user_rank(str(user_id), str(guild_id))
 
         level_up_result = await leveling.check_level_up(user_id, guild_id)
         updated_data = await leveling.get_user_level_data(user_id, guild_id)
@@ -810,6 +866,7 @@ async def api_leveling_admin_add_levels():
                     guild_id,
                 ),
             )
+            await leveling.refresh_user_rank(str(user_id), str(guild_id))
             level_up_result = await leveling.check_level_up(user_id, guild_id)
         else:
             level_up_result = None
@@ -861,6 +918,7 @@ async def api_leveling_admin_remove_levels():
             "UPDATE user_levels SET total_xp = ?, current_xp = 0, current_level = ? WHERE user_id = ? AND guild_id = ?",
             (required_xp, new_level, user_id, guild_id),
         )
+        await leveling.refresh_user_rank(str(user_id), str(guild_id))
 
         return jsonify({"success": True, "new_level": new_level, "total_xp": required_xp})
     except Exception as e:
@@ -869,6 +927,7 @@ async def api_leveling_admin_remove_levels():
 
 
 @leveling_bp.route("/api/leveling/guilds")
+@runs_in_bot
 async def api_leveling_guilds():
     """Get available guilds for leveling dashboard with resolved names."""
     try:
@@ -906,32 +965,30 @@ async def api_leveling_guilds():
 
 @leveling_bp.route("/api/leveling/stats")
 async def api_leveling_stats():
-    """Get leveling system statistics."""
+    """Get leveling system statistics. Today's figures come from the daily XP rollups."""
     try:
         guild_id = request.args.get("guild_id")
+        today = utc_day()
 
         conn = await get_leveling_db_connection()
 
         if guild_id:
             async with conn.execute("""
                 SELECT
-                    COUNT(*) as total_users,
-                    AVG(current_level) as avg_level,
-                    SUM(CASE WHEN DATE(last_xp_timestamp) = DATE('now') THEN daily_xp_earned ELSE 0 END) as xp_today,
-                    COUNT(CASE WHEN DATE(last_xp_timestamp) = DATE('now') THEN 1 END) as active_today
-                FROM user_levels
-                WHERE guild_id = ?
-            """, (guild_id,)) as cursor:
+                    (SELECT COUNT(*) FROM user_levels WHERE guild_id = ?) as total_users,
+                    (SELECT AVG(current_level) FROM user_levels WHERE guild_id = ?) as avg_level,
+                    (SELECT xp_awarded FROM xp_daily_guild_rollups WHERE guild_id = ? AND day = ?) as xp_today,
+                    (SELECT COUNT(*) FROM xp_daily_user_rollups WHERE guild_id = ? AND day = ?) as active_today
+            """, (guild_id, guild_id, guild_id, today, guild_id, today)) as cursor:
                 result = await cursor.fetchone()
         else:
             async with conn.execute("""
                 SELECT
-                    COUNT(*) as total_users,
-                    AVG(current_level) as avg_level,
-                    SUM(CASE WHEN DATE(last_xp_timestamp) = DATE('now') THEN daily_xp_earned ELSE 0 END) as xp_today,
-                    COUNT(CASE WHEN DATE(last_xp_timestamp) = DATE('now') THEN 1 END) as active_today
-                FROM user_levels
-            """) as cursor:
+                    (SELECT COUNT(*) FROM user_levels) as total_users,
+                    (SELECT AVG(current_level) FROM user_levels) as avg_level,
+                    (SELECT SUM(xp_awarded) FROM xp_daily_guild_rollups WHERE day = ?) as xp_today,
+                    (SELECT COUNT(DISTINCT user_id) FROM xp_daily_user_rollups WHERE day = ?) as active_today
+            """, (today, today)) as cursor:
                 result = await cursor.fetchone()
 
         await conn.close()
@@ -956,6 +1013,130 @@ async def api_leveling_stats():
         return jsonify({"error": str(e)}), 500
 
 
+@leveling_bp.route("/api/leveling/stats/daily")
+async def api_leveling_stats_daily():
+    """Per-day XP totals from the daily rollups (most recent first)."""
+    try:
+        guild_id = request.args.get("guild_id")
+        days = min(max(int(request.args.get("days", 30)), 1), 365)
+
+        conn = await get_leveling_db_connection()
+
+        if guild_id:
+            async with conn.execute("""
+                SELECT g.day, g.xp_awarded, g.awards, g.capped_awards,
+                       (SELECT COUNT(*) FROM xp_daily_user_rollups u
+                        WHERE u.guild_id = g.guild_id AND u.day = g.day) as active_users
+                FROM xp_daily_guild_rollups g
+                WHERE g.guild_id = ?
+                ORDER BY g.day DESC
+                LIMIT ?
+            """, (guild_id, days)) as cursor:
+                rows = await cursor.fetchall()
+        else:
+            async with conn.execute("""
+                SELECT g.day, SUM(g.xp_awarded), SUM(g.awards), SUM(g.capped_awards),
+                       (SELECT COUNT(DISTINCT u.user_id) FROM xp_daily_user_rollups u
+                        WHERE u.day = g.day) as active_users
+                FROM xp_daily_guild_rollups g
+                GROUP BY g.day
+                ORDER BY g.day DESC
+                LIMIT ?
+            """, (days,)) as cursor:
+                rows = await cursor.fetchall()
+
+        await conn.close()
+
+        return jsonify([
+            {
+                "day": row[0],
+                "xp_awarded": row[1] or 0,
+                "awards": row[2] or 0,
+                "capped_awards": row[3] or 0,
+                "active_users": row[4] or 0
+            }
+            for row in rows
+        ])
+
+    except Exception as e:
+        logging.error(f"Error getting daily leveling stats: {e}")
+        return jsonify({"error": str(e)}), 500
+
+
+@leveling_bp.route("/api/leveling/pipeline")
+@runs_in_bot
+async def api_leveling_pipeline():
+    """XP pipeline metrics: ledger, eligibility state, retention, daily resets and cache hit rates."""
+    try:
+        class MockBot:
+            pass
+
+        leveling = get_leveling_system(MockBot())
+        return jsonify({
+            "ledger": leveling.ledger.get_stats(),
+            "eligibility": leveling.eligibility.get_stats(),
+            "retention": leveling.retention.get_stats(),
+            "daily_reset": leveling.daily_reset.get_stats(),
+            "caches": {
+                "config": leveling._config_cache.get_stats(),
+                "users": leveling._user_cache.get_stats()
+            }
+        })
+    except Exception as e:
+        logging.error(f"Error getting leveling pipeline metrics: {e}")
+        return jsonify({"error": str(e)}), 500
+
+
+@leveling_bp.route("/api/leveling/replay", methods=["POST"])
+async def api_leveling_replay_start():
+    """Start rebuilding a guild's levels from its chat history."""
+    try:
+        data = await request.get_json()
+        guild_id = data.get("guild_id")
+        admin_id = str(data.get("admin_id", ""))
+        if not guild_id:
+            return jsonify({"error": "guild_id required"}), 400
+        if not _is_authorized_admin(admin_id):
+            return jsonify({"error": "unauthorized"}), 403
+
+        class MockBot:
+            pass
+
+        leveling = get_leveling_system(MockBot())
+        result = leveling.replay.start(str(guild_id), dry_run=bool(data.get("dry_run", False)))
+        if not result["success"]:
+            return jsonify({"error": result["reason"]}), 409
+
+        return jsonify(result), 202
+
+    except Exception as e:
+        logging.error(f"Error starting XP replay: {e}")
+        return jsonify({"error": str(e)}), 500
+
+
+@leveling_bp.route("/api/leveling/replay", methods=["GET"])
+@runs_in_bot
+async def api_leveling_replay_status():
+    """Progress and result of the latest XP replay for a guild."""
+    try:
+        guild_id = request.args.get("guild_id")
+        if not guild_id:
+            return jsonify({"error": "guild_id parameter required"}), 400
+
+        class MockBot:
+            pass
+
+        status = get_leveling_system(MockBot()).replay.get_status(str(guild_id))
+        if not status:
+            return jsonify({"error": "No replay has been run for this guild"}), 404
+
+        return jsonify(status)
+
+    except Exception as e:
+        logging.error(f"Error getting XP replay status: {e}")
+        return jsonify({"error": str(e)}), 500
+
+
 @leveling_bp.route("/api/leveling/message-templates", methods=["GET"])
 async def api_message_templates_get():
     """Get guild message templates."""
@@ -1062,6 +1243,11 @@ async def api_message_templates_create():
 
         await conn.close()
 
+        class MockBot:
+            pass
+
+        get_leveling_system(MockBot()).invalidate_templates(str(guild_id))
+
         return jsonify({
             "success": True,
             "template_id": template_id,
@@ -1127,6 +1313,11 @@ async def api_message_templates_update(template_id):
         await conn.commit()
         await conn.close()
 
+        class MockBot:
+            pass
+
+        get_leveling_system(MockBot()).invalidate_templates(str(guild_id))
+
         return jsonify({
             "success": True,
             "message": "Template updated successfully"
@@ -1165,6 +1356,11 @@ async def api_message_templates_delete(template_id):
         await conn.commit()
         await conn.close()
 
+        class MockBot:
+            pass
+
+        get_leveling_system(MockBot()).invalidate_templates(str(guild_id))
+
         return jsonify({
             "success": True,
             "message": f"Template '{existing_template[0]}' deleted successfully"
@@ -1381,6 +1577,11 @@ async def api_leveling_templates_create():
 
         await conn.close()
 
+        class MockBot:
+            pass
+
+        get_leveling_system(MockBot()).invalidate_templates(str(guild_id))
+
         return jsonify({
             "success": True,
             "template_id": template_id,
@@ -1527,6 +1728,11 @@ async def api_leveling_templates_update(template_id):
         await conn.commit()
         await conn.close()
 
+        class MockBot:
+            pass
+
+        get_leveling_system(MockBot()).invalidate_templates(str(guild_id))
+
         return jsonify({
             "success": True,
             "message": "Template updated successfully"
@@ -1565,6 +1771,11 @@ async def api_leveling_templates_delete(template_id):
         await conn.commit()
         await conn.close()
 
+        class MockBot:
+            pass
+
+        get_leveling_system(MockBot()).invalidate_templates(str(guild_id))
+
         return jsonify({
             "success": True,
             "message": f"Template '{existing_template[0]}' deleted successfully"
@@ -1637,6 +1848,7 @@ async def api_leveling_templates_preview(template_id):
 
 
 @leveling_bp.route("/api/leveling/ranges/guild/<guild_id>", methods=["GET"])
+@conditional("leveling")
 async def api_get_guild_ranges(guild_id):
     """Get all level ranges for a guild."""
     try:
@@ -1721,6 +1933,11 @@ async def api_create_level_range():
         await conn.commit()
         await conn.close()
 
+        class MockBot:
+            pass
+
+        get_leveling_system(MockBot()).invalidate_level_index(str(guild_id))
+
         return jsonify({"message": "Range added successfully"})
 
     except Exception as e:
@@ -1790,6 +2007,11 @@ async def api_update_level_range(range_id):
         await conn.commit()
         await conn.close()
 
+        class MockBot:
+            pass
+
+        get_leveling_system(MockBot()).invalidate_level_index(str(guild_id))
+
         return jsonify({"message": "Range updated successfully"})
 
     except Exception as e:
@@ -1804,7 +2026,7 @@ async def api_delete_level_range(range_id):
         conn = await get_leveling_db_connection()
 
         async with conn.execute(
-            "SELECT id FROM level_range_names WHERE id = ?",
+            "SELECT guild_id FROM level_range_names WHERE id = ?",
             (range_id,)
         ) as cursor:
             result = await cursor.fetchone()
@@ -1813,11 +2035,18 @@ async def api_delete_level_range(range_id):
             await conn.close()
             return jsonify({"error": "Range not found"}), 404
 
+        guild_id = result[0]
+
         await conn.execute("DELETE FROM level_range_names WHERE id = ?", (range_id,))
 
         await conn.commit()
         await conn.close()
 
+        class MockBot:
+            pass
+
+        get_leveling_system(MockBot()).invalidate_level_index(str(guild_id))
+
         return jsonify({"message": "Range deleted successfully"})
 
     except Exception as e:
@@ -1,15 +1,38 @@
-from quart import Blueprint, jsonify, send_from_directory
+from quart import Blueprint, jsonify, request, send_from_directory
 from werkzeug.exceptions import NotFound
 
+from ..http_cache import (
+    ENCODING_SUFFIXES,
+    negotiate_encoding,
+    precompressed_encodings,
+    static_cache_control,
+    static_file_mimetype,
+)
 from ..paths import REACT_BUILD_DIR
 
 spa_bp = Blueprint("dashboard_spa", __name__)
 
 
+async def _send_build_file(path: str):
+    """Send a file from the React build, preferring a precompressed copy the client accepts."""
+    encoding = negotiate_encoding(
+        request.headers.get("Accept-Encoding", ""), precompressed_encodings(REACT_BUILD_DIR, path)
+    )
+    if encoding:
+        response = await send_from_directory(REACT_BUILD_DIR, path + ENCODING_SUFFIXES[encoding], conditional=True)
+        response.mimetype = static_file_mimetype(path)
+        response.headers["Content-Encoding"] = encoding
+    else:
+        response = await send_from_directory(REACT_BUILD_DIR, path, conditional=True)
+    response.vary.add("Accept-Encoding")
+    response.headers["Cache-Control"] = static_cache_control(path)
+    return response
+
+
 @spa_bp.route("/")
 async def serve_react_app():
     """Serve React app."""
-    return await send_from_directory(REACT_BUILD_DIR, "index.html")
+    return await _send_build_file("index.html")
 
 
 @spa_bp.route("/<path:path>")
@@ -19,6 +42,6 @@ async def serve_react_static(path):
         return jsonify({"error": "Not found"}), 404
 
     try:
-        return await send_from_directory(REACT_BUILD_DIR, path)
+        return await _send_build_file(path)
     except NotFound:
-        return await send_from_directory(REACT_BUILD_DIR, "index.html")
+        return await _send_build_file("index.html")
@@ -7,9 +7,13 @@ import discord
 from quart import Blueprint, jsonify, request
 
 from .. import state
-from ..broadcast import broadcast_stats
+from ..api import dashboard_api
+from ..bot_bridge import runs_in_bot
+from ..broadcast import broadcast_stats, stats_broadcaster
+from ..http_cache import conditional
 from ..name_resolution import validate_guild_id
-from ..stats_service import get_enhanced_stats, real_time_stats
+from ..stats_service import gateway_latency_ms, real_time_stats
+from ..system_metrics import system_metrics
 from database_modules.ai_mode_overrides import get_ai_mode
 from database_modules import birthdays
 from database_modules import events as events_db
@@ -18,42 +22,91 @@ from database_modules import update_announcements
 system_bp = Blueprint("dashboard_system", __name__)
 
 
+async def _stats_version() -> str:
+    seq, _ = await stats_broadcaster.latest()
+    return f"stats={seq}"
+
+
 @system_bp.route("/api/stats")
+@conditional(version=_stats_version)
 async def api_stats():
-    """REST API endpoint for stats."""
-    return jsonify(await get_enhanced_stats())
+    """REST API endpoint for stats, served from the broadcaster's shared snapshot."""
+    _, snapshot = await stats_broadcaster.latest()
+    return jsonify(snapshot)
 
 
 @system_bp.route("/api/system_info")
+@runs_in_bot
 async def system_info():
-    """Get system information."""
+    """Get the latest system metrics sample."""
     try:
-        import psutil
-
-        cpu_percent = psutil.cpu_percent(interval=1)
-        memory = psutil.virtual_memory()
-        disk = psutil.disk_usage("/")
+        sample = system_metrics.latest()
+        if sample is None or "cpu_percent" not in sample:
+            return jsonify({
+                "error": "psutil not available" if sample else "No metrics sampled yet",
+                "cpu_usage": 0,
+                "memory_usage": 0,
+                "loop_lag_ms": sample["loop_lag_ms"] if sample else 0
+            })
 
         return jsonify({
-            "cpu_usage": cpu_percent,
-            "memory_usage": memory.percent,
-            "memory_total": memory.total // (1024 ** 3),
-            "memory_used": memory.used // (1024 ** 3),
-            "disk_usage": disk.percent,
-            "disk_total": disk.total // (1024 ** 3),
-            "disk_used": disk.used // (1024 ** 3)
+            "cpu_usage": sample["cpu_percent"],
+            "memory_usage": sample["memory_percent"],
+            "memory_total": sample["memory_total"] // (1024 ** 3),
+            "memory_used": sample["memory_used"] // (1024 ** 3),
+            "disk_usage": sample["disk_percent"],
+            "disk_total": sample["disk_total"] // (1024 ** 3),
+            "disk_used": sample["disk_used"] // (1024 ** 3),
+            "process_cpu_usage": sample["process_cpu_percent"],
+            "rss_mb": sample["rss_mb"],
+            "open_fds": sample["open_fds"],
+            "threads": sample["threads"],
+            "loop_lag_ms": sample["loop_lag_ms"],
+            "disk_read_bps": sample.get("disk_read_bps", 0),
+            "disk_write_bps": sample.get("disk_write_bps", 0),
+            "sampled_at": sample["timestamp"]
         })
-    except ImportError:
+    except Exception as e:
+        return jsonify({"error": str(e)})
+
+
+@system_bp.route("/api/system_info/history")
+@runs_in_bot
+async def system_info_history():
+    """Downsampled system metrics history for charts."""
+    try:
+        seconds = min(max(float(request.args.get("seconds", 900)), 1), 86400)
+        points = min(max(int(request.args.get("points", 120)), 1), 1000)
         return jsonify({
-            "error": "psutil not available",
-            "cpu_usage": 0,
-            "memory_usage": 0
+            "interval": system_metrics.interval,
+            "seconds": seconds,
+            "points": system_metrics.history(seconds, points)
         })
+    except ValueError:
+        return jsonify({"error": "seconds and points must be numbers"}), 400
     except Exception as e:
-        return jsonify({"error": str(e)})
+        logging.error(f"Error getting system metrics history: {e}")
+        return jsonify({"error": str(e)}), 500
+
+
+@system_bp.route("/api/dashboard/ipc")
+async def api_dashboard_ipc():
+    """How the dashboard is running: in the bot process, or split out with its bridge stats."""
+    if state.bot_instance is not None:
+        latency = gateway_latency_ms(state.bot_instance)
+    else:
+        # Pushed by the bot process every few seconds
+        latency = real_time_stats.stats.get("gateway_latency_ms")
+
+    return jsonify({
+        "mode": "split" if state.bot_bridge is not None else "inprocess",
+        "bridge": state.bot_bridge.get_stats() if state.bot_bridge is not None else None,
+        "gateway_latency_ms": latency
+    })
 
 
 @system_bp.route("/api/commands/list")
+@runs_in_bot
 async def api_commands_list():
     """Get live list of available commands from the bot's command tree."""
     try:
@@ -74,6 +127,7 @@ async def api_commands_list():
 
 
 @system_bp.route("/api/commands/guild/<guild_id>", methods=["GET"])
+@runs_in_bot
 async def api_guild_commands(guild_id):
     """Get commands and per-guild enablement states."""
     try:
@@ -231,6 +285,7 @@ async def api_update_settings(guild_id):
 
 
 @system_bp.route("/api/ai/modes", methods=["GET"])
+@runs_in_bot
 async def api_ai_modes():
     """List available AI modes."""
     try:
@@ -254,6 +309,7 @@ async def api_ai_modes():
 
 
 @system_bp.route("/api/ai/mode/<guild_id>", methods=["GET"])
+@runs_in_bot
 async def api_get_ai_mode(guild_id):
     """Get current AI mode for a guild."""
     try:
@@ -305,11 +361,38 @@ async def api_set_ai_mode(guild_id):
         return jsonify({"error": str(e)}), 500
 
 
+@system_bp.route("/api/ai/telemetry", methods=["GET"])
+@runs_in_bot
+async def api_ai_telemetry():
+    """AI pipeline telemetry: live aggregates plus persisted daily rollups."""
+    try:
+        if not state.bot_instance or not getattr(state.bot_instance, "ai_handler", None):
+            return jsonify({"error": "AI handler is not ready"}), 503
+
+        days = min(max(request.args.get("days", 7, type=int), 1), 90)
+        guild_id = request.args.get("guild_id")
+        if guild_id and validate_guild_id(guild_id) is None:
+            return jsonify({"error": "Invalid guild_id"}), 400
+
+        from modules.ai.anthropic.ai_telemetry import get_daily_rollups
+
+        ai_handler = state.bot_instance.ai_handler
+        return jsonify({
+            "live": ai_handler.telemetry.get_summary(),
+            "hedging": ai_handler.refusal_tracker.get_stats(),
+            "context_lookups": dict(ai_handler.context_provider.stats),
+            "daily": await get_daily_rollups(days, guild_id)
+        })
+    except Exception as e:
+        logging.error(f"Error getting AI telemetry: {e}")
+        return jsonify({"error": str(e)}), 500
+
+
 @system_bp.route("/api/bot/restart", methods=["POST"])
 async def api_bot_restart():
     """Restart the bot."""
     try:
-        real_time_stats.add_event_log("Bot restart requested via dashboard", "system")
+        dashboard_api.log_event("Bot restart requested via dashboard", "system")
         await broadcast_stats()
 
         # Schedule the restart as an async task
@@ -326,7 +409,7 @@ async def api_bot_restart():
 async def api_bot_shutdown():
     """Shutdown the bot."""
     try:
-        real_time_stats.add_event_log("Bot shutdown requested via dashboard", "system")
+        dashboard_api.log_event("Bot shutdown requested via dashboard", "system")
         await broadcast_stats()
 
         # Schedule the shutdown as an async task
@@ -403,10 +486,25 @@ async def _cleanup_for_restart():
             pass
         logging.info("Dashboard server stopped")
 
+    # In split-process mode, stop the dashboard process too
+    if state.bot_instance and getattr(state.bot_instance, 'dashboard_process', None):
+        await state.bot_instance.dashboard_process.stop()
+        logging.info("Dashboard process stopped")
+
     # Flush any pending database writes
     await flush_message_batches()
     logging.info("Message batches flushed")
 
+    # Persist AI telemetry rollups
+    if state.bot_instance and getattr(state.bot_instance, 'ai_handler', None):
+        await state.bot_instance.ai_handler.telemetry.stop()
+        logging.info("AI telemetry flushed")
+
+    # Persist pending leveling state (XP cooldowns)
+    if state.bot_instance and getattr(state.bot_instance, 'leveling_system', None):
+        await state.bot_instance.leveling_system.shutdown()
+        logging.info("Leveling state flushed")
+
     # Close all database pools
     await close_all_pools()
     logging.info("Database pools closed")
@@ -432,6 +530,11 @@ async def _cleanup_bot():
             pass
         logging.info("Dashboard server stopped")
 
+    # In split-process mode, stop the dashboard process too
+    if state.bot_instance and getattr(state.bot_instance, 'dashboard_process', None):
+        await state.bot_instance.dashboard_process.stop()
+        logging.info("Dashboard process stopped")
+
     # Stop historical fetcher if it exists
     if state.bot_instance and hasattr(state.bot_instance, 'historical_fetcher') and state.bot_instance.historical_fetcher:
         await state.bot_instance.historical_fetcher.stop()
@@ -441,6 +544,16 @@ async def _cleanup_bot():
     await flush_message_batches()
     logging.info("Message batches flushed")
 
+    # Persist AI telemetry rollups
+    if state.bot_instance and getattr(state.bot_instance, 'ai_handler', None):
+        await state.bot_instance.ai_handler.telemetry.stop()
+        logging.info("AI telemetry flushed")
+
+    # Persist pending leveling state (XP cooldowns)
+    if state.bot_instance and getattr(state.bot_instance, 'leveling_system', None):
+        await state.bot_instance.leveling_system.shutdown()
+        logging.info("Leveling state flushed")
+
     # Close all database pools
     await close_all_pools()
     logging.info("Database pools closed")
@@ -457,6 +570,7 @@ async def _cleanup_bot():
 
 
 @system_bp.route("/api/bot/config/<guild_id>", methods=["GET"])
+@runs_in_bot
 async def api_get_bot_config(guild_id):
     """Get bot configuration for a specific guild."""
     try:
@@ -0,0 +1,33 @@
+from dataclasses import dataclass
+from typing import Optional
+
+# Row types for the dashboard's largest list payloads, built straight from
+# database tuples. orjson serializes dataclasses natively without a dict per
+# row. They are deliberately not slots=True: orjson takes a much slower path
+# for slotted dataclasses than for ones with a __dict__.
+
+
+@dataclass
+class MessageRow:
+    id: int
+    user_id: str
+    username: str
+    channel_id: str
+    channel_name: str
+    message_content: str
+    timestamp: str
+
+
+@dataclass
+class XPFeedRow:
+    user_id: str
+    user_name: str
+    guild_id: str
+    guild_name: str
+    channel_id: Optional[str]
+    xp_awarded: int
+    message_length: int
+    word_count: int
+    char_count: int
+    timestamp: str
+    daily_cap_applied: bool
@@ -1,12 +1,19 @@
-from typing import Dict, Set
+from typing import Set
+
+from modules.ttl_cache import TTLCache
 
 # Bot instance for Discord API access
 bot_instance = None
 
+# Split-process mode: the bot's IPC server (in the bot process) and the
+# dashboard's bridge to it (in the dashboard process)
+ipc_server = None
+bot_bridge = None
+
 # Name resolution caches
-name_cache: Dict[str, str] = {}
-cache_expiry: Dict[str, float] = {}
 CACHE_DURATION = 300  # 5 minutes
+FALLBACK_CACHE_DURATION = 30  # Retry unresolved names sooner
+name_cache = TTLCache(maxsize=5000, ttl=CACHE_DURATION, name="dashboard_names")
 
 # Connected WebSocket clients
 connected_clients: Set = set()
@@ -17,4 +24,3 @@ def set_bot_instance(bot):
     global bot_instance
     bot_instance = bot
     name_cache.clear()
-    cache_expiry.clear()
@@ -1,15 +1,18 @@
 import logging
+import math
 import os
 import time
 from collections import deque
 from datetime import datetime
-from typing import Dict, List
+from typing import Dict, List, Optional
 
-import aiosqlite
+from database_modules.guild_stats_registry import guild_stats_registry
+from database_modules.guild_stats_writer import guild_stats_writer
 
 from . import state
 from .name_resolution import resolve_guild_name
 from .paths import DATABASE_DIR
+from .system_metrics import system_metrics
 
 
 class RealTimeStats:
@@ -138,6 +141,44 @@ class RealTimeStats:
 real_time_stats = RealTimeStats()
 
 
+def gateway_latency_ms(bot) -> Optional[float]:
+    """The bot's Discord gateway heartbeat latency, or None before the first heartbeat."""
+    latency = getattr(bot, "latency", None)
+    if latency is None or not math.isfinite(latency):
+        return None
+    return round(latency * 1000, 1)
+
+
+async def prepare_guild_databases():
+    """Migrate chat history indexes and catch up guild_stats. Writes, so it runs wherever the bot runs."""
+    from database_modules.database_utils import migrate_guild_chat_indexes
+
+    paths = _guild_db_paths_by_id()
+    for path in paths.values():
+        await migrate_guild_chat_indexes(path)
+    # Count anything stored since guild_stats was last written, e.g. before a crash
+    await guild_stats_writer.catch_up(list(paths))
+
+
+async def seed_guild_stats():
+    """Prepare the guild databases (unless the bot process does) and seed the message stats registry at startup."""
+    if state.bot_bridge is None:
+        await prepare_guild_databases()
+
+    paths = _guild_db_paths_by_id()
+    try:
+        await guild_stats_registry.seed_all(paths)
+        logging.info(
+            f"Seeded message stats for {len(paths)} guilds in {guild_stats_registry.stats['seed_ms']:.0f}ms"
+        )
+    except Exception as e:
+        logging.error(f"Error seeding guild message stats: {e}")
+
+
+def _guild_db_paths_by_id() -> Dict[str, str]:
+    return {os.path.basename(os.path.dirname(path)): path for path in _list_guild_db_paths()}
+
+
 def _list_guild_db_paths() -> List[str]:
     """List all guild chat history database paths."""
     paths: List[str] = []
@@ -202,10 +243,31 @@ async def get_database_health():
         }
 
 
+async def get_guild_breakdown_entry(guild_id: str, db_file: str, guild_name: Optional[str] = None,
+                                    is_scanning: bool = False) -> Dict:
+    """Build one guild's guild_breakdown entry from the message stats registry."""
+    guild_stats = await guild_stats_registry.get_guild_stats(guild_id, db_file)
+
+    if not guild_name:
+        guild_name = await resolve_guild_name(guild_id)
+
+    return {
+        "guild_id": guild_id,
+        "guild_name": guild_name,
+        "total_messages": guild_stats["total_messages"],
+        "unique_users": guild_stats["unique_users"],
+        "active_channels": guild_stats["active_channels"],
+        "recent_activity": guild_stats["recent_activity"],
+        "database_size_mb": round(os.path.getsize(db_file) / (1024 * 1024), 2),
+        "last_message": guild_stats["last_message"],
+        "is_scanning": is_scanning
+    }
+
+
 async def get_enhanced_stats():
     """Get comprehensive stats for the dashboard."""
     try:
-        from database_modules.database_utils import get_all_guild_settings, is_guild_scanning
+        from database_modules.database_utils import get_all_guild_settings, get_scanning_guild_ids
 
         guild_db_paths = _list_guild_db_paths()
         total_messages = 0
@@ -215,52 +277,19 @@ async def get_enhanced_stats():
 
         guild_settings = await get_all_guild_settings()
         guild_names = {s["guild_id"]: s["guild_name"] for s in guild_settings}
+        scanning_guild_ids = await get_scanning_guild_ids()
 
         for db_file in guild_db_paths:
             try:
                 guild_id = os.path.basename(os.path.dirname(db_file))
 
-                async with aiosqlite.connect(db_file) as conn:
-                    async with conn.execute("SELECT COUNT(*) FROM messages") as cursor:
-                        guild_messages = (await cursor.fetchone())[0]
-                        total_messages += guild_messages
-
-                    async with conn.execute("SELECT COUNT(DISTINCT user_id) FROM messages") as cursor:
-                        guild_users = (await cursor.fetchone())[0]
-                        unique_users += guild_users
-
-                    async with conn.execute("""
-                        SELECT COUNT(*) FROM messages
-                        WHERE datetime(timestamp) > datetime('now', '-1 hour')
-                    """) as cursor:
-                        guild_recent = (await cursor.fetchone())[0]
-                        recent_activity += guild_recent
-
-                    async with conn.execute("SELECT COUNT(DISTINCT channel_id) FROM messages") as cursor:
-                        guild_channels = (await cursor.fetchone())[0]
-
-                    async with conn.execute("SELECT timestamp FROM messages ORDER BY timestamp DESC LIMIT 1") as cursor:
-                        last_message_row = await cursor.fetchone()
-                        last_message = last_message_row[0] if last_message_row else None
-
-                db_size_mb = round(os.path.getsize(db_file) / (1024 * 1024), 2)
-                is_scanning = await is_guild_scanning(guild_id)
-
-                guild_name = guild_names.get(guild_id)
-                if not guild_name:
-                    guild_name = await resolve_guild_name(guild_id)
-
-                guild_breakdown.append({
-                    "guild_id": guild_id,
-                    "guild_name": guild_name,
-                    "total_messages": guild_messages,
-                    "unique_users": guild_users,
-                    "active_channels": guild_channels,
-                    "recent_activity": guild_recent,
-                    "database_size_mb": db_size_mb,
-                    "last_message": last_message,
-                    "is_scanning": is_scanning
-                })
+                guild_entry = await get_guild_breakdown_entry(
+                    guild_id, db_file, guild_names.get(guild_id), guild_id in scanning_guild_ids
+                )
+                total_messages += guild_entry["total_messages"]
+                unique_users += guild_entry["unique_users"]
+                recent_activity += guild_entry["recent_activity"]
+                guild_breakdown.append(guild_entry)
 
             except Exception as db_err:
                 logging.error(f"Error aggregating stats from {db_file}: {db_err}")
@@ -273,6 +302,13 @@ async def get_enhanced_stats():
         real_time_stats.update_stat("active_users", unique_users)
         real_time_stats.update_stat("database_size", health_info["database_size_mb"])
         real_time_stats.update_stat("bot_guilds", bot_guilds_count)
+        sample = system_metrics.latest()
+        if sample and "cpu_percent" in sample:
+            real_time_stats.update_stat("cpu_usage", sample["cpu_percent"])
+            real_time_stats.update_stat("memory_usage", sample["memory_percent"])
+        if state.bot_instance is not None:
+            # In split-process mode the bot pushes this instead
+            real_time_stats.update_stat("gateway_latency_ms", gateway_latency_ms(state.bot_instance))
         real_time_stats.update_uptime()
         real_time_stats.update_rates()
 
@@ -0,0 +1,189 @@
+import asyncio
+import logging
+import os
+import threading
+import time
+from collections import deque
+from typing import Any, Dict, List, Optional
+
+try:
+    import psutil
+except ImportError:
+    psutil = None
+
+# Seconds between samples
+SAMPLE_INTERVAL = float(os.getenv("DASHBOARD_METRICS_INTERVAL", "1"))
+# Samples kept in the ring buffer (one hour at the default interval)
+HISTORY_SIZE = int(os.getenv("DASHBOARD_METRICS_HISTORY", "3600"))
+# disk_usage walks the filesystem stats, so it is refreshed less often
+DISK_USAGE_INTERVAL = 30.0
+
+# Sample fields averaged when downsampling history
+AVERAGED_FIELDS = (
+    "cpu_percent", "process_cpu_percent", "memory_percent", "rss_mb", "open_fds",
+    "threads", "loop_lag_ms", "disk_read_bps", "disk_write_bps"
+)
+
+
+class SystemMetricsSampler:
+    """
+    Samples process and host metrics on a background thread.
+
+    CPU, memory, RSS, open file descriptors, thread count, disk I/O rates and
+    event-loop lag are recorded into a fixed-size ring buffer, so request
+    handlers only read the latest sample and never block on psutil. Loop lag
+    is measured by posting a callback to the event loop and timing how long it
+    takes to run; a probe that still hasn't run counts its age so far, so a
+    blocked loop shows up while it is blocked.
+    """
+
+    def __init__(self, interval: float = SAMPLE_INTERVAL, history_size: int = HISTORY_SIZE):
+        self.interval = interval
+        self._samples = deque(maxlen=history_size)
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+
+        self._process = psutil.Process() if psutil else None
+        self._probe_sent_at: Optional[float] = None
+        self._loop_lag_ms = 0.0
+        self._last_disk_io = None
+        self._disk_usage = None
+        self._disk_usage_at = 0.0
+
+    # =========================================================================
+    # LIFECYCLE
+    # =========================================================================
+
+    def start(self, loop: Optional[asyncio.AbstractEventLoop] = None) -> None:
+        """Start sampling. ``loop`` is the event loop whose lag is measured (default: the running loop)."""
+        if self._thread is not None and self._thread.is_alive():
+            return
+        self._loop = loop or asyncio.get_running_loop()
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="system-metrics", daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout=self.interval * 2)
+            self._thread = None
+
+    def _run(self) -> None:
+        if self._process is not None:
+            # The first cpu_percent call only sets the baseline
+            psutil.cpu_percent(interval=None)
+            self._process.cpu_percent(interval=None)
+
+        while not self._stop.wait(self.interval):
+            try:
+                sample = self._sample()
+                with self._lock:
+                    self._samples.append(sample)
+            except Exception as e:
+                logging.error(f"Error sampling system metrics: {e}")
+
+    # =========================================================================
+    # SAMPLING
+    # =========================================================================
+
+    def _loop_probe(self, sent_at: float) -> None:
+        self._loop_lag_ms = (time.monotonic() - sent_at) * 1000
+        self._probe_sent_at = None
+
+    def _measure_loop_lag(self) -> float:
+        sent_at = self._probe_sent_at
+        if sent_at is not None:
+            # Previous probe hasn't run yet: the loop has been busy at least this long
+            return round((time.monotonic() - sent_at) * 1000, 2)
+
+        lag_ms = self._loop_lag_ms
+        if self._loop is not None and not self._loop.is_closed():
+            sent_at = time.monotonic()
+            self._probe_sent_at = sent_at
+            self._loop.call_soon_threadsafe(self._loop_probe, sent_at)
+        return round(lag_ms, 2)
+
+    def _sample(self) -> Dict[str, Any]:
+        now = time.time()
+        sample = {
+            "timestamp": now,
+            "loop_lag_ms": self._measure_loop_lag(),
+            "threads": threading.active_count()
+        }
+        if self._process is None:
+            return sample
+
+        with self._process.oneshot():
+            sample["process_cpu_percent"] = self._process.cpu_percent(interval=None)
+            sample["rss_mb"] = round(self._process.memory_info().rss / (1024 * 1024), 1)
+            sample["threads"] = self._process.num_threads()
+            sample["open_fds"] = (
+                self._process.num_fds() if hasattr(self._process, "num_fds") else self._process.num_handles()
+            )
+
+        memory = psutil.virtual_memory()
+        sample["cpu_percent"] = psutil.cpu_percent(interval=None)
+        sample["memory_percent"] = memory.percent
+        sample["memory_total"] = memory.total
+        sample["memory_used"] = memory.used
+
+        disk_io = psutil.disk_io_counters()
+        if disk_io is not None:
+            if self._last_disk_io is not None:
+                previous, previous_at = self._last_disk_io
+                elapsed = max(now - previous_at, 1e-6)
+                sample["disk_read_bps"] = round((disk_io.read_bytes - previous.read_bytes) / elapsed)
+                sample["disk_write_bps"] = round((disk_io.write_bytes - previous.write_bytes) / elapsed)
+            self._last_disk_io = (disk_io, now)
+
+        if self._disk_usage is None or now - self._disk_usage_at >= DISK_USAGE_INTERVAL:
+            self._disk_usage = psutil.disk_usage("/")
+            self._disk_usage_at = now
+        sample["disk_percent"] = self._disk_usage.percent
+        sample["disk_total"] = self._disk_usage.total
+        sample["disk_used"] = self._disk_usage.used
+        return sample
+
+    # =========================================================================
+    # READS
+    # =========================================================================
+
+    def latest(self) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            return self._samples[-1] if self._samples else None
+
+    def history(self, seconds: float = 900, points: int = 120) -> List[Dict[str, Any]]:
+        """
+        Downsample the last ``seconds`` of samples into at most ``points`` buckets.
+
+        Each bucket averages the numeric fields and keeps the worst loop lag
+        as ``loop_lag_max_ms``, so short stalls stay visible on the chart.
+        """
+        cutoff = time.time() - seconds
+        with self._lock:
+            samples = [sample for sample in self._samples if sample["timestamp"] >= cutoff]
+        if not samples or points <= 0:
+            return []
+
+        width = max(seconds / points, self.interval)
+        buckets: Dict[int, List[Dict[str, Any]]] = {}
+        for sample in samples:
+            buckets.setdefault(int((sample["timestamp"] - cutoff) // width), []).append(sample)
+
+        history = []
+        for index in sorted(buckets):
+            bucket = buckets[index]
+            point = {"timestamp": round(cutoff + (index + 1) * width, 3), "samples": len(bucket)}
+            for field in AVERAGED_FIELDS:
+                values = [sample[field] for sample in bucket if field in sample]
+                if values:
+                    point[field] = round(sum(values) / len(values), 2)
+            point["loop_lag_max_ms"] = max(sample["loop_lag_ms"] for sample in bucket)
+            history.append(point)
+        return history
+
+
+system_metrics = SystemMetricsSampler()
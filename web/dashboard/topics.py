@@ -0,0 +1,331 @@
+import asyncio
+import logging
+import os
+from datetime import datetime, timezone
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Set
+
+from . import state
+from .name_resolution import bulk_resolve_names
+from .paths import DATABASE_DIR
+from .rows import XPFeedRow
+from .serialization import dumps
+from .stats_service import get_guild_breakdown_entry, real_time_stats
+
+# Seconds between checks for producers that poll
+GUILD_POLL_INTERVAL = 2.0
+FETCH_PROGRESS_POLL_INTERVAL = 5.0
+# Longest a notify-driven producer sleeps before checking again
+IDLE_WAIT_INTERVAL = 30.0
+
+# XP awards are batched into one leveling.feed message per interval
+FEED_FLUSH_INTERVAL = 0.5
+# Most awards sent in one leveling.feed message
+FEED_BATCH_LIMIT = 50
+
+# Caps how many producers a single client can start
+MAX_TOPICS_PER_CLIENT = 32
+
+
+class TopicProducer:
+    """How to produce one topic, or every topic under a ``prefix:``."""
+
+    __slots__ = ("run", "snapshot", "validate")
+
+    def __init__(self, run: Callable[[str], Awaitable[None]],
+                 snapshot: Optional[Callable[[str], Awaitable[Optional[str]]]] = None,
+                 validate: Optional[Callable[[str], bool]] = None):
+        self.run = run
+        self.snapshot = snapshot
+        self.validate = validate
+
+
+class TopicHub:
+    """
+    WebSocket topic subscriptions with producers that only run while watched.
+
+    The first subscriber to a topic starts its producer task and the last one
+    to leave cancels it, so nothing is computed for topics nobody is viewing.
+    Each published message is serialized once for every subscriber, and the
+    latest one is replayed to clients that subscribe later. A producer with a
+    ``snapshot`` hook (stats) sends its own initial message instead.
+    """
+
+    def __init__(self):
+        self._producers: Dict[str, TopicProducer] = {}
+        self._subscribers: Dict[str, Set] = {}
+        self._client_topics: Dict[Any, Set[str]] = {}
+        self._tasks: Dict[str, asyncio.Task] = {}
+        self._last: Dict[str, str] = {}
+        self._wakeups: Dict[str, asyncio.Event] = {}
+
+        self.stats = {
+            "messages_published": 0,
+            "bytes_sent": 0,
+            "producers_started": 0,
+            "producers_stopped": 0
+        }
+
+    # =========================================================================
+    # REGISTRATION
+    # =========================================================================
+
+    def register(self, name: str, run: Callable[[str], Awaitable[None]],
+                 snapshot: Optional[Callable[[str], Awaitable[Optional[str]]]] = None,
+                 validate: Optional[Callable[[str], bool]] = None) -> None:
+        """
+        Register a topic producer.
+
+        Args:
+            name: Topic name, or a prefix ending in ':' for parameterised topics
+            run: Coroutine function taking the topic, run while it has subscribers
+            snapshot: Optional coroutine function returning the initial message for a new subscriber
+            validate: Optional check for the parameter of a prefixed topic
+        """
+        self._producers[name] = TopicProducer(run, snapshot, validate)
+
+    def _resolve(self, topic: str) -> Optional[TopicProducer]:
+        producer = self._producers.get(topic)
+        if producer is not None:
+            return producer
+        prefix, separator, param = topic.partition(":")
+        producer = self._producers.get(prefix + separator) if separator else None
+        if producer is None or not param:
+            return None
+        if producer.validate is not None and not producer.validate(param):
+            return None
+        return producer
+
+    def topic_names(self) -> List[str]:
+        return sorted(self._producers)
+
+    # =========================================================================
+    # SUBSCRIPTIONS
+    # =========================================================================
+
+    def subscribers(self, topic: str) -> Set:
+        return self._subscribers.get(topic, set())
+
+    async def subscribe(self, client, topic: str) -> bool:
+        """Subscribe a client, starting the topic's producer if it is the first. Returns False if rejected."""
+        producer = self._resolve(topic)
+        if producer is None:
+            return False
+        client_topics = self._client_topics.setdefault(client, set())
+        if topic in client_topics:
+            return True
+        if len(client_topics) >= MAX_TOPICS_PER_CLIENT:
+            return False
+
+        # Send the current state before joining, so the client never gets an update it can't place
+        message = await producer.snapshot(topic) if producer.snapshot else self._last.get(topic)
+        if message:
+            await client.send(message)
+
+        client_topics.add(topic)
+        self._subscribers.setdefault(topic, set()).add(client)
+        if topic not in self._tasks:
+            self._tasks[topic] = asyncio.create_task(self._run_producer(topic, producer))
+            self.stats["producers_started"] += 1
+        return True
+
+    async def unsubscribe(self, client, topic: str) -> None:
+        """Unsubscribe a client, stopping the producer once the topic has no subscribers."""
+        client_topics = self._client_topics.get(client)
+        if client_topics is not None:
+            client_topics.discard(topic)
+            if not client_topics:
+                del self._client_topics[client]
+
+        subscribers = self._subscribers.get(topic)
+        if subscribers is not None:
+            subscribers.discard(client)
+            if not subscribers:
+                await self._stop(topic)
+
+    async def unsubscribe_all(self, client) -> None:
+        for topic in list(self._client_topics.get(client, ())):
+            await self.unsubscribe(client, topic)
+
+    async def _stop(self, topic: str) -> None:
+        self._subscribers.pop(topic, None)
+        self._last.pop(topic, None)
+        self._wakeups.pop(topic, None)
+        task = self._tasks.pop(topic, None)
+        if task:
+            task.cancel()
+            try:
+                await task
+            except asyncio.CancelledError:
+                pass
+            self.stats["producers_stopped"] += 1
+
+    async def _run_producer(self, topic: str, producer: TopicProducer) -> None:
+        try:
+            await producer.run(topic)
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            logging.error(f"Error in dashboard topic producer {topic}: {e}")
+
+    # =========================================================================
+    # PUBLISHING
+    # =========================================================================
+
+    async def publish(self, topic: str, data: Any) -> None:
+        """Send ``data`` to a topic's subscribers as ``{"type": topic, "data": data}``."""
+        message = dumps({"type": topic, "data": data})
+        self._last[topic] = message
+        await self.send(topic, message)
+
+    async def send(self, topic: str, message: str) -> None:
+        """Send an already serialized message to a topic's subscribers."""
+        subscribers = self._subscribers.get(topic)
+        if not subscribers:
+            return
+
+        self.stats["messages_published"] += 1
+        disconnected_clients = set()
+        for client in subscribers.copy():
+            try:
+                await client.send(message)
+                self.stats["bytes_sent"] += len(message)
+            except Exception as e:
+                logging.debug(f"Client disconnected during {topic} publish: {e}")
+                disconnected_clients.add(client)
+
+        # The endpoint's cleanup stops the producer; it can't cancel itself from here
+        subscribers.difference_update(disconnected_clients)
+        state.connected_clients.difference_update(disconnected_clients)
+
+    def notify(self, topic: str) -> None:
+        """Wake a producer waiting in ``wait`` because its data changed. No-op if it isn't running."""
+        if topic in self._tasks:
+            self._wakeups.setdefault(topic, asyncio.Event()).set()
+
+    async def wait(self, topic: str, timeout: float) -> None:
+        """Sleep until ``notify(topic)`` or ``timeout`` seconds, whichever comes first."""
+        event = self._wakeups.setdefault(topic, asyncio.Event())
+        try:
+            await asyncio.wait_for(event.wait(), timeout=timeout)
+        except asyncio.TimeoutError:
+            pass
+        event.clear()
+
+    def get_stats(self) -> Dict[str, Any]:
+        return dict(
+            self.stats,
+            clients=len(self._client_topics),
+            topics={topic: len(subscribers) for topic, subscribers in self._subscribers.items()}
+        )
+
+
+topic_hub = TopicHub()
+
+
+# =========================================================================
+# PRODUCERS
+# =========================================================================
+
+async def produce_guild_stats(topic: str) -> None:
+    """guild:<id> - one guild's guild_breakdown entry, sent when it changes."""
+    from database_modules.database_utils import is_guild_scanning
+
+    guild_id = topic.split(":", 1)[1]
+    db_file = os.path.join(DATABASE_DIR, guild_id, "chat_history.db")
+    last = None
+
+    while True:
+        try:
+            if os.path.isfile(db_file):
+                entry = await get_guild_breakdown_entry(
+                    guild_id, db_file, is_scanning=await is_guild_scanning(guild_id)
+                )
+                if entry != last:
+                    await topic_hub.publish(topic, entry)
+                    last = entry
+        except Exception as e:
+            logging.error(f"Error producing stats for guild {guild_id}: {e}")
+        await topic_hub.wait(topic, GUILD_POLL_INTERVAL)
+
+
+async def produce_leveling_feed(topic: str) -> None:
+    """leveling.feed[:<guild_id>] - XP awards as they commit, newest first."""
+    from modules.leveling_system import get_leveling_system
+
+    class MockBot:
+        pass
+
+    guild_id = topic.partition(":")[2] or None
+    buffered: List[tuple] = []
+
+    def on_batch(awards, results):
+        timestamp = datetime.now(timezone.utc).strftime("%Y-%m-%d %H:%M:%S")
+        for award in awards:
+            if guild_id is None or award.guild_id == guild_id:
+                buffered.append((award, timestamp))
+        if buffered:
+            topic_hub.notify(topic)
+
+    ledger = get_leveling_system(MockBot()).ledger
+    ledger.add_listener(on_batch)
+    try:
+        while True:
+            await topic_hub.wait(topic, IDLE_WAIT_INTERVAL)
+            if not buffered:
+                continue
+            # Let a burst of commits land in one message
+            await asyncio.sleep(FEED_FLUSH_INTERVAL)
+            batch = buffered[-FEED_BATCH_LIMIT:]
+            buffered.clear()
+
+            try:
+                resolved_names = await bulk_resolve_names(
+                    list({award.user_id for award, _ in batch}),
+                    list({award.guild_id for award, _ in batch})
+                )
+                await topic_hub.publish(topic, [XPFeedRow(
+                    award.user_id,
+                    resolved_names.get(f"user_{award.user_id}", f"Unknown User ({award.user_id[-4:]})"),
+                    award.guild_id,
+                    resolved_names.get(f"guild_{award.guild_id}", f"Unknown Guild ({award.guild_id[-4:]})"),
+                    award.channel_id, award.xp_amount, award.message_length, award.word_count,
+                    award.char_count, timestamp, bool(award.daily_cap_applied)
+                ) for award, timestamp in reversed(batch)])
+            except Exception as e:
+                logging.error(f"Error producing XP feed: {e}")
+    finally:
+        ledger.remove_listener(on_batch)
+
+
+async def produce_fetch_progress(topic: str) -> None:
+    """fetch.progress - historical fetch progress for every guild, sent when it changes."""
+    from database_modules.database_utils import get_fetch_progress
+
+    last = None
+    while True:
+        try:
+            progress = await get_fetch_progress()
+            if progress != last:
+                await topic_hub.publish(topic, progress)
+                last = progress
+        except Exception as e:
+            logging.error(f"Error producing fetch progress: {e}")
+        await topic_hub.wait(topic, FETCH_PROGRESS_POLL_INTERVAL)
+
+
+async def produce_events_log(topic: str) -> None:
+    """events.log - the recent bot events list, sent whenever an event is logged."""
+    last = None
+    while True:
+        events = list(real_time_stats.recent_events)
+        if events != last:
+            await topic_hub.publish(topic, events)
+            last = events
+        await topic_hub.wait(topic, IDLE_WAIT_INTERVAL)
+
+
+topic_hub.register("guild:", produce_guild_stats, validate=str.isdigit)
+topic_hub.register("leveling.feed", produce_leveling_feed)
+topic_hub.register("leveling.feed:", produce_leveling_feed, validate=str.isdigit)
+topic_hub.register("fetch.progress", produce_fetch_progress)
+topic_hub.register("events.log", produce_events_log)
@@ -1,25 +1,40 @@
-import json
 import logging
 
 from quart import Blueprint, websocket
 
 from . import state
-from .stats_service import get_enhanced_stats
+from .broadcast import stats_broadcaster
+from .serialization import JSONDecodeError, dumps, loads
+from .topics import topic_hub
 
 ws_bp = Blueprint("dashboard_websocket", __name__)
 
 
+def _requested_topics(data) -> list:
+    """Topics from a subscribe/unsubscribe message: {"data": {"topics": [...]}}."""
+    payload = data.get("data") or {}
+    topics = payload.get("topics", []) if isinstance(payload, dict) else payload
+    if isinstance(topics, str):
+        topics = [topics]
+    return [topic for topic in topics if isinstance(topic, str)]
+
+
 @ws_bp.websocket("/ws")
 async def websocket_endpoint():
-    """WebSocket endpoint for real-time updates."""
+    """
+    WebSocket endpoint for real-time updates.
+
+    Clients receive nothing but the connected message until they subscribe:
+    {"type": "subscribe", "data": {"topics": ["stats", "guild:<id>", "leveling.feed",
+    "leveling.feed:<guild_id>", "fetch.progress", "events.log"]}}
+    """
     ws = websocket._get_current_object()
     state.connected_clients.add(ws)
 
     try:
-        stats = await get_enhanced_stats()
-        await ws.send(json.dumps({
-            "type": "stats_update",
-            "data": stats
+        await ws.send(dumps({
+            "type": "connected",
+            "data": {"topics": topic_hub.topic_names()}
         }))
 
         while True:
@@ -27,18 +42,33 @@ async def websocket_endpoint():
                 message = await ws.receive()
                 if isinstance(message, str):
                     try:
-                        data = json.loads(message)
+                        data = loads(message)
 
                         if data.get("type") == "ping":
-                            await ws.send(json.dumps({"type": "pong"}))
-                        elif data.get("type") == "request_stats":
-                            stats = await get_enhanced_stats()
-                            await ws.send(json.dumps({
-                                "type": "stats_update",
-                                "data": stats
+                            await ws.send(dumps({"type": "pong"}))
+                        elif data.get("type") == "subscribe":
+                            subscribed, rejected = [], []
+                            for topic in _requested_topics(data):
+                                if await topic_hub.subscribe(ws, topic):
+                                    subscribed.append(topic)
+                                else:
+                                    rejected.append(topic)
+                            await ws.send(dumps({
+                                "type": "subscribed",
+                                "data": {"topics": subscribed, "rejected": rejected}
+                            }))
+                        elif data.get("type") == "unsubscribe":
+                            topics = _requested_topics(data)
+                            for topic in topics:
+                                await topic_hub.unsubscribe(ws, topic)
+                            await ws.send(dumps({
+                                "type": "unsubscribed",
+                                "data": {"topics": topics}
                             }))
-                    except json.JSONDecodeError:
-                        await ws.send(json.dumps({
+                        elif data.get("type") == "request_stats":
+                            await ws.send(await stats_broadcaster.snapshot_for_client())
+                    except JSONDecodeError:
+                        await ws.send(dumps({
                             "type": "error",
                             "message": "Invalid JSON"
                         }))
@@ -53,3 +83,4 @@ async def websocket_endpoint():
         logging.debug(f"WebSocket error: {e}")
     finally:
         state.connected_clients.discard(ws)
+        await topic_hub.unsubscribe_all(ws)
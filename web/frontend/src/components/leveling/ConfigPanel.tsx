@@ -177,6 +177,26 @@ const ConfigPanel = () => {
               </NumberInput>
             </FormControl>
 
+            <FormControl>
+              <FormLabel fontSize="sm">Daily Reset Time (HH:MM)</FormLabel>
+              <Input
+                value={formData.daily_reset_time}
+                onChange={(e) => setFormData({ ...formData, daily_reset_time: e.target.value })}
+                bg="#2A2A2A"
+                placeholder="00:00"
+              />
+            </FormControl>
+
+            <FormControl>
+              <FormLabel fontSize="sm">Daily Reset Timezone</FormLabel>
+              <Input
+                value={formData.daily_reset_timezone}
+                onChange={(e) => setFormData({ ...formData, daily_reset_timezone: e.target.value })}
+                bg="#2A2A2A"
+                placeholder="UTC"
+              />
+            </FormControl>
+
             <FormControl>
               <FormLabel fontSize="sm">Announcement Channel ID</FormLabel>
               <Input
@@ -2,7 +2,7 @@ import { useQuery, useMutation, useQueryClient } from '@tanstack/react-query'
 import { useToast } from '@chakra-ui/react'
 import api from '@/services/api'
 import { useChatStore } from '@/stores/chatStore'
-import { ChatGuild, ChatChannel, ChatMessage } from '@/types/chat'
+import { ChatGuild, ChatChannel, ChatMessage, ChatMessagePage } from '@/types/chat'
 
 export const useChatGuilds = () => {
   return useQuery({
@@ -42,23 +42,38 @@ export const useChannels = (guildId: string | null) => {
   })
 }
 
+// Pass a page's next_cursor as `before` for older messages, or its prev_cursor as `after` for newer ones
 export const useMessages = (
   guildId: string | null,
   channelId: string | null,
   limit: number = 50,
-  offset: number = 0
+  cursor: { before?: string; after?: string } = {}
 ) => {
   const { setMessages } = useChatStore()
 
   return useQuery({
-    queryKey: ['chat-messages', guildId, channelId, limit, offset],
+    queryKey: ['chat-messages', guildId, channelId, limit, cursor.before, cursor.after],
     queryFn: async () => {
-      if (!guildId || !channelId) return []
-      const { data } = await api.get<ChatMessage[]>(
-        `/chat/messages/${guildId}/${channelId}?limit=${limit}&offset=${offset}`
-      )
-      setMessages(data)
-      return data
+      if (!guildId || !channelId) return null
+      const params = new URLSearchParams({ channel_id: channelId, limit: String(limit) })
+      if (cursor.before) params.set('before', cursor.before)
+      if (cursor.after) params.set('after', cursor.after)
+      const { data } = await api.get<any>(`/chat/guild/${guildId}/messages?${params}`)
+      // Map backend response to frontend format
+      const page: ChatMessagePage = {
+        ...data,
+        messages: data.messages.map((msg: any) => ({
+          id: msg.id,
+          author_id: msg.user_id,
+          author_name: msg.username,
+          content: msg.message_content,
+          timestamp: msg.timestamp,
+          channel_id: msg.channel_id,
+          guild_id: guildId,
+        })) as ChatMessage[],
+      }
+      setMessages(page.messages)
+      return page
     },
     enabled: !!guildId && !!channelId,
   })
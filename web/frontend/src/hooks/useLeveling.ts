@@ -1,6 +1,8 @@
+import { useEffect } from 'react'
 import { useQuery, useMutation, useQueryClient } from '@tanstack/react-query'
 import { useToast } from '@chakra-ui/react'
 import api from '@/services/api'
+import { wsService } from '@/services/websocket'
 import { useLevelingStore } from '@/stores/levelingStore'
 import {
   Guild,
@@ -97,14 +99,38 @@ export const useLeaderboard = (guildId: string | null, limit: number = 10) => {
 }
 
 // XP Feed
+const XP_FEED_LIMIT = 20
+
 export const useXPFeed = (guildId: string | null) => {
   const { setXpFeed, feedPaused } = useLevelingStore()
+  const queryClient = useQueryClient()
+
+  // New awards are pushed over the WebSocket while the feed is live
+  useEffect(() => {
+    if (!guildId || feedPaused) return
+
+    const topic = `leveling.feed:${guildId}`
+    const handleAwards = (entries: XPFeedEntry[]) => {
+      const current = queryClient.getQueryData<XPFeedEntry[]>(['xp-feed', guildId]) ?? []
+      const xpFeed = [...entries, ...current].slice(0, XP_FEED_LIMIT)
+      queryClient.setQueryData(['xp-feed', guildId], xpFeed)
+      setXpFeed(xpFeed)
+    }
+
+    wsService.on(topic, handleAwards)
+    wsService.subscribe(topic)
+
+    return () => {
+      wsService.unsubscribe(topic)
+      wsService.off(topic, handleAwards)
+    }
+  }, [guildId, feedPaused, queryClient, setXpFeed])
 
   return useQuery({
     queryKey: ['xp-feed', guildId],
     queryFn: async () => {
       if (!guildId) return []
-      const { data } = await api.get<XPFeedEntry[]>(`/leveling/live-feed?guild_id=${guildId}&limit=20`)
+      const { data } = await api.get<XPFeedEntry[]>(`/leveling/live-feed?guild_id=${guildId}&limit=${XP_FEED_LIMIT}`)
       // Ensure data is always an array
       const xpFeed = Array.isArray(data) ? data : []
       if (!feedPaused) {
@@ -113,7 +139,6 @@ export const useXPFeed = (guildId: string | null) => {
       return xpFeed
     },
     enabled: !!guildId && !feedPaused,
-    refetchInterval: 5000, // Refresh every 5 seconds
     retry: 1,
   })
 }
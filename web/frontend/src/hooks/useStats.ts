@@ -2,21 +2,32 @@ import { useEffect } from 'react'
 import { wsService } from '@/services/websocket'
 import { useStatsStore } from '@/stores/statsStore'
 import { DashboardStats } from '@/types/stats'
+import { PatchOperation } from '@/utils/jsonPatch'
 
 export const useStats = () => {
-  const { stats, setStats } = useStatsStore()
+  const { stats, setStats, patchStats } = useStatsStore()
 
   useEffect(() => {
-    const handleStatsUpdate = (data: DashboardStats) => {
-      setStats(data)
+    const handleStatsUpdate = (data: DashboardStats, message: any) => {
+      setStats(data, message.seq)
+    }
+
+    const handleStatsPatch = (operations: PatchOperation[], message: any) => {
+      if (!patchStats(operations, message.base, message.seq)) {
+        wsService.send('request_stats')
+      }
     }
 
     wsService.on('stats_update', handleStatsUpdate)
+    wsService.on('stats_patch', handleStatsPatch)
+    wsService.subscribe('stats')
 
     return () => {
+      wsService.unsubscribe('stats')
       wsService.off('stats_update', handleStatsUpdate)
+      wsService.off('stats_patch', handleStatsPatch)
     }
-  }, [setStats])
+  }, [setStats, patchStats])
 
   return { stats }
 }
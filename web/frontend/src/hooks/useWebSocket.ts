@@ -10,7 +10,7 @@ export const useWebSocket = () => {
   useEffect(() => {
     wsService.connect()
 
-    const handleStatsUpdate = () => {
+    const handleConnected = () => {
       // Only update connection status and show toast if transitioning from disconnected to connected
       setIsConnected((prev) => {
         if (!prev && !hasShownConnectedToast.current) {
@@ -26,11 +26,11 @@ export const useWebSocket = () => {
       })
     }
 
-    // Monitor connection by listening to stats_update
-    wsService.on('stats_update', handleStatsUpdate)
+    // The server greets every connection before any topic is subscribed
+    wsService.on('connected', handleConnected)
 
     return () => {
-      wsService.off('stats_update', handleStatsUpdate)
+      wsService.off('connected', handleConnected)
       wsService.disconnect()
     }
   }, [toast])
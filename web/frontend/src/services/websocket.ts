@@ -1,8 +1,10 @@
-type MessageHandler = (data: any) => void
+type MessageHandler = (data: any, message: any) => void
 
 export class WebSocketService {
   private ws: WebSocket | null = null
   private handlers: Map<string, Set<MessageHandler>> = new Map()
+  // Subscriber count per topic, replayed to the server after a reconnect
+  private topics: Map<string, number> = new Map()
   private reconnectAttempts = 0
   private maxReconnectAttempts = 5
   private reconnectDelay = 2000
@@ -16,6 +18,9 @@ export class WebSocketService {
     this.ws.onopen = () => {
       console.log('WebSocket connected')
       this.reconnectAttempts = 0
+      if (this.topics.size > 0) {
+        this.send('subscribe', { topics: Array.from(this.topics.keys()) })
+      }
     }
 
     this.ws.onmessage = (event) => {
@@ -23,7 +28,7 @@ export class WebSocketService {
         const message = JSON.parse(event.data)
         const handlers = this.handlers.get(message.type)
         if (handlers) {
-          handlers.forEach(handler => handler(message.data))
+          handlers.forEach(handler => handler(message.data, message))
         }
       } catch (error) {
         console.error('WebSocket message error:', error)
@@ -63,6 +68,26 @@ export class WebSocketService {
     }
   }
 
+  subscribe(topic: string) {
+    const count = this.topics.get(topic) ?? 0
+    this.topics.set(topic, count + 1)
+    if (count === 0) {
+      this.send('subscribe', { topics: [topic] })
+    }
+  }
+
+  unsubscribe(topic: string) {
+    const count = this.topics.get(topic) ?? 0
+    if (count <= 1) {
+      this.topics.delete(topic)
+      if (count === 1) {
+        this.send('unsubscribe', { topics: [topic] })
+      }
+    } else {
+      this.topics.set(topic, count - 1)
+    }
+  }
+
   send(type: string, data?: any) {
     if (this.ws?.readyState === WebSocket.OPEN) {
       this.ws.send(JSON.stringify({ type, data }))
@@ -6,13 +6,14 @@ interface ChatState {
   selectedChannel: string | null
   messages: ChatMessage[]
   channels: ChatChannel[]
-  messageOffset: number
+  // Keyset cursor of the page being viewed; null is the newest page
+  messageCursor: string | null
 
   setSelectedGuild: (guildId: string | null) => void
   setSelectedChannel: (channelId: string | null) => void
   setMessages: (messages: ChatMessage[]) => void
   setChannels: (channels: ChatChannel[]) => void
-  setMessageOffset: (offset: number) => void
+  setMessageCursor: (cursor: string | null) => void
 }
 
 export const useChatStore = create<ChatState>((set) => ({
@@ -20,11 +21,11 @@ export const useChatStore = create<ChatState>((set) => ({
   selectedChannel: null,
   messages: [],
   channels: [],
-  messageOffset: 0,
+  messageCursor: null,
 
   setSelectedGuild: (guildId) => set({ selectedGuild: guildId, selectedChannel: null }),
-  setSelectedChannel: (channelId) => set({ selectedChannel: channelId, messageOffset: 0 }),
+  setSelectedChannel: (channelId) => set({ selectedChannel: channelId, messageCursor: null }),
   setMessages: (messages) => set({ messages }),
   setChannels: (channels) => set({ channels }),
-  setMessageOffset: (offset) => set({ messageOffset: offset }),
+  setMessageCursor: (cursor) => set({ messageCursor: cursor }),
 }))
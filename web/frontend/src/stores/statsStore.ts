@@ -1,12 +1,25 @@
 import { create } from 'zustand'
 import { DashboardStats } from '@/types/stats'
+import { applyPatch, PatchOperation } from '@/utils/jsonPatch'
 
 interface StatsState {
   stats: DashboardStats | null
-  setStats: (stats: DashboardStats) => void
+  seq: number | null
+  setStats: (stats: DashboardStats, seq?: number) => void
+  patchStats: (operations: PatchOperation[], base: number, seq: number) => boolean
 }
 
-export const useStatsStore = create<StatsState>((set) => ({
+export const useStatsStore = create<StatsState>((set, get) => ({
   stats: null,
-  setStats: (stats) => set({ stats }),
+  seq: null,
+  setStats: (stats, seq) => set({ stats, seq: seq ?? null }),
+  // Returns false when the patch isn't based on our snapshot and a full resync is needed
+  patchStats: (operations, base, seq) => {
+    const { stats, seq: current } = get()
+    if (!stats || current !== base) {
+      return false
+    }
+    set({ stats: applyPatch(stats, operations), seq })
+    return true
+  },
 }))
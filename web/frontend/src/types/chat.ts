@@ -21,6 +21,15 @@ export interface ChatMessage {
   guild_id: string
 }
 
+export interface ChatMessagePage {
+  messages: ChatMessage[]
+  total: number
+  has_more: boolean
+  has_newer: boolean
+  next_cursor: string | null
+  prev_cursor: string | null
+}
+
 export interface FetchProgress {
   guild_id: string
   guild_name: string
@@ -15,6 +15,8 @@ export interface LevelingConfig {
   level_up_announcements: boolean
   announcement_channel_id: string | null
   dm_level_notifications: boolean
+  daily_reset_time: string
+  daily_reset_timezone: string
 }
 
 export interface LeaderboardEntry {
@@ -0,0 +1,42 @@
+export interface PatchOperation {
+  op: 'add' | 'remove' | 'replace'
+  path: string
+  value?: any
+}
+
+const parsePointer = (path: string): string[] =>
+  path === '' ? [] : path.slice(1).split('/').map(part => part.replace(/~1/g, '/').replace(/~0/g, '~'))
+
+// Copies only the containers along each patched path, so untouched branches keep their identity
+export const applyPatch = <T>(document: T, operations: PatchOperation[]): T => {
+  let root: any = document
+
+  for (const operation of operations) {
+    const keys = parsePointer(operation.path)
+    if (keys.length === 0) {
+      root = operation.value
+      continue
+    }
+
+    root = Array.isArray(root) ? [...root] : { ...root }
+    let parent = root
+    for (const key of keys.slice(0, -1)) {
+      const child = parent[key]
+      parent[key] = Array.isArray(child) ? [...child] : { ...child }
+      parent = parent[key]
+    }
+
+    const last = keys[keys.length - 1]
+    if (operation.op === 'remove') {
+      if (Array.isArray(parent)) {
+        parent.splice(Number(last), 1)
+      } else {
+        delete parent[last]
+      }
+    } else {
+      parent[last] = operation.value
+    }
+  }
+
+  return root
+}